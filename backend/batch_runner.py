@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import os
+import re
+import glob
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+from jacoco_report import CoverageReport, find_jacoco_agent, find_jacoco_core, focal_class_path, worker_coverage_report
+from javac_runner import TestCounts, maven_like_test_log
+from jvm_worker import JvmWorker, JvmWorkerError, JvmWorkerTimeout
+from maven_utils import DEFAULT_LOCAL_REPOSITORY
+from test_results import parse_compiler_diagnostics
+from workspace_pool import write_file
+
+logger = logging.getLogger(__name__)
+
+_JUNIT5_IMPORT_RE = re.compile(r'^\s*import\s+(static\s+)?org\.junit\.jupiter\.', re.MULTILINE)
+
+
+def detect_junit_version(test_case: str) -> int:
+    return 5 if _JUNIT5_IMPORT_RE.search(test_case) else 4
+
+
+def rename_test_class(test_case: str, old_name: str, new_name: str) -> str:
+    # the class declaration, its constructors and self references all go by the simple name
+    return re.sub(rf'\b{re.escape(old_name)}\b', new_name, test_case)
+
+
+def compile_errors_by_file(build_log: str) -> Dict[str, str]:
+    """The compiler errors of a Maven log grouped by source file, each error with its indented detail lines."""
+    errors: Dict[str, List[str]] = {}
+    for diagnostic in parse_compiler_diagnostics(build_log):
+        errors.setdefault(diagnostic.path, []).append(diagnostic.format())
+    return {path: '\n'.join(lines) for path, lines in errors.items()}
+
+
+@dataclass
+class BatchTest:
+    test_case: str
+    # where the test was meant to go, and where it is written within the batch (renamed if the path is taken)
+    test_case_path: str
+    batch_path: str
+    class_fqn: str
+    junit_version: int
+    compile_log: str = ''
+    compile_success: bool = False
+    test_log: str = ''
+    execute_success: bool = False
+    coverage_file: Optional[str] = None
+    coverage_report: Optional[CoverageReport] = None
+
+
+class BatchTestRunner:
+    """Run many generated tests of one project with a single Maven compilation and a single JVM.
+
+    Tests that do not compile are taken out one compilation at a time, so they cannot fail the rest. The others run
+    one by one in a JVM worker started with the JaCoCo agent; its execution data is dumped after each test and the
+    same worker reads the coverage report of the focal class out of it with the JaCoCo core, so no Maven runs per test.
+    """
+
+    max_compile_rounds = 10
+
+    def __init__(self, runner: Any, worker: Optional[JvmWorker] = None) -> None:
+        self.runner = runner
+        self.configs = runner.configs
+        self.worker = worker
+
+    def plan(self, test_cases: Sequence[str], test_case_paths: Sequence[str]) -> List[BatchTest]:
+        tests, taken = [], set()
+        for test_case, test_case_path in zip(test_cases, test_case_paths):
+            test_dir, file_name = os.path.split(test_case_path)
+            class_name = os.path.splitext(file_name)[0]
+            batch_path, batch_class_name, index = test_case_path, class_name, 1
+            while batch_path in taken:
+                index += 1
+                batch_class_name = f'{class_name}_{index}'
+                batch_path = f'{test_dir}/{batch_class_name}.java'
+            taken.add(batch_path)
+            if batch_class_name != class_name:
+                test_case = rename_test_class(test_case, class_name, batch_class_name)
+            class_fqn = os.path.splitext(batch_path.split('/src/test/java/')[1])[0].replace('/', '.')
+            tests.append(BatchTest(test_case, test_case_path, batch_path, class_fqn, detect_junit_version(test_case)))
+        return tests
+
+    def compile(self, project_dir: str, tests: List[BatchTest]) -> None:
+        """Compile all tests with one `mvn clean test-compile`, isolating the ones that break it."""
+        pending = list(tests)
+        clean = True
+        for _ in range(self.max_compile_rounds):
+            if not pending:
+                return
+            args = ['mvn', 'clean', 'test-compile', '-Dcheckstyle.skip=true'] if clean else ['mvn', 'test-compile', '-Dcheckstyle.skip=true']
+            build_log = self.runner.run_maven(args, project_dir)
+            clean = False
+            if 'BUILD SUCCESS' in build_log:
+                for each in pending:
+                    each.compile_success = True
+                    each.compile_log = build_log
+                return
+            errors = compile_errors_by_file(build_log)
+            broken = [each for each in pending if each.batch_path.replace('\\', '/') in errors]
+            if not broken:
+                # nothing to blame on a generated test (e.g. the main sources do not compile), they all fail alike
+                break
+            for each in broken:
+                each.compile_log = f'[ERROR] COMPILATION ERROR : \n{errors[each.batch_path]}\n[INFO] BUILD FAILURE\n'
+                os.remove(each.batch_path)
+            pending = [each for each in pending if each not in broken]
+            logger.info(f'{len(broken)} generated tests do not compile, compiling the other {len(pending)} again')
+        for each in pending:
+            each.compile_log = build_log
+
+    def _start_worker(self, work_dir: str) -> JvmWorker:
+        agent = find_jacoco_agent(self.configs.maven_local_repository or DEFAULT_LOCAL_REPOSITORY)
+        if agent is None:
+            logger.warning('No JaCoCo agent in the local Maven repository, the batch runs without coverage')
+            return JvmWorker(work_dir)
+        return JvmWorker(work_dir, jvm_args=[f'-javaagent:{agent}=output=none'])
+
+    def execute(self, project_dir: str, tests: List[BatchTest]) -> None:
+        runnable = [each for each in tests if each.compile_success]
+        if not runnable:
+            return
+        target_dir = os.path.join(project_dir, 'target')
+        classpath = [os.path.join(target_dir, 'test-classes'), os.path.join(target_dir, 'classes')] + self.runner.dependency_classpath(project_dir)
+        coverage_dir = os.path.join(target_dir, 'batch-coverage')
+        os.makedirs(coverage_dir, exist_ok=True)
+        worker = self.worker or self._start_worker(os.path.join(self.configs.runner_cache_dir, 'batch-worker'))
+        with_coverage = any(each.startswith('-javaagent:') for each in worker.jvm_args)
+        jacoco_classpath = find_jacoco_core(self.configs.maven_local_repository or DEFAULT_LOCAL_REPOSITORY) if with_coverage else None
+        if with_coverage and jacoco_classpath is None:
+            logger.warning('No JaCoCo core in the local Maven repository, the coverage of the batch is not reported')
+        try:
+            for each in runnable:
+                test_classpath = classpath
+                if each.junit_version != 4 and self.configs.junit_console_launcher:
+                    # the standalone console jar bundles the JUnit Platform launcher, which projects rarely depend on
+                    test_classpath = classpath + [self.configs.junit_console_launcher]
+                payload = {'type': 'run', 'class_name': each.class_fqn, 'classpath': test_classpath, 'junit_version': each.junit_version}
+                if with_coverage:
+                    payload['coverage_file'] = os.path.join(coverage_dir, f'{each.class_fqn}.exec')
+                try:
+                    response = worker.request(payload, self.configs.test_timeout)
+                except JvmWorkerTimeout as e:
+                    # the next request starts a fresh worker
+                    response = {'error': f'{e}, the test was terminated'}
+                except JvmWorkerError as e:
+                    response = {'error': str(e)}
+                if 'error' in response:
+                    counts, output = TestCounts(run=1, errors=1), f'[ERROR] {each.class_fqn}: {response["error"]}\n'
+                else:
+                    counts, output = TestCounts(response['run'], response['failures'], response['errors'], response['skipped']), response['output']
+                    if with_coverage:
+                        each.coverage_file = payload['coverage_file']
+                        if jacoco_classpath is not None:
+                            each.coverage_report = self.coverage_report(worker, jacoco_classpath, target_dir, each)
+                each.test_log = maven_like_test_log(each.class_fqn, counts, output)
+                each.execute_success = counts.run > 0 and counts.failures == 0 and counts.errors == 0
+        finally:
+            if self.worker is None:
+                worker.stop()
+
+    def coverage_report(self, worker: JvmWorker, jacoco_classpath: List[str], target_dir: str, test: BatchTest) -> Optional[CoverageReport]:
+        """The coverage of the focal class (and its nested classes) by a single test, read from its execution data."""
+        focal_class = os.path.join(target_dir, 'classes', focal_class_path(test.test_case_path))
+        class_files = glob.glob(f'{glob.escape(focal_class)}.class') + glob.glob(f'{glob.escape(focal_class)}$*.class')
+        payload = {'type': 'coverage', 'jacoco_classpath': jacoco_classpath, 'exec_files': [test.coverage_file], 'class_files': class_files, 'report': True}
+        try:
+            response = worker.request(payload, self.configs.test_timeout)
+        except JvmWorkerError as e:
+            response = {'error': str(e)}
+        if 'error' in response:
+            logger.error(f'Failed to read the coverage of {test.class_fqn}: {response["error"]}')
+            return None
+        return worker_coverage_report(response['reports'][0])
+
+    def run(self, project_dir: str, test_cases: Sequence[str], test_case_paths: Sequence[str]) -> List[BatchTest]:
+        tests = self.plan(test_cases, test_case_paths)
+        for each in tests:
+            write_file(each.batch_path, each.test_case)
+        try:
+            self.compile(project_dir, tests)
+            self.execute(project_dir, tests)
+        finally:
+            for each in tests:
+                if os.path.exists(each.batch_path):
+                    os.remove(each.batch_path)
+        return tests
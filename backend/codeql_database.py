@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from process_runner import run_streaming
+
+logger = logging.getLogger(__name__)
+
+ProgressListener = Callable[[str, Dict], None]
+
+# the files a CodeQL database of a Java project is extracted from, whatever the build tool
+SOURCE_SUFFIXES = ('.java', '.kt', '.xml', '.gradle', '.kts', '.properties')
+_SKIPPED_DIRS = {'target', 'build', 'node_modules', 'out'}
+# written into a database directory once it is complete, with the fingerprint and time of its build
+BUILD_INFO_FILE = 'intention-test-build.json'
+# the databases of older source trees kept besides the current one, sessions may still be querying them
+KEEP_PREVIOUS = 1
+
+
+def source_fingerprint(project_path: str) -> str:
+    """A digest of the path, size and modification time of every source and build file of a project."""
+    entries = []
+    for root, dirs, files in os.walk(project_path):
+        dirs[:] = [each for each in dirs if each not in _SKIPPED_DIRS and not each.startswith('.')]
+        for file in files:
+            if not file.endswith(SOURCE_SUFFIXES):
+                continue
+            path = os.path.join(root, file)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append(f'{os.path.relpath(path, project_path)}\0{stat.st_size}\0{stat.st_mtime_ns}')
+    digest = hashlib.sha256()
+    for entry in sorted(entries):
+        digest.update(entry.replace('\\', '/').encode('utf8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def read_build_info(database_path: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(database_path, BUILD_INFO_FILE), 'r', encoding='utf8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class CodeQLDatabase:
+    """The CodeQL database of a project, built in a background thread and kept in line with its sources.
+
+    Each database lives in `databases_dir/<fingerprint>`, so that the server finds the database of an unchanged tree
+    again after a restart instead of creating it anew. The sources are polled every `watch_interval` seconds and a new
+    database is created next to the current one when they change; the current one is used until it is complete.
+    """
+
+    def __init__(self, project_path: str, databases_dir: str, codeql: str, build_command: str = '', watch_interval: float = 60,
+                 timeout: float = 0) -> None:
+        self.project_path = project_path
+        self.databases_dir = databases_dir
+        self.codeql = codeql
+        # empty extracts the sources without building them (--build-mode=none)
+        self.build_command = build_command
+        self.watch_interval = watch_interval
+        self.timeout = timeout
+        # idle, building or failed
+        self.state = 'idle'
+        self.error: Optional[str] = None
+        self.database_path: Optional[str] = None
+        # time.time() when the current database was created
+        self.built_at: Optional[float] = None
+        self._listeners: List[ProgressListener] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.database_path is not None
+
+    def seconds_since_build(self) -> Optional[float]:
+        """Seconds since the current database was created, None without a database."""
+        return None if self.built_at is None else max(time.time() - self.built_at, 0.0)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name=f'codeql-database-{os.path.basename(self.databases_dir)}', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def refresh(self) -> None:
+        """Check the sources now, without waiting for the next poll, and retry a failed build."""
+        self._wake.set()
+
+    def subscribe(self, listener: ProgressListener) -> Callable[[], None]:
+        """Call `listener(status, info)` when a build starts or ends, until the returned function is called."""
+        with self._lock:
+            self._listeners.append(listener)
+
+        def unsubscribe():
+            with self._lock:
+                if listener in self._listeners:
+                    self._listeners.remove(listener)
+        return unsubscribe
+
+    def status(self) -> Dict:
+        info = {'state': self.state, 'ready': self.ready, 'database': self.database_path, 'seconds_since_build': self.seconds_since_build()}
+        if self.error is not None:
+            info['error'] = self.error
+        return info
+
+    def _notify(self) -> None:
+        with self._lock:
+            listeners = list(self._listeners)
+        info = self.status()
+        for listener in listeners:
+            try:
+                listener('codeql', info)
+            except Exception as e:
+                logger.warning(f'CodeQL database listener failed: {e}')
+
+    def _use(self, database_path: str, info: Dict) -> None:
+        self.database_path, self.built_at = database_path, info['built_at']
+
+    def _create(self, fingerprint: str) -> None:
+        database_path = os.path.join(self.databases_dir, fingerprint)
+        tmp_path = f'{database_path}.{os.getpid()}.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        args = [self.codeql, 'database', 'create', tmp_path, '--language=java', f'--source-root={self.project_path}', '--overwrite']
+        args += [f'--command={self.build_command}'] if self.build_command else ['--build-mode=none']
+        logger.info(f'Creating the CodeQL database of {self.project_path}: {args}')
+        result = run_streaming(args, cwd=self.project_path, timeout=self.timeout or None, merge_stderr=True)
+        if result.returncode != 0:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            reason = 'timed out' if result.timed_out else f'exited with {result.returncode}'
+            raise RuntimeError(f'codeql database create {reason}:\n{result.stdout[-2000:]}')
+        info = {'fingerprint': fingerprint, 'project_path': self.project_path, 'built_at': time.time()}
+        with open(os.path.join(tmp_path, BUILD_INFO_FILE), 'w', encoding='utf8') as f:
+            json.dump(info, f)
+        shutil.rmtree(database_path, ignore_errors=True)
+        os.replace(tmp_path, database_path)
+        self._use(database_path, info)
+
+    def _databases(self) -> List[Tuple[float, str, Dict]]:
+        """(build time, path, build info) of the complete databases, the newest first."""
+        databases = []
+        if os.path.isdir(self.databases_dir):
+            for name in os.listdir(self.databases_dir):
+                path = os.path.join(self.databases_dir, name)
+                info = read_build_info(path)
+                if info is not None:
+                    databases.append((info['built_at'], path, info))
+        return sorted(databases, key=lambda each: each[0], reverse=True)
+
+    def _remove_old_databases(self) -> None:
+        previous = [path for _, path, _ in self._databases() if path != self.database_path]
+        for path in previous[KEEP_PREVIOUS:]:
+            logger.info(f'Removing the outdated CodeQL database {path}')
+            shutil.rmtree(path, ignore_errors=True)
+
+    def _build(self, fingerprint: str) -> None:
+        self.state, self.error = 'building', None
+        self._notify()
+        try:
+            os.makedirs(self.databases_dir, exist_ok=True)
+            self._create(fingerprint)
+            self._remove_old_databases()
+            self.state = 'idle'
+        except Exception as e:
+            # the current database stays in use, the next change of the sources tries again
+            logger.error(f'Failed to create the CodeQL database of {self.project_path}: {e}')
+            self.state, self.error = 'failed', str(e)
+        self._notify()
+
+    def _run(self) -> None:
+        databases = self._databases()
+        if databases:
+            # queries run against the newest database, however old, until the one of the current sources is created
+            _, database_path, info = databases[0]
+            self._use(database_path, info)
+        fingerprint, requested = None, False
+        # polling wakes up every watch_interval seconds, without watching only refresh() does
+        timeout = self.watch_interval if self.watch_interval > 0 else None
+        while not self._stopped:
+            current = source_fingerprint(self.project_path)
+            if current != fingerprint or (requested and self.state == 'failed'):
+                fingerprint = current
+                database_path = os.path.join(self.databases_dir, fingerprint)
+                info = read_build_info(database_path)
+                if info is not None:
+                    # built before, e.g. by an earlier run of the server
+                    self._use(database_path, info)
+                    self._notify()
+                else:
+                    self._build(fingerprint)
+            requested = self._wake.wait(timeout)
+            self._wake.clear()
+
+
+_databases: Dict[str, CodeQLDatabase] = {}
+_databases_lock = threading.Lock()
+
+
+def get_codeql_database(project_path: str, databases_dir: str, codeql: str, build_command: str = '', watch_interval: float = 60,
+                        timeout: float = 0) -> CodeQLDatabase:
+    """The started database of a project, shared by all sessions of the server."""
+    with _databases_lock:
+        if databases_dir not in _databases:
+            _databases[databases_dir] = CodeQLDatabase(project_path, databases_dir, codeql, build_command, watch_interval, timeout)
+            _databases[databases_dir].start()
+        return _databases[databases_dir]
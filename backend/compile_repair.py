@@ -0,0 +1,322 @@
+from __future__ import annotations
+
+import os
+import re
+import threading
+import zipfile
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# candidates from earlier tiers win over later ones when a simple name is ambiguous
+TIER_PROJECT_MAIN, TIER_JDK, TIER_PROJECT_TEST, TIER_JAR = range(4)
+
+# JDK classes are not part of the Maven classpath, so the most frequently forgotten imports are listed here
+JDK_COMMON_CLASSES = {
+    'java.util': [
+        'List', 'ArrayList', 'LinkedList', 'Map', 'HashMap', 'LinkedHashMap', 'TreeMap', 'Set', 'HashSet',
+        'LinkedHashSet', 'TreeSet', 'Collection', 'Collections', 'Arrays', 'Iterator', 'Optional', 'Objects',
+        'UUID', 'Date', 'Locale', 'Properties', 'Random', 'Queue', 'Deque', 'ArrayDeque', 'Stack', 'Vector',
+        'Comparator', 'Scanner', 'StringJoiner', 'NoSuchElementException', 'ConcurrentModificationException',
+    ],
+    'java.util.function': ['Function', 'BiFunction', 'Supplier', 'Consumer', 'BiConsumer', 'Predicate', 'BiPredicate', 'UnaryOperator', 'BinaryOperator'],
+    'java.util.stream': ['Stream', 'Collectors', 'IntStream'],
+    'java.util.concurrent': [
+        'ExecutorService', 'Executors', 'TimeUnit', 'ConcurrentHashMap', 'CountDownLatch', 'Future',
+        'CompletableFuture', 'Callable', 'TimeoutException', 'ExecutionException',
+    ],
+    'java.util.concurrent.atomic': ['AtomicInteger', 'AtomicLong', 'AtomicBoolean', 'AtomicReference'],
+    'java.util.regex': ['Pattern', 'Matcher'],
+    'java.io': [
+        'File', 'IOException', 'InputStream', 'OutputStream', 'ByteArrayInputStream', 'ByteArrayOutputStream',
+        'FileInputStream', 'FileOutputStream', 'Reader', 'Writer', 'StringReader', 'StringWriter', 'PrintWriter',
+        'PrintStream', 'BufferedReader', 'InputStreamReader', 'UncheckedIOException', 'Serializable', 'FileNotFoundException',
+    ],
+    'java.nio.file': ['Path', 'Paths', 'Files'],
+    'java.nio.charset': ['StandardCharsets', 'Charset'],
+    'java.math': ['BigDecimal', 'BigInteger'],
+    'java.time': ['LocalDate', 'LocalDateTime', 'LocalTime', 'Duration', 'Instant', 'ZoneId'],
+    'java.net': ['URI', 'URL', 'URISyntaxException', 'MalformedURLException'],
+    'java.lang.reflect': ['Method', 'Field', 'InvocationTargetException'],
+    'java.text': ['SimpleDateFormat', 'ParseException'],
+}
+
+# JUnit types exist in both flavours on many classpaths, so they are resolved by the JUnit version instead of the index
+JUNIT_TYPES = {
+    4: {name: 'org.junit' for name in ('Test', 'Before', 'After', 'BeforeClass', 'AfterClass', 'Ignore', 'Rule', 'Assert', 'Assume')},
+    5: {name: 'org.junit.jupiter.api' for name in ('Test', 'BeforeEach', 'AfterEach', 'BeforeAll', 'AfterAll', 'Disabled', 'DisplayName', 'Nested', 'Assertions', 'Assumptions')},
+}
+JUNIT_ASSERTIONS = {
+    4: ('org.junit.Assert', {'assertEquals', 'assertNotEquals', 'assertTrue', 'assertFalse', 'assertNull', 'assertNotNull', 'assertSame', 'assertNotSame', 'assertArrayEquals', 'assertThrows', 'fail'}),
+    5: ('org.junit.jupiter.api.Assertions', {'assertEquals', 'assertNotEquals', 'assertTrue', 'assertFalse', 'assertNull', 'assertNotNull', 'assertSame', 'assertNotSame', 'assertArrayEquals', 'assertThrows', 'assertAll', 'assertDoesNotThrow', 'fail'}),
+}
+MOCKITO_CLASS = 'org.mockito.Mockito'
+MOCKITO_STATICS = {'mock', 'spy', 'when', 'verify', 'times', 'never', 'any', 'eq', 'doReturn', 'doThrow', 'doNothing', 'anyString', 'anyInt'}
+
+# Maven: "[ERROR] /p/FooTest.java:[12,9] cannot find symbol"; javac: "/p/FooTest.java:12: error: cannot find symbol"
+_MAVEN_DIAGNOSTIC_RE = re.compile(r'^\[ERROR\]\s+(?P<path>.+?\.java):\[(?P<line>\d+),(?P<column>\d+)\]\s+(?P<message>.*)$')
+_JAVAC_DIAGNOSTIC_RE = re.compile(r'^(?P<path>.+?\.java):(?P<line>\d+):\s+error:\s+(?P<message>.*)$')
+_SYMBOL_RE = re.compile(r'^\s*symbol:\s+(?P<kind>class|method|variable|static)\s+(?P<name>[\w$]+)')
+_PACKAGE_RE = re.compile(r'^\s*package\s+([\w.]+)\s*;')
+_IMPORT_RE = re.compile(r'^\s*import\s+(static\s+)?([\w.]+)(\.\*)?\s*;')
+
+
+@dataclass
+class CompileDiagnostic:
+    path: str
+    line: int
+    message: str
+    symbol_kind: Optional[str] = None
+    symbol_name: Optional[str] = None
+
+
+@dataclass
+class RepairResult:
+    test_case: str
+    fixes: List[str] = field(default_factory=list)
+    unresolved: List[CompileDiagnostic] = field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        return len(self.fixes) > 0
+
+
+def parse_compile_errors(log: str) -> List[CompileDiagnostic]:
+    diagnostics: List[CompileDiagnostic] = []
+    for each_line in log.split('\n'):
+        match = _MAVEN_DIAGNOSTIC_RE.match(each_line.strip()) or _JAVAC_DIAGNOSTIC_RE.match(each_line.strip())
+        if match:
+            diagnostics.append(CompileDiagnostic(match.group('path'), int(match.group('line')), match.group('message').strip()))
+            continue
+        symbol = _SYMBOL_RE.match(each_line)
+        if symbol and diagnostics and diagnostics[-1].symbol_name is None:
+            diagnostics[-1].symbol_kind = symbol.group('kind')
+            diagnostics[-1].symbol_name = symbol.group('name')
+    return diagnostics
+
+
+def expected_package(test_case_path: str) -> Optional[str]:
+    if '/src/test/java/' not in test_case_path:
+        return None
+    rel_dir = os.path.dirname(test_case_path.split('/src/test/java/')[1])
+    return rel_dir.replace('/', '.')
+
+
+class ClassIndex:
+    """Simple class name -> candidate packages, built from the project sources and the dependency jars."""
+
+    def __init__(self) -> None:
+        self._classes: Dict[str, Set[Tuple[int, str]]] = {}
+
+    def add(self, simple_name: str, package: str, tier: int) -> None:
+        self._classes.setdefault(simple_name, set()).add((tier, package))
+
+    def has_class(self, qualified_name: str) -> bool:
+        package, _, simple_name = qualified_name.rpartition('.')
+        return any(pkg == package for _, pkg in self._classes.get(simple_name, ()))
+
+    def candidates(self, simple_name: str) -> List[Tuple[int, str]]:
+        return sorted(self._classes.get(simple_name, ()))
+
+    def lookup(self, simple_name: str, near_package: str = '') -> Optional[str]:
+        candidates = self.candidates(simple_name)
+        if not candidates:
+            return None
+        best_tier = candidates[0][0]
+        best = [pkg for tier, pkg in candidates if tier == best_tier]
+        if len(best) == 1:
+            return best[0]
+
+        # prefer the package sharing the longest prefix with the test's own package
+        def shared_prefix(pkg: str) -> int:
+            shared = 0
+            for a, b in zip(pkg.split('.'), near_package.split('.')):
+                if a != b:
+                    break
+                shared += 1
+            return shared
+
+        scores = sorted(((shared_prefix(pkg), pkg) for pkg in best), reverse=True)
+        if scores[0][0] > scores[1][0]:
+            return scores[0][1]
+        return None
+
+    def add_source_tree(self, source_root: str, tier: int, exclude: Iterable[str] = ()) -> None:
+        excluded = {os.path.abspath(each) for each in exclude}
+        for root, _, files in os.walk(source_root):
+            package = os.path.relpath(root, source_root).replace(os.sep, '.')
+            package = '' if package == '.' else package
+            for file in files:
+                if file.endswith('.java') and os.path.abspath(os.path.join(root, file)) not in excluded:
+                    self.add(file[:-5], package, tier)
+
+    def add_jar(self, jar_path: str) -> None:
+        try:
+            with zipfile.ZipFile(jar_path) as jar:
+                names = jar.namelist()
+        except (OSError, zipfile.BadZipFile) as e:
+            logger.warning(f'Cannot index dependency jar {jar_path}: {e}')
+            return
+        for name in names:
+            if not name.endswith('.class') or '$' in name or name.startswith('META-INF/') or name.endswith('module-info.class'):
+                continue
+            package, _, simple_name = name[:-6].rpartition('/')
+            self.add(simple_name, package.replace('/', '.'), TIER_JAR)
+
+    @classmethod
+    def build(cls, project_dir: str, classpath: Iterable[str] = (), exclude: Iterable[str] = ()) -> 'ClassIndex':
+        index = cls()
+        index.add_source_tree(os.path.join(project_dir, 'src', 'main', 'java'), TIER_PROJECT_MAIN)
+        index.add_source_tree(os.path.join(project_dir, 'src', 'test', 'java'), TIER_PROJECT_TEST, exclude)
+        for package, names in JDK_COMMON_CLASSES.items():
+            for name in names:
+                index.add(name, package, TIER_JDK)
+        for each in classpath:
+            if each.endswith('.jar'):
+                index.add_jar(each)
+        return index
+
+
+_index_cache: Dict[str, Tuple[tuple, ClassIndex]] = {}
+_index_lock = threading.Lock()
+
+
+def _source_tree_signature(project_dir: str) -> tuple:
+    signature = []
+    for source_root in ('src/main/java', 'src/test/java'):
+        n_files, latest = 0, 0.0
+        for root, _, files in os.walk(os.path.join(project_dir, source_root)):
+            latest = max(latest, os.stat(root).st_mtime)
+            n_files += len(files)
+        signature.append((n_files, latest))
+    return tuple(signature)
+
+
+def get_class_index(project_dir: str, classpath: Iterable[str] = ()) -> ClassIndex:
+    """Return a cached `ClassIndex`, rebuilt when Java files are added to or removed from the project."""
+    classpath = tuple(classpath)
+    signature = (_source_tree_signature(project_dir), classpath)
+    with _index_lock:
+        cached = _index_cache.get(project_dir)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    index = ClassIndex.build(project_dir, classpath)
+    with _index_lock:
+        _index_cache[project_dir] = (signature, index)
+    return index
+
+
+def detect_junit_version(test_case: str, default: int = 4) -> int:
+    if 'org.junit.jupiter' in test_case:
+        return 5
+    if re.search(r'^\s*import\s+(static\s+)?org\.junit\.', test_case, re.MULTILINE):
+        return 4
+    return default
+
+
+def add_imports(test_case: str, imports: Iterable[str]) -> str:
+    lines = test_case.split('\n')
+    existing = {each.strip() for each in lines}
+    new_lines = [f'import {each};' for each in imports if f'import {each};' not in existing]
+    if not new_lines:
+        return test_case
+
+    insert_at, after_package = 0, False
+    for idx, each_line in enumerate(lines):
+        if _IMPORT_RE.match(each_line):
+            insert_at, after_package = idx + 1, False
+        elif _PACKAGE_RE.match(each_line) and insert_at == 0:
+            insert_at, after_package = idx + 1, True
+    if after_package:
+        new_lines = [''] + new_lines
+    lines[insert_at:insert_at] = new_lines
+    return '\n'.join(lines)
+
+
+def fix_package_declaration(test_case: str, package: str) -> Tuple[str, Optional[str]]:
+    lines = test_case.split('\n')
+    for idx, each_line in enumerate(lines):
+        match = _PACKAGE_RE.match(each_line)
+        if match:
+            if match.group(1) == package:
+                return test_case, None
+            lines[idx] = f'package {package};'
+            return '\n'.join(lines), f'package {match.group(1)} -> {package}'
+        if each_line.strip() and not each_line.strip().startswith(('//', '/*', '*')):
+            break
+    if not package:
+        return test_case, None
+    return f'package {package};\n\n{test_case}', f'added package {package}'
+
+
+def repair_test_case(test_case: str, error_log: str, test_case_path: str, class_index: ClassIndex, junit_version: int = 4) -> RepairResult:
+    """Patch missing imports and a mismatched package declaration without involving the LLM."""
+    result = RepairResult(test_case)
+
+    package = expected_package(test_case_path)
+    if package is not None:
+        result.test_case, fix = fix_package_declaration(result.test_case, package)
+        if fix:
+            result.fixes.append(fix)
+
+    junit_version = detect_junit_version(result.test_case, junit_version)
+    assertion_class, assertion_methods = JUNIT_ASSERTIONS[junit_version]
+    has_mockito = class_index.has_class(MOCKITO_CLASS)
+    source_lines = test_case.split('\n')
+    test_file_name = os.path.basename(test_case_path)
+
+    new_imports: List[str] = []
+    replaced_imports: Dict[str, str] = {}
+    for diagnostic in parse_compile_errors(error_log):
+        if os.path.basename(diagnostic.path) != test_file_name:
+            continue
+        source_line = source_lines[diagnostic.line - 1] if 0 < diagnostic.line <= len(source_lines) else ''
+        import_match = _IMPORT_RE.match(source_line)
+
+        # a wrongly qualified import of a class that exists elsewhere in the project or its dependencies
+        if import_match and not import_match.group(1) and not import_match.group(3):
+            qualified_name = import_match.group(2)
+            simple_name = qualified_name.rpartition('.')[2]
+            found = class_index.lookup(simple_name, package or '')
+            if found and f'{found}.{simple_name}' != qualified_name:
+                replaced_imports[qualified_name] = f'{found}.{simple_name}'
+                continue
+            result.unresolved.append(diagnostic)
+            continue
+
+        if not diagnostic.message.startswith('cannot find symbol') or diagnostic.symbol_name is None:
+            result.unresolved.append(diagnostic)
+            continue
+
+        name = diagnostic.symbol_name
+        if diagnostic.symbol_kind == 'class':
+            found = JUNIT_TYPES[junit_version].get(name) or class_index.lookup(name, package or '')
+            if found is not None:
+                new_imports.append(f'{found}.{name}')
+                continue
+        elif diagnostic.symbol_kind == 'method':
+            if name in assertion_methods:
+                new_imports.append(f'static {assertion_class}.{name}')
+                continue
+            if has_mockito and name in MOCKITO_STATICS:
+                new_imports.append(f'static {MOCKITO_CLASS}.{name}')
+                continue
+        result.unresolved.append(diagnostic)
+
+    if replaced_imports:
+        lines = result.test_case.split('\n')
+        for idx, each_line in enumerate(lines):
+            import_match = _IMPORT_RE.match(each_line)
+            if import_match and not import_match.group(1) and import_match.group(2) in replaced_imports:
+                lines[idx] = f'import {replaced_imports[import_match.group(2)]};'
+                result.fixes.append(f'import {import_match.group(2)} -> {replaced_imports[import_match.group(2)]}')
+        result.test_case = '\n'.join(lines)
+
+    new_imports = list(dict.fromkeys(new_imports))
+    if new_imports:
+        result.test_case = add_imports(result.test_case, new_imports)
+        result.fixes.extend(f'import {each}' for each in new_imports)
+
+    return result
@@ -1,6 +1,7 @@
 from user_config import global_config
 import os
 import re
+import shutil
 
 class Configs:
     def __init__(self, project_name, tester_path = '', llm_name_override: str | None = None) -> None:
@@ -30,13 +31,62 @@ class Configs:
         else:
             self.workspace = f'{self.root_dir}/intention_test_extension'
 
-        # Align with dump_collect_pairs: it writes to backend/data/{project}.json
-        self.corpus_path =  f'{self.root_dir}/data/{project_name}.json'
+        # Align with dump_collect_pairs: it writes to backend/data/{project}.jsonl, see corpus_store.py
+        self.corpus_path =  f'{self.root_dir}/data/{project_name}.jsonl'
+        # a single JSON array, as written before the JSONL corpus, still read until the first rebuild
+        self.legacy_corpus_path = f'{self.root_dir}/data/{project_name}.json'
         self.project_without_test_file_path = f'{self.workspace}/data/repos_removing_test/{project_name}'
         self.project_with_test_file_path = f'{self.workspace}/data/repos_with_test/{project_name}'
         
         self.generation_log_dir = f'{self.workspace}/data/generation_logs/{project_name}'
         self.test_case_run_log_dir = f'{self.workspace}/data/test_case_running_logs/{project_name}'
+        self.runner_cache_dir = f'{self.workspace}/data/runner_cache/{project_name}'
+
+        # how generated test cases are compiled and executed, see TestCaseRunner.RUNNER_MODES
+        self.runner_mode = global_config.get('runner', 'mode', fallback='maven')
+        # junit-platform-console-standalone jar used by the `javac` mode for JUnit 5, searched on the test classpath if empty
+        self.junit_console_launcher = global_config.get('runner', 'junit_console_launcher', fallback='')
+        # seconds a single generated test may run before it is terminated
+        self.test_timeout = global_config.getfloat('runner', 'test_timeout', fallback=120)
+        # builds running at once across all sessions, 0 for the number of cores divided by the cores one build keeps busy
+        self.runner_parallelism = global_config.getint('runner', 'parallelism', fallback=0)
+        self.runner_build_weight = global_config.getint('runner', 'build_weight', fallback=2)
+        # wall-clock seconds of a whole build (0 for no limit), and per-process CPU seconds and address space caps (POSIX only)
+        self.build_timeout = global_config.getfloat('runner', 'build_timeout', fallback=600)
+        self.cpu_time_limit = global_config.getint('runner', 'cpu_time_limit', fallback=0)
+        self.memory_limit_mb = global_config.getint('runner', 'memory_limit_mb', fallback=0)
+        # outcomes of already built (test source, project snapshot) pairs, 0 entries disables the cache
+        self.outcome_cache_size = global_config.getint('runner', 'outcome_cache_size', fallback=2000)
+        self.outcome_cache_path = f'{self.runner_cache_dir}/outcomes.sqlite'
+        # classes JaCoCo instruments and reports (see TestCaseRunner.COVERAGE_SCOPES), and whether each attempt or only the passing test is measured
+        self.coverage_scope = global_config.get('runner', 'coverage_scope', fallback='project')
+        self.coverage_runs = global_config.get('runner', 'coverage_runs', fallback='every_run')
+        # generated tests of an evaluation run (run_all_test_cases) compiled by one Maven build and run in one JVM, 0 builds each on its own
+        self.batch_size = global_config.getint('runner', 'batch_size', fallback=0)
+        # build offline once the plugins and dependencies of the project are resolved into the local repository (empty for ~/.m2/repository)
+        self.maven_offline = global_config.getboolean('runner', 'offline', fallback=False)
+        self.maven_local_repository = global_config.get('runner', 'local_repository', fallback='')
+
+        # concurrent sessions build in private copies of repos_removing_test, 0 builds in the shared tree itself
+        self.workspace_pool_size = global_config.getint('workspace', 'pool_size', fallback=0)
+        self.workspace_pool_dir = f'{self.workspace}/data/workspaces/{project_name}'
+        # auto, reflink, hardlink or copy, see workspace_pool.CLONE_METHODS
+        self.workspace_clone = global_config.get('workspace', 'clone', fallback='auto')
+
+        # seconds between two polls of the project tests, whose changes rebuild the corpus in the background, 0 to build it only once
+        self.corpus_watch_interval = global_config.getfloat('corpus', 'watch_interval', fallback=10)
+        # the Python extractors of collect_pairs in place of their javaparser jars, see utils.IN_PROCESS_UTILITIES
+        self.corpus_in_process_extractor = global_config.getboolean('corpus', 'in_process_extractor', fallback=False)
+
+        # CodeQL CLI and the databases created from the project sources, one per source tree, see codeql_database.py
+        self.codeql_path = global_config.get('tools', 'codeql', fallback='')
+        self.codeql_database_dir = f'{self.workspace}/data/codeql_databases/{project_name}'
+        # command building the project while CodeQL extracts it, empty to extract the sources without building them
+        self.codeql_build_command = global_config.get('codeql', 'build_command', fallback='')
+        # seconds between two polls of the project sources, whose changes create a new database in the background, 0 to create it only once
+        self.codeql_watch_interval = global_config.getfloat('codeql', 'watch_interval', fallback=60)
+        # wall-clock seconds `codeql database create` may take, 0 for no limit
+        self.codeql_timeout = global_config.getfloat('codeql', 'timeout', fallback=1800)
 
         # dataset relevant paths
         self.coverage_human_labeled_dir = f'{self.root_dir}/data/collected_coverages'
@@ -61,5 +111,14 @@ class Configs:
         }[project_name]
 
 
+    def existing_corpus_path(self):
+        for path in (self.corpus_path, self.legacy_corpus_path):
+            if os.path.exists(path):
+                return path
+        return None
+
     def is_corpus_prepared(self):
-        return os.path.exists(self.corpus_path)
+        return self.existing_corpus_path() is not None
+
+    def is_codeql_available(self):
+        return bool(self.codeql_path) and shutil.which(self.codeql_path) is not None
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import os
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# dump_collect_pairs(project_path, progress=...), with progress(analyzed files, files to analyze), returns the number of pairs
+BuildFunction = Callable[..., Optional[int]]
+ProgressListener = Callable[[str, Dict], None]
+
+_SKIPPED_DIRS = {'target', 'build', 'node_modules'}
+
+
+def test_sources_snapshot(project_path: str) -> Dict[str, Tuple[int, int]]:
+    """(mtime, size) of every Java file under the src/test/java directories of a project, modules included."""
+    snapshot = {}
+    for root, dirs, files in os.walk(project_path):
+        dirs[:] = [each for each in dirs if each not in _SKIPPED_DIRS and not each.startswith('.')]
+        if 'src/test/java' not in root.replace('\\', '/'):
+            continue
+        for file in files:
+            if not file.endswith('.java'):
+                continue
+            path = os.path.join(root, file)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+
+class CorpusBuilder:
+    """Build the focal/test corpus of a project in a background thread and keep it up to date with its tests.
+
+    The first build starts as soon as the builder does. Afterwards the test sources are polled every `watch_interval`
+    seconds and the corpus is built again when they change, which only analyzes the changed files (see the manifest
+    of collect_pairs). Requests that come in before the first build is done are served without references.
+    """
+
+    def __init__(self, project_path: str, corpus_path: str, build: BuildFunction, watch_interval: float = 10) -> None:
+        self.project_path = project_path
+        self.corpus_path = corpus_path
+        self.build = build
+        self.watch_interval = watch_interval
+        # idle, building, failed or empty (built, but the project has no focal/test pairs);
+        # progress is (analyzed files, files to analyze) of the running build
+        self.state = 'idle'
+        self.progress = (0, 0)
+        # pairs of the last build, None before it or if the build function does not tell
+        self.n_pairs: Optional[int] = None
+        self.error: Optional[str] = None
+        self._listeners: List[ProgressListener] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return os.path.exists(self.corpus_path)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name=f'corpus-builder-{os.path.basename(self.corpus_path)}', daemon=True)
+        self._wake.set()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def refresh(self) -> None:
+        """Build again now, without waiting for the next poll."""
+        self._wake.set()
+
+    def subscribe(self, listener: ProgressListener) -> Callable[[], None]:
+        """Call `listener(status, info)` on the progress of the builds, until the returned function is called."""
+        with self._lock:
+            self._listeners.append(listener)
+
+        def unsubscribe():
+            with self._lock:
+                if listener in self._listeners:
+                    self._listeners.remove(listener)
+        return unsubscribe
+
+    def status(self) -> Dict:
+        done, total = self.progress
+        info = {'state': self.state, 'ready': self.ready, 'analyzed_files': done, 'total_files': total, 'pairs': self.n_pairs}
+        if self.error is not None:
+            info['error'] = self.error
+        return info
+
+    def _notify(self) -> None:
+        with self._lock:
+            listeners = list(self._listeners)
+        info = self.status()
+        for listener in listeners:
+            try:
+                listener('corpus', info)
+            except Exception as e:
+                logger.warning(f'Corpus progress listener failed: {e}')
+
+    def _on_progress(self, done: int, total: int) -> None:
+        self.progress = (done, total)
+        self._notify()
+
+    def _build(self) -> None:
+        self.state, self.progress, self.error = 'building', (0, 0), None
+        self._notify()
+        logger.info(f'{"Refreshing" if self.ready else "Building"} the test-focal corpus of {self.project_path} in the background')
+        try:
+            self.n_pairs = self.build(self.project_path, progress=self._on_progress)
+            # not a failure: the corpus is written and the next build only runs when the tests change
+            self.state = 'empty' if self.n_pairs == 0 else 'idle'
+        except Exception as e:
+            # the next change of the tests tries again, the requests meanwhile go on with the old corpus or none
+            logger.error(f'Failed to build the test-focal corpus of {self.project_path}: {e}', exc_info=True)
+            self.state, self.error = 'failed', str(e)
+        self._notify()
+
+    def _run(self) -> None:
+        snapshot = test_sources_snapshot(self.project_path)
+        # polling wakes up every watch_interval seconds, without watching only refresh() does
+        timeout = self.watch_interval if self.watch_interval > 0 else None
+        while True:
+            requested = self._wake.wait(timeout)
+            if self._stopped:
+                return
+            self._wake.clear()
+            current = test_sources_snapshot(self.project_path) if timeout is not None else snapshot
+            if not requested and current == snapshot:
+                continue
+            snapshot = current
+            self._build()
+
+
+_builders: Dict[str, CorpusBuilder] = {}
+_builders_lock = threading.Lock()
+
+
+def get_corpus_builder(project_path: str, corpus_path: str, build: BuildFunction, watch_interval: float = 10) -> CorpusBuilder:
+    """The started builder of a corpus, shared by all sessions of the server."""
+    with _builders_lock:
+        if corpus_path not in _builders:
+            _builders[corpus_path] = CorpusBuilder(project_path, corpus_path, build, watch_interval)
+            _builders[corpus_path].start()
+        return _builders[corpus_path]
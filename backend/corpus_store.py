@@ -0,0 +1,288 @@
+"""
+The focal/test corpus on disk: one JSON pair per line, written as the pairs are found and read back one at a time.
+
+An index next to the corpus maps each focal method name (without its parameters) to the positions and byte offsets of
+its pairs, so that a lookup reads only those lines. Corpora written before as a single JSON array are still read.
+
+Loaded in memory, e.g. the coverage dataset of dataset.py, pairs are a ColumnarCorpus: names and paths are interned and
+the texts are kept once each in a memory-mapped blob file, released by close().
+"""
+from __future__ import annotations
+
+import os
+import json
+import mmap
+import hashlib
+import tempfile
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+INDEX_VERSION = 1
+
+
+def index_path(corpus_path: str) -> str:
+    return f'{os.path.splitext(corpus_path)[0]}.index.json'
+
+
+def method_key(focal_method_name: str) -> str:
+    # Class::::name(Type) and Class::::name(OtherType) are looked up together, as overloads are by the generator
+    return focal_method_name.split('(')[0]
+
+
+def is_legacy_corpus(corpus_path: str) -> bool:
+    """Whether the corpus is a single JSON array, as dump_collect_pairs wrote it before the JSONL format."""
+    with open(corpus_path, 'rb') as f:
+        while True:
+            chunk = f.read(4096)
+            if not chunk:
+                return False
+            stripped = chunk.lstrip()
+            if stripped:
+                return stripped.startswith(b'[')
+
+
+def write_corpus(corpus_path: str, pairs: Iterable[Dict], index: bool = True, allow_empty: bool = True) -> int:
+    """Write the pairs one per line as they come and, with `index`, the index of their focal method names.
+
+    Both files are replaced at once when all pairs are written, since the server may be reading the previous corpus.
+    Without `allow_empty`, a ValueError is raised instead of replacing the corpus when there are no pairs.
+    Returns the number of pairs written.
+    """
+    tmp_path = f'{corpus_path}.{os.getpid()}.tmp'
+    names: Dict[str, List[Tuple[int, int]]] = {}
+    count = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            for pair in pairs:
+                if index:
+                    names.setdefault(method_key(pair.get('focal_method_name', '')), []).append((count, f.tell()))
+                f.write(json.dumps(pair, ensure_ascii=False).encode('utf8'))
+                f.write(b'\n')
+                count += 1
+    except BaseException:
+        # e.g. the analysis producing the pairs failed, the previous corpus stays as it was
+        os.remove(tmp_path)
+        raise
+    if count == 0 and not allow_empty:
+        os.remove(tmp_path)
+        raise ValueError(f'No focal/test pairs to write to {corpus_path}')
+    os.replace(tmp_path, corpus_path)
+    if index:
+        _write_index(corpus_path, names, count)
+    elif os.path.exists(index_path(corpus_path)):
+        os.remove(index_path(corpus_path))
+    return count
+
+
+def _write_index(corpus_path: str, names: Dict[str, List[Tuple[int, int]]], count: int) -> None:
+    stat = os.stat(corpus_path)
+    path = index_path(corpus_path)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf8') as f:
+        # the size and time of the corpus tell whether the index still describes it
+        json.dump({'version': INDEX_VERSION, 'corpus_size': stat.st_size, 'corpus_mtime_ns': stat.st_mtime_ns,
+                   'count': count, 'names': names}, f)
+    os.replace(tmp_path, path)
+
+
+def load_index(corpus_path: str) -> Optional[Dict]:
+    """The index of the corpus, None if there is none or it was written for another version of the corpus."""
+    try:
+        with open(index_path(corpus_path), 'r', encoding='utf8') as f:
+            index = json.load(f)
+        stat = os.stat(corpus_path)
+    except (OSError, ValueError):
+        return None
+    if index.get('version') != INDEX_VERSION or index.get('corpus_size') != stat.st_size or index.get('corpus_mtime_ns') != stat.st_mtime_ns:
+        return None
+    return index
+
+
+def iter_corpus(corpus_path: str) -> Iterator[Dict]:
+    """The pairs of the corpus in order, read one line at a time (a legacy JSON corpus is loaded at once)."""
+    if is_legacy_corpus(corpus_path):
+        with open(corpus_path, 'r', encoding='utf8') as f:
+            yield from json.load(f)
+        return
+    with open(corpus_path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def corpus_size(corpus_path: str) -> int:
+    index = load_index(corpus_path)
+    if index is not None:
+        return index['count']
+    return sum(1 for _ in iter_corpus(corpus_path))
+
+
+def find_pairs(corpus_path: str, focal_method_name: str) -> Iterator[Tuple[int, Dict]]:
+    """(position in the corpus, pair) of the pairs of a focal method, overloads included.
+
+    With an up-to-date index only the lines of those pairs are read, otherwise the whole corpus is scanned.
+    """
+    key = method_key(focal_method_name)
+    index = load_index(corpus_path)
+    if index is None:
+        for position, pair in enumerate(iter_corpus(corpus_path)):
+            if method_key(pair.get('focal_method_name', '')) == key:
+                yield position, pair
+        return
+    with open(corpus_path, 'rb') as f:
+        for position, offset in index['names'].get(key, []):
+            f.seek(offset)
+            yield position, json.loads(f.readline())
+
+
+class InternedColumn(Sequence):
+    """A column of short, repeated values (names, paths), each distinct value stored once."""
+
+    def __init__(self) -> None:
+        self._values: List[object] = []
+        self._ids: Dict[object, int] = {}
+        self._rows = array('I')
+
+    def append(self, value: object) -> None:
+        if value not in self._ids:
+            self._ids[value] = len(self._values)
+            self._values.append(value)
+        self._rows.append(self._ids[value])
+
+    @property
+    def n_distinct(self) -> int:
+        return len(self._values)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._values[each] for each in self._rows[i]]
+        return self._values[self._rows[i]]
+
+
+class BlobColumn(Sequence):
+    """A column of large texts, read from the memory-mapped blob file of its corpus by offset and length."""
+
+    def __init__(self, blobs: 'BlobFile') -> None:
+        self._blobs = blobs
+        self._offsets = array('Q')
+        self._lengths = array('Q')
+
+    def append(self, text: str) -> None:
+        offset, length = self._blobs.add(text)
+        self._offsets.append(offset)
+        self._lengths.append(length)
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[each] for each in range(*i.indices(len(self)))]
+        return self._blobs.read(self._offsets[i], self._lengths[i])
+
+
+class BlobFile:
+    """Texts appended to an anonymous temporary file, each distinct text once, and memory-mapped when complete.
+
+    The pages of the mapping belong to the page cache rather than the server process, so the texts of a corpus that
+    is not being read take no resident memory.
+    """
+
+    def __init__(self) -> None:
+        self._file = tempfile.TemporaryFile(prefix='corpus-', suffix='.blobs')
+        self._size = 0
+        # digest -> (offset, length) while the corpus is built, then dropped
+        self._seen: Optional[Dict[bytes, Tuple[int, int]]] = {}
+        self._map: Optional[mmap.mmap] = None
+
+    def add(self, text: str) -> Tuple[int, int]:
+        assert self._seen is not None, 'the blob file is closed for writing'
+        data = text.encode('utf8')
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        if digest not in self._seen:
+            self._file.write(data)
+            self._seen[digest] = (self._size, len(data))
+            self._size += len(data)
+        return self._seen[digest]
+
+    def seal(self) -> None:
+        self._seen = None
+        self._file.flush()
+        if self._size > 0:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def read(self, offset: int, length: int) -> str:
+        if length == 0:
+            return ''
+        assert self._map is not None, 'the blob file is still being written'
+        return self._map[offset:offset + length].decode('utf8')
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self) -> 'BlobFile':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class ColumnarCorpus(Mapping):
+    """Records stored column by column, e.g. `corpus['corpus_fm'][i]` as with the parallel lists it replaces.
+
+    Values of `interned` columns are stored once per distinct value, texts of `blob` columns once per distinct text in
+    a memory-mapped blob file, which suits pairs that share the same focal class and context. The owner closes it, or
+    uses it as a context manager, to release the blob file.
+    """
+
+    def __init__(self, interned: Sequence[str], blobs: Sequence[str]) -> None:
+        self.blob_file = BlobFile()
+        self._columns: Dict[str, Sequence] = {name: InternedColumn() for name in interned}
+        self._columns.update({name: BlobColumn(self.blob_file) for name in blobs})
+        self.n_rows = 0
+
+    @classmethod
+    def build(cls, records: Iterable[Dict], interned: Sequence[str], blobs: Sequence[str]) -> 'ColumnarCorpus':
+        corpus = cls(interned, blobs)
+        for record in records:
+            for name, column in corpus._columns.items():
+                column.append(record[name])
+            corpus.n_rows += 1
+        corpus.blob_file.seal()
+        return corpus
+
+    def row(self, i: int) -> Dict:
+        return {name: column[i] for name, column in self._columns.items()}
+
+    def rows(self) -> Iterator[Dict]:
+        for i in range(self.n_rows):
+            yield self.row(i)
+
+    def close(self) -> None:
+        self.blob_file.close()
+
+    def __enter__(self) -> 'ColumnarCorpus':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __getitem__(self, name: str) -> Sequence:
+        return self._columns[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._columns)
+
+    def __len__(self) -> int:
+        return len(self._columns)
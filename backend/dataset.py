@@ -2,7 +2,39 @@ import json
 import os
 import re
 from collections import namedtuple
+from collections.abc import Sequence
+from corpus_store import ColumnarCorpus
 CoveragePair = namedtuple('CoveragePair', ['project_name', 'focal_file_path', 'focal_method_name', 'coverage', 'focal_method', 'context', 'focal_file_skeleton', 'test_case', 'test_case_name', 'test_case_path', 'references'])
+# the fields of CoveragePair repeated across pairs, interned, and its texts, kept once each in a memory-mapped blob file
+COVERAGE_NAME_FIELDS = ('project_name', 'focal_file_path', 'focal_method_name', 'test_case_name', 'test_case_path', 'references')
+COVERAGE_TEXT_FIELDS = ('coverage', 'focal_method', 'context', 'focal_file_skeleton', 'test_case')
+
+
+class CoverageData(Sequence):
+    """The CoveragePair of each pair, put together from the columns of a ColumnarCorpus when it is accessed.
+
+    Closing it, or leaving its `with` block, releases the blob file of the columns.
+    """
+
+    def __init__(self, columns: ColumnarCorpus):
+        self.columns = columns
+
+    def close(self):
+        self.columns.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.columns.n_rows
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[each] for each in range(*i.indices(len(self)))]
+        return CoveragePair(**self.columns.row(i))
 
 
 class Dataset:
@@ -12,57 +44,43 @@ class Dataset:
         self.coverage_human_labeled = None
 
     def load_coverage_data_jacoco(self):
+        # the caller closes the returned CoverageData, e.g. `with dataset.load_coverage_data_jacoco() as coverage_data:`
         path = os.path.join(self.configs.coverage_human_labeled_dir, f'{self.configs.project_name}.json')
         coverage_data = self._load_coverage_data_jacoco(path)
         return coverage_data
 
     def _load_coverage_data_jacoco(self, path: str):
-        coverage_data = []
+        # the pairs of the methods of a focal class share its context and skeleton, which are then stored once
+        return CoverageData(ColumnarCorpus.build((pair._asdict() for pair in self.iter_coverage_data_jacoco(path)), COVERAGE_NAME_FIELDS, COVERAGE_TEXT_FIELDS))
+
+    def iter_coverage_data_jacoco(self, path: str = None):
+        """The CoveragePair of each pair of a coverage dataset, decoding the file one focal file at a time."""
+        if path is None:
+            path = os.path.join(self.configs.coverage_human_labeled_dir, f'{self.configs.project_name}.json')
         with open(path, 'r') as f:
-            data = json.load(f)
-        for each_focal_file_path, coverages in data.items():
+            yield from self._coverage_pairs(iter_json_object(f))
+
+    def _coverage_pairs(self, focal_files):
+        for each_focal_file_path, coverages in focal_files:
+            focal_case_dir = each_focal_file_path[:each_focal_file_path.rfind('/')]
+            test_case_dir = focal_case_dir.replace('/main/', '/test/')
             for each_fm_name, tc_cov_pairs in coverages.items():
                 for each_pair in tc_cov_pairs:
                     tc_name, tc, cov, context, focal_file_skeleton = each_pair
 
                     # check data, will be removed after standardising the format of dataset
                     tc = [self.add_newline_char(each_line) for each_line in tc]
-                    cov = [self.add_newline_char(each_line) for each_line in cov]
-                    context = [self.add_newline_char(each_line) for each_line in context]
+                    coverage = ''.join(self.add_newline_char(each_line) for each_line in cov)
+                    context = ''.join(self.add_newline_char(each_line) for each_line in context)
 
                     if '::::' in tc_name:
                         tc_name = tc_name.split('::::')[1]
                         tc_name = tc_name.split('(')[0]
                     # 
 
-                    fm = ''.join(cov).replace('<COVER>', '')
+                    fm = coverage.replace('<COVER>', '')
 
-                    focal_case_dir = each_focal_file_path[:each_focal_file_path.rfind('/')]
-                    test_case_dir = focal_case_dir.replace('/main/', '/test/')
-                    
-                    is_extend_clss = False
-                    test_case_class_name = None
-                    for each_line in tc:
-                        tc_class_name = re.findall(r'public class (\w+)\s*{', each_line)
-                        if len(tc_class_name) == 1:
-                            test_case_class_name = tc_class_name[0]
-                            break
-
-                        tc_class_name = re.findall(r'public class (\w+) extends \w+\s*{', each_line)
-                        if len(tc_class_name) == 1:
-                            test_case_class_name = tc_class_name[0]
-                            is_extend_clss = True
-                            break
-                        
-                        tc_class_name = re.findall(r'class (\w+)\s*{', each_line)
-                        if len(tc_class_name) == 1:
-                            test_case_class_name = tc_class_name[0]
-                            break
-
-                        tc_class_name = re.findall(r'public class (\$\w+)\s*{', each_line)  # project lambda
-                        if len(tc_class_name) == 1:
-                            test_case_class_name = tc_class_name[0]
-                            break
+                    test_case_class_name, is_extend_clss = find_test_class_name(tc)
                     
                     # NOTE: for blade, we skip the test cases that extend other classes
                     
@@ -84,8 +102,8 @@ class Dataset:
                         project_name=self.configs.project_name, 
                         focal_file_path=each_focal_file_path, 
                         focal_method=fm, 
-                        coverage=''.join(cov), 
-                        context=''.join(context), 
+                        coverage=coverage, 
+                        context=context, 
                         focal_file_skeleton=focal_file_skeleton,
                         test_case=''.join(tc), 
                         test_case_name = tc_name,
@@ -93,8 +111,7 @@ class Dataset:
                         focal_method_name=each_fm_name, 
                         references=None
                     )
-                    coverage_data.append(coverage_pair)
-        return coverage_data
+                    yield coverage_pair
 
     def add_newline_char(self, string):
         if not string.endswith('\n'):
@@ -177,4 +194,81 @@ class Dataset:
         save_path = f'{self.configs.fact_set_dir}/ref_{reference_setting}_fact_golden_desc_{test_desc_setting}_depth_{max_exploration_depth}_refThres_{retrieval_threshold}.json'
         with open(save_path, 'r') as f:
             fact_ref_data = json.load(f)
-        return fact_ref_data
\ No newline at end of file
+        return fact_ref_data
+
+
+# the class declaration patterns of a test case, tried in this order on each line, with whether the class extends another
+_TEST_CLASS_PATTERNS = (
+    (re.compile(r'public class (\w+)\s*{'), False),
+    (re.compile(r'public class (\w+) extends \w+\s*{'), True),
+    (re.compile(r'class (\w+)\s*{'), False),
+    (re.compile(r'public class (\$\w+)\s*{'), False),  # project lambda
+)
+
+
+def find_test_class_name(test_case_lines):
+    """(class name, whether it extends another class) of the first line declaring exactly one class, (None, False) if none does."""
+    for each_line in test_case_lines:
+        # every pattern needs the keyword, most lines are skipped without running any of them
+        if 'class ' not in each_line:
+            continue
+        for pattern, extends in _TEST_CLASS_PATTERNS:
+            tc_class_name = pattern.findall(each_line)
+            if len(tc_class_name) == 1:
+                return tc_class_name[0], extends
+    return None, False
+
+
+def iter_json_object(f, chunk_size=1 << 16):
+    """(key, value) of the JSON object of a text file, decoding one value at a time instead of the whole file."""
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = '', 0, False
+
+    def fill():
+        # read at least as much as is buffered, so that a large value is decoded again only a few times
+        nonlocal buffer, pos, eof
+        chunk = f.read(max(chunk_size, len(buffer) - pos))
+        buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+
+    def skip_to_token():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+                pos += 1
+            if pos < len(buffer) or eof:
+                return buffer[pos:pos + 1]
+            fill()
+
+    def decode():
+        nonlocal pos
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                # a value is followed by a separator, otherwise it is a number that may go on in the next chunk
+                if eof or (end < len(buffer) and buffer[end] in ' \t\r\n,:}]'):
+                    pos = end
+                    return value
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            fill()
+
+    if skip_to_token() != '{':
+        raise ValueError(f'Expected a JSON object in {getattr(f, "name", f)}')
+    pos += 1
+    if skip_to_token() == '}':
+        return
+    while True:
+        skip_to_token()
+        key = decode()
+        if skip_to_token() != ':':
+            raise ValueError(f'Expected ":" after {key!r} in {getattr(f, "name", f)}')
+        pos += 1
+        skip_to_token()
+        yield key, decode()
+        separator = skip_to_token()
+        pos += 1
+        if separator == '}':
+            return
+        if separator != ',':
+            raise ValueError(f'Expected "," or "}}" after the value of {key!r} in {getattr(f, "name", f)}')
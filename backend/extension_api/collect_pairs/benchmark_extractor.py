@@ -0,0 +1,98 @@
+"""Compare the in-process utilities of java_extractor.py with the javaparser jars on the Java files of a repository.
+
+    python benchmark_extractor.py /path/to/repo [--limit 500] [--one-shot]
+
+Each utility runs over the same files in process, in the warm JVM worker of AnalysisClient and, with --one-shot, with a
+`java -jar` per file as collect_pairs used to. The time, the files per second and the files whose output differs from
+the jar's are printed for each; jars missing from javaparser_utils, or all of them without a JDK, are skipped.
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+
+if __name__ == '__main__':
+    import utils
+else:
+    from . import utils
+
+logger = logging.getLogger(__name__)
+
+UTILITY_NAMES = {
+    utils.method_lines_jar_path_new: 'method lines',
+    utils.method_lines_jar_path_old: 'method lines (old)',
+    utils.method_calls_jar_path: 'method calls',
+    utils.comments_lines_jar_path: 'comment lines',
+}
+
+
+def java_files(repo_path, limit=0):
+    files = []
+    for root, dirs, names in os.walk(repo_path):
+        dirs[:] = [each for each in dirs if not each.startswith('.') and each != 'target']
+        files.extend(os.path.join(root, each) for each in sorted(names) if each.endswith('.java'))
+    return files[:limit] if limit else files
+
+
+def _timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def _analyze_with(client, jar_path, files):
+    try:
+        return client.analyze(jar_path, files)
+    finally:
+        client.close()
+
+
+def benchmark(repo_path, limit=0, one_shot=False):
+    """One row per utility and way of running it: (utility, way, seconds, files, files differing from the jar or None)."""
+    files = java_files(repo_path, limit)
+    rows = []
+    for jar_path, name in UTILITY_NAMES.items():
+        seconds, in_process = _timed(_analyze_with, utils.AnalysisClient(in_process=True), jar_path, files)
+        if not os.path.exists(jar_path):
+            rows.append((name, 'in process', seconds, len(files), None))
+            continue
+        try:
+            jar_seconds, jar_outputs = _timed(_analyze_with, utils.AnalysisClient(in_process=False), jar_path, files)
+        except (OSError, utils.JvmWorkerError) as e:
+            logger.warning(f'Cannot run {jar_path}: {e}')
+            rows.append((name, 'in process', seconds, len(files), None))
+            continue
+        differing = [each for each in files if in_process[each] != jar_outputs[each]]
+        for each in differing[:5]:
+            logger.warning(f'{name} of {each} differ:\n  in process: {in_process[each]}\n  jar:        {jar_outputs[each]}')
+        rows.append((name, 'in process', seconds, len(files), len(differing)))
+        rows.append((name, 'JVM worker', jar_seconds, len(files), 0))
+        if one_shot:
+            one_shot_seconds, _ = _timed(lambda: [utils.run_result_lines(['java', '-jar', jar_path, each]) for each in files])
+            rows.append((name, 'java -jar', one_shot_seconds, len(files), 0))
+    return rows
+
+
+def format_rows(rows):
+    lines = [f'{"utility":<20} {"run":<12} {"seconds":>9} {"files/s":>9} {"differing":>9}']
+    for name, way, seconds, n_files, differing in rows:
+        lines.append(f'{name:<20} {way:<12} {seconds:>9.2f} {n_files / max(seconds, 1e-9):>9.1f} {"-" if differing is None else differing:>9}')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the in-process Java extractor against the javaparser jars')
+    parser.add_argument('repo_path', help='repository whose Java files are analyzed')
+    parser.add_argument('--limit', type=int, default=0, help='analyze only the first LIMIT files, 0 for all')
+    parser.add_argument('--one-shot', action='store_true', help='also time a `java -jar` per file')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    repo_path = os.path.abspath(args.repo_path)
+    # the jar paths are relative to this directory, as for main.py
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    print(format_rows(benchmark(repo_path, args.limit, args.one_shot)))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,402 @@
+"""In-process stand-ins for the javaparser utility jars of collect_pairs.
+
+Method line ranges, comment lines and the calls between the methods of a file are read off the tokens of
+java_syntax.tokenize with a small recursive descent over type bodies, so no JVM is started at all. Each utility
+prints exactly what its jar prints, for the parsers in utils.py:
+
+- method lines: `Class::::name(Type, Type) begin end` (`Class::::name begin end` for the old variant)
+- comment lines: the number of every line that starts with `//` or lies in a block or Javadoc comment
+- method calls: `Class::::name(Type)////Class::::callee(Type)----` with the methods of the same file it calls
+
+Methods are those of named classes, interfaces, enums and records, nested ones included; constructors, initializers
+and the methods of anonymous classes are not, like javaparser's MethodDeclaration. A method begins at its first
+annotation or modifier, the Javadoc before it is not part of it. Calls are resolved by name and argument count
+against the methods of the file, an ambiguous overload is resolved to all candidates.
+"""
+import os
+import re
+import sys
+import functools
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from java_syntax import Token, tokenize
+except ImportError:
+    # run as a script from this directory, the tokenizer lives in the backend root
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+    from java_syntax import Token, tokenize
+
+_MODIFIERS = {'public', 'protected', 'private', 'static', 'final', 'abstract', 'native', 'synchronized', 'transient',
+              'volatile', 'strictfp', 'default', 'sealed'}
+_TYPE_KEYWORDS = {'class', 'interface', 'enum', 'record', '@interface'}
+# identifiers followed by `(` that are no method calls
+_NOT_CALLS = {'if', 'for', 'while', 'switch', 'catch', 'synchronized', 'return', 'throw', 'new', 'super', 'this', 'try',
+              'assert', 'yield', 'case', 'else', 'do'}
+# Files.readAllLines breaks lines at \n, \r\n and \r, and String.trim strips every control character and space
+_LINE_BREAK_RE = re.compile(r'\r\n|\r|\n')
+_JAVA_TRIMMED = ''.join(chr(each) for each in range(33))
+
+
+@dataclass
+class MethodDeclaration:
+    class_name: str
+    name: str
+    parameter_types: List[str]
+    begin: int
+    end: int
+    varargs: bool = False
+    # (name, number of arguments) of the calls in its body that may target a method of the same file
+    calls: List[Tuple[str, int]] = field(default_factory=list)
+
+    @property
+    def signature(self) -> str:
+        return f'{self.name}({", ".join(self.parameter_types)})'
+
+    @property
+    def qualified_name(self) -> str:
+        return f'{self.class_name}::::{self.signature}'
+
+    def accepts(self, n_arguments: int) -> bool:
+        n_parameters = len(self.parameter_types)
+        return n_arguments == n_parameters or (self.varargs and n_arguments >= n_parameters - 1)
+
+
+@dataclass
+class JavaFile:
+    methods: List[MethodDeclaration]
+    # the lines of block and Javadoc comments
+    block_comment_lines: List[int]
+    type_names: List[str]
+
+
+def _strip_type_arguments(type_text: str) -> str:
+    # like javaparser's Signature, only the type arguments of the outermost type are dropped: Map.Entry<K, V> is Map.Entry
+    if not type_text.endswith('>'):
+        return type_text
+    depth = 0
+    for index in range(len(type_text) - 1, -1, -1):
+        if type_text[index] == '>':
+            depth += 1
+        elif type_text[index] == '<':
+            depth -= 1
+            if depth == 0:
+                return type_text[:index]
+    return type_text
+
+
+def _type_text(tokens: List[Token]) -> str:
+    text = ''
+    for token in tokens:
+        if token.kind == 'annotation':
+            continue
+        text += ', ' if token.text == ',' else token.text
+    return text
+
+
+class _Parser:
+    def __init__(self, tokens: List[Token]) -> None:
+        self.tokens = tokens
+        self.methods: List[MethodDeclaration] = []
+        self.type_names: List[str] = []
+
+    def text(self, index: int) -> str:
+        return self.tokens[index].text if index < len(self.tokens) else ''
+
+    def skip_balanced(self, index: int) -> int:
+        """The index after the bracket that closes the one at `index`."""
+        depth = 0
+        while index < len(self.tokens):
+            kind = self.tokens[index].kind
+            if kind == 'open':
+                depth += 1
+            elif kind == 'close':
+                depth -= 1
+                if depth == 0:
+                    return index + 1
+            index += 1
+        return index
+
+    def skip_angle(self, index: int) -> int:
+        depth = 0
+        while index < len(self.tokens):
+            text = self.text(index)
+            if text == '<':
+                depth += 1
+            elif text == '>':
+                depth -= 1
+                if depth == 0:
+                    return index + 1
+            elif self.tokens[index].kind == 'open' and text == '(':
+                index = self.skip_balanced(index)
+                continue
+            elif text in (';', '{', '}'):
+                return index
+            index += 1
+        return index
+
+    def skip_annotation(self, index: int) -> int:
+        index += 1
+        if self.text(index) == '(':
+            index = self.skip_balanced(index)
+        return index
+
+    def skip_to_statement_end(self, index: int) -> int:
+        # a field, with initializers of arrays and anonymous classes skipped whole
+        while index < len(self.tokens):
+            text = self.text(index)
+            if text == ';':
+                return index + 1
+            if text == '}':
+                return index
+            if self.tokens[index].kind == 'open':
+                index = self.skip_balanced(index)
+                continue
+            index += 1
+        return index
+
+    def parse(self) -> None:
+        index = 0
+        while index < len(self.tokens):
+            index = self.parse_member(index, None)
+
+    def parse_type(self, index: int) -> int:
+        """A type declaration from its keyword on."""
+        keyword = self.text(index)
+        index += 1
+        name = self.text(index)
+        while index < len(self.tokens) and self.text(index) != '{':
+            if self.text(index) == '(':
+                # the components of a record
+                index = self.skip_balanced(index)
+            elif self.text(index) in (';', '}'):
+                return index
+            else:
+                index += 1
+        index += 1
+        if keyword == 'enum':
+            index = self.parse_enum_constants(index)
+        while index < len(self.tokens) and self.text(index) != '}':
+            index = self.parse_member(index, name)
+        return index + 1
+
+    def parse_enum_constants(self, index: int) -> int:
+        while index < len(self.tokens):
+            text = self.text(index)
+            if text == ';':
+                return index + 1
+            if text == '}':
+                return index
+            if self.tokens[index].kind == 'annotation':
+                index = self.skip_annotation(index)
+            elif self.tokens[index].kind == 'open':
+                # the arguments of a constant, or its body, whose methods are those of an anonymous class
+                index = self.skip_balanced(index)
+            else:
+                index += 1
+        return index
+
+    def parse_member(self, index: int, class_name: Optional[str]) -> int:
+        start = None
+        while index < len(self.tokens):
+            token = self.tokens[index]
+            if token.kind == 'annotation' and token.text != '@interface':
+                start = index if start is None else start
+                index = self.skip_annotation(index)
+            elif token.text in _MODIFIERS and self.text(index + 1) != '.':
+                start = index if start is None else start
+                index += 1
+            elif token.text == 'non' and self.text(index + 1) == '-' and self.text(index + 2) == 'sealed':
+                index += 3
+            else:
+                break
+        if index >= len(self.tokens):
+            return index
+        text = self.text(index)
+        if text == ';':
+            return index + 1
+        if text == '{':
+            # an initializer block, or at the top level something that is no declaration
+            return self.skip_balanced(index)
+        if text in _TYPE_KEYWORDS and self.tokens[index].kind in ('ident', 'annotation') and self.text(index + 1) not in ('.', '('):
+            return self.parse_type(index)
+        if class_name is None:
+            # package and import declarations
+            return self.skip_to_statement_end(index) if text != '}' else index + 1
+        if text == '}':
+            return index
+        start = index if start is None else start
+        if text == '<':
+            index = self.skip_angle(index)
+        declaration_start = index
+        # the return type and the name, up to the parameters, an initializer or the end of a field
+        while index < len(self.tokens):
+            text = self.text(index)
+            if text == '<':
+                index = self.skip_angle(index)
+                continue
+            if text in ('(', '=', ';', '{', '}'):
+                break
+            if text == '[':
+                index = self.skip_balanced(index)
+                continue
+            index += 1
+        if self.text(index) == '{' and index == declaration_start + 1:
+            # the compact constructor of a record
+            return self.skip_balanced(index)
+        if self.text(index) != '(':
+            return self.skip_to_statement_end(index)
+        name_index = index - 1
+        is_constructor = name_index == declaration_start
+        params_end = self.skip_balanced(index)
+        parameter_types, varargs = self.parameter_types(index + 1, params_end - 1)
+        index = params_end
+        while index < len(self.tokens) and self.text(index) not in ('{', ';', '}'):
+            index += 1
+        end = index
+        if self.text(index) == '{':
+            end = self.skip_balanced(index) - 1
+        if is_constructor:
+            return end + 1
+        method = MethodDeclaration(class_name, self.text(name_index), parameter_types, self.tokens[start].line, self.tokens[min(end, len(self.tokens) - 1)].line, varargs)
+        if self.text(index) == '{':
+            method.calls = self.calls(index + 1, end)
+        self.methods.append(method)
+        return end + 1
+
+    def parameter_types(self, begin: int, end: int) -> Tuple[List[str], bool]:
+        types: List[str] = []
+        varargs = False
+        parameter: List[Token] = []
+        depth = 0
+        for index in range(begin, end + 1):
+            token = self.tokens[index] if index < end else None
+            if token is not None and (token.text != ',' or depth > 0):
+                if token.text == '<':
+                    depth += 1
+                elif token.text == '>':
+                    depth -= 1
+                parameter.append(token)
+                continue
+            if not parameter:
+                continue
+            # skip annotations with their arguments, `final` and the receiver parameter `Foo this`
+            kept: List[Token] = []
+            skip_until = -1
+            for position, each in enumerate(parameter):
+                if position < skip_until:
+                    continue
+                if each.kind == 'annotation':
+                    skip_until = position + 1
+                    if position + 1 < len(parameter) and parameter[position + 1].text == '(':
+                        closing = position + 1
+                        nesting = 0
+                        for closing in range(position + 1, len(parameter)):
+                            nesting += parameter[closing].text == '('
+                            nesting -= parameter[closing].text == ')'
+                            if nesting == 0:
+                                break
+                        skip_until = closing + 1
+                    continue
+                if each.text == 'final':
+                    continue
+                kept.append(each)
+            parameter = []
+            if not kept or kept[-1].text == 'this':
+                continue
+            name_dims = 0
+            while len(kept) > 2 and kept[-1].text == ']':
+                # C-style arrays, `int values[]`
+                kept = kept[:-2]
+                name_dims += 1
+            type_tokens = kept[:-1]
+            dims = '[]' * name_dims
+            if len(type_tokens) >= 3 and [each.text for each in type_tokens[-3:]] == ['.', '.', '.']:
+                type_tokens = type_tokens[:-3]
+                dims += '[]'
+                varargs = True
+            types.append(_strip_type_arguments(_type_text(type_tokens)) + dims)
+        return types, varargs
+
+    def calls(self, begin: int, end: int) -> List[Tuple[str, int]]:
+        calls = []
+        for index in range(begin, end):
+            token = self.tokens[index]
+            if token.kind != 'ident' or self.text(index + 1) != '(' or token.text in _NOT_CALLS:
+                continue
+            if self.text(index - 1) == '.':
+                # this.m(), Outer.this.m() and Foo.m() may call a method of this file, other.m() does not
+                qualifier = self.text(index - 2)
+                if qualifier != 'this' and qualifier not in self.type_names:
+                    continue
+            if self.text(self.skip_balanced(index + 1)) in ('{', 'throws'):
+                # the declaration of a method of a local or anonymous class
+                continue
+            calls.append((token.text, self.argument_count(index + 1)))
+        return calls
+
+    def argument_count(self, index: int) -> int:
+        end = self.skip_balanced(index) - 1
+        if end == index + 1:
+            return 0
+        count, depth = 1, 0
+        for position in range(index + 1, end):
+            token = self.tokens[position]
+            if token.kind == 'open':
+                depth += 1
+            elif token.kind == 'close':
+                depth -= 1
+            elif token.text == ',' and depth == 0:
+                count += 1
+        return count
+
+
+@functools.lru_cache(maxsize=256)
+def parse_java(source: str) -> JavaFile:
+    """The methods and block comments of a Java source, kept for the same source as collect_pairs asks for each file several times."""
+    # line numbers as javaparser counts them
+    source = source.replace('\r\n', '\n').replace('\r', '\n')
+    tokens, block_comment_lines = [], []
+    for token in tokenize(source, keep_comments=True):
+        if token.kind == 'block_comment':
+            block_comment_lines.extend(range(token.line, token.line + token.text.count('\n') + 1))
+        elif token.kind != 'line_comment':
+            tokens.append(token)
+    parser = _Parser(tokens)
+    parser.type_names = [tokens[index + 1].text for index in range(len(tokens) - 1)
+                         if tokens[index].text in _TYPE_KEYWORDS and tokens[index + 1].kind == 'ident']
+    parser.parse()
+    return JavaFile(parser.methods, block_comment_lines, parser.type_names)
+
+
+def _read(path: str) -> str:
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def method_lines_output(path: str, new_version: bool = True) -> List[str]:
+    return [f'{each.qualified_name if new_version else f"{each.class_name}::::{each.name}"} {each.begin} {each.end}'
+            for each in parse_java(_read(path)).methods]
+
+
+def comment_lines_output(path: str) -> List[str]:
+    source = _read(path)
+    block_comment_lines = set(parse_java(source).block_comment_lines)
+    lines = _LINE_BREAK_RE.split(source)
+    if lines and lines[-1] == '':
+        lines.pop()
+    return [str(nr) for nr, line in enumerate(lines, 1) if line.lstrip(_JAVA_TRIMMED).startswith('//') or nr in block_comment_lines]
+
+
+def method_calls_output(path: str) -> List[str]:
+    methods = parse_java(_read(path)).methods
+    by_name: Dict[str, List[MethodDeclaration]] = {}
+    for method in methods:
+        by_name.setdefault(method.name, []).append(method)
+    output = []
+    for method in methods:
+        callees = []
+        for name, n_arguments in method.calls:
+            callees.extend(each.qualified_name for each in by_name.get(name, []) if each.accepts(n_arguments))
+        output.append(f'{method.qualified_name}////' + ''.join(f'{each}----' for each in dict.fromkeys(callees)))
+    return output
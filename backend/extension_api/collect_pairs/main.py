@@ -1,26 +1,34 @@
 import os
 import json
+import time
+import hashlib
 import pathlib
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 logger = logging.getLogger(__name__)
 
 if __name__ == '__main__':
     import utils
 else:
     from . import utils
+# the backend root is on the path once utils is imported
+from corpus_store import is_legacy_corpus, write_corpus
 
 module_path_str = os.path.dirname(__file__)
 tester_path = pathlib.Path(module_path_str, '..', '..')
 os.chdir(module_path_str)
 
+# focal/test pairs analyzed by one task of the process pool, with a single request per javaparser utility
+CHUNK_SIZE = 32
+MANIFEST_VERSION = 2
+
 def posix_path(*paths: str):
     return pathlib.Path(*paths).as_posix()
 
-def collect_pairs(repo_path, do_dynamic_analysis=False):
-    all_data = []
-
-    test_suffix = "Test"
-
+# (source root, focal file, test file) of every class with a test class next to it
+def focal_test_pairs(repo_path, test_suffix="Test"):
     for root, dirs, files in os.walk(repo_path):
         root = posix_path(root)
         if 'src/main/java' not in root:
@@ -30,7 +38,7 @@ def collect_pairs(repo_path, do_dynamic_analysis=False):
             if not file.endswith('.java'):
                 continue
 
-            test_name = file[:-5] + 'Test.java'
+            test_name = file[:-5] + test_suffix + '.java'
             test_root = root.replace('src/main/java', 'src/test/java')
             full_test_path = posix_path(test_root, test_name)
             full_focal_path = posix_path(root, file)
@@ -38,113 +46,339 @@ def collect_pairs(repo_path, do_dynamic_analysis=False):
             if not os.path.exists(full_test_path):
                 continue
 
-            with open(full_test_path, encoding='utf-8') as f:
-                test_content = f.readlines()
-            
-            with open(full_focal_path, encoding='utf-8') as f:
-                focal_content = f.readlines()
-
-            test_method_lines_dic, test_reverse_method_lines_dic = utils.get_method_lines(full_test_path)
-            foc_method_lines_dic, foc_reverse_method_lines_dic = utils.get_method_lines(full_focal_path)
-            old_foc_method_lines_dic, old_foc_reverse_method_lines_dic = utils.get_method_lines(full_focal_path, False)
-            cross_calls_map = utils.get_method_calls_cross_map(full_test_path)
-            test_calls_map = utils.get_method_calls_map(full_test_path)
-            unused_classes_test_lines = utils.get_unused_classes_lines(full_test_path)
+            yield root, full_focal_path, full_test_path
 
-            possible_focal_methods = list(old_foc_method_lines_dic.keys())
+# the pairs of one focal file and its test class, which depend on nothing but the two files (and the coverage of the test)
+# coverage: the lines each test method covers from utils.collect_suite_coverage, None to build and run each test method on its own
+def collect_file_pairs(root, full_focal_path, full_test_path, do_dynamic_analysis=False, maven_args=(), test_suffix="Test", coverage=None):
+    data = []
 
-            for method_name, method_lines in test_method_lines_dic.items():
-                start_line = method_lines[0]
-                end_line = method_lines[1]
-                
-                if test_content[start_line - 1].strip() == '@Test':   
-                    expected_focal_method_name = utils.get_expected_focal_method_name(method_name, possible_focal_methods)
-                    if expected_focal_method_name == "":
-                        continue
+    with open(full_test_path, encoding='utf-8') as f:
+        test_content = f.readlines()
 
-                    # path is the path before "/src/main/java"
-                    path = root.split("/src/main/java")[0]
-                    
-                    # org_name is the name of the organization
-                    org_name = root.split("/src/main/java/")[1].split("/")[0]
+    with open(full_focal_path, encoding='utf-8') as f:
+        focal_content = f.readlines()
 
-                    # test_class_name_formatted example: 'utils.CollectionUtilsTest'
-                    test_class_name_formatted = full_focal_path.split('/src/main/java/' + org_name + '/')[1][:-5].replace("/", ".") + test_suffix
+    test_method_lines_dic, test_reverse_method_lines_dic = utils.get_method_lines(full_test_path)
+    foc_method_lines_dic, foc_reverse_method_lines_dic = utils.get_method_lines(full_focal_path)
+    old_foc_method_lines_dic, old_foc_reverse_method_lines_dic = utils.get_method_lines(full_focal_path, False)
+    cross_calls_map = utils.get_method_calls_cross_map(full_test_path)
+    test_calls_map = utils.get_method_calls_map(full_test_path)
+    unused_classes_test_lines = utils.get_unused_classes_lines(full_test_path)
 
-                    test_method_name = method_name.split("(")[0]
+    possible_focal_methods = list(old_foc_method_lines_dic.keys())
 
-                    if do_dynamic_analysis:
-                        jacoco_path = utils.get_jacoco_report(path, test_class_name_formatted, test_method_name[test_method_name.index("::::") + 4:], org_name, test_suffix)
-
-                        if not os.path.exists(jacoco_path):
-                            continue
+    for method_name, method_lines in test_method_lines_dic.items():
+        start_line = method_lines[0]
+        end_line = method_lines[1]
+    
+        if test_content[start_line - 1].strip() == '@Test':   
+            expected_focal_method_name = utils.get_expected_focal_method_name(method_name, possible_focal_methods)
+            if expected_focal_method_name == "":
+                continue
 
-                        cov_lines, uncov_lines = utils.get_lines_coverage(jacoco_path)
+            # path is the path before "/src/main/java"
+            path = root.split("/src/main/java")[0]
+        
+            # org_name is the name of the organization
+            org_name = root.split("/src/main/java/")[1].split("/")[0]
 
-                    called_methods = cross_calls_map[method_name] if method_name in cross_calls_map else []
+            # test_class_name_formatted example: 'utils.CollectionUtilsTest'
+            test_class_name_formatted = full_focal_path.split('/src/main/java/' + org_name + '/')[1][:-5].replace("/", ".") + test_suffix
 
-                    foc_start, foc_end = None, None
+            test_method_name = method_name.split("(")[0]
 
-                    foc_method_final = None
+            if do_dynamic_analysis and coverage is not None:
+                test_method_coverage = coverage.get((f'{org_name}.{test_class_name_formatted}', test_method_name[test_method_name.index("::::") + 4:]))
 
-                    for called_method in called_methods:
-                        if called_method.split("(")[0] == expected_focal_method_name:
-                            foc_start, foc_end = foc_method_lines_dic[called_method]
+                if test_method_coverage is None:
+                    continue
 
-                            if not do_dynamic_analysis:
-                                foc_method_final = called_method
-                                break
+                source_file = utils.focal_source_file(test_class_name_formatted, org_name, test_suffix)
+                cov_lines, uncov_lines = test_method_coverage.get(source_file, ([], []))
+            elif do_dynamic_analysis:
+                jacoco_path, source_file = utils.get_jacoco_report(path, test_class_name_formatted, test_method_name[test_method_name.index("::::") + 4:], org_name, test_suffix, maven_args)
 
-                            for i in range(foc_start, foc_end + 1):
-                                if i in cov_lines:
-                                    foc_method_final = called_method
-                                    break
+                if not os.path.exists(jacoco_path):
+                    continue
 
-                    if foc_method_final is None:
-                        continue
+                cov_lines, uncov_lines = utils.get_lines_coverage(jacoco_path, source_file)
 
-                    test_method_full = test_content[start_line - 1 : end_line]
-                    focal_method_full = focal_content[foc_start - 1 : foc_end]
+            called_methods = cross_calls_map[method_name] if method_name in cross_calls_map else []
 
-                    irrelevant_methods_test = utils.get_irrelevant_methods(test_calls_map, method_name)
+            foc_start, foc_end = None, None
 
-                    comment_lines_test = utils.get_comment_lines(full_test_path)
-                    if method_name not in unused_classes_test_lines:
-                        logger.error(f'Method {method_name} not found in unused_classes_test_lines {unused_classes_test_lines}')
-                        raise ValueError(f'Method {method_name} not found in unused_classes_test_lines {unused_classes_test_lines}')
+            foc_method_final = None
 
-                    unused_classes_lines_specific_test = unused_classes_test_lines[method_name]
+            for called_method in called_methods:
+                if called_method.split("(")[0] == expected_focal_method_name:
+                    foc_start, foc_end = foc_method_lines_dic[called_method]
 
-                    sanitised_test_content = utils.annotate_deleted_classes(test_content, unused_classes_lines_specific_test)
-                    sanitised_test_content = utils.delete_irrelevant_methods_and_comments(sanitised_test_content, irrelevant_methods_test, test_method_lines_dic, comment_lines_test, True)
-                    sanitised_test_content = utils.delete_consecutive_empty_lines(sanitised_test_content)
-                    
-                    all_data.append({
-                        "test_path": full_test_path,
-                        "focal_path": full_focal_path,
-                        "test_lines": [start_line, end_line],
-                        "focal_lines": [foc_start, foc_end],
-                        "test_name": method_name,
-                        "test_method": test_method_full,
-                        "full_test_content": sanitised_test_content,
-                        "focal_method_name": foc_method_final,
-                        "focal_method": focal_method_full
-                    })
+                    if not do_dynamic_analysis:
+                        foc_method_final = called_method
+                        break
 
-                    # print(json.dumps(all_data[-1], indent=4))
+                    for i in range(foc_start, foc_end + 1):
+                        if i in cov_lines:
+                            foc_method_final = called_method
+                            break
 
-    return all_data
+            if foc_method_final is None:
+                continue
 
+            test_method_full = test_content[start_line - 1 : end_line]
+            focal_method_full = focal_content[foc_start - 1 : foc_end]
+
+            irrelevant_methods_test = utils.get_irrelevant_methods(test_calls_map, method_name)
+
+            comment_lines_test = utils.get_comment_lines(full_test_path)
+            if method_name not in unused_classes_test_lines:
+                logger.error(f'Method {method_name} not found in unused_classes_test_lines {unused_classes_test_lines}')
+                raise ValueError(f'Method {method_name} not found in unused_classes_test_lines {unused_classes_test_lines}')
+
+            unused_classes_lines_specific_test = unused_classes_test_lines[method_name]
+
+            sanitised_test_content = utils.annotate_deleted_classes(test_content, unused_classes_lines_specific_test)
+            sanitised_test_content = utils.delete_irrelevant_methods_and_comments(sanitised_test_content, irrelevant_methods_test, test_method_lines_dic, comment_lines_test, True)
+            sanitised_test_content = utils.delete_consecutive_empty_lines(sanitised_test_content)
+        
+            data.append({
+                "test_path": full_test_path,
+                "focal_path": full_focal_path,
+                "test_lines": [start_line, end_line],
+                "focal_lines": [foc_start, foc_end],
+                "test_name": method_name,
+                "test_method": test_method_full,
+                "full_test_content": sanitised_test_content,
+                "focal_method_name": foc_method_final,
+                "focal_method": focal_method_full
+            })
+
+            # print(json.dumps(data[-1], indent=4))
+
+    return data
+
+
+def _collect_chunk(chunk, do_dynamic_analysis, offline, local_repository, coverage=None, in_process=False):
+    # all files of the chunk go through each javaparser utility in one request to the warm JVM of this process
+    analysis = utils.analysis_client()
+    analysis.in_process = in_process
+    analysis.prefetch([focal for _, focal, _ in chunk], [test for _, _, test in chunk])
+    maven_args_of_project = {}
+    results = []
+    try:
+        for root, full_focal_path, full_test_path in chunk:
+            path = root.split("/src/main/java")[0]
+            if do_dynamic_analysis and path not in maven_args_of_project:
+                # offline: run the coverage builds with --offline, see maven_utils.prepare_offline
+                maven_args_of_project[path] = utils.maven_mode_args(path, offline, local_repository)
+            results.append(collect_file_pairs(root, full_focal_path, full_test_path, do_dynamic_analysis, maven_args_of_project.get(path, ()), coverage=coverage))
+    finally:
+        analysis.clear()
+    return results
+
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class CorpusManifest:
+    """The hashes of the focal/test files a corpus was built from, and where the pairs of each pair of files are in it.
+
+    A rebuild only analyzes the files whose hashes changed; the pairs of the others are read back from the previous
+    corpus as they are written to the new one, so neither the manifest nor the collection keeps pairs in memory. The
+    manifest is only used with the very corpus it was saved for.
+    """
+
+    def __init__(self, manifest_path, corpus_path, do_dynamic_analysis):
+        self.manifest_path = manifest_path
+        self.corpus_path = corpus_path
+        self.do_dynamic_analysis = do_dynamic_analysis
+        # key -> {'hashes', 'start', 'count'} of the previous corpus, and of the one being written
+        self.previous = self._load()
+        self.files = {}
+        self._reader, self._position = None, 0
+
+    def _corpus_stat(self):
+        stat = os.stat(self.corpus_path)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def _load(self):
+        if not os.path.exists(self.manifest_path) or not os.path.exists(self.corpus_path) or is_legacy_corpus(self.corpus_path):
+            return {}
+        with open(self.manifest_path, 'r', encoding='utf8') as f:
+            manifest = json.load(f)
+        # pairs found by the dynamic analysis differ from the static ones, neither can stand in for the other
+        if manifest.get('version') != MANIFEST_VERSION or manifest.get('dynamic_analysis') != self.do_dynamic_analysis:
+            return {}
+        if manifest.get('corpus') != self._corpus_stat():
+            return {}
+        return manifest['files']
+
+    def is_unchanged(self, key, hashes):
+        return key in self.previous and self.previous[key]['hashes'] == hashes
+
+    def previous_pairs(self, key):
+        """The pairs of an unchanged pair of files, read from the previous corpus."""
+        start, count = self.previous[key]['start'], self.previous[key]['count']
+        if self._reader is None or start < self._position:
+            # files mostly come in the same order as last time, the corpus is then read once from start to end
+            self.close()
+            self._reader, self._position = open(self.corpus_path, 'rb'), 0
+        while self._position < start:
+            self._reader.readline()
+            self._position += 1
+        for _ in range(count):
+            line = self._reader.readline()
+            self._position += 1
+            yield json.loads(line)
+
+    def record(self, key, hashes, start, count):
+        self.files[key] = {'hashes': hashes, 'start': start, 'count': count}
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def save(self):
+        """Save the recorded files, once the corpus they were written to has replaced the previous one."""
+        self.close()
+        tmp_path = f'{self.manifest_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'dynamic_analysis': self.do_dynamic_analysis, 'corpus': self._corpus_stat(),
+                       'files': self.files}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+
+def collect_coverage(pairs, offline, local_repository, test_suffix="Test"):
+    # the test methods of each project, all measured by a single run of its tests
+    test_methods_of_project = {}
+    for root, _, full_test_path in pairs:
+        test_methods_of_project.setdefault(root.split("/src/main/java")[0], {})[full_test_path] = utils.get_test_method_names(full_test_path)
+    coverage = {}
+    for path, test_methods in test_methods_of_project.items():
+        maven_args = utils.maven_mode_args(path, offline, local_repository)
+        coverage.update(utils.collect_suite_coverage(path, test_methods, maven_args, local_repository, test_suffix))
+    return coverage
+
+
+def collect_pairs(repo_path, do_dynamic_analysis=False, offline=False, local_repository='', workers=1, progress=None,
+                  single_coverage_run=True, in_process=False):
+    """The focal/test method pairs of a repository, analyzing files in `workers` processes (see iter_collect_pairs)."""
+    return list(iter_collect_pairs(repo_path, do_dynamic_analysis, offline, local_repository, workers, None, progress,
+                                   single_coverage_run, in_process))
+
+
+def iter_collect_pairs(repo_path, do_dynamic_analysis=False, offline=False, local_repository='', workers=1, manifest=None,
+                       progress=None, single_coverage_run=True, in_process=False):
+    """The focal/test method pairs of a repository, in the order of its files, each yielded once its files are analyzed.
+
+    With a CorpusManifest, (focal file, test file) pairs whose contents are unchanged since the corpus was written keep
+    their pairs, read back from it, and only the others are analyzed again; where the pairs of each file go is recorded
+    in the manifest. `progress(analyzed files, files to analyze)` is called after each chunk.
+    The dynamic analysis measures the coverage of all test methods with one build and one run of the tests of each
+    project (see utils.collect_suite_coverage), or with a build per test method without `single_coverage_run`.
+    With `in_process`, the extractors of utils.IN_PROCESS_UTILITIES stand in for their javaparser jars.
+    """
+    start = time.monotonic()
+    test_suffix = "Test"
 
-def dump_collect_pairs(project_path):
+    pairs = list(focal_test_pairs(repo_path, test_suffix))
+    keys, hashes_of_key, changed = [], {}, []
+    for pair in pairs:
+        _, full_focal_path, full_test_path = pair
+        key = f'{full_focal_path}////{full_test_path}'
+        keys.append(key)
+        hashes_of_key[key] = [_file_hash(full_focal_path), _file_hash(full_test_path)]
+        if manifest is None or not manifest.is_unchanged(key, hashes_of_key[key]):
+            changed.append((pair, key))
+
+    chunks = [changed[i:i + CHUNK_SIZE] for i in range(0, len(changed), CHUNK_SIZE)]
+    chunk_pairs = [[pair for pair, _ in chunk] for chunk in chunks]
+    n_files, analyzed = 2 * len(changed), 0
+    if progress is not None:
+        progress(0, n_files)
+
+    # pairs of analyzed files until they are yielded, at most a chunk since chunks follow the order of the files
+    analyzed_pairs = {}
+    n_ready, n_yielded = 0, 0
+
+    def store(chunk, chunk_results):
+        nonlocal analyzed
+        for (_, key), data in zip(chunk, chunk_results):
+            analyzed_pairs[key] = data
+        analyzed += 2 * len(chunk)
+        if progress is not None:
+            progress(analyzed, n_files)
+        return ready()
+
+    def ready():
+        # the pairs up to the first file not analyzed yet can be handed out
+        nonlocal n_ready, n_yielded
+        while n_ready < len(keys):
+            key = keys[n_ready]
+            if key in analyzed_pairs:
+                data = analyzed_pairs.pop(key)
+            elif manifest is not None and manifest.is_unchanged(key, hashes_of_key[key]):
+                data = manifest.previous_pairs(key)
+            else:
+                return
+            first = n_yielded
+            for each in data:
+                yield each
+                n_yielded += 1
+            if manifest is not None:
+                manifest.record(key, hashes_of_key[key], first, n_yielded - first)
+            n_ready += 1
+
+    # the unchanged files before the first changed one
+    yield from ready()
+
+    # the builds of the dynamic analysis share the target directory of the project, they cannot run side by side
+    if workers <= 1 or do_dynamic_analysis or len(chunks) <= 1:
+        try:
+            coverage = None
+            if do_dynamic_analysis and single_coverage_run:
+                coverage = collect_coverage([pair for pair, _ in changed], offline, local_repository, test_suffix)
+            for chunk, pairs_of_chunk in zip(chunks, chunk_pairs):
+                yield from store(chunk, _collect_chunk(pairs_of_chunk, do_dynamic_analysis, offline, local_repository, coverage, in_process))
+        finally:
+            utils.analysis_client().close()
+    else:
+        # the server builds corpora from a background thread: a forked worker could inherit a lock another thread holds
+        with ProcessPoolExecutor(min(workers, len(chunks)), mp_context=multiprocessing.get_context('spawn')) as executor:
+            results = executor.map(_collect_chunk, chunk_pairs, repeat(do_dynamic_analysis), repeat(offline), repeat(local_repository),
+                                   repeat(None), repeat(in_process))
+            for chunk, chunk_results in zip(chunks, results):
+                yield from store(chunk, chunk_results)
+
+    elapsed = max(time.monotonic() - start, 1e-6)
+    logger.info(f'Analyzed {n_files} files ({len(pairs) - len(changed)} unchanged focal/test pairs reused) in {elapsed:.1f}s, {n_files / elapsed:.1f} files/s')
+
+
+def write_collect_pairs(repo_path, corpus_path, manifest_path, do_dynamic_analysis=False, **kwargs):
+    """Write the pairs of a repository to a JSONL corpus as they are found, analyzing only the files changed since the
+    corpus was last written (see CorpusManifest). Returns the number of pairs, 0 for a project without any."""
+    manifest = CorpusManifest(manifest_path, corpus_path, do_dynamic_analysis)
+    try:
+        count = write_corpus(corpus_path, iter_collect_pairs(repo_path, do_dynamic_analysis, manifest=manifest, **kwargs))
+    finally:
+        manifest.close()
+    manifest.save()
+    return count
+
+
+def dump_collect_pairs(project_path, workers=0, progress=None, in_process=False):
     save_dir = tester_path / 'data'
     
     project_path = pathlib.Path(project_path)
     project_name = project_path.stem
-    all_data = collect_pairs(project_path.as_posix(), False)
-    assert len(all_data) > 0
-    with open((save_dir / f'{project_name}.json').as_posix(), 'w') as f:
-        json.dump(all_data, f, indent=4)
+    # one line per pair, written as they are found, with the index of the focal method names next to it; the manifest
+    # of file hashes lets a re-run only analyze what changed
+    return write_collect_pairs(project_path.as_posix(), (save_dir / f'{project_name}.jsonl').as_posix(), (save_dir / f'{project_name}.manifest.json').as_posix(),
+                        workers=workers or os.cpu_count() or 1, progress=progress, in_process=in_process)
 
 
 if __name__ == "__main__":
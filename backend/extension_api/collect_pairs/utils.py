@@ -1,7 +1,30 @@
 from ast import arg
 import subprocess
-from bs4 import BeautifulSoup
+import os
+import sys
+import glob
 import logging
+import functools
+
+import tempfile
+
+try:
+    from batch_runner import detect_junit_version
+    from jacoco_report import find_jacoco_agent, find_jacoco_core, jacoco_xml_report_path, parse_jacoco_xml
+    from jvm_worker import JvmWorker, JvmWorkerError
+    from maven_utils import DEFAULT_LOCAL_REPOSITORY, MAVEN_SHELL, maven_mode_args, resolve_test_classpath
+except ImportError:
+    # run as a script from this directory, the report parser lives in the backend root
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+    from batch_runner import detect_junit_version
+    from jacoco_report import find_jacoco_agent, find_jacoco_core, jacoco_xml_report_path, parse_jacoco_xml
+    from jvm_worker import JvmWorker, JvmWorkerError
+    from maven_utils import DEFAULT_LOCAL_REPOSITORY, MAVEN_SHELL, maven_mode_args, resolve_test_classpath
+
+try:
+    from . import java_extractor
+except ImportError:
+    import java_extractor
 
 logger = logging.getLogger(__name__)
 
@@ -12,26 +35,120 @@ method_calls_cross_jar_path = "../javaparser_utils/javaparser-method-calls-cross
 comments_lines_jar_path = "../javaparser_utils/javaparser-comments-lines-1.0-SNAPSHOT-shaded.jar"
 unused_classes_del_jar_path = "../javaparser_utils/javaparser-unused-classes-del-1.0-SNAPSHOT-shaded.jar"
 
+# utilities with an in-process implementation printing what the jar prints, see java_extractor.py
+# the calls across files and the unused classes need javaparser's symbol solver and stay with the jars
+IN_PROCESS_UTILITIES = {
+    method_lines_jar_path_new: java_extractor.method_lines_output,
+    method_lines_jar_path_old: functools.partial(java_extractor.method_lines_output, new_version=False),
+    method_calls_jar_path: java_extractor.method_calls_output,
+    comments_lines_jar_path: java_extractor.comment_lines_output,
+}
+
+def output_lines(output):
+    # deal with difference of `subprocess.run` output between Windows and Linux
+    output = output.replace('\r\n', '\n')
+    # use `.splitlines()` to avoid the "last line" got from `.split('\n')`
+    # and fit cross-platform line breaks
+    return [l for l in output.splitlines()]
+
 def run_result_lines(args):
     # for formality
-    # deal with difference of `subprocess.run` output between Windows and Linux
     process = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     if process.returncode != 0:
         logger.error(f'Error running "{args}". The outputs are: \nstderr:\n{process.stderr.decode("utf-8")}stdout:\n{process.stdout.decode("utf-8")}')
-    result = process.stdout.decode('utf-8')
-    result = result.replace('\r\n', '\n')
-    # use `.splitlines()` to avoid the "last line" got from `.split('\n')`
-    # and fit cross-platform line breaks
-    result_lines = [l for l in result.splitlines()]
-    return result_lines
+    return output_lines(process.stdout.decode('utf-8'))
+
+class AnalysisClient:
+    """Runs the javaparser utility jars inside one long-lived JVM worker instead of a `java -jar` per file.
+
+    Outputs are kept per (jar, file) for the client's lifetime, collect_pairs asks for the same test file many times.
+    Files the worker fails on, or all of them once it keeps failing, go through the one-shot `java -jar` instead.
+    With `in_process` ([corpus] in_process_extractor), the utilities of IN_PROCESS_UTILITIES run in Python and only the
+    others need a JVM; the jars stay the default until benchmark_extractor.py finds no file where the outputs differ.
+    """
+
+    max_failures = 3
+    request_timeout = 60
+    file_timeout = 5
+
+    def __init__(self, worker=None, in_process=False):
+        self.worker = worker
+        self.in_process = in_process
+        self.failures = 0
+        self._outputs = {}
+
+    @property
+    def enabled(self):
+        return self.failures < self.max_failures
+
+    def _worker(self):
+        if self.worker is None:
+            self.worker = JvmWorker(os.path.join(tempfile.gettempdir(), 'intention-test-analysis-worker'))
+        return self.worker
+
+    def analyze(self, jar_path, file_paths):
+        """The output lines of the utility `jar_path` for each of `file_paths`, sent to the worker in one batch."""
+        extractor = IN_PROCESS_UTILITIES.get(jar_path) if self.in_process else None
+        jar_path = os.path.abspath(jar_path)
+        missing = list(dict.fromkeys(each for each in file_paths if (jar_path, each) not in self._outputs))
+        if missing and extractor is not None:
+            for file_path in missing:
+                try:
+                    self._outputs[(jar_path, file_path)] = extractor(file_path)
+                except Exception as e:
+                    logger.warning(f'Failed to analyze {file_path} in process, running {jar_path} instead: {e}')
+            missing = [each for each in missing if (jar_path, each) not in self._outputs]
+        if missing and self.enabled:
+            try:
+                response = self._worker().request({'type': 'analyze', 'jar': jar_path, 'files': [os.path.abspath(each) for each in missing]},
+                                                  self.request_timeout + self.file_timeout * len(missing))
+            except JvmWorkerError as e:
+                self.failures += 1
+                logger.warning(f'The analysis worker failed ({self.failures}/{self.max_failures}), running the jar once per file: {e}')
+                response = {}
+            if 'error' in response:
+                logger.warning(f'The analysis worker cannot run {jar_path}: {response["error"]}')
+            for file_path, output, error in zip(missing, response.get('outputs', []), response.get('errors', [])):
+                if error is None:
+                    self._outputs[(jar_path, file_path)] = output_lines(output)
+                else:
+                    logger.warning(f'Failed to analyze {file_path} with {jar_path}:\n{error}')
+        for file_path in missing:
+            if (jar_path, file_path) not in self._outputs:
+                self._outputs[(jar_path, file_path)] = run_result_lines(["java", "-jar", jar_path, file_path])
+        return {each: self._outputs[(jar_path, each)] for each in file_paths}
+
+    def result_lines(self, jar_path, file_path):
+        return self.analyze(jar_path, [file_path])[file_path]
+
+    def prefetch(self, focal_paths, test_paths):
+        # every utility collect_pairs runs, each with all its files in a single request
+        self.analyze(method_lines_jar_path_new, focal_paths + test_paths)
+        self.analyze(method_lines_jar_path_old, focal_paths)
+        for jar_path in (method_calls_cross_jar_path, method_calls_jar_path, unused_classes_del_jar_path, comments_lines_jar_path):
+            self.analyze(jar_path, test_paths)
+
+    def clear(self):
+        self._outputs.clear()
+
+    def close(self):
+        self.clear()
+        if self.worker is not None:
+            self.worker.stop()
+
+_analysis_client = None
+
+def analysis_client():
+    global _analysis_client
+    if _analysis_client is None:
+        _analysis_client = AnalysisClient()
+    return _analysis_client
 
 # focal_path = '/bernard/dataset_construction/prep/repos/spark/src/main/java/spark/utils/CollectionUtils.java'
 # get mapping between methods and their lines
 def get_method_lines(focal_path, new_version = True):
     method_lines_jar_path = method_lines_jar_path_new if new_version else method_lines_jar_path_old
-    args = ["java", "-jar", method_lines_jar_path, focal_path]
-    
-    result_lines = run_result_lines(args)
+    result_lines = analysis_client().result_lines(method_lines_jar_path, focal_path)
 
     method_lines_dic = {}
 
@@ -84,9 +201,7 @@ def get_expected_focal_method_name(test_method_name, possible_focal_methods):
 def get_method_calls_cross_map(testPath):
     methodCallsMap = {}
 
-    args = ["java", "-jar", method_calls_cross_jar_path, testPath]
-
-    result_lines = run_result_lines(args)
+    result_lines = analysis_client().result_lines(method_calls_cross_jar_path, testPath)
 
     for line in result_lines:
         split_line = line.split("////")
@@ -112,8 +227,9 @@ def get_method_calls_cross_map(testPath):
 
 # test_class_name example: utils.CollectionUtilsTest
 # test_method_name example: testIsEmpty_whenCollectionIsEmpty_thenReturnTrue
-def generate_codecov(base_path, test_class_name, test_method_name):
-    args = ["mvn", "clean", "verify", "-Dtest=" + test_class_name + "#" + test_method_name]
+# maven_args example: ['--offline'], see maven_utils.maven_mode_args
+def generate_codecov(base_path, test_class_name, test_method_name, maven_args=()):
+    args = ["mvn", "clean", "verify", "-Dtest=" + test_class_name + "#" + test_method_name, *maven_args]
     logger.debug(f'Generating code coverage info: {args}')
     # args = ["mvn", "verify", "-Dtest=" + test_class_name + "#" + test_method_name]
     subprocess.run(args, cwd=base_path, stdout=None, stderr=None)
@@ -121,134 +237,207 @@ def generate_codecov(base_path, test_class_name, test_method_name):
 # base_path = '/bernard/dataset_construction/prep/repos/spark'
 # test_class_name = 'utils.CollectionUtilsTest'
 # test_method_name = 'testIsEmpty_whenCollectionIsEmpty_thenReturnTrue'
-# generate and get the relevant jacoco report path
-def get_jacoco_report(base_path, test_class_name, test_method_name, org_name, test_suffix):
+# generate and get the jacoco XML report path together with the focal file as named in it
+def get_jacoco_report(base_path, test_class_name, test_method_name, org_name, test_suffix, maven_args=()):
     # generate codecov
-    generate_codecov(base_path, test_class_name, test_method_name)
+    generate_codecov(base_path, test_class_name, test_method_name, maven_args)
     # get jacoco report
-    # append_path = "spark/" if '.' not in test_class_name else "spark." + '.'.join(test_class_name.split(".")[:-1]) + '/'
-    append_path = org_name + "/" if '.' not in test_class_name else org_name + "." + '.'.join(test_class_name.split(".")[:-1]) + '/'
-    suff_len = len(test_suffix)
-    html_name = test_class_name.split(".")[-1][:suff_len * -1] + ".java.html" # changes from -4 to -5 depending on whether it's Test or Tests
-    jacoco_path = base_path + "/target/site/jacoco/" + append_path + html_name
-    return jacoco_path
+    return jacoco_xml_report_path(base_path), focal_source_file(test_class_name, org_name, test_suffix)
 
-# jacoco_path (path of relevant jacoco report) = '/bernard/dataset_construction/prep/repos/spark/target/site/jacoco/spark/utils/CollectionUtils.java.html'
+# the focal file as named in the jacoco report, e.g. spark/utils/CollectionUtils.java for utils.CollectionUtilsTest
+def focal_source_file(test_class_name, org_name, test_suffix):
+    # package_path = "spark" if '.' not in test_class_name else "spark/" + '/'.join(test_class_name.split(".")[:-1])
+    package_path = org_name if '.' not in test_class_name else org_name + "/" + '/'.join(test_class_name.split(".")[:-1])
+    suff_len = len(test_suffix)
+    return package_path + "/" + test_class_name.split(".")[-1][:suff_len * -1] + ".java" # changes from -4 to -5 depending on whether it's Test or Tests
+
+# the @Test methods of a test file, as collect_file_pairs picks them, e.g. ['testIsEmpty_whenCollectionIsEmpty_thenReturnTrue']
+def get_test_method_names(test_path):
+    with open(test_path, encoding='utf-8') as f:
+        test_content = f.readlines()
+    method_lines_dic, _ = get_method_lines(test_path)
+    names = [method_name.split("(")[0].split("::::")[-1] for method_name, (start_line, _) in method_lines_dic.items()
+             if test_content[start_line - 1].strip() == '@Test']
+    # overloads run together
+    return list(dict.fromkeys(names))
+
+SUITE_TEST_TIMEOUT = 120
+
+def collect_suite_coverage(project_dir, test_methods, maven_args=(), local_repository='', test_suffix="Test", junit_console_launcher='', worker=None):
+    """The lines each test method covers, from a single build and a single run of the tests instead of a build per method.
+
+    `test_methods` maps test files to their test methods. After one `mvn clean test-compile`, the methods run one after
+    the other in a JVM worker started with the JaCoCo agent, which writes the execution data of each method to a file
+    of its own. The same worker reads the covered lines of the focal class out of these files with the JaCoCo core, so
+    no `jacoco:report` runs either. Returns {(test class, method): {focal file: (covered lines, uncovered lines)}}, with
+    the focal file named as in the jacoco report; test classes that fail to run are left out.
+    """
+    coverage = {}
+    local_repository = local_repository or DEFAULT_LOCAL_REPOSITORY
+    agent, jacoco_classpath = find_jacoco_agent(local_repository), find_jacoco_core(local_repository)
+    if agent is None or jacoco_classpath is None:
+        logger.error(f'No JaCoCo agent and core in {local_repository}, run `mvn jacoco:report` in {project_dir} once to fetch them')
+        return coverage
+
+    args = ['mvn', 'clean', 'test-compile', '-Dcheckstyle.skip=true', *maven_args]
+    logger.debug(f'Compiling the tests for their coverage: {args}')
+    process = subprocess.run(args, cwd=project_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True, shell=MAVEN_SHELL)
+    if 'BUILD SUCCESS' not in process.stdout:
+        logger.error(f'Failed to compile the tests of {project_dir}:\n{process.stdout}')
+        return coverage
+
+    target_dir = os.path.join(project_dir, 'target')
+    coverage_dir = os.path.join(target_dir, 'suite-coverage')
+    classpath = [os.path.join(target_dir, 'test-classes'), os.path.join(target_dir, 'classes')] + resolve_test_classpath(project_dir, coverage_dir, maven_args)
+    os.makedirs(coverage_dir, exist_ok=True)
+    own_worker = worker is None
+    if own_worker:
+        worker = JvmWorker(os.path.join(target_dir, 'suite-worker'), jvm_args=[f'-javaagent:{agent}=output=none'])
+    try:
+        for test_path, methods in test_methods.items():
+            if not methods:
+                continue
+            test_class_path = os.path.splitext(test_path.split('/src/test/java/')[1])[0]
+            test_class = test_class_path.replace('/', '.')
+            with open(test_path, encoding='utf-8') as f:
+                junit_version = detect_junit_version(f.read())
+            test_classpath = classpath
+            if junit_version != 4 and junit_console_launcher:
+                test_classpath = classpath + [junit_console_launcher]
+            # the focal class and its nested classes
+            focal_class = os.path.join(target_dir, 'classes', test_class_path[:-len(test_suffix)])
+            class_files = glob.glob(f'{glob.escape(focal_class)}.class') + glob.glob(f'{glob.escape(focal_class)}$*.class')
+            try:
+                response = worker.request({'type': 'run', 'class_name': test_class, 'classpath': test_classpath, 'junit_version': junit_version,
+                                           'methods': methods, 'coverage_dir': coverage_dir}, SUITE_TEST_TIMEOUT * len(methods))
+                if 'error' in response:
+                    raise JvmWorkerError(response['error'])
+                exec_files = response['coverage_files']
+                lines = worker.request({'type': 'coverage', 'jacoco_classpath': jacoco_classpath, 'exec_files': list(exec_files.values()),
+                                        'class_files': class_files}, SUITE_TEST_TIMEOUT)
+                if 'error' in lines:
+                    raise JvmWorkerError(lines['error'])
+            except JvmWorkerError as e:
+                # a timeout restarts the worker with the next request
+                logger.error(f'Failed to measure the coverage of {test_class}: {e}')
+                continue
+            for method, source_files in zip(exec_files, lines['coverage']):
+                coverage[(test_class, method)] = {source_file: (each['covered'], each['uncovered']) for source_file, each in source_files.items()}
+    finally:
+        if own_worker:
+            worker.stop()
+    return coverage
+
+# jacoco_path = '/bernard/dataset_construction/prep/repos/spark/target/site/jacoco/jacoco.xml', source_file = 'spark/utils/CollectionUtils.java'
 # get the covered and uncovered lines within the focal file
-def get_lines_coverage(jacoco_path):
-    with open(jacoco_path) as f:
-        soup = BeautifulSoup(f, 'html.parser')
-        # find all spans with class 'fc' or 'pc' or 'bpc', and extract the ID
-        cov_lines = []
-        uncov_lines = []
-        for span in soup.find_all('span', class_=['fc', 'pc', 'bpc', 'nc']):
-            if span['class'][0] == 'nc':
-                uncov_lines.append(int(span['id'][1:]))
-            else:
-                cov_lines.append(int(span['id'][1:]))
-        
-        return cov_lines, uncov_lines
+def get_lines_coverage(jacoco_path, source_file):
+    report = parse_jacoco_xml(jacoco_path, [source_file])
+    if source_file not in report.source_files:
+        return [], []
+    source_file_coverage = report.source_files[source_file]
+    return source_file_coverage.covered_lines, source_file_coverage.uncovered_lines
     
+DELETE_MARK = "<DELETE>"
+
+class LineMask:
+    """The lines of a file with a deletion flag each; lines are flagged in place and compacted once by `kept_lines`.
+
+    Indices follow list indexing, -1 flags the last line, as the former "<DELETE>"-prefixed copies did. A line that
+    itself starts with "<DELETE>" is flagged from the start, like before.
+    """
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.deleted = bytearray(line.startswith(DELETE_MARK) for line in lines)
+
+    @classmethod
+    def of(cls, class_content):
+        return class_content if isinstance(class_content, LineMask) else cls(class_content)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def mark(self, index):
+        self.deleted[index] = 1
+
+    def mark_lines(self, start, end):
+        # 1-based, inclusive line numbers
+        for index in range(start - 1, end):
+            self.deleted[index] = 1
+
+    def is_marked(self, index):
+        return self.deleted[index] == 1
+
+    def kept_lines(self):
+        return [line for line, deleted in zip(self.lines, self.deleted) if not deleted]
+
 def annotate_deleted_classes(class_content, unused_classes_lines):
-    deleted_lines = []
+    mask = LineMask(class_content)
     for start, end in unused_classes_lines:
-        del_lines = range(start - 1, end)
-        deleted_lines.extend(del_lines)
-    
-    class_content_copy = class_content.copy()
+        mask.mark_lines(start, end)
 
-    for line in deleted_lines:
-        class_content_copy[line] = "<DELETE>" + class_content_copy[line]
-    
-    return class_content_copy
+    return mask
+
+def _mark_comment_blocks(mask, comment_lines, is_block_start):
+    # a comment line whose previous line matches takes the whole run of comment lines around it
+    n = len(mask)
+    i = 0
+    while i < n - 1:
+        j = i
+        if i in comment_lines and is_block_start(mask.lines[i - 1]):
+            j = i - 1
+            while j > 0 and j in comment_lines:
+                mask.mark(j - 1)
+                j -= 1
+            j = i
+            while j < n and j in comment_lines:
+                mask.mark(j - 1)
+                j += 1
+        if i == j:
+            i += 1
+        else:
+            i = j
 
 def delete_irrelevant_methods_and_comments(class_content, irrelevant_methods, foc_method_lines_dic, comment_lines, is_test = False, delete_all_comments = True):
-    deleted_lines = []
+    mask = LineMask.of(class_content)
+    n = len(mask)
+    comment_lines = set(comment_lines)
     for method in irrelevant_methods:
         # print(foc_method_lines_dic, method)
         if method not in foc_method_lines_dic:
             continue
-        del_lines = range(foc_method_lines_dic[method][0] - 1, foc_method_lines_dic[method][1])
-        deleted_lines.extend(del_lines)
-    
-    class_content_copy = class_content.copy()
+        mask.mark_lines(foc_method_lines_dic[method][0], foc_method_lines_dic[method][1])
 
-    for line in deleted_lines:
-        class_content_copy[line] = "<DELETE>" + class_content_copy[line]
-    
     if not is_test and not delete_all_comments:
         # For consecutive comment lines (can just be 1 line), delete all of them if the next line has been annotated <DELETE>
-        i = 0
-        while i < len(class_content_copy) - 1:
-            if class_content_copy[i].startswith("<DELETE>") and i in comment_lines:
+        for i in range(n - 1):
+            if mask.is_marked(i) and i in comment_lines:
                 j = i
                 while j >= 1 and j in comment_lines:
-                    class_content_copy[j - 1] = "<DELETE>" + class_content_copy[j - 1]
+                    mask.mark(j - 1)
                     j -= 1
-            i += 1
 
         # Delete comments if there is any non ascii characters inside
-        i = 0
-        while i < len(class_content_copy) - 1:
-            j = i
-            if i in comment_lines and (not class_content_copy[i - 1].isascii() or "Copyright" in class_content_copy[i - 1] or "copyright" in class_content_copy[i - 1]):
-                j = i - 1
-                while j > 0 and j in comment_lines:
-                    class_content_copy[j - 1] = "<DELETE>" + class_content_copy[j - 1]
-                    j -= 1
-                j = i
-                while j < len(class_content_copy) and j in comment_lines:
-                    class_content_copy[j - 1] = "<DELETE>" + class_content_copy[j - 1]
-                    j += 1
-            if i == j:
-                i += 1
-            else:
-                i = j
+        _mark_comment_blocks(mask, comment_lines, lambda line: not line.isascii() or "Copyright" in line or "copyright" in line)
     else:
         # delete all comments
-        i = 0
-        while i < len(class_content_copy) + 1:
-            if i in comment_lines:
-                class_content_copy[i - 1] = "<DELETE>" + class_content_copy[i - 1]
-            i += 1
+        for i in comment_lines:
+            if 0 <= i <= n:
+                mask.mark(i - 1)
 
     if is_test:
         # Delete test annotations (defined as block comments that contains @author)
-        i = 0
-        while i < len(class_content_copy) - 1:
-            j = i
-            if i in comment_lines and "@author" in class_content_copy[i - 1]:
-                j = i - 1
-                while j > 0 and j in comment_lines:
-                    class_content_copy[j - 1] = "<DELETE>" + class_content_copy[j - 1]
-                    j -= 1
-                j = i
-                while j < len(class_content_copy) and j in comment_lines:
-                    class_content_copy[j - 1] = "<DELETE>" + class_content_copy[j - 1]
-                    j += 1
-            if i == j:
-                i += 1
-            else:
-                i = j
+        _mark_comment_blocks(mask, comment_lines, lambda line: "@author" in line)
 
     # now actually delete
-    i = 0
-    while i < len(class_content_copy):
-        if class_content_copy[i].startswith("<DELETE>"):
-            del class_content_copy[i]
-        else:
-            i += 1
-
-    return class_content_copy
+    return mask.kept_lines()
 
 def delete_consecutive_empty_lines(class_content):
-    i = 0
-    while i < len(class_content) - 1:
-        if class_content[i].strip() == "" and class_content[i + 1].strip() == "":
-            del class_content[i]
-        else:
-            i += 1
-            
+    # of each run of empty lines only the last one is kept
+    n = len(class_content)
+    class_content[:] = [line for i, line in enumerate(class_content)
+                        if not (line.strip() == "" and i + 1 < n and class_content[i + 1].strip() == "")]
+
     return class_content
 
 def get_irrelevant_methods(method_call_map, focal_method):
@@ -270,9 +459,7 @@ def get_irrelevant_methods(method_call_map, focal_method):
 def get_comment_lines(filepath):
     comment_lines = []
 
-    args = ["java", "-jar", comments_lines_jar_path, filepath]
-
-    result_lines = run_result_lines(args)
+    result_lines = analysis_client().result_lines(comments_lines_jar_path, filepath)
 
     for line in result_lines:
         if not line.strip():
@@ -287,9 +474,7 @@ def get_comment_lines(filepath):
 def get_method_calls_map(filepath):
     methodCallsMap = {}
 
-    args = ["java", "-jar", method_calls_jar_path, filepath]
-
-    result_lines = run_result_lines(args)
+    result_lines = analysis_client().result_lines(method_calls_jar_path, filepath)
 
     for line in result_lines:
         split_line = line.split("////")
@@ -314,9 +499,7 @@ def get_method_calls_map(filepath):
     return methodCallsMap
 
 def get_unused_classes_lines(filepath):
-    args = ["java", "-jar", unused_classes_del_jar_path, filepath]
-
-    result_lines = run_result_lines(args)
+    result_lines = analysis_client().result_lines(unused_classes_del_jar_path, filepath)
     # print(args)
 
     dic = {}
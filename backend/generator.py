@@ -8,7 +8,9 @@ from modules.session import ModelQuerySession
 from modules.exceptions import GenerationCancelled
 from configs import Configs
 from agents import TestGenAgent, TestRefineAgent
-from test_case_runner import TestCaseRunner
+from test_case_runner import TestCaseRunner, is_interrupted_build
+from outcome_cache import CachedOutcome, get_outcome_cache, outcome_key, project_snapshot
+from compile_repair import get_class_index, repair_test_case
 
 
 class IntentionTester:
@@ -20,7 +22,10 @@ class IntentionTester:
         self.test_gen_agent = TestGenAgent(configs.llm_name, configs.project_name, configs.project_url, n_responses=1, skip_deepseek_think=skip_deepseek_think)
         self.test_refine_agent = TestRefineAgent(configs.llm_name, configs.project_name, configs.project_url, n_responses=1, skip_deepseek_think=skip_deepseek_think)
         self.test_runner = TestCaseRunner(configs, configs.test_case_run_log_dir)
+        self.test_runner.on_queue_wait = self.report_queue_wait
+        self.test_runner.on_build_output = self.report_build_output
         self.generation_with_refine_log = []  # [(test_status, prompt, test_case)]
+        self.final_coverage = None  # covered and uncovered focal class lines of the passing test, see measure_final_coverage()
         self.query_session: ModelQuerySession | None = None
         self._cancel_check = lambda: False
         self._message_prefix: list[dict] = []
@@ -38,6 +43,32 @@ class IntentionTester:
         if self.query_session:
             self.query_session.update_messages(self._message_prefix + messages)
 
+    def report_queue_wait(self, status, info):
+        # e.g. `queued` with the position in the build queue, then `running` with the seconds spent waiting
+        if self.query_session:
+            self.query_session.write_status_message(status, info)
+
+    def report_build_output(self, line):
+        # compiler errors reach the client while Maven is still running
+        if self.query_session:
+            self.query_session.write_status_message('build_output', {'line': line})
+
+    def measure_final_coverage(self, test_case, test_case_path, junit_version=4):
+        # the attempts were built without JaCoCo, only the test that passed is measured
+        if not self.test_runner.skip_coverage:
+            return
+        self._ensure_not_cancelled()
+        outcome_cache, _, cache_key = self._outcome_cache_entry(test_case, test_case_path, junit_version)
+        cached = outcome_cache.get(cache_key) if outcome_cache is not None else None
+        if cached is not None and cached.coverage is not None:
+            self.final_coverage = cached.coverage
+        else:
+            self.final_coverage = self.test_runner.collect_coverage(test_case, test_case_path)
+            if outcome_cache is not None and self.final_coverage is not None:
+                outcome_cache.put_coverage(cache_key, self.final_coverage)
+        if self.final_coverage is not None and self.query_session:
+            self.query_session.write_status_message('coverage', self.final_coverage)
+
     def _ensure_not_cancelled(self):
         if self.query_session and self.query_session.should_stop():
             raise GenerationCancelled()
@@ -47,6 +78,7 @@ class IntentionTester:
                                        referable_test_case, facts, junit_version,
                                        prohibit_fact: bool = False, query_session: ModelQuerySession | None = None):
         self.generation_with_refine_log = []
+        self.final_coverage = None
         self.query_session = query_session
         self._apply_cancel_hook()
         self._ensure_not_cancelled()
@@ -55,10 +87,12 @@ class IntentionTester:
         gen_test_case, prompt, messages = self.generate_test_case(target_focal_method, target_context, target_test_class_name, target_test_case_desc, referable_test_case, facts, junit_version, prohibit_fact)
         self.update_messages_to_remote(messages)
         self._ensure_not_cancelled()
-        error_msg, test_status = self.run_test_case(gen_test_case, target_test_case_path)
+        error_msg, test_status = self.run_test_case(gen_test_case, target_test_case_path, junit_version)
         self.generation_with_refine_log.append((test_status, prompt, gen_test_case))
+        gen_test_case, error_msg, test_status, messages = self.repair_locally(gen_test_case, error_msg, test_status, target_test_case_path, junit_version, messages)
 
         if test_status == 'success':
+            self.measure_final_coverage(gen_test_case, target_test_case_path, junit_version)
             messages = self.finish_generate()
             return gen_test_case, test_status, messages
 
@@ -68,10 +102,12 @@ class IntentionTester:
             messages += refine_messages
             self.update_messages_to_remote(messages)
             self._ensure_not_cancelled()
-            error_msg, test_status = self.run_test_case(gen_test_case, target_test_case_path)
+            error_msg, test_status = self.run_test_case(gen_test_case, target_test_case_path, junit_version)
             self.generation_with_refine_log.append((test_status, prompt, gen_test_case))
+            gen_test_case, error_msg, test_status, messages = self.repair_locally(gen_test_case, error_msg, test_status, target_test_case_path, junit_version, messages)
 
             if test_status == 'success':
+                self.measure_final_coverage(gen_test_case, target_test_case_path, junit_version)
                 messages = self.finish_generate()
                 self.update_messages_to_remote(messages)
                 break
@@ -96,61 +132,52 @@ class IntentionTester:
         refined_tc, prompt, messages = self.test_refine_agent.refine(gen_test_case, error_msg_cut, target_focal_method, target_context, target_test_case_desc, facts, prohibit_fact)
         return refined_tc, prompt, messages
 
-    def run_test_case(self, test_case, test_case_path):
+    def repair_locally(self, test_case, error_msg, test_status, test_case_path, junit_version, messages):
+        # fix missing imports and package mismatches without a round-trip to the LLM, only what remains goes to refine();
+        # a test that compiled is left as it is, its failing assertions are for refine() to look at
+        if test_status != 'fail_compile':
+            return test_case, error_msg, test_status, messages
         self._ensure_not_cancelled()
-        def _extract_error_msg(log):
-            error_msg = []
-            stop_flag = False
-            for each_line in log.split('\n'):
-                if each_line.strip().startswith('[INFO]'):
-                    continue
-                if each_line.strip().startswith('[main]'):
-                    continue
-                if each_line.strip().startswith('[WARNING]'):
-                    continue
-                
-                if each_line.strip().startswith('[ERROR] Tests run:'):
-                    if stop_flag:
-                        break
-                    else:
-                        stop_flag = True
-                
-                if each_line.strip().startswith('[ERROR] To see the full stack trace'):
-                    break
-
-                error_msg.append(each_line)
-
-            error_msg = '\n'.join(error_msg)
-            return error_msg
-
-        compile_log, test_log, compile_success, execute_success = self.test_runner.compile_and_execute_test_case(test_case, test_case_path) 
-
-        if not compile_success:
-            error_msg = _extract_error_msg(compile_log)
-            test_status = 'fail_compile'
-        elif not execute_success:
-            error_msg = _extract_error_msg(test_log)
-            test_status = 'fail_execute'
-
-            test_run_info = re.search(r'Tests run: (\d+), Failures: (\d+), Errors: (\d+), Skipped: (\d+)', test_log)
-            if test_run_info is not None:
-                test_run_info = test_run_info.groups()
-
-                if int(test_run_info[0]) > 1:
-                    print(f'[INFO] Multiple test methods in a single test case: {test_case_path}')
-
-                success = int(test_run_info[0]) - int(test_run_info[1]) - int(test_run_info[2]) - int(test_run_info[3])
-                if success > 0:
-                    test_status = 'success'
-                    error_msg = ""
-                elif int(test_run_info[1]) > 0:
-                    test_status = 'fail_pass'
-                else:
-                    test_status = 'fail_execute'
 
-        else:
-            error_msg = ""
-            test_status = 'success'
+        project_dir = test_case_path.split('/src/test/')[0]
+        class_index = get_class_index(project_dir, self.test_runner.dependency_classpath(project_dir))
+        repair = repair_test_case(test_case, error_msg, test_case_path, class_index, int(junit_version))
+        if not repair.changed:
+            return test_case, error_msg, test_status, messages
+
+        fixes_str = '\n'.join(f'- {each}' for each in repair.fixes)
+        messages = messages + [{"role": "system", "content": f"### Local repair\n{fixes_str}\n\n```java\n{repair.test_case}\n```"}]
+        self.update_messages_to_remote(messages)
+        self._ensure_not_cancelled()
+        error_msg, test_status = self.run_test_case(repair.test_case, test_case_path, junit_version)
+        self.generation_with_refine_log.append((test_status, fixes_str, repair.test_case))
+        return repair.test_case, error_msg, test_status, messages
+
+    def _outcome_cache_entry(self, test_case, test_case_path, junit_version):
+        """(cache, project snapshot, key) of the outcome of a test, all None when the cache is disabled."""
+        outcome_cache = get_outcome_cache(self.configs.outcome_cache_path, self.configs.outcome_cache_size)
+        if outcome_cache is None:
+            return None, None, None
+        snapshot = project_snapshot(test_case_path.split('/src/test/')[0], test_case_path)
+        return outcome_cache, snapshot, outcome_key(test_case, test_case_path, snapshot, int(junit_version), self.configs.runner_mode)
+
+    def run_test_case(self, test_case, test_case_path, junit_version=4):
+        self._ensure_not_cancelled()
+        # regenerations and other models often produce a test that was already built against the same sources
+        outcome_cache, snapshot, cache_key = self._outcome_cache_entry(test_case, test_case_path, junit_version)
+        if outcome_cache is not None:
+            cached = outcome_cache.get(cache_key)
+            if cached is not None:
+                return cached.error_msg, cached.test_status
+
+        result = self.test_runner.run_test(test_case, test_case_path, int(junit_version))
+        error_msg, test_status = result.error_message, result.status
+        counts = result.counts() if result.compile_success and not result.execute_success else None
+        if counts is not None and counts[0] > 1:
+            print(f'[INFO] Multiple test methods in a single test case: {test_case_path}')
+
+        if outcome_cache is not None and not is_interrupted_build(result.compile_log + result.test_log):
+            outcome_cache.put(cache_key, snapshot, CachedOutcome(error_msg, test_status))
 
         return error_msg, test_status
 
@@ -161,3 +188,5 @@ class IntentionTester:
         self._cancel_check = cancel_check
         self.test_gen_agent.set_cancel_check(cancel_check)
         self.test_refine_agent.set_cancel_check(cancel_check)
+        # a stop request kills a running build instead of waiting for it to end
+        self.test_runner.cancel_check = cancel_check
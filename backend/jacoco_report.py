@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import os
+import re
+import xml.etree.ElementTree as ET
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+JACOCO_XML_REPORT = os.path.join('target', 'site', 'jacoco', 'jacoco.xml')
+
+_PRIMITIVE_DESCRIPTORS = {'Z': 'boolean', 'B': 'byte', 'C': 'char', 'S': 'short', 'I': 'int', 'J': 'long', 'F': 'float', 'D': 'double', 'V': 'void'}
+_PRIMITIVES = set(_PRIMITIVE_DESCRIPTORS.values())
+_ANGLE_BRACKETS_RE = re.compile(r'<[^<>]*>')
+
+
+def jacoco_xml_report_path(project_dir: str) -> str:
+    return os.path.join(project_dir, JACOCO_XML_REPORT).replace('\\', '/')
+
+
+def _version_key(version: str) -> List[int]:
+    return [int(each) if each.isdigit() else -1 for each in re.split(r'[.-]', version)]
+
+
+def _newest_jar(local_repository: str, group_id: str, artifact_id: str, classifier: str = '') -> Optional[str]:
+    artifact_dir = os.path.join(os.path.expanduser(local_repository), *group_id.split('.'), artifact_id)
+    if not os.path.isdir(artifact_dir):
+        return None
+    for version in sorted(os.listdir(artifact_dir), key=_version_key, reverse=True):
+        jar = os.path.join(artifact_dir, version, f'{artifact_id}-{version}{classifier}.jar')
+        if os.path.exists(jar):
+            return jar
+    return None
+
+
+def find_jacoco_agent(local_repository: str = os.path.join('~', '.m2', 'repository')) -> Optional[str]:
+    """The newest JaCoCo agent runtime jar in the local Maven repository, fetched there by `jacoco:prepare-agent`."""
+    return _newest_jar(local_repository, 'org.jacoco', 'org.jacoco.agent', '-runtime')
+
+
+def find_jacoco_core(local_repository: str = os.path.join('~', '.m2', 'repository')) -> Optional[List[str]]:
+    """The JaCoCo core jar and the ASM jars it analyzes classes with, fetched into the local Maven repository by `jacoco:report`."""
+    jars = [_newest_jar(local_repository, 'org.jacoco', 'org.jacoco.core')] + \
+        [_newest_jar(local_repository, 'org.ow2.asm', artifact_id) for artifact_id in ('asm', 'asm-commons', 'asm-tree')]
+    return None if None in jars else jars
+
+
+def focal_class_path(test_case_path: str, test_suffix: str = 'Test') -> str:
+    """The focal class of a generated test as a VM name, e.g. spark/utils/CollectionUtils for .../spark/utils/CollectionUtilsTest.java."""
+    test_class_path = os.path.splitext(test_case_path.split('/src/test/java/')[1])[0]
+    if test_class_path.endswith(test_suffix):
+        return test_class_path[:-len(test_suffix)]
+    return test_class_path
+
+
+def coverage_includes(test_case_path: str, scope: str) -> List[str]:
+    """JaCoCo `includes` for the focal class (with its nested classes) or its whole package; matched by both the agent and the report."""
+    focal_class = focal_class_path(test_case_path)
+    if scope == 'package':
+        return [f'{os.path.dirname(focal_class)}/*']
+    return [f'{focal_class}*']
+
+
+@dataclass
+class MethodCoverage:
+    name: str
+    # JVM descriptor, e.g. (Ljava/util/Map;[Ljava/lang/Object;)Ljava/util/List;
+    desc: str
+    line: Optional[int]
+    # counter type (INSTRUCTION, BRANCH, LINE, COMPLEXITY, METHOD) -> (missed, covered)
+    counters: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+
+    def total(self, counter_type: str) -> int:
+        return sum(self.counters.get(counter_type, (0, 0)))
+
+    def percent(self, counter_type: str) -> Optional[float]:
+        missed, covered = self.counters.get(counter_type, (0, 0))
+        if missed + covered == 0:
+            return None
+        # rounded down like the HTML report, which only shows 100% when nothing is missed
+        return float(covered * 100 // (missed + covered))
+
+    def to_cov_stat(self) -> Dict[str, object]:
+        # the keys and values of the method table of the former HTML report
+        branch_coverage = self.percent('BRANCH')
+        return {
+            'number_of_lines': self.total('LINE'),
+            'number_of_branches': self.total('COMPLEXITY') - 1,
+            'line_coverage': self.percent('INSTRUCTION') or 0.0,
+            'branch_coverage': branch_coverage if branch_coverage is not None else 'n/a',
+        }
+
+
+@dataclass
+class ClassCoverage:
+    # binary name, e.g. spark/utils/Index$Z
+    name: str
+    source_file: str
+    methods: List[MethodCoverage] = field(default_factory=list)
+
+    @property
+    def simple_name(self) -> str:
+        return re.split(r'[/$]', self.name)[-1]
+
+
+@dataclass
+class SourceFileCoverage:
+    # line number -> (missed instructions, covered instructions, missed branches, covered branches)
+    lines: Dict[int, Tuple[int, int, int, int]] = field(default_factory=dict)
+
+    @property
+    def covered_lines(self) -> List[int]:
+        # fully and partly covered lines, `fc`/`pc` in the HTML report
+        return [nr for nr, (_, ci, _, _) in self.lines.items() if ci > 0]
+
+    @property
+    def uncovered_lines(self) -> List[int]:
+        return [nr for nr, (mi, ci, _, _) in self.lines.items() if ci == 0 and mi > 0]
+
+
+@dataclass
+class CoverageReport:
+    # keyed by the source path relative to the source root, e.g. spark/utils/Index.java
+    source_files: Dict[str, SourceFileCoverage] = field(default_factory=dict)
+    classes: Dict[str, ClassCoverage] = field(default_factory=dict)
+
+    def classes_of(self, source_file: str) -> List[ClassCoverage]:
+        package = os.path.dirname(source_file)
+        file_name = os.path.basename(source_file)
+        # the top-level class first, then its nested and local classes
+        return sorted((each for each in self.classes.values() if each.source_file == file_name and os.path.dirname(each.name) == package),
+                      key=lambda each: ('$' in each.name, each.name))
+
+
+def _counters(element: ET.Element) -> Dict[str, Tuple[int, int]]:
+    return {counter.get('type'): (int(counter.get('missed', 0)), int(counter.get('covered', 0))) for counter in element.findall('counter')}
+
+
+def parse_jacoco_xml(report_path: str, source_files: Optional[Iterable[str]] = None) -> CoverageReport:
+    """Read `jacoco.xml` incrementally, keeping only the given source files (all if None) and their classes."""
+    wanted = set(source_files) if source_files is not None else None
+    report = CoverageReport()
+    package = ''
+    for event, element in ET.iterparse(report_path, events=('start', 'end')):
+        tag = element.tag
+        if event == 'start':
+            if tag == 'package':
+                package = element.get('name', '')
+            continue
+        if tag == 'class':
+            key = f"{package}/{element.get('sourcefilename', '')}".lstrip('/')
+            if wanted is None or key in wanted:
+                class_coverage = ClassCoverage(element.get('name', ''), element.get('sourcefilename', ''))
+                for method in element.findall('method'):
+                    line = method.get('line')
+                    class_coverage.methods.append(MethodCoverage(method.get('name', ''), method.get('desc', ''), int(line) if line else None, _counters(method)))
+                report.classes[class_coverage.name] = class_coverage
+            element.clear()
+        elif tag == 'sourcefile':
+            key = f"{package}/{element.get('name', '')}".lstrip('/')
+            if wanted is None or key in wanted:
+                report.source_files[key] = SourceFileCoverage({
+                    int(line.get('nr')): (int(line.get('mi', 0)), int(line.get('ci', 0)), int(line.get('mb', 0)), int(line.get('cb', 0)))
+                    for line in element.iter('line')
+                })
+            element.clear()
+        elif tag == 'package':
+            element.clear()
+    return report
+
+
+def worker_coverage_report(report: Dict) -> CoverageReport:
+    """The report of one execution data file as the JVM worker reads it (a `coverage` request with `report`), like
+    parse_jacoco_xml of the jacoco.xml written for the same classes."""
+    coverage = CoverageReport()
+    for source_file, lines in report['lines'].items():
+        coverage.source_files[source_file] = SourceFileCoverage({int(nr): tuple(each) for nr, each in lines.items()})
+    for each in report['classes']:
+        methods = [MethodCoverage(method['name'], method['desc'], method['line'] if method['line'] >= 0 else None,
+                                  {counter_type: tuple(counter) for counter_type, counter in method['counters'].items()})
+                   for method in each['methods']]
+        coverage.classes[each['name']] = ClassCoverage(each['name'], each['source_file'] or '', methods)
+    return coverage
+
+
+def descriptor_parameter_types(desc: str) -> List[Tuple[str, int]]:
+    """The parameters of a JVM method descriptor as (Java type name, array dimensions)."""
+    params = desc[desc.index('(') + 1:desc.index(')')]
+    types = []
+    i, dims = 0, 0
+    while i < len(params):
+        char = params[i]
+        if char == '[':
+            dims += 1
+            i += 1
+            continue
+        if char == 'L':
+            end = params.index(';', i)
+            types.append((params[i + 1:end].replace('/', '.').replace('$', '.'), dims))
+            i = end + 1
+        else:
+            types.append((_PRIMITIVE_DESCRIPTORS[char], dims))
+            i += 1
+        dims = 0
+    return types
+
+
+def _split_parameters(params_str: str) -> List[str]:
+    while True:
+        params_str, count = _ANGLE_BRACKETS_RE.subn('', params_str)
+        if count == 0:
+            break
+    return [each.strip() for each in params_str.split(',') if each.strip()]
+
+
+def source_parameter_types(params_str: str) -> List[Tuple[str, int]]:
+    """The parameters of a source signature like `(java.util.Map<K, V>,K...)` as (erased type name, array dimensions)."""
+    types = []
+    for param in _split_parameters(params_str):
+        # drop annotations and modifiers, then the parameter name if there is one
+        tokens = [each for each in param.replace('...', '[] ').replace(' [', '[').split() if not each.startswith('@') and each != 'final']
+        if len(tokens) > 1:
+            # `int xs[]` is as much an array as `int[] xs`
+            tokens[-1] = tokens[-1][tokens[-1].find('['):] if '[' in tokens[-1] else ''
+        type_name = ''.join(tokens)
+        dims = type_name.count('[]')
+        types.append((type_name.replace('[]', ''), dims))
+    return types
+
+
+def _parameter_match(source_type: Tuple[str, int], jvm_type: Tuple[str, int]) -> Optional[int]:
+    """2 for the same type, 1 for a type variable that may have been erased to it, None if the types differ."""
+    (source_name, source_dims), (jvm_name, jvm_dims) = source_type, jvm_type
+    if source_dims != jvm_dims:
+        return None
+    if source_name in _PRIMITIVES or jvm_name in _PRIMITIVES:
+        return 2 if source_name == jvm_name else None
+    if source_name == jvm_name:
+        return 2
+    if '.' in source_name:
+        return None
+    # an unqualified name is either the simple name of the class or a type variable, erased to its bound
+    return 2 if jvm_name.split('.')[-1] == source_name else 1
+
+
+def find_method(classes: List[ClassCoverage], focal_method_name_param: str) -> Optional[MethodCoverage]:
+    """The method of `classes` with the source signature `name(java.util.Map<K, V>,K[])`, matched by its JVM descriptor."""
+    name, _, params_str = focal_method_name_param.strip().partition('(')
+    source_types = source_parameter_types(params_str.rsplit(')', 1)[0])
+    for class_coverage in classes:
+        jvm_name = '<init>' if name == class_coverage.simple_name else name
+        candidates = [each for each in class_coverage.methods if each.name == jvm_name]
+        best, best_score = None, -1
+        for method in candidates:
+            jvm_types = descriptor_parameter_types(method.desc)
+            if len(jvm_types) != len(source_types):
+                continue
+            scores = [_parameter_match(source_type, jvm_type) for source_type, jvm_type in zip(source_types, jvm_types)]
+            if None not in scores and sum(scores) > best_score:
+                best, best_score = method, sum(scores)
+        if best is None and len(candidates) == 1:
+            # the only overload, e.g. a parameter type the source signature spells differently
+            best = candidates[0]
+        if best is not None:
+            return best
+    return None
+
+
+def describe_methods(classes: List[ClassCoverage]) -> str:
+    # for a manual check when the focal method is not found
+    return '\n'.join(f'{each_class.name}#{method.name}{method.desc} line {method.line}' for each_class in classes for method in each_class.methods)
@@ -0,0 +1,717 @@
+import javax.tools.Diagnostic;
+import javax.tools.DiagnosticCollector;
+import javax.tools.FileObject;
+import javax.tools.ForwardingJavaFileManager;
+import javax.tools.JavaCompiler;
+import javax.tools.JavaFileObject;
+import javax.tools.SimpleJavaFileObject;
+import javax.tools.StandardJavaFileManager;
+import javax.tools.ToolProvider;
+import java.io.BufferedReader;
+import java.io.ByteArrayOutputStream;
+import java.io.File;
+import java.io.FileDescriptor;
+import java.io.FileOutputStream;
+import java.io.InputStreamReader;
+import java.io.OutputStream;
+import java.io.PrintStream;
+import java.io.PrintWriter;
+import java.io.StringWriter;
+import java.lang.reflect.Array;
+import java.lang.reflect.InvocationTargetException;
+import java.net.URI;
+import java.net.URL;
+import java.net.URLClassLoader;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+import java.nio.file.Paths;
+import java.util.ArrayList;
+import java.util.Arrays;
+import java.util.Collection;
+import java.util.HashMap;
+import java.util.LinkedHashMap;
+import java.util.List;
+import java.util.Locale;
+import java.util.Map;
+import java.util.jar.JarFile;
+
+/**
+ * Long-lived helper of the `worker` runner mode (see backend/jvm_worker.py).
+ *
+ * Reads one JSON request per line from stdin and answers with one JSON line on stdout. A "run" request compiles
+ * the generated test in memory with javax.tools.JavaCompiler and runs it with JUnit 4 or the JUnit Platform in a
+ * fresh class loader, so nothing leaks between requests while the JVM itself stays warm.
+ *
+ * Without "source_path" the test class is taken from the classpath as Maven compiled it (batch runs, see
+ * backend/batch_runner.py). With "coverage_file" the JaCoCo agent the worker was started with is reset before the
+ * test and its execution data is written to that file afterwards, so coverage is attributed to each test on its own.
+ * With "methods" each of those test methods runs on its own and, with "coverage_dir", its execution data is written
+ * to {coverage_dir}/{class_name}#{method}.exec (the dynamic analysis of collect_pairs, one run of the whole suite).
+ *
+ * A "coverage" request turns execution data files into the covered and uncovered lines of the source files of the
+ * given class files, with the JaCoCo core jars of "jacoco_classpath" (as the jacoco:report goal would).
+ *
+ * An "analyze" request runs the main class of a javaparser utility jar on each of its files and returns what it
+ * printed (collect_pairs, see backend/extension_api/collect_pairs/utils.py). The jar is loaded once for all requests,
+ * so the utilities must not keep state between runs of their main method.
+ */
+public class TestWorker {
+    private static final int MAX_TRACE_LINES = 30;
+    // the main method of each analysis jar, in a class loader of its own that lives as long as the worker
+    private static final Map<String, java.lang.reflect.Method> ANALYSIS_MAINS = new HashMap<String, java.lang.reflect.Method>();
+    // the JaCoCo core of coverage requests, also loaded once
+    private static final Map<String, ClassLoader> JACOCO_LOADERS = new HashMap<String, ClassLoader>();
+
+    public static void main(String[] args) throws Exception {
+        PrintStream protocolOut = new PrintStream(new FileOutputStream(FileDescriptor.out), true, "UTF-8");
+        // whatever the tests print must never end up in the protocol stream
+        System.setOut(System.err);
+
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+        String line;
+        while ((line = in.readLine()) != null) {
+            if (line.trim().isEmpty()) {
+                continue;
+            }
+            Map<String, Object> response;
+            Object id = null;
+            try {
+                @SuppressWarnings("unchecked")
+                Map<String, Object> request = (Map<String, Object>) new Json(line).parse();
+                id = request.get("id");
+                response = handle(request);
+            } catch (Throwable t) {
+                response = new LinkedHashMap<String, Object>();
+                response.put("error", trace(t));
+            }
+            response.put("id", id);
+            protocolOut.println(Json.write(response));
+        }
+    }
+
+    @SuppressWarnings("unchecked")
+    private static Map<String, Object> handle(Map<String, Object> request) throws Exception {
+        Map<String, Object> response = new LinkedHashMap<String, Object>();
+        String type = (String) request.get("type");
+        if ("ping".equals(type)) {
+            response.put("pong", Boolean.TRUE);
+            return response;
+        }
+        if ("analyze".equals(type)) {
+            return analyze((String) request.get("jar"), (List<Object>) request.get("files"), response);
+        }
+        if ("coverage".equals(type)) {
+            return coverage((List<Object>) request.get("jacoco_classpath"), (List<Object>) request.get("exec_files"),
+                    (List<Object>) request.get("class_files"), Boolean.TRUE.equals(request.get("report")), response);
+        }
+        if (!"run".equals(type)) {
+            throw new IllegalArgumentException("Unknown request type: " + type);
+        }
+
+        List<Object> classpath = (List<Object>) request.get("classpath");
+        String sourcePath = (String) request.get("source_path");
+        String sourcepath = (String) request.get("sourcepath");
+        String className = (String) request.get("class_name");
+        int junitVersion = ((Number) request.get("junit_version")).intValue();
+        String coverageFile = (String) request.get("coverage_file");
+        List<Object> methods = (List<Object>) request.get("methods");
+        String coverageDir = (String) request.get("coverage_dir");
+
+        Map<String, ByteArrayOutputStream> compiledClasses = new HashMap<String, ByteArrayOutputStream>();
+        if (sourcePath != null && !sourcePath.isEmpty()) {
+            if (!compile(classpath, sourcePath, sourcepath, compiledClasses, response)) {
+                return response;
+            }
+        } else {
+            response.put("compile_success", Boolean.TRUE);
+            response.put("compile_log", "");
+        }
+
+        URL[] urls = new URL[classpath.size()];
+        for (int i = 0; i < urls.length; i++) {
+            urls[i] = new File((String) classpath.get(i)).toURI().toURL();
+        }
+        ByteArrayOutputStream captured = new ByteArrayOutputStream();
+        PrintStream capture = new PrintStream(captured, true, "UTF-8");
+        PrintStream oldOut = System.out;
+        PrintStream oldErr = System.err;
+        ClassLoader oldContext = Thread.currentThread().getContextClassLoader();
+        MemoryClassLoader loader = new MemoryClassLoader(urls, compiledClasses);
+        int[] counts = new int[4];
+        StringBuilder output = new StringBuilder();
+        Map<String, Object> coverageFiles = new LinkedHashMap<String, Object>();
+        try {
+            System.setOut(capture);
+            System.setErr(capture);
+            Thread.currentThread().setContextClassLoader(loader);
+            Class<?> testClass = loader.loadClass(className);
+            if (methods == null) {
+                run(loader, testClass, null, junitVersion, coverageFile, counts, output);
+            } else {
+                for (Object method : methods) {
+                    String methodCoverageFile = null;
+                    if (coverageDir != null) {
+                        methodCoverageFile = new File(coverageDir, className + "#" + method + ".exec").getPath();
+                        coverageFiles.put((String) method, methodCoverageFile);
+                    }
+                    run(loader, testClass, (String) method, junitVersion, methodCoverageFile, counts, output);
+                }
+            }
+        } finally {
+            Thread.currentThread().setContextClassLoader(oldContext);
+            System.setOut(oldOut);
+            System.setErr(oldErr);
+            loader.close();
+        }
+        output.append(new String(captured.toByteArray(), StandardCharsets.UTF_8));
+        response.put("run", counts[0]);
+        response.put("failures", counts[1]);
+        response.put("errors", counts[2]);
+        response.put("skipped", counts[3]);
+        response.put("output", output.toString());
+        if (methods != null && coverageDir != null) {
+            response.put("coverage_files", coverageFiles);
+        }
+        return response;
+    }
+
+    // one test method, or the whole class without a method, with its execution data written to coverageFile
+    private static void run(ClassLoader loader, Class<?> testClass, String method, int junitVersion, String coverageFile,
+                            int[] counts, StringBuilder output) throws Exception {
+        if (coverageFile != null) {
+            coverageAgent("reset");
+        }
+        if (junitVersion == 4) {
+            runJUnit4(loader, testClass, method, counts, output);
+        } else {
+            runJUnitPlatform(loader, testClass, method, counts, output);
+        }
+        if (coverageFile != null) {
+            Files.write(Paths.get(coverageFile), (byte[]) coverageAgent("getExecutionData"));
+        }
+    }
+
+    private static Map<String, Object> analyze(String jar, List<Object> files, Map<String, Object> response) throws Exception {
+        java.lang.reflect.Method main = analysisMain(jar);
+        List<Object> outputs = new ArrayList<Object>();
+        List<Object> errors = new ArrayList<Object>();
+        PrintStream oldOut = System.out;
+        for (Object file : files) {
+            ByteArrayOutputStream captured = new ByteArrayOutputStream();
+            String error = null;
+            try {
+                System.setOut(new PrintStream(captured, true, "UTF-8"));
+                invoke(main, null, (Object) new String[] {(String) file});
+            } catch (Throwable t) {
+                // one unparsable file must not fail the others of the batch
+                error = trace(t);
+            } finally {
+                System.setOut(oldOut);
+            }
+            outputs.add(new String(captured.toByteArray(), StandardCharsets.UTF_8));
+            errors.add(error);
+        }
+        response.put("outputs", outputs);
+        response.put("errors", errors);
+        return response;
+    }
+
+    private static java.lang.reflect.Method analysisMain(String jar) throws Exception {
+        java.lang.reflect.Method main = ANALYSIS_MAINS.get(jar);
+        if (main != null) {
+            return main;
+        }
+        String mainClass;
+        JarFile jarFile = new JarFile(jar);
+        try {
+            mainClass = jarFile.getManifest().getMainAttributes().getValue("Main-Class");
+        } finally {
+            jarFile.close();
+        }
+        URLClassLoader loader = new URLClassLoader(new URL[] {new File(jar).toURI().toURL()}, ClassLoader.getSystemClassLoader().getParent());
+        main = loader.loadClass(mainClass).getMethod("main", String[].class);
+        ANALYSIS_MAINS.put(jar, main);
+        return main;
+    }
+
+    private static boolean compile(List<Object> classpath, String sourcePath, String sourcepath, Map<String, ByteArrayOutputStream> classes,
+                                   Map<String, Object> response) {
+        JavaCompiler compiler = ToolProvider.getSystemJavaCompiler();
+        if (compiler == null) {
+            throw new IllegalStateException("No system Java compiler, the worker must run on a JDK");
+        }
+        DiagnosticCollector<JavaFileObject> diagnostics = new DiagnosticCollector<JavaFileObject>();
+        StandardJavaFileManager standard = compiler.getStandardFileManager(diagnostics, Locale.ROOT, StandardCharsets.UTF_8);
+        MemoryFileManager fileManager = new MemoryFileManager(standard);
+        StringBuilder cp = new StringBuilder();
+        for (Object each : classpath) {
+            if (cp.length() > 0) {
+                cp.append(File.pathSeparatorChar);
+            }
+            cp.append(each);
+        }
+        List<String> options = new ArrayList<String>(Arrays.asList("-classpath", cp.toString(), "-encoding", "UTF-8", "-nowarn", "-g", "-proc:none"));
+        if (sourcepath != null && !sourcepath.isEmpty()) {
+            options.add("-sourcepath");
+            options.add(sourcepath);
+        }
+        boolean compiled = compiler.getTask(null, fileManager, diagnostics, options, null, standard.getJavaFileObjects(new File(sourcePath))).call();
+        StringBuilder compileLog = new StringBuilder();
+        for (Diagnostic<? extends JavaFileObject> each : diagnostics.getDiagnostics()) {
+            if (each.getKind() != Diagnostic.Kind.ERROR) {
+                continue;
+            }
+            String path = each.getSource() == null ? "" : each.getSource().getName();
+            compileLog.append(path).append(':').append(each.getLineNumber()).append(": error: ").append(each.getMessage(Locale.ROOT)).append('\n');
+        }
+        response.put("compile_success", compiled);
+        response.put("compile_log", compileLog.toString());
+        classes.putAll(fileManager.classes);
+        return compiled;
+    }
+
+    @SuppressWarnings("unchecked")
+    // with report, also what jacoco.xml holds of the classes: the counters of each method and of each line
+    private static Map<String, Object> coverage(List<Object> jacocoClasspath, List<Object> execFiles, List<Object> classFiles,
+                                                boolean report, Map<String, Object> response) throws Exception {
+        ClassLoader loader = jacocoLoader(jacocoClasspath);
+        Class<?> execFileLoaderType = loader.loadClass("org.jacoco.core.tools.ExecFileLoader");
+        Class<?> storeType = loader.loadClass("org.jacoco.core.data.ExecutionDataStore");
+        Class<?> visitorType = loader.loadClass("org.jacoco.core.analysis.ICoverageVisitor");
+        Class<?> builderType = loader.loadClass("org.jacoco.core.analysis.CoverageBuilder");
+        Class<?> analyzerType = loader.loadClass("org.jacoco.core.analysis.Analyzer");
+        Class<?> sourceType = loader.loadClass("org.jacoco.core.analysis.ISourceFileCoverage");
+        Class<?> lineType = loader.loadClass("org.jacoco.core.analysis.ILine");
+        Class<?> classType = loader.loadClass("org.jacoco.core.analysis.IClassCoverage");
+        Class<?> methodType = loader.loadClass("org.jacoco.core.analysis.IMethodCoverage");
+        Class<?> nodeType = loader.loadClass("org.jacoco.core.analysis.ICoverageNode");
+        Class<?> counterType = loader.loadClass("org.jacoco.core.analysis.ICounter");
+        List<Object> results = new ArrayList<Object>();
+        List<Object> reports = new ArrayList<Object>();
+        for (Object execFile : execFiles) {
+            Object execFileLoader = execFileLoaderType.newInstance();
+            invoke(execFileLoaderType.getMethod("load", File.class), execFileLoader, new File((String) execFile));
+            Object store = invoke(execFileLoaderType.getMethod("getExecutionDataStore"), execFileLoader);
+            Object builder = builderType.newInstance();
+            Object analyzer = analyzerType.getConstructor(storeType, visitorType).newInstance(store, builder);
+            for (Object classFile : classFiles) {
+                invoke(analyzerType.getMethod("analyzeAll", File.class), analyzer, new File((String) classFile));
+            }
+            Map<String, Object> sourceFiles = new LinkedHashMap<String, Object>();
+            Map<String, Object> reportLines = new LinkedHashMap<String, Object>();
+            for (Object source : (Collection<Object>) invoke(builderType.getMethod("getSourceFiles"), builder)) {
+                String packageName = (String) invoke(sourceType.getMethod("getPackageName"), source);
+                String name = (String) invoke(sourceType.getMethod("getName"), source);
+                int first = (Integer) invoke(sourceType.getMethod("getFirstLine"), source);
+                int last = (Integer) invoke(sourceType.getMethod("getLastLine"), source);
+                List<Object> covered = new ArrayList<Object>();
+                List<Object> uncovered = new ArrayList<Object>();
+                Map<String, Object> counters = new LinkedHashMap<String, Object>();
+                // ICounter.NOT_COVERED, FULLY_COVERED and PARTLY_COVERED; like the XML report, partly covered lines are covered
+                for (int nr = first; first >= 0 && nr <= last; nr++) {
+                    Object line = invoke(sourceType.getMethod("getLine", int.class), source, nr);
+                    int status = (Integer) invoke(lineType.getMethod("getStatus"), line);
+                    if (status == 1) {
+                        uncovered.add(nr);
+                    } else if (status > 1) {
+                        covered.add(nr);
+                    }
+                    if (report && status > 0) {
+                        // mi, ci, mb and cb of a line of jacoco.xml
+                        List<Object> lineCounters = new ArrayList<Object>();
+                        lineCounters.addAll(counter(counterType, invoke(lineType.getMethod("getInstructionCounter"), line)));
+                        lineCounters.addAll(counter(counterType, invoke(lineType.getMethod("getBranchCounter"), line)));
+                        counters.put(String.valueOf(nr), lineCounters);
+                    }
+                }
+                Map<String, Object> lines = new LinkedHashMap<String, Object>();
+                lines.put("covered", covered);
+                lines.put("uncovered", uncovered);
+                sourceFiles.put(packageName.isEmpty() ? name : packageName + "/" + name, lines);
+                reportLines.put(packageName.isEmpty() ? name : packageName + "/" + name, counters);
+            }
+            results.add(sourceFiles);
+            if (report) {
+                List<Object> classes = new ArrayList<Object>();
+                for (Object each : (Collection<Object>) invoke(builderType.getMethod("getClasses"), builder)) {
+                    List<Object> methods = new ArrayList<Object>();
+                    for (Object method : (Collection<Object>) invoke(classType.getMethod("getMethods"), each)) {
+                        Map<String, Object> methodReport = new LinkedHashMap<String, Object>();
+                        methodReport.put("name", invoke(nodeType.getMethod("getName"), method));
+                        methodReport.put("desc", invoke(methodType.getMethod("getDesc"), method));
+                        methodReport.put("line", invoke(methodType.getMethod("getFirstLine"), method));
+                        methodReport.put("counters", nodeCounters(nodeType, counterType, method));
+                        methods.add(methodReport);
+                    }
+                    Map<String, Object> classReport = new LinkedHashMap<String, Object>();
+                    classReport.put("name", invoke(nodeType.getMethod("getName"), each));
+                    classReport.put("source_file", invoke(classType.getMethod("getSourceFileName"), each));
+                    classReport.put("methods", methods);
+                    classes.add(classReport);
+                }
+                Map<String, Object> executionReport = new LinkedHashMap<String, Object>();
+                executionReport.put("lines", reportLines);
+                executionReport.put("classes", classes);
+                reports.add(executionReport);
+            }
+        }
+        response.put("coverage", results);
+        if (report) {
+            response.put("reports", reports);
+        }
+        return response;
+    }
+
+    // (missed, covered) of an ICounter
+    private static List<Object> counter(Class<?> counterType, Object counter) throws Exception {
+        return Arrays.asList(invoke(counterType.getMethod("getMissedCount"), counter), invoke(counterType.getMethod("getCoveredCount"), counter));
+    }
+
+    // the counters of a method as the <counter type=...> elements of jacoco.xml, those without any item left out as there
+    private static Map<String, Object> nodeCounters(Class<?> nodeType, Class<?> counterType, Object node) throws Exception {
+        String[][] getters = {{"INSTRUCTION", "getInstructionCounter"}, {"BRANCH", "getBranchCounter"}, {"LINE", "getLineCounter"},
+                {"COMPLEXITY", "getComplexityCounter"}, {"METHOD", "getMethodCounter"}};
+        Map<String, Object> counters = new LinkedHashMap<String, Object>();
+        for (String[] getter : getters) {
+            Object counter = invoke(nodeType.getMethod(getter[1]), node);
+            if ((Integer) invoke(counterType.getMethod("getTotalCount"), counter) > 0) {
+                counters.put(getter[0], counter(counterType, counter));
+            }
+        }
+        return counters;
+    }
+
+    private static ClassLoader jacocoLoader(List<Object> jacocoClasspath) throws Exception {
+        String key = jacocoClasspath.toString();
+        ClassLoader loader = JACOCO_LOADERS.get(key);
+        if (loader == null) {
+            URL[] urls = new URL[jacocoClasspath.size()];
+            for (int i = 0; i < urls.length; i++) {
+                urls[i] = new File((String) jacocoClasspath.get(i)).toURI().toURL();
+            }
+            // not a child of the system class loader, whose JaCoCo agent runtime must not be mixed up with this JaCoCo
+            loader = new URLClassLoader(urls, ClassLoader.getSystemClassLoader().getParent());
+            JACOCO_LOADERS.put(key, loader);
+        }
+        return loader;
+    }
+
+    private static Object coverageAgent(String method) throws Exception {
+        // the runtime of -javaagent:jacocoagent.jar is on the system class path, which the tests' class loader does not see
+        Object agent = invoke(Class.forName("org.jacoco.agent.rt.RT").getMethod("getAgent"), null);
+        Class<?> agentType = Class.forName("org.jacoco.agent.rt.IAgent");
+        if ("reset".equals(method)) {
+            return invoke(agentType.getMethod("reset"), agent);
+        }
+        return invoke(agentType.getMethod("getExecutionData", boolean.class), agent, Boolean.TRUE);
+    }
+
+    private static void runJUnit4(ClassLoader loader, Class<?> testClass, String method, int[] counts, StringBuilder output) throws Exception {
+        Class<?> core = loader.loadClass("org.junit.runner.JUnitCore");
+        Object result;
+        if (method == null) {
+            result = invoke(core.getMethod("runClasses", Class[].class), null, (Object) new Class<?>[]{testClass});
+        } else {
+            Class<?> requestClass = loader.loadClass("org.junit.runner.Request");
+            Object request = invoke(requestClass.getMethod("method", Class.class, String.class), null, testClass, method);
+            result = invoke(core.getMethod("run", requestClass), core.newInstance(), request);
+        }
+        Class<?> resultClass = loader.loadClass("org.junit.runner.Result");
+        Class<?> failureClass = loader.loadClass("org.junit.runner.notification.Failure");
+        int ignored = (Integer) invoke(resultClass.getMethod("getIgnoreCount"), result);
+        // surefire counts ignored tests in "Tests run"
+        counts[0] += (Integer) invoke(resultClass.getMethod("getRunCount"), result) + ignored;
+        counts[3] += ignored;
+        int index = counts[1] + counts[2];
+        for (Object failure : (List<?>) invoke(resultClass.getMethod("getFailures"), result)) {
+            Throwable exception = (Throwable) invoke(failureClass.getMethod("getException"), failure);
+            String header = (String) invoke(failureClass.getMethod("getTestHeader"), failure);
+            countFailure(exception, counts);
+            output.append(++index).append(") ").append(header).append('\n').append(trace(exception));
+        }
+    }
+
+    private static void runJUnitPlatform(ClassLoader loader, Class<?> testClass, String method, int[] counts, StringBuilder output) throws Exception {
+        Class<?> selectors = loader.loadClass("org.junit.platform.engine.discovery.DiscoverySelectors");
+        Class<?> selectorType = loader.loadClass("org.junit.platform.engine.DiscoverySelector");
+        Class<?> builderClass = loader.loadClass("org.junit.platform.launcher.core.LauncherDiscoveryRequestBuilder");
+        Class<?> requestType = loader.loadClass("org.junit.platform.launcher.LauncherDiscoveryRequest");
+        Class<?> launcherType = loader.loadClass("org.junit.platform.launcher.Launcher");
+        Class<?> listenerType = loader.loadClass("org.junit.platform.launcher.TestExecutionListener");
+        Class<?> summaryListenerClass = loader.loadClass("org.junit.platform.launcher.listeners.SummaryGeneratingListener");
+        Class<?> summaryType = loader.loadClass("org.junit.platform.launcher.listeners.TestExecutionSummary");
+        Class<?> failureType = loader.loadClass("org.junit.platform.launcher.listeners.TestExecutionSummary$Failure");
+        Class<?> identifierType = loader.loadClass("org.junit.platform.launcher.TestIdentifier");
+
+        Object selectorArray = Array.newInstance(selectorType, 1);
+        if (method == null) {
+            Array.set(selectorArray, 0, invoke(selectors.getMethod("selectClass", Class.class), null, testClass));
+        } else {
+            Array.set(selectorArray, 0, invoke(selectors.getMethod("selectMethod", Class.class, String.class), null, testClass, method));
+        }
+        Object builder = invoke(builderClass.getMethod("request"), null);
+        builder = invoke(builderClass.getMethod("selectors", selectorArray.getClass()), builder, selectorArray);
+        Object request = invoke(builderClass.getMethod("build"), builder);
+        Object launcher = invoke(loader.loadClass("org.junit.platform.launcher.core.LauncherFactory").getMethod("create"), null);
+        Object listener = summaryListenerClass.newInstance();
+        Object listenerArray = Array.newInstance(listenerType, 1);
+        Array.set(listenerArray, 0, listener);
+        invoke(launcherType.getMethod("execute", requestType, listenerArray.getClass()), launcher, request, listenerArray);
+
+        Object summary = invoke(summaryListenerClass.getMethod("getSummary"), listener);
+        long skipped = (Long) invoke(summaryType.getMethod("getTestsSkippedCount"), summary);
+        long aborted = (Long) invoke(summaryType.getMethod("getTestsAbortedCount"), summary);
+        counts[0] += ((Long) invoke(summaryType.getMethod("getTestsFoundCount"), summary)).intValue();
+        counts[3] += (int) (skipped + aborted);
+        int index = counts[1] + counts[2];
+        for (Object failure : (List<?>) invoke(summaryType.getMethod("getFailures"), summary)) {
+            Throwable exception = (Throwable) invoke(failureType.getMethod("getException"), failure);
+            Object identifier = invoke(failureType.getMethod("getTestIdentifier"), failure);
+            String name = (String) invoke(identifierType.getMethod("getDisplayName"), identifier);
+            countFailure(exception, counts);
+            output.append(++index).append(") ").append(name).append('(').append(testClass.getName()).append(")\n").append(trace(exception));
+        }
+    }
+
+    private static void countFailure(Throwable exception, int[] counts) {
+        // surefire reports assertion errors as failures and everything else as errors
+        if (exception instanceof AssertionError) {
+            counts[1]++;
+        } else {
+            counts[2]++;
+        }
+    }
+
+    private static Object invoke(java.lang.reflect.Method method, Object target, Object... args) throws Exception {
+        try {
+            return method.invoke(target, args);
+        } catch (InvocationTargetException e) {
+            Throwable cause = e.getCause();
+            if (cause instanceof Exception) {
+                throw (Exception) cause;
+            }
+            throw new RuntimeException(cause);
+        }
+    }
+
+    private static String trace(Throwable t) {
+        StringWriter writer = new StringWriter();
+        t.printStackTrace(new PrintWriter(writer));
+        String[] lines = writer.toString().split("\n");
+        StringBuilder trimmed = new StringBuilder();
+        for (int i = 0; i < lines.length && i < MAX_TRACE_LINES; i++) {
+            trimmed.append(lines[i].replace("\r", "")).append('\n');
+        }
+        return trimmed.toString();
+    }
+
+    static final class MemoryFileManager extends ForwardingJavaFileManager<StandardJavaFileManager> {
+        final Map<String, ByteArrayOutputStream> classes = new HashMap<String, ByteArrayOutputStream>();
+
+        MemoryFileManager(StandardJavaFileManager fileManager) {
+            super(fileManager);
+        }
+
+        @Override
+        public JavaFileObject getJavaFileForOutput(Location location, final String className, JavaFileObject.Kind kind, FileObject sibling) {
+            return new SimpleJavaFileObject(URI.create("mem:///" + className.replace('.', '/') + kind.extension), kind) {
+                @Override
+                public OutputStream openOutputStream() {
+                    ByteArrayOutputStream out = new ByteArrayOutputStream();
+                    classes.put(className, out);
+                    return out;
+                }
+            };
+        }
+    }
+
+    static final class MemoryClassLoader extends URLClassLoader {
+        private final Map<String, ByteArrayOutputStream> classes;
+
+        MemoryClassLoader(URL[] urls, Map<String, ByteArrayOutputStream> classes) {
+            // the extension/platform loader as parent keeps the worker's own classes invisible to the tests
+            super(urls, ClassLoader.getSystemClassLoader().getParent());
+            this.classes = classes;
+        }
+
+        @Override
+        protected Class<?> findClass(String name) throws ClassNotFoundException {
+            ByteArrayOutputStream bytes = classes.get(name);
+            if (bytes != null) {
+                byte[] b = bytes.toByteArray();
+                return defineClass(name, b, 0, b.length);
+            }
+            return super.findClass(name);
+        }
+    }
+
+    /** Just enough JSON for the request/response protocol. */
+    static final class Json {
+        private final String text;
+        private int pos;
+
+        Json(String text) {
+            this.text = text;
+        }
+
+        Object parse() {
+            skipWhitespace();
+            char c = text.charAt(pos);
+            if (c == '{') {
+                Map<String, Object> map = new LinkedHashMap<String, Object>();
+                pos++;
+                skipWhitespace();
+                if (text.charAt(pos) == '}') {
+                    pos++;
+                    return map;
+                }
+                while (true) {
+                    skipWhitespace();
+                    String key = parseString();
+                    skipWhitespace();
+                    expect(':');
+                    map.put(key, parse());
+                    skipWhitespace();
+                    if (text.charAt(pos) == ',') {
+                        pos++;
+                    } else {
+                        expect('}');
+                        return map;
+                    }
+                }
+            }
+            if (c == '[') {
+                List<Object> list = new ArrayList<Object>();
+                pos++;
+                skipWhitespace();
+                if (text.charAt(pos) == ']') {
+                    pos++;
+                    return list;
+                }
+                while (true) {
+                    list.add(parse());
+                    skipWhitespace();
+                    if (text.charAt(pos) == ',') {
+                        pos++;
+                    } else {
+                        expect(']');
+                        return list;
+                    }
+                }
+            }
+            if (c == '"') {
+                return parseString();
+            }
+            if (text.startsWith("true", pos)) {
+                pos += 4;
+                return Boolean.TRUE;
+            }
+            if (text.startsWith("false", pos)) {
+                pos += 5;
+                return Boolean.FALSE;
+            }
+            if (text.startsWith("null", pos)) {
+                pos += 4;
+                return null;
+            }
+            int start = pos;
+            while (pos < text.length() && "+-0123456789.eE".indexOf(text.charAt(pos)) >= 0) {
+                pos++;
+            }
+            String number = text.substring(start, pos);
+            if (number.contains(".") || number.contains("e") || number.contains("E")) {
+                return Double.valueOf(number);
+            }
+            return Long.valueOf(number);
+        }
+
+        private String parseString() {
+            expect('"');
+            StringBuilder sb = new StringBuilder();
+            while (true) {
+                char c = text.charAt(pos++);
+                if (c == '"') {
+                    return sb.toString();
+                }
+                if (c != '\\') {
+                    sb.append(c);
+                    continue;
+                }
+                char escaped = text.charAt(pos++);
+                switch (escaped) {
+                    case 'n': sb.append('\n'); break;
+                    case 't': sb.append('\t'); break;
+                    case 'r': sb.append('\r'); break;
+                    case 'b': sb.append('\b'); break;
+                    case 'f': sb.append('\f'); break;
+                    case 'u':
+                        sb.append((char) Integer.parseInt(text.substring(pos, pos + 4), 16));
+                        pos += 4;
+                        break;
+                    default: sb.append(escaped);
+                }
+            }
+        }
+
+        private void skipWhitespace() {
+            while (pos < text.length() && Character.isWhitespace(text.charAt(pos))) {
+                pos++;
+            }
+        }
+
+        private void expect(char c) {
+            if (text.charAt(pos) != c) {
+                throw new IllegalArgumentException("Expected '" + c + "' at " + pos);
+            }
+            pos++;
+        }
+
+        static String write(Object value) {
+            if (value == null) {
+                return "null";
+            }
+            if (value instanceof Boolean || value instanceof Number) {
+                return value.toString();
+            }
+            if (value instanceof Map) {
+                StringBuilder sb = new StringBuilder("{");
+                for (Map.Entry<?, ?> entry : ((Map<?, ?>) value).entrySet()) {
+                    if (sb.length() > 1) {
+                        sb.append(',');
+                    }
+                    sb.append(write(String.valueOf(entry.getKey()))).append(':').append(write(entry.getValue()));
+                }
+                return sb.append('}').toString();
+            }
+            if (value instanceof List) {
+                StringBuilder sb = new StringBuilder("[");
+                for (Object each : (List<?>) value) {
+                    if (sb.length() > 1) {
+                        sb.append(',');
+                    }
+                    sb.append(write(each));
+                }
+                return sb.append(']').toString();
+            }
+            String s = value.toString();
+            StringBuilder sb = new StringBuilder("\"");
+            for (int i = 0; i < s.length(); i++) {
+                char c = s.charAt(i);
+                switch (c) {
+                    case '"': sb.append("\\\""); break;
+                    case '\\': sb.append("\\\\"); break;
+                    case '\n': sb.append("\\n"); break;
+                    case '\r': sb.append("\\r"); break;
+                    case '\t': sb.append("\\t"); break;
+                    default:
+                        if (c < 0x20) {
+                            sb.append(String.format("\\u%04x", (int) c));
+                        } else {
+                            sb.append(c);
+                        }
+                }
+            }
+            return sb.append('"').toString();
+        }
+    }
+}
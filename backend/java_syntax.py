@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import bisect
+import os
+import re
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+_TOKEN_RE = re.compile(r'''
+    (?P<ws>\s+)
+  | (?P<line_comment>//[^\n]*)
+  | (?P<block_comment>/\*.*?\*/)
+  | (?P<unclosed_comment>/\*)
+  | (?P<text_block>"""(?:\\.|[^\\])*?""")
+  | (?P<string>"(?:\\.|[^"\\\n])*")
+  | (?P<unclosed_string>")
+  | (?P<char>'(?:\\.|[^'\\\n])+')
+  | (?P<unclosed_char>')
+  | (?P<annotation>@\s*[A-Za-z_$][\w$]*(?:\s*\.\s*[A-Za-z_$][\w$]*)*)
+  | (?P<ident>[A-Za-z_$][\w$]*)
+  | (?P<number>\d[\w.]*)
+  | (?P<open>[({\[])
+  | (?P<close>[)}\]])
+  | (?P<op>.)
+''', re.DOTALL | re.VERBOSE)
+
+_PAIRS = {'(': ')', '[': ']', '{': '}'}
+_TYPE_KEYWORDS = ('class', 'interface', 'enum', 'record')
+_TEST_ANNOTATIONS = ('Test', 'ParameterizedTest', 'RepeatedTest', 'TestFactory', 'TestTemplate')
+_GENERATION_FAILURES = ('[ERROR] Failed to generate', 'Failed to generate')
+
+
+@dataclass
+class Token:
+    kind: str
+    text: str
+    line: int
+    column: int
+
+
+@dataclass
+class SyntaxDiagnostic:
+    line: int
+    column: int
+    message: str
+
+
+def tokenize(source: str, keep_comments: bool = False) -> Iterator[Token]:
+    """Yield Java tokens with 1-based positions; whitespace (and comments unless asked for) is skipped."""
+    line_starts = [0] + [m.end() for m in re.finditer('\n', source)]
+    for match in _TOKEN_RE.finditer(source):
+        kind = match.lastgroup
+        if kind == 'ws' or (not keep_comments and kind in ('line_comment', 'block_comment')):
+            continue
+        line_idx = bisect.bisect_right(line_starts, match.start()) - 1
+        yield Token(kind, match.group(), line_idx + 1, match.start() - line_starts[line_idx] + 1)
+
+
+def check_java_source(source: str, file_name: Optional[str] = None) -> List[SyntaxDiagnostic]:
+    """Cheap javac-like checks that catch responses which can never compile, without starting a JVM."""
+    if not source.strip():
+        return [SyntaxDiagnostic(1, 1, 'the generated test case is empty, no Java code was found in the response')]
+    for each_line_idx, each_line in enumerate(source.split('\n')):
+        if each_line.strip().startswith(_GENERATION_FAILURES):
+            return [SyntaxDiagnostic(each_line_idx + 1, 1, f'the response contains no test case: {each_line.strip()}')]
+
+    diagnostics: List[SyntaxDiagnostic] = []
+    tokens: List[Token] = []
+    stack: List[Token] = []
+    for token in tokenize(source):
+        if token.kind == 'unclosed_comment':
+            diagnostics.append(SyntaxDiagnostic(token.line, token.column, 'unclosed comment'))
+            break
+        if token.kind == 'unclosed_string':
+            diagnostics.append(SyntaxDiagnostic(token.line, token.column, 'unclosed string literal'))
+            continue
+        if token.kind == 'unclosed_char':
+            diagnostics.append(SyntaxDiagnostic(token.line, token.column, 'unclosed character literal'))
+            continue
+
+        if token.kind == 'open':
+            stack.append(token)
+        elif token.kind == 'close':
+            if not stack:
+                diagnostics.append(SyntaxDiagnostic(token.line, token.column, 'class, interface, enum, or record expected'))
+                return diagnostics
+            opening = stack.pop()
+            if _PAIRS[opening.text] != token.text:
+                diagnostics.append(SyntaxDiagnostic(token.line, token.column, f"'{_PAIRS[opening.text]}' expected"))
+                return diagnostics
+        tokens.append(token)
+
+    if stack:
+        last_line = source.rstrip().count('\n') + 1
+        diagnostics.append(SyntaxDiagnostic(last_line, 1, 'reached end of file while parsing'))
+    if diagnostics:
+        return diagnostics
+
+    return _check_structure(tokens, file_name)
+
+
+def _check_structure(tokens: List[Token], file_name: Optional[str]) -> List[SyntaxDiagnostic]:
+    depth = 0
+    type_decl: Optional[Token] = None
+    type_name: Optional[Token] = None
+    is_public = False
+    has_test_annotation = False
+    for idx, token in enumerate(tokens):
+        if token.kind == 'open':
+            depth += 1
+        elif token.kind == 'close':
+            depth -= 1
+        elif token.kind == 'annotation':
+            if re.sub(r'\s', '', token.text)[1:].split('.')[-1] in _TEST_ANNOTATIONS:
+                has_test_annotation = True
+        elif depth == 0 and type_decl is None and token.kind == 'ident' and token.text in _TYPE_KEYWORDS:
+            # skip `@interface` and `Foo.class` style uses
+            prev = tokens[idx - 1] if idx > 0 else None
+            if prev is not None and prev.text == '.':
+                continue
+            if idx + 1 < len(tokens) and tokens[idx + 1].kind == 'ident':
+                type_decl, type_name = token, tokens[idx + 1]
+                is_public = any(each.text == 'public' for each in tokens[max(0, idx - 4):idx])
+
+    if type_decl is None:
+        first = tokens[0]
+        return [SyntaxDiagnostic(first.line, first.column, 'class, interface, enum, or record expected')]
+
+    diagnostics: List[SyntaxDiagnostic] = []
+    if file_name and is_public:
+        expected = os.path.splitext(os.path.basename(file_name))[0]
+        if type_name.text != expected:
+            diagnostics.append(SyntaxDiagnostic(type_decl.line, type_decl.column, f'class {type_name.text} is public, should be declared in a file named {type_name.text}.java'))
+    if not has_test_annotation:
+        diagnostics.append(SyntaxDiagnostic(type_decl.line, type_decl.column, 'no test method annotated with @Test was found'))
+    return diagnostics
+
+
+def format_diagnostics(diagnostics: List[SyntaxDiagnostic], path: str) -> str:
+    # same shape as maven-compiler-plugin errors, so the log extraction and compile_repair treat both alike
+    lines = ['[ERROR] COMPILATION ERROR : (pre-flight syntax check, the Maven build was skipped)']
+    lines += [f'[ERROR] {path}:[{each.line},{each.column}] {each.message}' for each in diagnostics]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import glob
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from maven_utils import resolve_test_classpath
+from modules.exceptions import GenerationCancelled
+from process_runner import ResourceLimits, run_streaming
+
+logger = logging.getLogger(__name__)
+
+JUNIT4_RUNNER = 'org.junit.runner.JUnitCore'
+JUNIT5_LAUNCHER = 'org.junit.platform.console.ConsoleLauncher'
+# surefire counts these as "Failures", every other throwable is an "Error"
+ASSERTION_ERRORS = (
+    'java.lang.AssertionError',
+    'org.junit.ComparisonFailure',
+    'junit.framework.AssertionFailedError',
+    'junit.framework.ComparisonFailure',
+    'org.opentest4j.AssertionFailedError',
+    'org.opentest4j.MultipleFailuresError',
+)
+
+_JUNIT4_FAILURE_RE = re.compile(r'^\d+\) .+\n(?P<exception>[\w.$]+)', re.MULTILINE)
+_JUNIT4_RESULT_RE = re.compile(r'^OK \((?P<run>\d+) tests?\)|^Tests run: (?P<run_f>\d+),\s+Failures: (?P<failures>\d+)', re.MULTILINE)
+
+
+def java_tool(name: str) -> str:
+    java_home = os.environ.get('JAVA_HOME')
+    if java_home:
+        candidate = os.path.join(java_home, 'bin', name + ('.exe' if os.name == 'nt' else ''))
+        if os.path.exists(candidate):
+            return candidate
+    return name
+
+
+def source_tree_fingerprint(*source_roots: str, exclude: Iterable[str] = ()) -> str:
+    excluded = {os.path.normpath(each) for each in exclude}
+    digest = hashlib.sha256()
+    for source_root in source_roots:
+        for root, dirs, files in os.walk(source_root):
+            dirs.sort()
+            for file in sorted(files):
+                path = os.path.join(root, file)
+                if os.path.normpath(path) in excluded:
+                    continue
+                stat = os.stat(path)
+                digest.update(f'{os.path.relpath(path, source_root)}:{stat.st_size}:{stat.st_mtime_ns}\n'.encode())
+    return digest.hexdigest()
+
+
+@dataclass
+class TestCounts:
+    run: int = 0
+    failures: int = 0
+    errors: int = 0
+    skipped: int = 0
+
+    def summary_line(self) -> str:
+        level = 'INFO' if self.failures == 0 and self.errors == 0 else 'ERROR'
+        return f'[{level}] Tests run: {self.run}, Failures: {self.failures}, Errors: {self.errors}, Skipped: {self.skipped}'
+
+
+def count_junit4_output(output: str) -> TestCounts:
+    counts = TestCounts()
+    result = None
+    for result in _JUNIT4_RESULT_RE.finditer(output):
+        pass
+    if result is None:
+        return counts
+    if result.group('run') is not None:
+        counts.run = int(result.group('run'))
+        return counts
+    counts.run = int(result.group('run_f'))
+    # JUnitCore only reports "Failures", split them into surefire's failures and errors by the thrown type
+    for failure in _JUNIT4_FAILURE_RE.finditer(output):
+        exception = failure.group('exception').rstrip(':')
+        if exception in ASSERTION_ERRORS:
+            counts.failures += 1
+        else:
+            counts.errors += 1
+    return counts
+
+
+def count_junit_xml_reports(reports_dir: str) -> TestCounts:
+    counts = TestCounts()
+    for report in glob.glob(os.path.join(reports_dir, '*.xml')):
+        for testcase in ET.parse(report).getroot().iter('testcase'):
+            counts.run += 1
+            if testcase.find('skipped') is not None:
+                counts.skipped += 1
+            elif testcase.find('failure') is not None:
+                counts.failures += 1
+            elif testcase.find('error') is not None:
+                error = testcase.find('error')
+                if error.get('type', '') in ASSERTION_ERRORS:
+                    counts.failures += 1
+                else:
+                    counts.errors += 1
+    return counts
+
+
+def maven_like_test_log(test_class_fqn: str, counts: TestCounts, test_output: str) -> str:
+    """The surefire section of a Maven log for a test run outside of Maven."""
+    execute_success = counts.run > 0 and counts.failures == 0 and counts.errors == 0
+    return '\n'.join([
+        '[INFO] -------------------------------------------------------',
+        '[INFO]  T E S T S',
+        '[INFO] -------------------------------------------------------',
+        f'[INFO] Running {test_class_fqn}',
+        test_output.rstrip('\n'),
+        counts.summary_line(),
+        '[INFO] BUILD SUCCESS' if execute_success else '[INFO] BUILD FAILURE',
+    ]) + '\n'
+
+
+class JavacTestRunner:
+    """Compile only the generated test with javac and run it with the JUnit launcher, bypassing the Maven lifecycle.
+
+    The logs mimic Maven's (`BUILD SUCCESS`/`BUILD FAILURE` and the surefire `Tests run:` summary) so the statuses
+    derived by `IntentionTester.run_test_case` are the same as with the Maven runner.
+    """
+
+    kept_main_versions = 3
+
+    def __init__(self, cache_dir: str, junit_console_launcher: str = '', timeout: Optional[float] = None, limits: Optional[ResourceLimits] = None) -> None:
+        self.cache_dir = cache_dir
+        self.junit_console_launcher = junit_console_launcher
+        self.timeout = timeout
+        self.limits = limits
+        # polled while javac or a test runs, the process tree is killed once it returns True
+        self.cancel_check = None
+        # project dir -> extra arguments of the Maven calls resolving the classpath, e.g. offline mode
+        self.maven_args = None
+        self._project_locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _project_lock(self, project_dir: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._project_locks.setdefault(project_dir, threading.Lock())
+
+    def _run(self, args: List[str], cwd: str) -> Tuple[int, str]:
+        logger.debug(f'Running: {args}')
+        result = run_streaming(args, cwd, timeout=self.timeout, cancel_check=self.cancel_check, limits=self.limits, merge_stderr=True)
+        if result.cancelled:
+            raise GenerationCancelled()
+        if result.timed_out:
+            return -1, f'{result.stdout}\n[ERROR] {args[0]} was terminated: {result.aborted}\n'
+        return result.returncode, result.stdout
+
+    def test_classpath(self, project_dir: str) -> List[str]:
+        return resolve_test_classpath(project_dir, self.cache_dir, self.maven_args(project_dir) if self.maven_args else ())
+
+    def compile_main(self, project_dir: str, classpath: List[str]) -> Tuple[Optional[str], str]:
+        """Compile `src/main/java` once per source version; returns (classes dir, javac log)."""
+        main_src = os.path.join(project_dir, 'src', 'main', 'java')
+        classes_dir = os.path.join(self.cache_dir, f'main-classes-{source_tree_fingerprint(main_src)[:16]}')
+        with self._project_lock(project_dir):
+            if os.path.isdir(classes_dir):
+                return classes_dir, ''
+            sources = [os.path.join(root, file) for root, _, files in os.walk(main_src) for file in files if file.endswith('.java')]
+            tmp_dir = tempfile.mkdtemp(prefix='main-classes-', dir=self.cache_dir)
+            returncode, log = self._javac(sources, tmp_dir, classpath, project_dir) if sources else (0, '')
+            if returncode != 0:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                return None, log
+            os.replace(tmp_dir, classes_dir)
+            # keep a few recent versions (other sessions may still run against them) and drop the rest
+            versions = sorted((each for each in glob.glob(os.path.join(self.cache_dir, 'main-classes-*')) if os.path.isdir(each)), key=os.path.getmtime, reverse=True)
+            for each in versions[self.kept_main_versions:]:
+                shutil.rmtree(each, ignore_errors=True)
+            return classes_dir, log
+
+    def _javac(self, sources: List[str], output_dir: str, classpath: List[str], cwd: str, sourcepath: str = '') -> Tuple[int, str]:
+        args_file = os.path.join(output_dir, 'sources.txt')
+        with open(args_file, 'w', encoding='utf8') as f:
+            f.write('\n'.join(f'"{each}"'.replace('\\', '/') for each in sources))
+        args = [java_tool('javac'), '-encoding', 'UTF-8', '-nowarn', '-g', '-d', output_dir, '-cp', os.pathsep.join(classpath)]
+        if sourcepath:
+            args += ['-sourcepath', sourcepath]
+        returncode, log = self._run(args + [f'@{args_file}'], cwd)
+        os.remove(args_file)
+        return returncode, log
+
+    def compile_and_execute(self, test_case_path: str, junit_version: int) -> Tuple[str, str, bool, bool]:
+        project_dir = test_case_path.split('/src/test/')[0]
+        test_class_fqn = os.path.splitext(test_case_path.split('/src/test/java/')[1])[0].replace('/', '.')
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        dependency_classpath = self.test_classpath(project_dir)
+        main_classes, main_log = self.compile_main(project_dir, dependency_classpath)
+        if main_classes is None:
+            return f'{main_log}\n[ERROR] Failed to compile the main sources\n[INFO] BUILD FAILURE\n', '', False, False
+
+        resource_dirs = [os.path.join(project_dir, 'src', each, 'resources') for each in ('test', 'main')]
+        classpath = [main_classes] + [each for each in resource_dirs if os.path.isdir(each)] + dependency_classpath
+
+        compile_success, compile_log, counts, test_output = self.compile_and_run_test(test_case_path, test_class_fqn, classpath, junit_version, project_dir)
+        if not compile_success:
+            return f'{compile_log}\n[INFO] BUILD FAILURE\n', '', False, False
+
+        execute_success = counts.run > 0 and counts.failures == 0 and counts.errors == 0
+        return f'{compile_log}\n[INFO] BUILD SUCCESS\n', maven_like_test_log(test_class_fqn, counts, test_output), True, execute_success
+
+    def compile_and_run_test(self, test_case_path: str, test_class_fqn: str, classpath: List[str], junit_version: int, project_dir: str) -> Tuple[bool, str, TestCounts, str]:
+        test_classes = tempfile.mkdtemp(prefix='test-classes-', dir=self.cache_dir)
+        try:
+            # helpers left in src/test/java are compiled on demand through the source path
+            returncode, compile_log = self._javac([test_case_path], test_classes, classpath, project_dir, sourcepath=os.path.join(project_dir, 'src', 'test', 'java'))
+            if returncode != 0:
+                return False, compile_log, TestCounts(), ''
+            counts, test_output = self.run_test(test_class_fqn, [test_classes] + classpath, junit_version, project_dir)
+            return True, compile_log, counts, test_output
+        finally:
+            shutil.rmtree(test_classes, ignore_errors=True)
+
+    def run_test(self, test_class_fqn: str, classpath: List[str], junit_version: int, cwd: str) -> Tuple[TestCounts, str]:
+        if int(junit_version) == 4:
+            _, output = self._run([java_tool('java'), '-cp', os.pathsep.join(classpath), JUNIT4_RUNNER, test_class_fqn], cwd)
+            return count_junit4_output(output), output
+
+        reports_dir = tempfile.mkdtemp(prefix='junit-reports-', dir=self.cache_dir)
+        try:
+            launcher_args = ['--disable-banner', '--details=tree', '--select-class', test_class_fqn, '--reports-dir', reports_dir]
+            console_jar = self.junit_console_launcher or next((each for each in classpath if 'junit-platform-console-standalone' in os.path.basename(each)), '')
+            if console_jar:
+                args = [java_tool('java'), '-jar', console_jar, '-cp', os.pathsep.join(classpath)] + launcher_args
+            else:
+                # junit-platform-console as a regular test dependency
+                args = [java_tool('java'), '-cp', os.pathsep.join(classpath), JUNIT5_LAUNCHER] + launcher_args
+            _, output = self._run(args, cwd)
+            return count_junit_xml_reports(reports_dir), output
+        finally:
+            shutil.rmtree(reports_dir, ignore_errors=True)
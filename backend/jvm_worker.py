@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import atexit
+import hashlib
+import itertools
+import json
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from javac_runner import JavacTestRunner, TestCounts, java_tool
+from modules.exceptions import GenerationCancelled
+from process_runner import kill_process_tree
+
+logger = logging.getLogger(__name__)
+
+WORKER_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'java', 'TestWorker.java')
+WORKER_MAIN_CLASS = 'TestWorker'
+# how often cancellation is checked while waiting for the worker
+_POLL_INTERVAL = 0.2
+
+
+class JvmWorkerError(RuntimeError):
+    """The worker process died or answered with a malformed response."""
+
+
+class JvmWorkerTimeout(JvmWorkerError):
+    """The worker did not answer in time and has been killed."""
+
+
+class JvmWorkerCancelled(JvmWorkerError):
+    """The request was cancelled and the worker has been killed."""
+
+
+class JvmWorker:
+    """A long-lived `TestWorker` JVM speaking one JSON object per line over stdin/stdout.
+
+    Requests are serialized; a request that times out kills the process and the next request starts a new one.
+    """
+
+    def __init__(self, work_dir: str, command: Optional[List[str]] = None, jvm_args: Sequence[str] = ()) -> None:
+        self.work_dir = work_dir
+        self.command = command
+        # e.g. the JaCoCo agent of batch runs
+        self.jvm_args = list(jvm_args)
+        self.n_starts = 0
+        self._process: Optional[subprocess.Popen] = None
+        self._responses: 'queue.Queue[Optional[str]]' = queue.Queue()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _worker_command(self) -> List[str]:
+        if self.command is not None:
+            return self.command
+        with open(WORKER_SOURCE, 'rb') as f:
+            source_hash = hashlib.sha256(f.read()).hexdigest()[:16]
+        classes_dir = os.path.join(self.work_dir, f'worker-{source_hash}')
+        if not os.path.exists(os.path.join(classes_dir, f'{WORKER_MAIN_CLASS}.class')):
+            # compiled aside and moved in place, workers of other processes may share the work dir (e.g. the collect_pairs pool)
+            tmp_dir = tempfile.mkdtemp(prefix='tmp-worker-', dir=self.work_dir)
+            process = subprocess.run([java_tool('javac'), '-encoding', 'UTF-8', '-d', tmp_dir, WORKER_SOURCE], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+            if process.returncode != 0:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                raise JvmWorkerError(f'Failed to compile the JVM worker:\n{process.stdout}')
+            try:
+                os.replace(tmp_dir, classes_dir)
+            except OSError:
+                # another process got there first
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        return [java_tool('java'), '-XX:+UseSerialGC', *self.jvm_args, '-cp', classes_dir, WORKER_MAIN_CLASS]
+
+    def _start(self) -> None:
+        os.makedirs(self.work_dir, exist_ok=True)
+        command = self._worker_command()
+        logger.info(f'Starting the JVM worker: {command}')
+        # what the tests print outside of a request goes to stderr, keep it for debugging instead of blocking on a pipe
+        stderr_log = open(os.path.join(self.work_dir, 'worker-stderr.log'), 'a', encoding='utf8')
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=stderr_log, universal_newlines=True, encoding='utf8', bufsize=1,
+                                         start_new_session=os.name == 'posix')
+        stderr_log.close()
+        self._responses = queue.Queue()
+        threading.Thread(target=self._read_responses, args=(self._process, self._responses), daemon=True).start()
+        self.n_starts += 1
+
+    @staticmethod
+    def _read_responses(process: subprocess.Popen, responses: 'queue.Queue[Optional[str]]') -> None:
+        for line in iter(process.stdout.readline, ''):
+            responses.put(line)
+        responses.put(None)
+
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def stop(self) -> None:
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        # processes started by a test die with the worker
+        kill_process_tree(process.pid)
+        process.wait()
+
+    def request(self, payload: Dict[str, Any], timeout: float, cancel_check: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+        with self._lock:
+            if not self.is_alive():
+                self.stop()
+                self._start()
+            request_id = next(self._ids)
+            try:
+                self._process.stdin.write(json.dumps(dict(payload, id=request_id)) + '\n')
+                self._process.stdin.flush()
+            except OSError as e:
+                self.stop()
+                raise JvmWorkerError(f'The JVM worker is gone: {e}')
+
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    line = self._responses.get(timeout=max(0.0, min(deadline - time.monotonic(), _POLL_INTERVAL)))
+                except queue.Empty:
+                    if cancel_check is not None and cancel_check():
+                        self.stop()
+                        raise JvmWorkerCancelled('The request to the JVM worker was cancelled')
+                    if time.monotonic() < deadline:
+                        continue
+                    self.stop()
+                    raise JvmWorkerTimeout(f'The JVM worker did not answer within {timeout} seconds')
+                if line is None:
+                    self.stop()
+                    raise JvmWorkerError('The JVM worker exited while handling a request')
+                try:
+                    response = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f'Ignoring a malformed line from the JVM worker: {line!r}')
+                    continue
+                if response.get('id') == request_id:
+                    return response
+
+
+_workers: Dict[str, JvmWorker] = {}
+_workers_lock = threading.Lock()
+
+
+def get_worker(work_dir: str) -> JvmWorker:
+    # runners are created per generation, the warm JVM must outlive them
+    with _workers_lock:
+        if work_dir not in _workers:
+            _workers[work_dir] = JvmWorker(work_dir)
+        return _workers[work_dir]
+
+
+@atexit.register
+def stop_all_workers() -> None:
+    with _workers_lock:
+        for worker in _workers.values():
+            worker.stop()
+
+
+class WorkerTestRunner(JavacTestRunner):
+    """Like `JavacTestRunner`, but the generated test is compiled in memory and run inside the warm JVM worker."""
+
+    def __init__(self, cache_dir: str, junit_console_launcher: str = '', request_timeout: float = 120, worker: Optional[JvmWorker] = None) -> None:
+        super().__init__(cache_dir, junit_console_launcher)
+        self.request_timeout = request_timeout
+        self.worker = worker or get_worker(os.path.join(cache_dir, 'jvm-worker'))
+
+    def _request_with_restart(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return self.worker.request(payload, self.request_timeout, self.cancel_check)
+        except (JvmWorkerTimeout, JvmWorkerCancelled):
+            raise
+        except JvmWorkerError as e:
+            # a crash (e.g. a test calling System.exit) only costs a restart
+            logger.warning(f'{e}, retrying once with a fresh worker')
+            return self.worker.request(payload, self.request_timeout, self.cancel_check)
+
+    def compile_and_run_test(self, test_case_path: str, test_class_fqn: str, classpath: List[str], junit_version: int, project_dir: str) -> Tuple[bool, str, TestCounts, str]:
+        if int(junit_version) != 4 and self.junit_console_launcher:
+            # the standalone console jar bundles the JUnit Platform launcher, which projects rarely depend on
+            classpath = classpath + [self.junit_console_launcher]
+        payload = {
+            'type': 'run',
+            'source_path': test_case_path,
+            'sourcepath': os.path.join(project_dir, 'src', 'test', 'java'),
+            'class_name': test_class_fqn,
+            'classpath': classpath,
+            'junit_version': int(junit_version),
+        }
+
+        try:
+            response = self._request_with_restart(payload)
+        except JvmWorkerTimeout as e:
+            return True, '', TestCounts(run=1, errors=1), f'[ERROR] {test_class_fqn}: {e}, the test was terminated\n'
+        except JvmWorkerCancelled:
+            raise GenerationCancelled()
+
+        if 'error' in response:
+            return True, '', TestCounts(run=1, errors=1), f'[ERROR] The JVM worker failed to run {test_class_fqn}:\n{response["error"]}'
+        if not response['compile_success']:
+            return False, response['compile_log'], TestCounts(), ''
+        counts = TestCounts(response['run'], response['failures'], response['errors'], response['skipped'])
+        return True, response['compile_log'], counts, response['output']
@@ -1,7 +1,7 @@
-import json
 import os
 import re
 import shutil
+import functools
 from generator import IntentionTester
 from dataset import Dataset
 from configs import Configs
@@ -9,6 +9,9 @@ from modules.session import ModelQuerySession
 from typing import Optional
 import pathlib
 from extension_api.collect_pairs.main import dump_collect_pairs
+from corpus_builder import get_corpus_builder
+from codeql_database import get_codeql_database
+from corpus_store import corpus_size, find_pairs
 
 import logging
 logger = logging.getLogger(__name__)
@@ -20,60 +23,65 @@ logger.warning('UTF-8 mode is enabled' if sys.flags.utf8_mode else 'UTF-8 mode i
 # because project file should be opened using UTF-8, but subprocess.run() (for Java, but CodeQL should still use UTF-8) output should still be decoded in local encoding
 # both would cause error if not set properly
 
+
 class IntentionTest:
     def __init__(self, project_path, configs):
         self.project_path = project_path
-        self.corpus = None
+        self.corpus_size = 0
 
-        self.corpus_path =  configs.corpus_path
+        # the legacy JSON corpus is used until the JSONL one is built
+        self.corpus_path = configs.existing_corpus_path() or configs.corpus_path
         self.generator = IntentionTester(configs)
 
+    def use_empty_corpus(self):
+        # no pairs yet, the test case is generated without a reference
+        self.corpus_size = 0
+
     def load_corpus(self):
-        # collect pairs
+        # collect pairs, which are only read when a focal method is looked up or the corpus is used as a whole
         assert os.path.exists(self.corpus_path)
-        with open(self.corpus_path, 'r', encoding='utf8') as f:
-            all_data = json.load(f)
-
-        corpus_fm, corpus_fm_name, corpus_context, corpus_tc_name, corpus_test_case_path = [], [], [], [], []
-
-        for each_data in all_data:
-            if 'target_coverage' in each_data:
-                # original expected format
-                corpus_fm.append(''.join(each_data['target_coverage']).replace('<COVER>', ''))
-                corpus_fm_name.append(each_data.get('focal_method_name', ''))
-                corpus_context.append(each_data.get('target_context', ''))
-                tc_name = each_data.get('target_test_case_name', '')
-                corpus_tc_name.append(tc_name.split('::::')[-1].split('(')[0] if tc_name else '')
-                focal_file_path = each_data.get('focal_file_path', '')
-                if focal_file_path:
-                    corpus_test_case_path.append(focal_file_path.replace('src/main/java', 'src/test/java').replace('.java', 'Test.java'))
-                else:
-                    corpus_test_case_path.append('')
-            else:
-                # fallback to collect_pairs schema
-                # focal method text
-                fm = each_data.get('focal_method', [])
-                corpus_fm.append(''.join(fm) if isinstance(fm, list) else str(fm))
-                # focal method name
-                corpus_fm_name.append(each_data.get('focal_method_name', ''))
-                # use focal method content as context (best available without re-reading files)
-                corpus_context.append(''.join(fm) if isinstance(fm, list) else str(fm))
-                # derive test case simple name from test_name or test_path
-                test_name = each_data.get('test_name', '')
-                if test_name:
-                    corpus_tc_name.append(test_name.split('(')[0].split('::::')[-1])
-                else:
-                    test_path = each_data.get('test_path', '')
-                    corpus_tc_name.append(os.path.splitext(os.path.basename(test_path))[0] if test_path else '')
-                # test case path provided directly
-                corpus_test_case_path.append(each_data.get('test_path', ''))
-
-        self.corpus = {
-            'corpus_fm': corpus_fm,
-            'corpus_fm_name': corpus_fm_name,
-            'corpus_context': corpus_context,
-            'corpus_tc_name': corpus_tc_name,
-            'corpus_test_case_path': corpus_test_case_path
+        self.corpus_size = corpus_size(self.corpus_path)
+
+    def find_focal_method(self, focal_method_name):
+        """(position in the corpus, context) of the first pair of a focal method, None if the corpus has none."""
+        if self.corpus_size == 0:
+            return None
+        for position, each_data in find_pairs(self.corpus_path, focal_method_name):
+            return position, self.corpus_entry(each_data)['context']
+        return None
+
+    @staticmethod
+    def corpus_entry(each_data):
+        if 'target_coverage' in each_data:
+            # original expected format
+            tc_name = each_data.get('target_test_case_name', '')
+            focal_file_path = each_data.get('focal_file_path', '')
+            return {
+                'fm': ''.join(each_data['target_coverage']).replace('<COVER>', ''),
+                'fm_name': each_data.get('focal_method_name', ''),
+                'context': each_data.get('target_context', ''),
+                'tc_name': tc_name.split('::::')[-1].split('(')[0] if tc_name else '',
+                'test_case_path': focal_file_path.replace('src/main/java', 'src/test/java').replace('.java', 'Test.java') if focal_file_path else '',
+            }
+        # fallback to collect_pairs schema
+        # focal method text
+        fm = each_data.get('focal_method', [])
+        fm = ''.join(fm) if isinstance(fm, list) else str(fm)
+        # derive test case simple name from test_name or test_path
+        test_name = each_data.get('test_name', '')
+        test_path = each_data.get('test_path', '')
+        if test_name:
+            tc_name = test_name.split('(')[0].split('::::')[-1]
+        else:
+            tc_name = os.path.splitext(os.path.basename(test_path))[0] if test_path else ''
+        return {
+            'fm': fm,
+            'fm_name': each_data.get('focal_method_name', ''),
+            # use focal method content as context (best available without re-reading files)
+            'context': fm,
+            'tc_name': tc_name,
+            # test case path provided directly
+            'test_case_path': test_path,
         }
 
 
@@ -97,12 +105,27 @@ def main(target_focal_method, target_focal_file, test_desc, project_path, focal_
     intention_test.generator.connect_to_request_session(query_session)
 
     logger.info('Checking test-focal corpus file')
-    # prepare test-focal pairs
-    if not configs.is_corpus_prepared():
-        logger.warning('The test-focal corpus file does not exists, start collecting pairs')
-        dump_collect_pairs(project_path)
-
-    intention_test.load_corpus()
+    # test-focal pairs are collected in the background and again whenever the tests of the project change
+    build_corpus = functools.partial(dump_collect_pairs, in_process=configs.corpus_in_process_extractor)
+    corpus_builder = get_corpus_builder(project_path, configs.corpus_path, build_corpus, configs.corpus_watch_interval)
+    with_references = configs.is_corpus_prepared()
+    if with_references:
+        intention_test.load_corpus()
+        # the corpus of a project without any focal/test pairs is empty
+        with_references = intention_test.corpus_size > 0
+    else:
+        logger.warning('The test-focal corpus file does not exist yet, generating without references while it is built')
+        intention_test.use_empty_corpus()
+    if query_session:
+        query_session.write_status_message('corpus', corpus_builder.status())
+
+    # the CodeQL database of the project is created in the background too, and again when its sources change
+    codeql_database = None
+    if configs.is_codeql_available():
+        codeql_database = get_codeql_database(project_path, configs.codeql_database_dir, configs.codeql_path, configs.codeql_build_command,
+                                              configs.codeql_watch_interval, configs.codeql_timeout)
+        if query_session:
+            query_session.write_status_message('codeql', codeql_database.status())
 
     # prepare two copies of the project in repos_with_test and repos_removing_test. the former is used to create the initial codeql database, while the latter is used to wirte the referable and generated test case during the generation process.
     # shutil.copytree(project_path, configs.project_with_test_file_path, dirs_exist_ok=True, ignore=shutil.ignore_patterns('.git'))
@@ -128,7 +151,7 @@ def main(target_focal_method, target_focal_file, test_desc, project_path, focal_
         offline_fact_ref_data = dataset.load_offline_fact_ref_data()
     except FileNotFoundError:
         # Fallback: construct empty facts/references with proper length
-        corpus_len = len(intention_test.corpus['corpus_fm_name']) if intention_test.corpus else 0
+        corpus_len = intention_test.corpus_size
         offline_fact_ref_data = [
             {
                 'target_coverage_idx': i,
@@ -145,47 +168,56 @@ def main(target_focal_method, target_focal_file, test_desc, project_path, focal_
 
     # TODO extract context from local java files
     target_pair_idx = 0
-    for i in range(0, len(intention_test.corpus['corpus_fm_name'])):
-        if focal_method_name.split("(")[0] == intention_test.corpus['corpus_fm_name'][i].split("(")[0]:
-            target_pair_idx = i
-            target_focal_file = intention_test.corpus['corpus_context'][i]
-            break
+    found = intention_test.find_focal_method(focal_method_name)
+    if found is not None:
+        target_pair_idx, target_focal_file = found
 
-    ref_score, ref_focal_method, ref_test_case = retrieve_reference_offline(target_pair_idx, offline_fact_ref_data,
-                                                                            focal_method_name)
-    references_tc_rag = [ref_test_case]
+    if with_references:
+        ref_score, ref_focal_method, ref_test_case = retrieve_reference_offline(target_pair_idx, offline_fact_ref_data,
+                                                                                focal_method_name)
+        references_tc_rag = [ref_test_case]
+
+        # collect facts
+        facts, facts_sim, usages, usages_sim = get_crucial_facts_offline(target_pair_idx, offline_fact_ref_data, focal_method_name)
+    else:
+        references_tc_rag, facts = [], []
 
     if len(references_tc_rag) > 0:
         top_1_reference_tc_rag = references_tc_rag[0]
     else:
         top_1_reference_tc_rag = None
 
-    # collect facts
-    facts, facts_sim, usages, usages_sim = get_crucial_facts_offline(target_pair_idx, offline_fact_ref_data, focal_method_name)
-
     logger.info('Starting a multi-round chat for generating test case')
     messages: list[dict] = []
     generated_test_case = None
-    for model_name in configs.llm_names:
-        model_configs = Configs(project_name, tester_path, llm_name_override=model_name)
-        dtester = IntentionTester(model_configs)
-        dtester.connect_to_request_session(query_session)
-
-        messages.append({"role": "system", "content": f"### Model: {model_name}"})
-        dtester.set_message_prefix(messages)
-
-        # generate the test case
-        generated_test_case, test_status, model_messages = dtester.generate_test_case_with_refine(
-            target_focal_method=target_focal_method,
-            target_context=target_focal_file,
-            target_test_case_desc=target_test_case_desc,
-            target_test_case_path=target_test_case_path,
-            referable_test_case=top_1_reference_tc_rag,
-            facts=facts,
-            junit_version=str(query_session.junit_version),
-            query_session=query_session
-        )
-        messages = messages + model_messages
+    # the client follows the corpus and CodeQL database builds while the session runs
+    unsubscribers = [corpus_builder.subscribe(query_session.write_status_message)] if query_session else []
+    if query_session and codeql_database is not None:
+        unsubscribers.append(codeql_database.subscribe(query_session.write_status_message))
+    try:
+        for model_name in configs.llm_names:
+            model_configs = Configs(project_name, tester_path, llm_name_override=model_name)
+            dtester = IntentionTester(model_configs)
+            dtester.connect_to_request_session(query_session)
+
+            messages.append({"role": "system", "content": f"### Model: {model_name}"})
+            dtester.set_message_prefix(messages)
+
+            # generate the test case
+            generated_test_case, test_status, model_messages = dtester.generate_test_case_with_refine(
+                target_focal_method=target_focal_method,
+                target_context=target_focal_file,
+                target_test_case_desc=target_test_case_desc,
+                target_test_case_path=target_test_case_path,
+                referable_test_case=top_1_reference_tc_rag,
+                facts=facts,
+                junit_version=str(query_session.junit_version),
+                query_session=query_session
+            )
+            messages = messages + model_messages
+    finally:
+        for unsubscribe in unsubscribers:
+            unsubscribe()
 
     return messages, generated_test_case
 
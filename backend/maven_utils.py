@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import subprocess
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+import logging
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# `mvn` is a batch script (mvn.cmd) on Windows and can only be resolved through the shell there
+MAVEN_SHELL = os.name == 'nt'
+# concurrent builds share one local repository; Maven 3.9+ then guards each artifact with a file lock, older versions ignore these
+MAVEN_SHARED_REPO_ARGS = ['-Daether.syncContext.named.factory=file-lock', '-Daether.syncContext.named.nameMapper=file-gav']
+# skips prepare-agent, report and check of the JaCoCo plugin
+MAVEN_SKIP_COVERAGE_ARGS = ['-Djacoco.skip=true']
+# no remote repository is contacted, every artifact must already be in the local repository
+MAVEN_OFFLINE_ARGS = ['--offline']
+DEFAULT_LOCAL_REPOSITORY = os.path.join('~', '.m2', 'repository')
+# markers of the poms whose plugins and dependencies a local repository holds, see `prepare_offline`
+OFFLINE_MARKER_DIR = '.intention-test-offline'
+# next to pom.xml, so that relative paths (parent, modules, resources) resolve the same
+# each build with a narrowed JaCoCo configuration gets its own copy of pom.xml, named with this prefix
+COVERAGE_POM_PREFIX = '.intention-test-pom-'
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def pom_hash(project_dir: str) -> str:
+    return file_sha256(os.path.join(project_dir, 'pom.xml'))
+
+
+def local_repository_args(local_repository: str) -> List[str]:
+    return [f'-Dmaven.repo.local={os.path.expanduser(local_repository)}'] if local_repository else []
+
+
+_prepare_locks: Dict[str, threading.Lock] = {}
+_prepare_locks_guard = threading.Lock()
+
+
+def prepare_offline(project_dir: str, local_repository: str = '') -> bool:
+    """Resolve every plugin and dependency of the project into the local repository, once per `pom.xml` content.
+
+    `dependency:go-offline` misses what plugins only resolve while they run (e.g. the surefire JUnit provider), so a
+    build without any test follows it. Returns whether the builds can run offline.
+    """
+    if not os.path.exists(os.path.join(project_dir, 'pom.xml')):
+        return False
+    repository = os.path.expanduser(local_repository or DEFAULT_LOCAL_REPOSITORY)
+    marker = os.path.join(repository, OFFLINE_MARKER_DIR, pom_hash(project_dir))
+    with _prepare_locks_guard:
+        lock = _prepare_locks.setdefault(marker, threading.Lock())
+    with lock:
+        if os.path.exists(marker):
+            return True
+        repository_args = local_repository_args(local_repository)
+        args = ['mvn', '-B', 'dependency:go-offline', *repository_args]
+        logger.info(f'Resolving the plugins and dependencies of {project_dir} for offline builds: {args}')
+        process = subprocess.run(args, cwd=project_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True, shell=MAVEN_SHELL)
+        if process.returncode != 0:
+            logger.error(f'Failed to prepare {project_dir} for offline builds, building online:\n{process.stdout}')
+            return False
+        args = ['mvn', '-B', 'verify', '-Dtest=IntentionTestOfflineWarmUp', '-Dsurefire.failIfNoSpecifiedTests=false', '-DfailIfNoTests=false',
+                '-Dcheckstyle.skip=true', *repository_args]
+        process = subprocess.run(args, cwd=project_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True, shell=MAVEN_SHELL)
+        if process.returncode != 0:
+            # the project itself may not build yet (e.g. the tests are removed), the offline builds will tell what is missing
+            logger.warning(f'The warm-up build of {project_dir} failed, some build-time artifacts may be missing offline:\n{process.stdout}')
+        os.makedirs(os.path.dirname(marker), exist_ok=True)
+        with open(marker, 'w', encoding='utf8') as f:
+            f.write(project_dir)
+        return True
+
+
+def maven_mode_args(project_dir: str, offline: bool, local_repository: str = '') -> List[str]:
+    """The arguments selecting the local repository and, once the project is prepared for it, offline mode."""
+    args = local_repository_args(local_repository)
+    if offline and prepare_offline(project_dir, local_repository):
+        args += MAVEN_OFFLINE_ARGS
+    return args
+
+
+def resolve_test_classpath(project_dir: str, cache_dir: str, maven_args: Sequence[str] = ()) -> List[str]:
+    """Return the dependency jars of the project test scope, resolved once per `pom.xml` content."""
+    pom_path = os.path.join(project_dir, 'pom.xml')
+    if not os.path.exists(pom_path):
+        logger.warning(f'No pom.xml found in {project_dir}, the dependency classpath is empty')
+        return []
+
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = os.path.join(cache_dir, f'classpath-{pom_hash(project_dir)[:16]}.txt')
+    if not os.path.exists(cache_path):
+        # sessions of the server resolving the same project at once each write their own file
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=f'{os.path.basename(cache_path)}.', suffix='.tmp')
+        os.close(fd)
+        try:
+            args = ['mvn', '-q', 'dependency:build-classpath', '-Dmdep.includeScope=test', f'-Dmdep.outputFile={tmp_path}', *maven_args]
+            logger.debug(f'Resolving the test classpath: {args}')
+            process = subprocess.run(args, cwd=project_dir, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, shell=MAVEN_SHELL)
+            if process.returncode != 0:
+                logger.error(f'Failed to resolve the test classpath of {project_dir}:\n{process.stdout}\n{process.stderr}')
+                return []
+            os.replace(tmp_path, cache_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    with open(cache_path, 'r', encoding='utf8') as f:
+        classpath = f.read().strip()
+    return [each for each in classpath.split(os.pathsep) if each]
+
+
+def _set_child(parent: ET.Element, ns: str, tag: str, item_tag: str, items: List[str]) -> None:
+    for each in parent.findall(f'{ns}{tag}'):
+        parent.remove(each)
+    element = ET.SubElement(parent, f'{ns}{tag}')
+    for item in items:
+        ET.SubElement(element, f'{ns}{item_tag}').text = item
+
+
+def write_coverage_pom(project_dir: str, includes: List[str]) -> Optional[str]:
+    """Write a copy of pom.xml whose JaCoCo plugin only instruments and reports `includes`, as XML only.
+
+    JaCoCo has no user properties for either, so they go into every configuration of the plugin. Returns the file name
+    of the copy, to be passed with `-f` and removed by the caller after the build, or None if the pom does not configure
+    JaCoCo itself.
+    """
+    pom_path = os.path.join(project_dir, 'pom.xml')
+    if not os.path.exists(pom_path):
+        return None
+    tree = ET.parse(pom_path)
+    root = tree.getroot()
+    ns = root.tag[:root.tag.index('}') + 1] if root.tag.startswith('{') else ''
+    if ns:
+        ET.register_namespace('', ns[1:-1])
+
+    plugins = [each for each in root.iter(f'{ns}plugin') if each.findtext(f'{ns}artifactId') == 'jacoco-maven-plugin']
+    if not plugins:
+        return None
+    for plugin in plugins:
+        configuration = plugin.find(f'{ns}configuration')
+        if configuration is None:
+            configuration = ET.SubElement(plugin, f'{ns}configuration')
+        _set_child(configuration, ns, 'includes', 'include', includes)
+        _set_child(configuration, ns, 'formats', 'format', ['XML'])
+        # an execution's own configuration takes precedence over the plugin's
+        for execution in plugin.findall(f'{ns}executions/{ns}execution'):
+            configuration = execution.find(f'{ns}configuration')
+            if configuration is None:
+                continue
+            _set_child(configuration, ns, 'includes', 'include', includes)
+            if any('report' in (goal.text or '') for goal in execution.iter(f'{ns}goal')):
+                _set_child(configuration, ns, 'formats', 'format', ['XML'])
+
+    # a copy per build, sessions of the server may narrow the coverage of the same project to different classes at once
+    fd, coverage_pom = tempfile.mkstemp(dir=project_dir, prefix=COVERAGE_POM_PREFIX, suffix='.xml')
+    with os.fdopen(fd, 'wb') as f:
+        tree.write(f, encoding='utf-8', xml_declaration=True)
+    return os.path.basename(coverage_pom)
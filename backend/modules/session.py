@@ -68,6 +68,9 @@ class ModelQuerySession:
         payload = {"session_id": self.session_id, "junit_version": self.junit_version}
         self._safe_write(NoRefMessage(payload).to_bytes())
 
+    def write_status_message(self, status: str, info: Dict[str, Any]) -> None:
+        self._safe_write(StatusMessage(status, {"session_id": self.session_id, **info}).to_bytes())
+
     def write_finish_message(self) -> None:
         self._safe_write(StatusMessage("finish", {"session_id": self.session_id}).to_bytes())
 
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional
+
+from javac_runner import source_tree_fingerprint
+from maven_utils import pom_hash
+
+logger = logging.getLogger(__name__)
+
+# everything of the project a generated test can observe, besides the test itself
+SNAPSHOT_ROOTS = (('src', 'main'), ('src', 'test'))
+
+
+def normalize_test_source(test_case: str) -> str:
+    # only differences that cannot change the outcome; lines are kept in place since errors refer to them
+    lines = test_case.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return '\n'.join(each.rstrip() for each in lines).rstrip('\n')
+
+
+def project_snapshot(project_dir: str, test_case_path: str) -> str:
+    """Hash of the sources and build file of a project, leaving out the file the generated test is written to."""
+    digest = hashlib.sha256()
+    roots = [os.path.join(project_dir, *each) for each in SNAPSHOT_ROOTS]
+    digest.update(source_tree_fingerprint(*roots, exclude=(test_case_path,)).encode())
+    if os.path.exists(os.path.join(project_dir, 'pom.xml')):
+        digest.update(pom_hash(project_dir).encode())
+    return digest.hexdigest()
+
+
+def outcome_key(test_case: str, test_case_path: str, snapshot: str, junit_version: int, runner_mode: str) -> str:
+    # the path is part of the key: the same source under another class name does not even compile
+    test_rel_path = test_case_path.split('/src/test/')[-1]
+    parts = [normalize_test_source(test_case), test_rel_path, snapshot, str(int(junit_version)), runner_mode]
+    return hashlib.sha256('\0'.join(parts).encode()).hexdigest()
+
+
+@dataclass
+class CachedOutcome:
+    error_msg: str
+    test_status: str
+    coverage: Optional[Dict[str, Any]] = None
+
+
+class OutcomeCache:
+    """Persistent, size-bounded map from a build key to its outcome; the least recently used entries are evicted first.
+
+    The snapshot is part of every key, so edits to the sources invalidate the cache without any bookkeeping. Entries of
+    other snapshots are kept, sessions working on the project at once may see different ones, and the entries of
+    outdated snapshots are evicted as they stop being used.
+    """
+
+    def __init__(self, path: str, max_entries: int) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS outcomes (key TEXT PRIMARY KEY, snapshot TEXT NOT NULL, error_msg TEXT NOT NULL, '
+                               'test_status TEXT NOT NULL, coverage TEXT, last_used REAL NOT NULL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS outcomes_last_used ON outcomes (last_used)')
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # a connection per call, sessions run in different threads and other server processes may share the file
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get(self, key: str) -> Optional[CachedOutcome]:
+        with self._lock, self._connect() as connection:
+            row = connection.execute('SELECT error_msg, test_status, coverage FROM outcomes WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            connection.execute('UPDATE outcomes SET last_used = ? WHERE key = ?', (time.time(), key))
+        error_msg, test_status, coverage = row
+        return CachedOutcome(error_msg, test_status, json.loads(coverage) if coverage else None)
+
+    def put(self, key: str, snapshot: str, outcome: CachedOutcome) -> None:
+        coverage = json.dumps(outcome.coverage) if outcome.coverage is not None else None
+        with self._lock, self._connect() as connection:
+            connection.execute('INSERT OR REPLACE INTO outcomes VALUES (?, ?, ?, ?, ?, ?)',
+                               (key, snapshot, outcome.error_msg, outcome.test_status, coverage, time.time()))
+            connection.execute('DELETE FROM outcomes WHERE key IN (SELECT key FROM outcomes ORDER BY last_used DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+
+    def put_coverage(self, key: str, coverage: Dict[str, Any]) -> None:
+        """Add the coverage measured after the build to the outcome stored under `key`, if any."""
+        with self._lock, self._connect() as connection:
+            connection.execute('UPDATE outcomes SET coverage = ?, last_used = ? WHERE key = ?', (json.dumps(coverage), time.time(), key))
+
+    def __len__(self) -> int:
+        with self._lock, self._connect() as connection:
+            return connection.execute('SELECT COUNT(*) FROM outcomes').fetchone()[0]
+
+
+_caches: Dict[str, OutcomeCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_outcome_cache(path: str, max_entries: int) -> Optional[OutcomeCache]:
+    if max_entries <= 0:
+        return None
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = OutcomeCache(path, max_entries)
+        return _caches[path]
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextlib
+import os
+import signal
+import subprocess
+import time
+import logging
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# per stream; a Maven build that downloads half of Maven Central must not keep all of it in memory
+DEFAULT_MAX_CHARS = 1 << 20
+# asyncio's default of 64 KiB per line is exceeded by some stack traces and dependency dumps
+_LINE_LIMIT = 1 << 20
+# how long to wait for the pipes to close once the process was killed
+_DRAIN_TIMEOUT = 5
+# how often timeouts and cancellation are checked while the process runs
+_POLL_INTERVAL = 0.2
+
+
+class Buffer:
+    """The output of a process, keeping at most `max_chars` of the most recent text of each stream."""
+
+    def __init__(self, max_chars: int = DEFAULT_MAX_CHARS):
+        self.max_chars = max_chars
+        self._lines: Dict[str, Deque[str]] = {'stdout': collections.deque(), 'stderr': collections.deque()}
+        self._sizes = {'stdout': 0, 'stderr': 0}
+        self._dropped = {'stdout': 0, 'stderr': 0}
+
+    def append(self, out_type: str, text: str) -> None:
+        lines = self._lines[out_type]
+        if len(text) > self.max_chars:
+            text = text[-self.max_chars:]
+        lines.append(text)
+        self._sizes[out_type] += len(text)
+        while self._sizes[out_type] > self.max_chars:
+            self._sizes[out_type] -= len(lines.popleft())
+            self._dropped[out_type] += 1
+
+    def _get(self, out_type: str) -> str:
+        text = ''.join(self._lines[out_type])
+        if self._dropped[out_type]:
+            # [INFO] lines are left out of the error messages shown to the LLM
+            return f'[INFO] ({self._dropped[out_type]} earlier lines were dropped)\n{text}'
+        return text
+
+    def _set(self, out_type: str, text: str) -> None:
+        self._lines[out_type].clear()
+        self._sizes[out_type] = 0
+        self._dropped[out_type] = 0
+        self.append(out_type, text)
+
+    stdout = property(lambda self: self._get('stdout'), lambda self, text: self._set('stdout', text))
+    stderr = property(lambda self: self._get('stderr'), lambda self, text: self._set('stderr', text))
+
+
+@dataclass
+class ProcessResult:
+    returncode: Optional[int]
+    stdout: str
+    stderr: str
+    # why the process was stopped before it finished on its own
+    aborted: Optional[str] = None
+    timed_out: bool = False
+    cancelled: bool = False
+
+
+@dataclass
+class ResourceLimits:
+    """Per-process caps applied with setrlimit on POSIX (0 for none); every process of the tree inherits them."""
+    cpu_seconds: int = 0
+    # address space, which a JVM reserves generously: leave room well above -Xmx
+    memory_mb: int = 0
+
+    def preexec_fn(self) -> Optional[Callable[[], None]]:
+        if os.name != 'posix' or not (self.cpu_seconds or self.memory_mb):
+            return None
+        import resource
+
+        def apply_limits() -> None:
+            if self.cpu_seconds:
+                resource.setrlimit(resource.RLIMIT_CPU, (self.cpu_seconds, self.cpu_seconds))
+            if self.memory_mb:
+                memory_bytes = self.memory_mb * 1024 * 1024
+                resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+        return apply_limits
+
+
+def kill_process_tree(pid: int) -> None:
+    """Kill a process started by `run_streaming` together with everything it spawned, e.g. the surefire JVMs of Maven."""
+    if os.name == 'nt':
+        subprocess.run(['taskkill', '/F', '/T', '/PID', str(pid)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return
+    try:
+        # the process leads its own process group, see `_stream_process`
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+LineCallback = Callable[[str], None]
+AbortCheck = Callable[[str], Optional[str]]
+CancelCheck = Callable[[], bool]
+
+
+async def _stream_process(args: List[str], cwd: str, on_line: Optional[LineCallback], should_abort: Optional[AbortCheck], shell: bool, max_chars: int,
+                          timeout: Optional[float], cancel_check: Optional[CancelCheck], limits: Optional[ResourceLimits], merge_stderr: bool) -> ProcessResult:
+    kwargs = dict(cwd=cwd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT if merge_stderr else asyncio.subprocess.PIPE, limit=_LINE_LIMIT)
+    # a process group of its own, so that the whole tree can be killed at once
+    if os.name == 'nt':
+        kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs['start_new_session'] = True
+        if limits is not None and limits.preexec_fn() is not None:
+            kwargs['preexec_fn'] = limits.preexec_fn()
+    if shell:
+        process = await asyncio.create_subprocess_shell(subprocess.list2cmdline(args), **kwargs)
+    else:
+        process = await asyncio.create_subprocess_exec(*args, **kwargs)
+
+    buffer = Buffer(max_chars)
+    aborted: List[str] = []
+    abort_event = asyncio.Event()
+
+    async def read(stream: asyncio.StreamReader, out_type: str) -> None:
+        while True:
+            try:
+                raw_line = await stream.readline()
+            except ValueError:
+                # a line longer than the limit, take what is there
+                raw_line = await stream.read(_LINE_LIMIT)
+            if not raw_line:
+                return
+            line = raw_line.decode(errors='replace')
+            buffer.append(out_type, line)
+            if on_line is not None:
+                on_line(line)
+            if should_abort is not None and not aborted:
+                reason = should_abort(line)
+                if reason:
+                    aborted.append(reason)
+                    logger.debug(f'Stopping {args}: {reason}')
+                    kill_process_tree(process.pid)
+                    abort_event.set()
+
+    streams = [read(process.stdout, 'stdout')] + ([] if merge_stderr else [read(process.stderr, 'stderr')])
+    readers = asyncio.ensure_future(asyncio.gather(*streams))
+    abort_waiter = asyncio.ensure_future(abort_event.wait())
+    deadline = time.monotonic() + timeout if timeout else None
+    timed_out, cancelled = False, False
+    exited_at = None
+    while not readers.done() and not abort_event.is_set():
+        await asyncio.wait([readers, abort_waiter], timeout=_POLL_INTERVAL, return_when=asyncio.FIRST_COMPLETED)
+        if readers.done() or abort_event.is_set():
+            break
+        if process.returncode is not None:
+            # the process is gone but a child it leaked still holds the pipes
+            exited_at = exited_at or time.monotonic()
+            if time.monotonic() - exited_at > _DRAIN_TIMEOUT:
+                logger.warning(f'Killing the processes left behind by {args}')
+                kill_process_tree(process.pid)
+                break
+        if deadline is not None and time.monotonic() > deadline:
+            timed_out = True
+            aborted.append(f'timed out after {timeout:g} seconds')
+        elif cancel_check is not None and cancel_check():
+            cancelled = True
+            aborted.append('cancelled')
+        else:
+            continue
+        logger.debug(f'Stopping {args}: {aborted[0]}')
+        kill_process_tree(process.pid)
+        break
+    abort_waiter.cancel()
+    if not readers.done():
+        try:
+            await asyncio.wait_for(asyncio.shield(readers), _DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            # something out of reach still holds the pipes, what was read so far is enough
+            logger.warning(f'The output of {args} was still open after the process was killed')
+            readers.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await readers
+    try:
+        # wait() also waits for the pipes, which an orphaned child may keep open
+        returncode = await asyncio.wait_for(process.wait(), _DRAIN_TIMEOUT)
+    except asyncio.TimeoutError:
+        returncode = process.returncode
+    # reap what the process left behind, like a surefire JVM still running a hanging test
+    if os.name != 'nt':
+        kill_process_tree(process.pid)
+    return ProcessResult(returncode, buffer.stdout, buffer.stderr, aborted[0] if aborted else None, timed_out, cancelled)
+
+
+def run_streaming(args: List[str], cwd: str, on_line: Optional[LineCallback] = None, should_abort: Optional[AbortCheck] = None,
+                  shell: bool = False, max_chars: int = DEFAULT_MAX_CHARS, timeout: Optional[float] = None,
+                  cancel_check: Optional[CancelCheck] = None, limits: Optional[ResourceLimits] = None, merge_stderr: bool = False) -> ProcessResult:
+    """Run a process in its own process group, handing each output line to `on_line` as it arrives.
+
+    The whole process tree is killed as soon as `should_abort` returns a reason for a line, `timeout` seconds have passed
+    or `cancel_check` returns True; the output read so far is returned.
+    """
+    return asyncio.run(_stream_process(args, cwd, on_line, should_abort, shell, max_chars, timeout, cancel_check, limits, merge_stderr))
@@ -3,12 +3,24 @@ import json
 import shutil
 import re
 from tqdm import tqdm
-from bs4 import BeautifulSoup
 import subprocess
 import sys
-import asyncio
+import contextlib
+import heapq
+import itertools
 import threading
+import time
 import logging
+from maven_utils import MAVEN_SHARED_REPO_ARGS, MAVEN_SHELL, MAVEN_SKIP_COVERAGE_ARGS, maven_mode_args, resolve_test_classpath, write_coverage_pom
+from java_syntax import check_java_source, format_diagnostics
+from javac_runner import JavacTestRunner
+from jacoco_report import coverage_includes, describe_methods, find_method, focal_class_path, jacoco_xml_report_path, parse_jacoco_xml
+from jvm_worker import WorkerTestRunner
+from batch_runner import BatchTestRunner
+from test_results import TestRunResult, parse_compiler_diagnostics, read_surefire_reports
+from workspace_pool import get_pool, write_file
+from process_runner import ResourceLimits, run_streaming
+from modules.exceptions import GenerationCancelled
 logger = logging.getLogger(__name__)
 
 # Not provided setting JAVA_HOME for Maven at runtime yet, to be implemented
@@ -18,53 +30,189 @@ logger = logging.getLogger(__name__)
 # env_vars = os.environ.copy()
 # env_vars.update(JAVA_ENVS)
 
-class Buffer:
+_COMPILER_GOAL_FAILURE_RE = re.compile(r'\[ERROR\] Failed to execute goal org\.apache\.maven\.plugins:maven-compiler-plugin:[^:]*:(test)?[cC]ompile')
+
+def is_compile_failure(build_log):
+    # the compiler plugin aborts the lifecycle before surefire starts, so its failure marks the compile phase
+    return 'COMPILATION ERROR' in build_log or _COMPILER_GOAL_FAILURE_RE.search(build_log) is not None
+
+# the endings given to builds and tests stopped by a timeout or a resource limit, see `run_maven` and the javac/worker runners
+_INTERRUPTED_RE = re.compile(r'was terminated|killed by signal')
+
+def is_interrupted_build(build_log):
+    # such an outcome says more about the machine load than about the test, it must not be reused
+    return _INTERRUPTED_RE.search(build_log) is not None
+
+_ERROR_COUNT_RE = re.compile(r'^\[INFO\] \d+ errors?\s*$')
+_BOILERPLATE_ERROR_PREFIXES = ('[ERROR] -> [Help', '[ERROR] To see the full stack trace', '[ERROR] Re-run Maven', '[ERROR] For more information', '[ERROR] [Help')
+
+class CompileErrorWatcher:
+    """Tells `run_streaming` to stop a build once the compiler has listed its errors; the rest would only be the failure summary."""
+
     def __init__(self):
-        self.stdout = ''
-        self.stderr = ''
-
-def stream_output(pipe, buffer, out_type):
-    for line in iter(pipe.readline, ''):
-        print(line, end='')
-        if out_type == 'stdout':
-            buffer.stdout += line
-        elif out_type == 'stderr':
-            buffer.stderr += line
-    pipe.close()
+        self.in_compile_errors = False
+
+    def __call__(self, line):
+        if 'COMPILATION ERROR' in line:
+            self.in_compile_errors = True
+        elif self.in_compile_errors and (_ERROR_COUNT_RE.match(line) or 'BUILD FAILURE' in line):
+            return 'compilation failed'
+        return None
+
+def is_relevant_build_line(line):
+    # what is worth showing while the build is still running: the errors and the symbols javac could not find
+    stripped = line.strip()
+    if stripped.startswith('[ERROR]'):
+        return stripped != '[ERROR]' and not stripped.startswith(_BOILERPLATE_ERROR_PREFIXES)
+    return stripped.startswith(('symbol:', 'location:'))
+
+# lower runs first; sessions a developer is waiting for go before batch evaluation runs
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+class ExecutionScheduler:
+    """Bounds the builds running at once across all sessions; waiting builds start by priority, then first come first served."""
+
+    def __init__(self, parallelism):
+        assert parallelism > 0, 'at least one build must be allowed to run'
+        self.parallelism = parallelism
+        self._running = 0
+        self._waiting = []  # heap of (priority, arrival, wake-up event)
+        self._arrivals = itertools.count()
+        self._lock = threading.Lock()
+
+    def n_waiting(self):
+        with self._lock:
+            return len(self._waiting)
+
+    @contextlib.contextmanager
+    def slot(self, priority=PRIORITY_INTERACTIVE, on_wait=None, cancel_check=None):
+        """Hold one build slot; `on_wait(status, info)` hears about a queued build and when it eventually starts.
+
+        A queued build whose `cancel_check` returns True leaves the queue with `GenerationCancelled`.
+        """
+        start = time.monotonic()
+        ticket = None
+        with self._lock:
+            if self._running < self.parallelism and not self._waiting:
+                self._running += 1
+            else:
+                ticket = (priority, next(self._arrivals), threading.Event())
+                heapq.heappush(self._waiting, ticket)
+                position = sum(1 for each in self._waiting if each[:2] <= ticket[:2])
+
+        if ticket is not None:
+            if on_wait:
+                on_wait('queued', {'position': position, 'parallelism': self.parallelism})
+            while not ticket[2].wait(0.2):
+                if cancel_check is not None and cancel_check():
+                    self._leave_queue(ticket)
+                    raise GenerationCancelled()
+            if on_wait:
+                on_wait('running', {'queue_wait': round(time.monotonic() - start, 3)})
+        try:
+            yield time.monotonic() - start
+        finally:
+            self._release()
+
+    def _leave_queue(self, ticket):
+        with self._lock:
+            if ticket[2].is_set():
+                # the slot was handed over meanwhile, pass it on
+                self._release_locked()
+                return
+            self._waiting.remove(ticket)
+            heapq.heapify(self._waiting)
+
+    def _release(self):
+        with self._lock:
+            self._release_locked()
+
+    def _release_locked(self):
+        if self._waiting:
+            # hand the slot straight to the next build, so nobody can overtake it in between
+            heapq.heappop(self._waiting)[2].set()
+        else:
+            self._running -= 1
+
+
+def default_parallelism(build_weight):
+    # a Maven build keeps about `build_weight` cores busy (compiler, surefire fork, JIT and GC threads)
+    return max(1, (os.cpu_count() or 1) // max(1, build_weight))
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler(parallelism=0, build_weight=2):
+    # shared by every runner in the process, the point is to bound builds across sessions
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ExecutionScheduler(parallelism if parallelism > 0 else default_parallelism(build_weight))
+            logger.info(f'Running at most {_scheduler.parallelism} builds at once')
+        return _scheduler
 
 class TestCaseRunner():
+    RUNNER_MODES = ('maven', 'incremental', 'javac', 'worker')
+    COVERAGE_SCOPES = ('focal', 'package', 'project')
+    COVERAGE_RUNS = ('every_run', 'final')
+
     def __init__(self, configs, test_case_run_log_dir):
         self.configs = configs
         self.test_case_run_log_dir = test_case_run_log_dir
+        self.runner_mode = configs.runner_mode
+        assert self.runner_mode in self.RUNNER_MODES, f'Unknown runner mode: {self.runner_mode}'
+        # caps of every build process; the JVM worker only has the per-test timeout
+        self.limits = ResourceLimits(configs.cpu_time_limit, configs.memory_limit_mb)
+        self.javac_runner = None
+        if self.runner_mode == 'javac':
+            self.javac_runner = JavacTestRunner(configs.runner_cache_dir, configs.junit_console_launcher, configs.test_timeout, self.limits)
+        elif self.runner_mode == 'worker':
+            self.javac_runner = WorkerTestRunner(configs.runner_cache_dir, configs.junit_console_launcher, configs.test_timeout)
+        if self.javac_runner is not None:
+            self.javac_runner.maven_args = self.maven_args
+        # builds of a session go before batch runs, `on_queue_wait(status, info)` is told when a build has to wait
+        self.priority = PRIORITY_INTERACTIVE
+        self.on_queue_wait = None
+        # called with each error line of a running build
+        self.on_build_output = None
+        # polled while queued or building, a cancelled session kills its build and frees the slot at once
+        self.cancel_check = None
+        assert configs.coverage_scope in self.COVERAGE_SCOPES, f'Unknown coverage scope: {configs.coverage_scope}'
+        assert configs.coverage_runs in self.COVERAGE_RUNS, f'Unknown coverage runs: {configs.coverage_runs}'
+        # attempts of the refine loop only need a verdict, the coverage of the passing test is measured by `collect_coverage`
+        self.skip_coverage = configs.coverage_runs == 'final'
         self.cur_no_ref_log_name = None
         self.cur_human_ref_log_name = None
         self.cur_rag_ref_log_name = None
 
         self.focal_file_coverage = dict()  # e.g., {'Base64_1_no_ref': cov_no_ref, 'Base64_1_with_rag_ref': cov_with_rag_ref}
 
-    def run_with_std_out(self, *args, **kwargs):
-        return asyncio.run(self.__run_with_std_out(*args, **kwargs))
-    
-    async def __run_with_std_out(self, *args, **kwargs):
-        process = subprocess.Popen(*args, **kwargs)
-
-        buffer = Buffer()
-
-        # Create threads for stdout and stderr
-        stdout_thread = threading.Thread(target=stream_output, args=(process.stdout, buffer, 'stdout'))
-        stderr_thread = threading.Thread(target=stream_output, args=(process.stderr, buffer, 'stderr'))
-
-        # Start the threads
-        stdout_thread.start()
-        stderr_thread.start()
+    def run_maven(self, args, cwd, abort_on_compile_error=True):
+        """Run a Maven build in its own process group, forwarding error lines as they are printed; returns the build log."""
+        def on_line(line):
+            if self.on_build_output is not None and is_relevant_build_line(line):
+                self.on_build_output(line.rstrip('\n'))
+
+        args = [*args, *self.maven_args(cwd)]
+        result = run_streaming(args, cwd, on_line, CompileErrorWatcher() if abort_on_compile_error else None, shell=MAVEN_SHELL,
+                               timeout=self.configs.build_timeout or None, cancel_check=self.cancel_check, limits=self.limits)
+        if result.cancelled:
+            raise GenerationCancelled()
+        build_log = f'{result.stdout}\n\n{result.stderr}\n\n'
+        if result.timed_out:
+            # kept in the error message, an endless loop or a deadlock in the test is the usual cause
+            build_log += f'[ERROR] The build was terminated: {result.aborted}, the test may never finish\n'
+        elif result.aborted:
+            build_log += f'[INFO] The build was stopped early: {result.aborted}\n'
+        elif result.returncode is not None and result.returncode < 0:
+            build_log += f'[ERROR] The build was killed by signal {-result.returncode}, it may have reached the CPU time or memory limit\n'
+        return build_log
+
+    def maven_args(self, project_dir):
+        # on machines without network every build runs offline against the prepared local repository
+        return maven_mode_args(project_dir, self.configs.maven_offline, self.configs.maven_local_repository)
 
-        # Wait for both threads to finish
-        stdout_thread.join()
-        stderr_thread.join()
-        process.wait()
-
-        return buffer
-    
     def run_with_err_out(self, *args, **kwargs):
         process = subprocess.run(*args, **kwargs)
         if process.returncode != 0:
@@ -77,6 +225,8 @@ class TestCaseRunner():
         return process
 
     def run_all_test_cases(self, test_cases, is_ref):
+        if self.configs.batch_size > 0:
+            return self.run_all_test_cases_in_batches(test_cases, is_ref)
         test_case_with_log_coverage = []
         # run the generated test cases
         for each_test_case in tqdm(test_cases, ncols=80, desc='Running test cases'):
@@ -95,16 +245,43 @@ class TestCaseRunner():
             test_case_with_log_coverage.append(each_test_case)
         return test_case_with_log_coverage
 
+    def run_all_test_cases_in_batches(self, test_cases, is_ref):
+        """Like `run_all_test_cases`, but each batch of tests is compiled by one Maven build and run in one JVM."""
+        test_case_with_log_coverage = []
+        project_dir = self.configs.project_with_test_workspace
+        batch_size = self.configs.batch_size
+        for start in tqdm(range(0, len(test_cases), batch_size), ncols=80, desc='Running test case batches'):
+            batch = test_cases[start:start + batch_size]
+            tc_paths = [f"{project_dir}/{each['test_case_path']}" for each in batch]
+            with self.scheduler().slot(PRIORITY_BATCH):
+                batch_runner = BatchTestRunner(self)
+                results = batch_runner.run(project_dir, [each['generated_test_case'] for each in batch], tc_paths)
+                for each_test_case, result in zip(batch, results):
+                    log_path = self.new_log_file_path(each_test_case['focal_file_path'], is_ref)
+                    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+                    with open(log_path, 'w', encoding='utf8') as f:
+                        f.write(f'{result.compile_log}\n{result.test_log}')
+
+                    focal_file_coverage, fm_cov_statistic_by_jacoco = None, None
+                    if result.coverage_report is not None:
+                        fm_name_param = each_test_case['focal_method_name'].split('::::')[1]
+                        focal_file_coverage, fm_cov_statistic_by_jacoco = self.get_report_coverage(
+                            result.coverage_report, each_test_case['focal_file_path'], result.test_case_path, fm_name_param)
+                        focal_file_coverage = ''.join(focal_file_coverage) if focal_file_coverage is not None else None
+                    each_test_case[f'log_path_{is_ref}'] = log_path
+                    each_test_case[f'coverage_focal_file'] = focal_file_coverage
+                    each_test_case[f'coverage_focal_method'] = fm_cov_statistic_by_jacoco
+                    test_case_with_log_coverage.append(each_test_case)
+        return test_case_with_log_coverage
+
     def save_log_coverage(self, log_coverage, save_path):
         os.makedirs(os.path.dirname(save_path), exist_ok=True)
         with open(save_path, 'w', encoding='utf8') as f:
             json.dump(log_coverage, f, indent=4)
             logger.debug(f'Saved the generated test cases log and coverage to {save_path}')
 
-    def run_test_case(self, test_case_path, focal_file_path, is_ref):
+    def new_log_file_path(self, focal_file_path, is_ref):
         assert is_ref in ('no_ref', 'human_ref', 'rag_ref')
-        test_case_relative_path = self.get_test_case_relative_path(test_case_path)
-
         focal_method_name = focal_file_path.split('/')[-1].split('.')[0]
 
         suffix = is_ref
@@ -114,13 +291,19 @@ class TestCaseRunner():
             index += 1
             log_file_path = f'{self.test_case_run_log_dir}/{focal_method_name}_{index}_{suffix}.log'
         setattr(self, f'cur_{is_ref}_ref_log_name', f'{focal_method_name}_{index}_{suffix}')
+        return log_file_path
+
+    def run_test_case(self, test_case_path, focal_file_path, is_ref):
+        test_case_relative_path = self.get_test_case_relative_path(test_case_path)
+        log_file_path = self.new_log_file_path(focal_file_path, is_ref)
 
         cwd_path = test_case_path.split('/src/test/')[0]
 
         cmd = f"cd {cwd_path} && mvn clean verify -Dtest={test_case_relative_path} -Dcheckstyle.skip=true > '{log_file_path}' 2>&1"
 
         logger.debug(f'Running test case: f{cmd}')
-        os.system(cmd)
+        with self.scheduler().slot(PRIORITY_BATCH):
+            os.system(cmd)
         return log_file_path
 
     def run_test_case_and_get_coverage(self, test_case, test_case_path, focal_file_path, focal_method_name_parameter, is_ref):
@@ -148,34 +331,187 @@ class TestCaseRunner():
 
         return focal_file_coverage, fm_cov_statistic_by_jacoco
 
-    def compile_and_execute_test_case(self, test_case, test_case_path):
+    def compile_and_execute_test_case(self, test_case, test_case_path, junit_version=4):
+        result = self.run_test(test_case, test_case_path, junit_version)
+        return result.compile_log, result.test_log, result.compile_success, result.execute_success
+
+    def run_test(self, test_case, test_case_path, junit_version=4):
+        """Build and run one generated test; the logs along with the compiler errors and the outcome of each test method."""
+        # obviously broken responses are reported in milliseconds instead of after a full Maven cycle
+        diagnostics = check_java_source(test_case, test_case_path)
+        if diagnostics:
+            compile_log = format_diagnostics(diagnostics, test_case_path)
+            logger.debug(f'Pre-flight syntax check failed, skip the build:\n{compile_log}')
+            return TestRunResult(compile_log, '', False, False, parse_compiler_diagnostics(compile_log))
+
+        with self.scheduler().slot(self.priority, self.on_queue_wait, self.cancel_check):
+            pool = self.workspace_pool(test_case_path.split('/src/test/')[0])
+            if pool is None:
+                write_file(test_case_path, test_case)
+                return self.read_test_result(test_case_path, *self.build_and_run(test_case_path, junit_version))
+            return self.build_and_run_in_workspace(pool, test_case, test_case_path, junit_version)
+
+    def build_and_run_in_workspace(self, pool, test_case, test_case_path, junit_version=4):
+        # concurrent sessions each build in a private workspace instead of clobbering the shared tree
+        with pool.checkout() as workspace:
+            workspace_test_case_path = workspace.map_path(test_case_path)
+            workspace.write_file(workspace_test_case_path, test_case)
+            results = self.build_and_run(workspace_test_case_path, junit_version, MAVEN_SHARED_REPO_ARGS)
+            # the surefire reports are read before the workspace goes back to the pool
+            result = self.read_test_result(workspace_test_case_path, *results)
+        result.compile_log, result.test_log = workspace.unmap_text(result.compile_log), workspace.unmap_text(result.test_log)
+        for each in result.diagnostics:
+            each.path = workspace.unmap_text(each.path)
+        return result
+
+    def read_test_result(self, test_case_path, compile_log, test_log, compile_success, execute_success):
+        result = TestRunResult(compile_log, test_log, compile_success, execute_success)
+        if not compile_success:
+            result.diagnostics = parse_compiler_diagnostics(compile_log)
+        elif self.runner_mode in ('maven', 'incremental'):
+            # the javac and worker runners write no surefire reports, their statuses come from the Maven-like logs
+            project_dir = test_case_path.split('/src/test/')[0]
+            test_class_fqn = os.path.splitext(test_case_path.split('/src/test/java/')[1])[0].replace('/', '.')
+            result.test_cases = read_surefire_reports(project_dir, test_class_fqn)
+        return result
+
+    def scheduler(self):
+        return get_scheduler(self.configs.runner_parallelism, self.configs.runner_build_weight)
+
+    def workspace_pool(self, project_dir):
+        return get_pool(project_dir, self.configs.workspace_pool_dir, self.configs.workspace_pool_size, self.configs.workspace_clone)
+
+    def build_and_run(self, test_case_path, junit_version=4, maven_args=()):
         compile_success, execute_success = False, False
         compile_log, test_log = '', ''
 
-        tc_rel_path = test_case_path.split('/src/test/')[1]
-        tc_base_dir = test_case_path.replace(tc_rel_path, '')
-        os.makedirs(os.path.dirname(test_case_path), exist_ok=True)
-        with open(test_case_path, 'w', encoding='utf8') as f:
-            f.write(test_case)
+        if self.runner_mode == 'incremental':
+            return self.compile_and_execute_incremental(test_case_path, maven_args)
+        if self.runner_mode in ('javac', 'worker'):
+            self.javac_runner.cancel_check = self.cancel_check
+            return self.javac_runner.compile_and_execute(test_case_path, junit_version)
 
         test_case_relative_path = self.get_test_case_relative_path(test_case_path)
 
         cwd_path = test_case_path.split('/src/test/')[0]
-        mvn_compile_cmd = ['mvn', 'clean', f'-Dtest={test_case_relative_path}', 'test-compile', '-Dcheckstyle.skip=true']
-        compile_result = subprocess.run(mvn_compile_cmd, cwd=cwd_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True, universal_newlines=True)
-        compile_log = f'{compile_result.stdout}\n\n{compile_result.stderr}\n\n'
+        mvn_compile_cmd = ['mvn', 'clean', f'-Dtest={test_case_relative_path}', 'test-compile', '-Dcheckstyle.skip=true', *maven_args]
+        compile_log = self.run_maven(mvn_compile_cmd, cwd_path)
 
         if "BUILD SUCCESS" in compile_log:
             compile_success = True
 
-            mvn_test_cmd = ['mvn', 'clean', 'verify', f'-Dtest={test_case_relative_path}', '-Dcheckstyle.skip=true']  # test and get the coverage
-            test_result = subprocess.run(mvn_test_cmd, cwd=cwd_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True, universal_newlines=True)
-            test_log = f'{test_result.stdout}\n\n{test_result.stderr}'
+            with self.coverage_args(cwd_path, test_case_path, self.skip_coverage) as coverage_args:
+                mvn_test_cmd = ['mvn', 'clean', 'verify', f'-Dtest={test_case_relative_path}', '-Dcheckstyle.skip=true', *maven_args,
+                                *coverage_args]  # test and get the coverage
+                test_log = self.run_maven(mvn_test_cmd, cwd_path)
             if "BUILD SUCCESS" in test_log:
                 execute_success = True
         
         return compile_log, test_log, compile_success, execute_success
 
+    def compile_and_execute_incremental(self, test_case_path, maven_args=()):
+        """One non-clean `mvn verify`; compile errors and test failures are told apart from the build output."""
+        compile_success, execute_success = False, False
+        compile_log, test_log = '', ''
+
+        cwd_path = test_case_path.split('/src/test/')[0]
+        self.remove_stale_test_outputs(cwd_path, test_case_path)
+
+        test_case_relative_path = self.get_test_case_relative_path(test_case_path)
+        with self.coverage_args(cwd_path, test_case_path, self.skip_coverage) as coverage_args:
+            mvn_cmd = ['mvn', 'verify', f'-Dtest={test_case_relative_path}', '-Dcheckstyle.skip=true', *maven_args, *coverage_args]
+            build_log = self.run_maven(mvn_cmd, cwd_path)
+
+        if is_compile_failure(build_log):
+            compile_log = build_log
+        else:
+            compile_success = True
+            test_log = build_log
+            execute_success = "BUILD SUCCESS" in build_log
+
+        return compile_log, test_log, compile_success, execute_success
+
+    @contextlib.contextmanager
+    def coverage_args(self, project_dir, test_case_path, skip_coverage):
+        """Maven arguments of a build with or without JaCoCo, valid until the build is done."""
+        if skip_coverage:
+            yield MAVEN_SKIP_COVERAGE_ARGS
+            return
+        with self.coverage_pom_args(project_dir, test_case_path) as args:
+            yield args
+
+    @contextlib.contextmanager
+    def coverage_pom_args(self, project_dir, test_case_path):
+        if self.configs.coverage_scope == 'project':
+            yield []
+            return
+        # the report of a large project takes longer than the test itself, only the focal class is ever read
+        coverage_pom = write_coverage_pom(project_dir, coverage_includes(test_case_path, self.configs.coverage_scope))
+        if coverage_pom is None:
+            yield []
+            return
+        try:
+            yield ['-f', coverage_pom]
+        finally:
+            os.remove(os.path.join(project_dir, coverage_pom))
+
+    def collect_coverage(self, test_case, test_case_path):
+        """Build the (passing) test once more with JaCoCo and return the covered and uncovered lines of the focal class."""
+        with self.scheduler().slot(self.priority, self.on_queue_wait, self.cancel_check):
+            pool = self.workspace_pool(test_case_path.split('/src/test/')[0])
+            if pool is None:
+                write_file(test_case_path, test_case)
+                return self.measure_coverage(test_case_path)
+            # the report is read before the workspace goes back to the pool
+            with pool.checkout() as workspace:
+                workspace_test_case_path = workspace.map_path(test_case_path)
+                workspace.write_file(workspace_test_case_path, test_case)
+                return self.measure_coverage(workspace_test_case_path, MAVEN_SHARED_REPO_ARGS)
+
+    def measure_coverage(self, test_case_path, maven_args=()):
+        project_dir = test_case_path.split('/src/test/')[0]
+        self.remove_stale_test_outputs(project_dir, test_case_path)
+        with self.coverage_args(project_dir, test_case_path, skip_coverage=False) as coverage_args:
+            mvn_cmd = ['mvn', 'verify', f'-Dtest={self.get_test_case_relative_path(test_case_path)}', '-Dcheckstyle.skip=true', *maven_args,
+                       *coverage_args]
+            self.run_maven(mvn_cmd, project_dir)
+
+        jacoco_xml_report = jacoco_xml_report_path(project_dir)
+        source_file = f'{focal_class_path(test_case_path)}.java'
+        if not os.path.exists(jacoco_xml_report):
+            logger.warning(f'[WARNING] Jacoco report not found: {jacoco_xml_report}')
+            return None
+        report = parse_jacoco_xml(jacoco_xml_report, [source_file])
+        if source_file not in report.source_files:
+            return None
+        source_file_coverage = report.source_files[source_file]
+        return {'source_file': source_file, 'covered_lines': source_file_coverage.covered_lines, 'uncovered_lines': source_file_coverage.uncovered_lines}
+
+    def remove_stale_test_outputs(self, project_dir, test_case_path):
+        # without `clean`, outputs of the previous attempt must not leak into this one:
+        # the old test classes (the compiler may skip an unchanged-looking file), its surefire reports and the appended JaCoCo data
+        test_class_rel_path = os.path.splitext(test_case_path.split('/src/test/java/')[1])[0]
+        test_class_dir = os.path.join(project_dir, 'target', 'test-classes', os.path.dirname(test_class_rel_path))
+        test_class_name = os.path.basename(test_class_rel_path)
+        test_class_fqn = test_class_rel_path.replace('/', '.')
+        surefire_dir = os.path.join(project_dir, 'target', 'surefire-reports')
+
+        stale_files = []
+        if os.path.isdir(test_class_dir):
+            stale_files += [os.path.join(test_class_dir, each) for each in os.listdir(test_class_dir)
+                            if each == f'{test_class_name}.class' or each.startswith(f'{test_class_name}$')]
+        if os.path.isdir(surefire_dir):
+            stale_files += [os.path.join(surefire_dir, each) for each in os.listdir(surefire_dir) if each.startswith((f'TEST-{test_class_fqn}.', f'{test_class_fqn}.', f'{test_class_fqn}-'))]
+        stale_files.append(os.path.join(project_dir, 'target', 'jacoco.exec'))
+
+        for each in stale_files:
+            if os.path.exists(each):
+                os.remove(each)
+        shutil.rmtree(os.path.join(project_dir, 'target', 'site', 'jacoco'), ignore_errors=True)
+
+    def dependency_classpath(self, project_dir):
+        return resolve_test_classpath(project_dir, self.configs.runner_cache_dir, self.maven_args(project_dir))
+
     def get_test_case_relative_path(self, test_case_path):
         test_case_relative_path = test_case_path.split('/src/test/java/')[1]
         test_case_relative_path = test_case_relative_path.split('/')[1:]
@@ -191,15 +527,26 @@ class TestCaseRunner():
         test_suffix = 'Test'
         test_case_relative_path = self.get_test_case_relative_path(test_case_path)
 
-        # jacoco java.html report contains java code lines with tags.
-        jacoco_java_html_report_path = self.get_jacoco_java_html_report_path(base_path, test_case_relative_path, org_name, test_suffix)
+        jacoco_xml_report = jacoco_xml_report_path(base_path)
+        if not os.path.exists(jacoco_xml_report):
+            logger.warning(f'[WARNING] Jacoco report not found: {jacoco_xml_report}')
+            return None, None
+
+        # only the focal file is kept while the report is read, reports of large projects run into the hundreds of MB
+        source_file = self.get_jacoco_source_file(test_case_relative_path, org_name, test_suffix)
+        report = parse_jacoco_xml(jacoco_xml_report, [source_file])
+        return self.get_report_coverage(report, focal_file_path, test_case_path, focal_method_name_parameter)
 
-        if not os.path.exists(jacoco_java_html_report_path):
-            logger.warning(f'[WARNING] Jacoco report not found: {jacoco_java_html_report_path}')
+    def get_report_coverage(self, report, focal_file_path, test_case_path, focal_method_name_parameter):
+        # the coverage of the focal file as get_focal_file_coverage() reads it, out of a jacoco.xml or a JVM worker report
+        org_name = test_case_path.split('/src/test/java/')[1].split('/')[0]
+        source_file = self.get_jacoco_source_file(self.get_test_case_relative_path(test_case_path), org_name, 'Test')
+        if source_file not in report.source_files:
+            logger.warning(f'[WARNING] {source_file} is not in the Jacoco report of {test_case_path}')
             return None, None
 
         # will be used for analyze_coverage_with_target_coverage(). will be used to count the target coverage's coverage
-        cov_lines, uncov_lines = self.get_lines_coverage(jacoco_java_html_report_path)
+        cov_lines, uncov_lines = self.get_lines_coverage(report, source_file)
         with open(f'{self.configs.project_dir}/{focal_file_path}', 'r', encoding='utf8') as f:
             focal_file = f.readlines()
         for line in cov_lines:
@@ -207,149 +554,29 @@ class TestCaseRunner():
                 focal_file[line - 1] = "<COVER>" + focal_file[line - 1]
 
         # will be used for analyze_coverage_with_target_focal_method(). directly use the focal method's coverage counted by jacoco
-        jacoco_html_report_path = jacoco_java_html_report_path.replace('.java.html', '.html')
-
-        # TODO: optimize this. here, in lambda, target_coverage_idx=171, focal method name is 'Index.Z::::get(com.jnape.palatable.lambda.adt.hlist.HList.HCons<Target, ?>)'. will throw "/evosuite_pp/rag_tester/data/raw_data/repos_removing_test/lambda/target/site/jacoco/com.jnape.palatable.lambda.adt.hlist/Index.html" not such file.
-        if not os.path.exists(jacoco_html_report_path):
-            logger.warning(f'[WARNING] Jacoco report not found: {jacoco_html_report_path}. But Jacoco java.html report is found: {jacoco_java_html_report_path}')
-            return None, None
-        #
-
-        fm_cov_statistic_by_jacoco = self.get_focal_method_coverage_statistic_by_jacoco(focal_method_name_parameter, jacoco_html_report_path)
+        fm_cov_statistic_by_jacoco = self.get_focal_method_coverage_statistic_by_jacoco(focal_method_name_parameter, report.classes_of(source_file))
 
         return focal_file, fm_cov_statistic_by_jacoco
 
-    # copy from /bernard/dataset_construction/human_written_tests/v2/utils.py
-    def get_jacoco_java_html_report_path(self, base_path, test_class_name, org_name, test_suffix):
-        # get jacoco report
-        # append_path = "spark/" if '.' not in test_class_name else "spark." + '.'.join(test_class_name.split(".")[:-1]) + '/'
-        append_path = org_name + "/" if '.' not in test_class_name else org_name + "." + '.'.join(test_class_name.split(".")[:-1]) + '/'
+    def get_jacoco_source_file(self, test_class_name, org_name, test_suffix):
+        # the focal file as named in jacoco.xml, e.g. spark/utils/CollectionUtils.java for the test class utils.CollectionUtilsTest
+        package_path = org_name if '.' not in test_class_name else org_name + '/' + '/'.join(test_class_name.split('.')[:-1])
         suff_len = len(test_suffix)
-        html_name = test_class_name.split(".")[-1][:suff_len * -1] + ".java.html" # changes from -4 to -5 depending on whether it's Test or Tests
-        
-        jacoco_path = base_path + "/target/site/jacoco/" + append_path + html_name
-        return jacoco_path
-
-    # copy from /bernard/dataset_construction/human_written_tests/v2/utils.py
-    def get_lines_coverage(self, jacoco_java_html_report_path):
-        with open(jacoco_java_html_report_path, encoding='utf8') as f:
-            soup = BeautifulSoup(f, 'html.parser')
-            # find all spans with class 'fc' or 'pc' or 'bpc', and extract the ID
-            cov_lines = []
-            uncov_lines = []
-            for span in soup.find_all('span', class_=['fc', 'pc', 'bpc', 'nc']):
-                if span['class'][0] == 'nc':
-                    uncov_lines.append(int(span['id'][1:]))
-                else:
-                    cov_lines.append(int(span['id'][1:]))
-        
-        return cov_lines, uncov_lines
-    
-
-    def get_focal_method_coverage_statistic_by_jacoco(self, focal_method_name_param, jacoco_html_report_path):
-        with open(jacoco_html_report_path, encoding='utf8') as f:
-            soup = BeautifulSoup(f, 'html.parser')
-
-        # example: focal_method_name_param is intersectionDistinct(java.util.Collection<T>,java.util.Collection<T>,java.util.Collection<T>[]). to match intersectionDistinct(Collection, Collection, Collection[])
-        # example: valuesOfKeys(java.util.Map<K, V>,K[]) to match valuesOfKeys(Map, Object[])
-        # example: groupingBy(java.util.function.Function<? super T, ? extends K>,java.util.function.Function<? super T, ? extends R>) to match groupingBy(Function, Function)
-        # example: filter(java.util.Map<K, V>,cn.hutool.core.lang.Filter<java.util.Map.Entry<K, V>>) to match filter(Map, Filter)
-        target_fm_name = focal_method_name_param.strip().split('(')[0]
-        target_fm_params_str = focal_method_name_param.strip().split('(')[1][:-1]
-        target_fm_params_str = self.remove_angle_brackets_substrings(target_fm_params_str)
-        target_fm_params = [each_param.strip() for each_param in target_fm_params_str.split(',')]
-        target_fm_params = [each_param.split('.')[-1] if '.' in each_param else each_param for each_param in target_fm_params]
-
-        cov_stat = {}
-
-        candidates = []
-        table = soup.find('tbody')
-        for each_tr in table.find_all('tr'):
-            # check the method name
-            candidate_all_column = each_tr.find_all('td')
-
-            method_name = candidate_all_column[0].text
-            candidate_fm_name = method_name.strip().split('(')[0]
-            if candidate_fm_name != target_fm_name:
-                continue
-            
-            candidates.append(candidate_all_column)
-
-        if len(candidates) == 0:
-            logger.warning('[WARNING] Cannot find the focal method in the jacoco report. Need manual check\n', f'focal_method_name: {focal_method_name_param}\n\n')
-            cov_stat['raw_html'] = str(soup)
-            return cov_stat        
-
-        if len(candidates) > 1:
-            all_column = self.select_focal_method_coverage_statistic_by_jacoco(target_fm_params, candidates)
-        else:
-            all_column = candidates[0]
-
-        if all_column is not None:
-            # parse the result
-            cov_stat['number_of_lines'] = int(all_column[8].text.strip())
-            cov_stat['number_of_branches'] = int(all_column[6].text.strip()) - 1
-            cov_stat['line_coverage'] = float(all_column[2].text.strip()[:-1])  # remove the '%'
-            branch_cov = all_column[4].text.strip()
-            cov_stat['branch_coverage'] = float(branch_cov[:-1]) if branch_cov != 'n/a' else branch_cov
-        else:
-            logger.warning('[WARNING] Cannot find the focal method in the jacoco report. Need manual check\n', f'focal_method_name: {focal_method_name_param}\n\n')
-            cov_stat['raw_html'] = str(soup)
-
-        return cov_stat
-
-    def select_focal_method_coverage_statistic_by_jacoco(self, target_fm_params, candidates):
-        # filter according to the number of parameters
-        filter_candidates = []
-        for each_candidate in candidates:
-            method_name = each_candidate[0].text
-
-            candidate_fm_params = [each_param.strip() for each_param in method_name.strip().split('(')[1][:-1].split(',')]
-            if len(target_fm_params) == len(candidate_fm_params):
-                filter_candidates.append(each_candidate)
-        
-        if len(filter_candidates) == 1:
-            all_column = filter_candidates[0]
-            return all_column
-
-        # filter according to the detailed parameters
-        all_column = None
-
-        for each_candidate in filter_candidates:
-            method_name = each_candidate[0].text
-
-            candidate_fm_params = [each_param.strip() for each_param in method_name.strip().split('(')[1][:-1].split(',')]
-            is_match = True
-            for idx in range(len(target_fm_params)):
-                if target_fm_params[idx] != candidate_fm_params[idx]:
-                    is_match = False
-                    break
-
-            if is_match:
-                all_column = each_candidate
-                return all_column
-
-        # for corner case such as: valuesOfKeys(java.util.Map<K, V>,K[]) to match valuesOfKeys(Map, Object[]). need to transform K to Object
-        if all_column is None:  
-            for each_candidate in filter_candidates:
-                method_name = each_candidate[0].text
-
-                candidate_fm_params = [each_param.strip() for each_param in method_name.strip().split('(')[1][:-1].split(',')]
-                is_match = True
-                for idx in range(len(target_fm_params)): 
-                    if target_fm_params[idx] != candidate_fm_params[idx]:
-                        change_to_object = re.sub(r'[A-Za-z]', 'Object', target_fm_params[idx])
-                        if change_to_object == candidate_fm_params[idx]:  # add this to check the corner case
-                            continue
-                        else:
-                            is_match = False
-                            break
-
-                if is_match:
-                    all_column = each_candidate
-                    break
-
-        return all_column
+        return package_path + '/' + test_class_name.split('.')[-1][:suff_len * -1] + '.java'  # changes from -4 to -5 depending on whether it's Test or Tests
+
+    def get_lines_coverage(self, report, source_file):
+        source_file_coverage = report.source_files[source_file]
+        return source_file_coverage.covered_lines, source_file_coverage.uncovered_lines
+
+    def get_focal_method_coverage_statistic_by_jacoco(self, focal_method_name_param, classes):
+        # example: focal_method_name_param is intersectionDistinct(java.util.Collection<T>,java.util.Collection<T>,java.util.Collection<T>[]).
+        # matched against the descriptor (Ljava/util/Collection;Ljava/util/Collection;[Ljava/util/Collection;)Ljava/util/Collection;
+        method = find_method(classes, focal_method_name_param)
+        if method is None:
+            logger.warning(f'[WARNING] Cannot find the focal method in the jacoco report. Need manual check\nfocal_method_name: {focal_method_name_param}\n\n')
+            # the key of the former HTML report page, now the methods of the focal classes
+            return {'raw_html': describe_methods(classes)}
+        return method.to_cov_stat()
 
     def remove_angle_brackets_substrings(self, input_string):
         # Define the regular expression pattern to match substrings within angle brackets, including nested ones
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import os
+import re
+import xml.etree.ElementTree as ET
+import logging
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# maven-compiler-plugin: `[ERROR] /repo/src/test/java/spark/FooTest.java:[4,9] cannot find symbol`
+_MAVEN_DIAGNOSTIC_RE = re.compile(r'^\[ERROR\] (?P<path>.+?\.java):\[(?P<line>\d+),(?P<column>\d+)\] (?P<message>.*)$')
+# javac (the javac and worker runners): `/repo/src/test/java/spark/FooTest.java:4: error: cannot find symbol`
+_JAVAC_DIAGNOSTIC_RE = re.compile(r'^(?P<path>.+?\.java):(?P<line>\d+): error: (?P<message>.*)$')
+# the goal failure summary repeats every error with its details prefixed by `[ERROR] `
+_REPEATED_DETAIL_RE = re.compile(r'^\[ERROR\] (?P<detail>\s+\S.*)$')
+_TEST_RUN_RE = re.compile(r'Tests run: (\d+), Failures: (\d+), Errors: (\d+), Skipped: (\d+)')
+
+# frames of the test framework, the build tool and reflection, between the test method and the JVM entry point
+FRAMEWORK_FRAME_PREFIXES = (
+    'org.junit.', 'junit.', 'org.apache.maven.surefire.', 'sun.reflect.', 'java.lang.reflect.', 'jdk.internal.', 'java.util.ArrayList.forEach',
+)
+MAX_FRAMES = 8
+
+
+@dataclass
+class CompilerDiagnostic:
+    path: str
+    line: int
+    column: int
+    message: str
+    # the indented lines javac adds, e.g. `  symbol:   class List`
+    details: List[str] = field(default_factory=list)
+
+    def format(self) -> str:
+        return '\n'.join([f'[ERROR] {self.path}:[{self.line},{self.column}] {self.message}'] + self.details)
+
+
+@dataclass
+class TestCaseOutcome:
+    class_name: str
+    name: str
+    # passed, failure (an assertion failed), error (anything else was thrown) or skipped
+    status: str
+    message: str = ''
+    exception_type: str = ''
+    stack_trace: str = ''
+    time: float = 0.0
+
+    def format(self) -> str:
+        lines = [f'[ERROR] {self.name}({self.class_name})  <<< {self.status.upper()}!']
+        lines.append(self.stack_trace or f'{self.exception_type}: {self.message}'.strip(': '))
+        return '\n'.join(lines)
+
+
+def parse_compiler_diagnostics(build_log: str) -> List[CompilerDiagnostic]:
+    """The compiler errors of a Maven or javac log, each once, in the order they were reported."""
+    diagnostics: List[CompilerDiagnostic] = []
+    seen = set()
+    current = None
+    for line in build_log.splitlines():
+        match = _MAVEN_DIAGNOSTIC_RE.match(line) or _JAVAC_DIAGNOSTIC_RE.match(line)
+        if match:
+            key = (match.group('path').replace('\\', '/'), int(match.group('line')), int(match.groupdict().get('column') or 0), match.group('message'))
+            # the details of a repeated error are skipped along with it
+            current = None if key in seen else CompilerDiagnostic(*key)
+            if current is not None:
+                seen.add(key)
+                diagnostics.append(current)
+            continue
+        repeated = _REPEATED_DETAIL_RE.match(line)
+        if repeated is not None:
+            line = repeated.group('detail')
+        if current is None or not line.strip() or not line[0].isspace():
+            current = None
+        elif line.strip() == '^':
+            # javac echoes the source line with a caret under the column, which says nothing more than [line,column]
+            if current.details:
+                current.details.pop()
+            current.column = current.column or line.index('^') + 1
+        else:
+            current.details.append(line.rstrip())
+    return diagnostics
+
+
+def _is_framework_frame(frame: str) -> bool:
+    return frame.startswith(FRAMEWORK_FRAME_PREFIXES)
+
+
+def trim_stack_trace(stack_trace: str, test_class_fqn: str, max_frames: int = MAX_FRAMES) -> str:
+    """Keep the exception lines and the frames down to the test method, without the frames of JUnit, surefire and reflection."""
+    trimmed: List[str] = []
+    frames: List[str] = []
+
+    def flush():
+        # below the last frame of the test class there is only the machinery that called it
+        test_frames = [i for i, frame in enumerate(frames) if frame.startswith((f'{test_class_fqn}.', f'{test_class_fqn}$'))]
+        kept = frames[:test_frames[-1] + 1] if test_frames else frames
+        kept = [frame for frame in kept if not _is_framework_frame(frame)]
+        trimmed.extend(f'\tat {frame}' for frame in kept[:max_frames])
+        if len(kept) > max_frames:
+            trimmed.append(f'\t... {len(kept) - max_frames} more')
+        frames.clear()
+
+    for line in stack_trace.strip().splitlines():
+        stripped = line.strip()
+        if stripped.startswith('at '):
+            frames.append(stripped[3:])
+        elif re.match(r'\.\.\. \d+ (more|common frames omitted)$', stripped):
+            continue
+        elif stripped:
+            flush()
+            trimmed.append(line.rstrip())
+    flush()
+    return '\n'.join(trimmed)
+
+
+def parse_surefire_report(report_path: str) -> List[TestCaseOutcome]:
+    outcomes = []
+    root = ET.parse(report_path).getroot()
+    for testcase in root.iter('testcase'):
+        class_name = testcase.get('classname') or root.get('name', '')
+        outcome = TestCaseOutcome(class_name, testcase.get('name', ''), 'passed', time=float(testcase.get('time') or 0))
+        for status in ('failure', 'error', 'skipped'):
+            element = testcase.find(status)
+            if element is None:
+                continue
+            outcome.status = status
+            outcome.message = element.get('message', '')
+            outcome.exception_type = element.get('type', '')
+            outcome.stack_trace = trim_stack_trace(element.text or '', class_name)
+            break
+        outcomes.append(outcome)
+    return outcomes
+
+
+def read_surefire_reports(project_dir: str, test_class_fqn: str) -> Optional[List[TestCaseOutcome]]:
+    """The outcomes surefire wrote for one test class, None if it did not get to run it."""
+    report_path = os.path.join(project_dir, 'target', 'surefire-reports', f'TEST-{test_class_fqn}.xml')
+    if not os.path.exists(report_path):
+        return None
+    try:
+        return parse_surefire_report(report_path)
+    except ET.ParseError as e:
+        # the fork was killed while writing it
+        logger.warning(f'Unreadable surefire report {report_path}: {e}')
+        return None
+
+
+@dataclass
+class TestRunResult:
+    """The outcome of building and running one generated test: the build logs, the compiler errors and the outcome of each test method.
+
+    Without structured results (a runner that writes no surefire reports, or a build that stopped before surefire) the
+    status and the error message are derived from the logs as before.
+    """
+    compile_log: str
+    test_log: str
+    compile_success: bool
+    execute_success: bool
+    diagnostics: List[CompilerDiagnostic] = field(default_factory=list)
+    test_cases: Optional[List[TestCaseOutcome]] = None
+
+    def counts(self) -> Optional[Tuple[int, int, int, int]]:
+        """(run, failures, errors, skipped) like surefire's summary line."""
+        if self.test_cases is not None:
+            return (len(self.test_cases), sum(each.status == 'failure' for each in self.test_cases),
+                    sum(each.status == 'error' for each in self.test_cases), sum(each.status == 'skipped' for each in self.test_cases))
+        test_run_info = _TEST_RUN_RE.search(self.test_log)
+        if test_run_info is None:
+            return None
+        return tuple(int(each) for each in test_run_info.groups())
+
+    @property
+    def status(self) -> str:
+        if not self.compile_success:
+            return 'fail_compile'
+        if self.execute_success:
+            return 'success'
+        counts = self.counts()
+        if counts is None:
+            return 'fail_execute'
+        run, failures, errors, skipped = counts
+        # a test case with one passing method is kept, its failing methods are dropped later
+        if run - failures - errors - skipped > 0:
+            return 'success'
+        if failures > 0:
+            return 'fail_pass'
+        return 'fail_execute'
+
+    @property
+    def error_message(self) -> str:
+        status = self.status
+        if status == 'success':
+            return ''
+        if status == 'fail_compile':
+            if self.diagnostics:
+                return '\n'.join(each.format() for each in self.diagnostics)
+            return extract_error_lines(self.compile_log)
+        failed = [each for each in self.test_cases or [] if each.status in ('failure', 'error')]
+        if failed:
+            run, failures, errors, skipped = self.counts()
+            header = f'[ERROR] Tests run: {run}, Failures: {failures}, Errors: {errors}, Skipped: {skipped}'
+            return '\n'.join([header] + [each.format() for each in failed])
+        return extract_error_lines(self.test_log)
+
+
+def extract_error_lines(log: str) -> str:
+    """The error part of a Maven log, without the INFO/WARNING lines and the help boilerplate at the end."""
+    error_msg = []
+    stop_flag = False
+    for each_line in log.split('\n'):
+        if each_line.strip().startswith('[INFO]'):
+            continue
+        if each_line.strip().startswith('[main]'):
+            continue
+        if each_line.strip().startswith('[WARNING]'):
+            continue
+
+        if each_line.strip().startswith('[ERROR] Tests run:'):
+            if stop_flag:
+                break
+            else:
+                stop_flag = True
+
+        if each_line.strip().startswith('[ERROR] To see the full stack trace'):
+            break
+
+        error_msg.append(each_line)
+
+    return '\n'.join(error_msg)
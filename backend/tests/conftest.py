@@ -24,3 +24,20 @@ def setup_env():
     except LookupError:
         nltk.download('stopwords', quiet=True)
     yield
+
+
+@pytest.fixture
+def runner_configs():
+    """Configs with the [runner]/[workspace] defaults that TestCaseRunner reads, fields can be overridden."""
+    from types import SimpleNamespace
+
+    def make(**overrides):
+        defaults = dict(
+            runner_mode="maven", runner_cache_dir="", junit_console_launcher="", test_timeout=120,
+            runner_parallelism=0, runner_build_weight=2, build_timeout=0, cpu_time_limit=0, memory_limit_mb=0,
+            workspace_pool_size=0, workspace_pool_dir="", workspace_clone="auto",
+            coverage_scope="project", coverage_runs="every_run", batch_size=0,
+            maven_offline=False, maven_local_repository="",
+        )
+        return SimpleNamespace(**dict(defaults, **overrides))
+    return make
@@ -0,0 +1,133 @@
+"""
+Tests for batch_runner.py batch compilation and execution of generated tests.
+"""
+import contextlib
+import os
+from types import SimpleNamespace
+
+
+def _make_runner(tmp_path, runner_configs, build_logs, maven_calls):
+    def run_maven(args, cwd, abort_on_compile_error=True):
+        maven_calls.append(args)
+        return build_logs.pop(0)
+
+    configs = runner_configs(runner_cache_dir=(tmp_path / "cache").as_posix(), batch_size=10)
+    return SimpleNamespace(configs=configs, run_maven=run_maven, dependency_classpath=lambda _project_dir: ["dep.jar"],
+                           coverage_pom_args=lambda _project_dir, _path: contextlib.nullcontext([]))
+
+
+class FakeWorker:
+    jvm_args = ["-javaagent:/m2/org.jacoco.agent-0.8.11-runtime.jar=output=none"]
+
+    def __init__(self, failing=()):
+        self.requests = []
+        self.failing = failing
+
+    def request(self, payload, timeout, cancel_check=None):
+        self.requests.append(payload)
+        if payload["type"] == "coverage":
+            method = {"name": "add", "desc": "(II)I", "line": 4, "counters": {"INSTRUCTION": [0, 4], "LINE": [0, 1], "COMPLEXITY": [0, 1], "METHOD": [0, 1]}}
+            report = {"lines": {"spark/Foo.java": {"4": [0, 4, 0, 0], "8": [3, 0, 0, 0]}},
+                      "classes": [{"name": "spark/Foo", "source_file": "Foo.java", "methods": [method]}]}
+            return {"coverage": [{"spark/Foo.java": {"covered": [4], "uncovered": [8]}}], "reports": [report]}
+        if payload["class_name"] in self.failing:
+            return {"compile_success": True, "compile_log": "", "run": 1, "failures": 1, "errors": 0, "skipped": 0,
+                    "output": "1) t(spark.FooTest_2)\njava.lang.AssertionError\n"}
+        return {"compile_success": True, "compile_log": "", "run": 1, "failures": 0, "errors": 0, "skipped": 0, "output": ""}
+
+
+class TestBatchPlan:
+    def test_taken_paths_get_unique_class_names(self, tmp_path, runner_configs):
+        from batch_runner import BatchTestRunner
+
+        runner = BatchTestRunner(_make_runner(tmp_path, runner_configs, [], []))
+        path = "/repo/spark/src/test/java/spark/FooTest.java"
+        source = "package spark;\npublic class FooTest {\n    public FooTest() {}\n}"
+
+        tests = runner.plan([source, source, "import org.junit.jupiter.api.Test;\nclass BarTest {}"],
+                            [path, path, "/repo/spark/src/test/java/spark/BarTest.java"])
+
+        assert [each.batch_path for each in tests] == [path, "/repo/spark/src/test/java/spark/FooTest_2.java", "/repo/spark/src/test/java/spark/BarTest.java"]
+        assert [each.class_fqn for each in tests] == ["spark.FooTest", "spark.FooTest_2", "spark.BarTest"]
+        assert tests[1].test_case == "package spark;\npublic class FooTest_2 {\n    public FooTest_2() {}\n}"
+        assert tests[1].test_case_path == path
+        assert [each.junit_version for each in tests] == [4, 4, 5]
+
+    def test_compile_errors_by_file(self):
+        from batch_runner import compile_errors_by_file
+
+        log = ("[ERROR] COMPILATION ERROR : \n"
+               "[ERROR] /p/src/test/java/spark/FooTest.java:[4,9] cannot find symbol\n"
+               "  symbol:   class List\n"
+               "  location: class spark.FooTest\n"
+               "[ERROR] /p/src/test/java/spark/BarTest.java:[2,1] class, interface, or enum expected\n"
+               "[INFO] 2 errors\n")
+
+        errors = compile_errors_by_file(log)
+
+        assert errors["/p/src/test/java/spark/FooTest.java"].splitlines()[1] == "  symbol:   class List"
+        assert list(errors) == ["/p/src/test/java/spark/FooTest.java", "/p/src/test/java/spark/BarTest.java"]
+
+
+class TestBatchRun:
+    def test_broken_test_is_isolated_and_the_rest_run_in_one_worker(self, tmp_path, runner_configs):
+        from batch_runner import BatchTestRunner
+
+        project = (tmp_path / "spark").as_posix()
+        foo_path = f"{project}/src/test/java/spark/FooTest.java"
+        bar_path = f"{project}/src/test/java/spark/BarTest.java"
+        compile_failure = f"[ERROR] COMPILATION ERROR : \n[ERROR] {bar_path}:[3,5] cannot find symbol\n  symbol:   class List\n[INFO] 1 error\n"
+        maven_calls = []
+        runner = _make_runner(tmp_path, runner_configs, [compile_failure, "[INFO] BUILD SUCCESS\n"], maven_calls)
+        worker = FakeWorker(failing=("spark.FooTest_2",))
+
+        tests = BatchTestRunner(runner, worker).run(project, ["class FooTest {}", "class BarTest { List l; }", "class FooTest {}"], [foo_path, bar_path, foo_path])
+
+        assert maven_calls == [["mvn", "clean", "test-compile", "-Dcheckstyle.skip=true"], ["mvn", "test-compile", "-Dcheckstyle.skip=true"]]
+        assert [each.compile_success for each in tests] == [True, False, True]
+        assert "symbol:   class List" in tests[1].compile_log
+        assert [each["class_name"] for each in worker.requests] == ["spark.FooTest", "spark.FooTest_2"]
+        assert worker.requests[0]["classpath"][-1] == "dep.jar"
+        assert tests[0].coverage_file.endswith("spark.FooTest.exec")
+        assert [each.execute_success for each in tests] == [True, False, False]
+        assert "Tests run: 1, Failures: 1" in tests[2].test_log
+        assert not any(os.path.exists(each.batch_path) for each in tests)
+
+    def test_coverage_is_read_by_the_worker(self, tmp_path, runner_configs, monkeypatch):
+        import batch_runner
+        from batch_runner import BatchTestRunner
+
+        monkeypatch.setattr(batch_runner, "find_jacoco_core", lambda _repository: ["org.jacoco.core.jar"])
+        project = (tmp_path / "spark").as_posix()
+        (tmp_path / "spark" / "target" / "classes" / "spark").mkdir(parents=True)
+        (tmp_path / "spark" / "target" / "classes" / "spark" / "Foo.class").write_bytes(b"")
+        (tmp_path / "spark" / "target" / "classes" / "spark" / "Foo$Inner.class").write_bytes(b"")
+        maven_calls = []
+        worker = FakeWorker()
+
+        tests = BatchTestRunner(_make_runner(tmp_path, runner_configs, ["[INFO] BUILD SUCCESS\n"], maven_calls), worker).run(
+            project, ["class FooTest {}"], [f"{project}/src/test/java/spark/FooTest.java"])
+
+        # the compilation is the only Maven run
+        assert len(maven_calls) == 1
+        coverage_request = worker.requests[1]
+        assert coverage_request["exec_files"] == [tests[0].coverage_file]
+        assert sorted(os.path.basename(each) for each in coverage_request["class_files"]) == ["Foo$Inner.class", "Foo.class"]
+        report = tests[0].coverage_report
+        assert report.source_files["spark/Foo.java"].covered_lines == [4]
+        assert report.source_files["spark/Foo.java"].uncovered_lines == [8]
+        assert report.classes_of("spark/Foo.java")[0].methods[0].to_cov_stat()["line_coverage"] == 100.0
+
+    def test_unattributable_compile_failure_fails_every_test(self, tmp_path, runner_configs):
+        from batch_runner import BatchTestRunner
+
+        project = (tmp_path / "spark").as_posix()
+        log = "[ERROR] COMPILATION ERROR : \n[ERROR] /p/src/main/java/spark/Foo.java:[1,1] error\n[INFO] 1 error\n"
+        worker = FakeWorker()
+
+        tests = BatchTestRunner(_make_runner(tmp_path, runner_configs, [log], []), worker).run(
+            project, ["class FooTest {}"], [f"{project}/src/test/java/spark/FooTest.java"])
+
+        assert not tests[0].compile_success
+        assert tests[0].compile_log == log
+        assert worker.requests == []
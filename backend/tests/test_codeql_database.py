@@ -0,0 +1,151 @@
+"""
+Tests for codeql_database.py, with a fake `codeql` executable that records its calls.
+"""
+
+import json
+import os
+import sys
+import time
+
+import pytest
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="the fake codeql is a script with a shebang")
+
+FAKE_CODEQL = """#!{python}
+import json, os, sys
+with open({log!r}, "a") as f:
+    f.write(json.dumps(sys.argv[1:]) + "\\n")
+if os.path.exists({fail!r}):
+    print("extraction failed")
+    sys.exit(2)
+os.makedirs(sys.argv[3], exist_ok=True)
+with open(os.path.join(sys.argv[3], "codeql-database.yml"), "w") as f:
+    f.write("primaryLanguage: java\\n")
+"""
+
+
+def _make_project(tmp_path):
+    source_dir = tmp_path / "spark" / "src" / "main" / "java" / "spark"
+    source_dir.mkdir(parents=True)
+    (source_dir / "Foo.java").write_text("class Foo {}")
+    (tmp_path / "spark" / "pom.xml").write_text("<project/>")
+    return (tmp_path / "spark").as_posix(), source_dir
+
+
+def _fake_codeql(tmp_path):
+    path = tmp_path / "codeql"
+    log = (tmp_path / "codeql.log").as_posix()
+    path.write_text(FAKE_CODEQL.format(python=sys.executable, log=log, fail=(tmp_path / "fail").as_posix()))
+    path.chmod(0o755)
+    return path.as_posix(), log
+
+
+def _calls(log):
+    if not os.path.exists(log):
+        return []
+    with open(log) as f:
+        return [json.loads(line) for line in f]
+
+
+def _wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+class TestCodeQLDatabase:
+    def test_database_is_created_once_and_reused_after_a_restart(self, tmp_path):
+        from codeql_database import CodeQLDatabase, source_fingerprint
+
+        project, _ = _make_project(tmp_path)
+        codeql, log = _fake_codeql(tmp_path)
+        databases_dir = (tmp_path / "databases").as_posix()
+
+        database = CodeQLDatabase(project, databases_dir, codeql, watch_interval=0)
+        events = []
+        database.subscribe(lambda status, info: events.append((status, info["state"], info["ready"])))
+        database.start()
+        try:
+            _wait_for(lambda: database.ready and database.state == "idle")
+        finally:
+            database.stop()
+
+        assert database.database_path == os.path.join(databases_dir, source_fingerprint(project))
+        assert os.path.exists(os.path.join(database.database_path, "codeql-database.yml"))
+        assert _calls(log) == [["database", "create", f"{database.database_path}.{os.getpid()}.tmp", "--language=java",
+                                f"--source-root={project}", "--overwrite", "--build-mode=none"]]
+        assert events == [("codeql", "building", False), ("codeql", "idle", True)]
+        assert 0 <= database.seconds_since_build() < 10
+
+        restarted = CodeQLDatabase(project, databases_dir, codeql, watch_interval=0)
+        restarted.start()
+        try:
+            _wait_for(lambda: restarted.ready)
+        finally:
+            restarted.stop()
+
+        assert len(_calls(log)) == 1
+        assert restarted.database_path == database.database_path
+        assert restarted.built_at == database.built_at
+
+    def test_changed_sources_create_a_new_database_in_the_background(self, tmp_path):
+        from codeql_database import CodeQLDatabase
+
+        project, source_dir = _make_project(tmp_path)
+        codeql, log = _fake_codeql(tmp_path)
+        databases_dir = (tmp_path / "databases").as_posix()
+
+        database = CodeQLDatabase(project, databases_dir, codeql, build_command="mvn -B compile", watch_interval=0.02)
+        database.start()
+        try:
+            _wait_for(lambda: database.ready and database.state == "idle")
+            first = database.database_path
+            time.sleep(0.1)
+            assert len(_calls(log)) == 1
+
+            # files CodeQL does not extract leave the database as it is
+            (tmp_path / "spark" / "README.md").write_text("readme")
+            time.sleep(0.1)
+            assert len(_calls(log)) == 1
+
+            (source_dir / "Bar.java").write_text("class Bar {}")
+            _wait_for(lambda: database.database_path != first and database.state == "idle")
+            second = database.database_path
+            assert _calls(log)[-1][-1] == "--command=mvn -B compile"
+
+            (source_dir / "Baz.java").write_text("class Baz {}")
+            _wait_for(lambda: database.database_path not in (first, second) and database.state == "idle")
+        finally:
+            database.stop()
+
+        # the current database and the one before it are kept
+        assert len(_calls(log)) == 3
+        assert sorted(os.listdir(databases_dir)) == sorted(os.path.basename(each) for each in (second, database.database_path))
+
+    def test_a_failed_build_keeps_the_current_database(self, tmp_path):
+        from codeql_database import CodeQLDatabase
+
+        project, source_dir = _make_project(tmp_path)
+        codeql, log = _fake_codeql(tmp_path)
+
+        database = CodeQLDatabase(project, (tmp_path / "databases").as_posix(), codeql, watch_interval=0.02)
+        database.start()
+        try:
+            _wait_for(lambda: database.ready and database.state == "idle")
+            first = database.database_path
+
+            (tmp_path / "fail").write_text("")
+            (source_dir / "Bar.java").write_text("class Bar {}")
+            _wait_for(lambda: database.state == "failed")
+            assert database.database_path == first
+            assert "extraction failed" in database.status()["error"]
+
+            # a refresh retries the build of the unchanged sources
+            os.remove(tmp_path / "fail")
+            database.refresh()
+            _wait_for(lambda: database.state == "idle" and database.database_path != first)
+        finally:
+            database.stop()
+
+        assert len(_calls(log)) == 3
@@ -0,0 +1,518 @@
+"""
+Tests for the javaparser analysis client of extension_api/collect_pairs/utils.py.
+"""
+import os
+
+
+class FakeWorker:
+    def __init__(self, fail=False):
+        self.requests = []
+        self.fail = fail
+        self.stopped = False
+
+    def request(self, payload, timeout, cancel_check=None):
+        from jvm_worker import JvmWorkerError
+
+        self.requests.append(payload)
+        if self.fail:
+            raise JvmWorkerError("The JVM worker exited while handling a request")
+        outputs = [f"{os.path.basename(each)}::::m() 3 5\r\n" for each in payload["files"]]
+        errors = ["java.lang.RuntimeException: unparsable\n" if each.endswith("Broken.java") else None for each in payload["files"]]
+        return {"outputs": outputs, "errors": errors}
+
+    def stop(self):
+        self.stopped = True
+
+
+class TestAnalysisClient:
+    def test_files_are_analyzed_in_one_request_and_kept(self, monkeypatch):
+        from extension_api.collect_pairs import utils
+
+        worker = FakeWorker()
+        client = utils.AnalysisClient(worker)
+        one_shot = []
+        monkeypatch.setattr(utils, "run_result_lines", lambda args: one_shot.append(args) or ["fallback"])
+
+        outputs = client.analyze("tool.jar", ["/p/A.java", "/p/B.java", "/p/Broken.java"])
+
+        assert outputs["/p/A.java"] == ["A.java::::m() 3 5"]
+        assert outputs["/p/Broken.java"] == ["fallback"]
+        assert one_shot == [["java", "-jar", os.path.abspath("tool.jar"), "/p/Broken.java"]]
+        assert client.result_lines("tool.jar", "/p/B.java") == ["B.java::::m() 3 5"]
+        assert len(worker.requests) == 1
+        assert worker.requests[0]["jar"] == os.path.abspath("tool.jar")
+
+        client.close()
+        assert worker.stopped
+
+    def test_failing_worker_is_given_up(self, monkeypatch):
+        from extension_api.collect_pairs import utils
+
+        worker = FakeWorker(fail=True)
+        client = utils.AnalysisClient(worker)
+        monkeypatch.setattr(utils, "run_result_lines", lambda args: ["fallback"])
+
+        for i in range(5):
+            assert client.result_lines("tool.jar", f"/p/T{i}.java") == ["fallback"]
+
+        assert len(worker.requests) == client.max_failures
+        assert not client.enabled
+
+    def test_get_method_lines_goes_through_the_client(self, monkeypatch):
+        from extension_api.collect_pairs import utils
+
+        monkeypatch.setattr(utils, "_analysis_client", utils.AnalysisClient(FakeWorker(), in_process=False))
+
+        method_lines, reverse = utils.get_method_lines("/p/Foo.java")
+
+        assert method_lines == {"Foo.java::::m()": (3, 5)}
+        assert reverse[4] == "Foo.java::::m()"
+
+
+def _make_repo(tmp_path, names):
+    for name in names:
+        focal = tmp_path / "spark" / "src" / "main" / "java" / "spark" / f"{name}.java"
+        test = tmp_path / "spark" / "src" / "test" / "java" / "spark" / f"{name}Test.java"
+        focal.parent.mkdir(parents=True, exist_ok=True)
+        test.parent.mkdir(parents=True, exist_ok=True)
+        focal.write_text(f"class {name} {{}}")
+        test.write_text(f"class {name}Test {{}}")
+    return (tmp_path / "spark").as_posix()
+
+
+class TestIncrementalCollectPairs:
+    def _collector(self, monkeypatch):
+        monkeypatch.chdir(os.getcwd())
+        from extension_api.collect_pairs import main, utils
+
+        analyzed = []
+
+        def collect_file_pairs(root, full_focal_path, full_test_path, *_args, **_kwargs):
+            analyzed.append(os.path.basename(full_focal_path))
+            return [{"focal_path": full_focal_path, "test_path": full_test_path}]
+
+        monkeypatch.setattr(main, "collect_file_pairs", collect_file_pairs)
+        monkeypatch.setattr(utils, "_analysis_client", utils.AnalysisClient(FakeWorker()))
+        return main, analyzed
+
+    def _write(self, main, repo, tmp_path, **kwargs):
+        from corpus_store import iter_corpus
+
+        corpus = (tmp_path / "spark.jsonl").as_posix()
+        main.write_collect_pairs(repo, corpus, (tmp_path / "spark.manifest.json").as_posix(), **kwargs)
+        return list(iter_corpus(corpus))
+
+    def test_only_changed_files_are_analyzed_again(self, tmp_path, monkeypatch):
+        import json
+
+        main, analyzed = self._collector(monkeypatch)
+        repo = _make_repo(tmp_path, ["Foo", "Bar", "Baz"])
+
+        first = self._write(main, repo, tmp_path)
+        assert sorted(analyzed) == ["Bar.java", "Baz.java", "Foo.java"]
+        # the manifest points into the corpus instead of holding the pairs again
+        with open(tmp_path / "spark.manifest.json") as f:
+            assert all(sorted(each) == ["count", "hashes", "start"] for each in json.load(f)["files"].values())
+
+        analyzed.clear()
+        (tmp_path / "spark" / "src" / "test" / "java" / "spark" / "BarTest.java").write_text("class BarTest { int x; }")
+        os.remove(tmp_path / "spark" / "src" / "test" / "java" / "spark" / "BazTest.java")
+        second = self._write(main, repo, tmp_path)
+
+        assert analyzed == ["Bar.java"]
+        assert second == [each for each in first if "Baz" not in each["focal_path"]]
+
+        analyzed.clear()
+        assert self._write(main, repo, tmp_path) == second
+        assert analyzed == []
+
+    def test_a_replaced_corpus_is_analyzed_again(self, tmp_path, monkeypatch):
+        main, analyzed = self._collector(monkeypatch)
+        repo = _make_repo(tmp_path, ["Foo", "Bar"])
+
+        first = self._write(main, repo, tmp_path)
+        with open(tmp_path / "spark.jsonl", "a") as f:
+            f.write('{"focal_path": "elsewhere"}\n')
+
+        assert self._write(main, repo, tmp_path) == first
+        assert len(analyzed) == 4
+
+    def test_a_project_without_pairs_writes_an_empty_corpus(self, tmp_path, monkeypatch):
+        main, analyzed = self._collector(monkeypatch)
+        repo = _make_repo(tmp_path, ["Foo"])
+        os.remove(tmp_path / "spark" / "src" / "test" / "java" / "spark" / "FooTest.java")
+
+        for _ in range(2):
+            assert self._write(main, repo, tmp_path) == []
+        assert analyzed == []
+
+    def test_dynamic_analysis_does_not_reuse_static_pairs(self, tmp_path, monkeypatch):
+        main, analyzed = self._collector(monkeypatch)
+        repo = _make_repo(tmp_path, ["Foo"])
+        monkeypatch.setattr(main.utils, "maven_mode_args", lambda *_args: [])
+        monkeypatch.setattr(main, "collect_coverage", lambda *_args: {})
+
+        self._write(main, repo, tmp_path)
+        self._write(main, repo, tmp_path, do_dynamic_analysis=True)
+
+        assert analyzed == ["Foo.java", "Foo.java"]
+
+    def test_progress_counts_the_analyzed_files(self, tmp_path, monkeypatch):
+        main, _ = self._collector(monkeypatch)
+        monkeypatch.setattr(main, "CHUNK_SIZE", 2)
+        repo = _make_repo(tmp_path, ["Foo", "Bar", "Baz"])
+        progress = []
+
+        main.collect_pairs(repo, progress=lambda done, total: progress.append((done, total)))
+
+        assert progress == [(0, 6), (4, 6), (6, 6)]
+
+    def test_worker_processes_are_spawned(self, tmp_path, monkeypatch):
+        main, analyzed = self._collector(monkeypatch)
+        monkeypatch.setattr(main, "CHUNK_SIZE", 1)
+        repo = _make_repo(tmp_path, ["Foo", "Bar"])
+        contexts = []
+
+        class FakeExecutor:
+            def __init__(self, max_workers, mp_context=None):
+                contexts.append(mp_context.get_start_method())
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *_args):
+                return False
+
+            def map(self, function, *iterables):
+                return map(function, *iterables)
+
+        monkeypatch.setattr(main, "ProcessPoolExecutor", FakeExecutor)
+
+        pairs = main.collect_pairs(repo, workers=2)
+
+        assert contexts == ["spawn"]
+        assert len(pairs) == 2 and sorted(analyzed) == ["Bar.java", "Foo.java"]
+
+
+class FakeSuiteWorker:
+    def __init__(self, failing_class=None):
+        self.requests = []
+        self.failing_class = failing_class
+
+    def request(self, payload, timeout, cancel_check=None):
+        self.requests.append(payload)
+        if payload["type"] == "run":
+            if payload["class_name"] == self.failing_class:
+                return {"error": "java.lang.ClassNotFoundException: " + payload["class_name"]}
+            return {"run": len(payload["methods"]), "failures": 0, "errors": 0, "skipped": 0, "output": "",
+                    "coverage_files": {each: f'{payload["coverage_dir"]}/{payload["class_name"]}#{each}.exec' for each in payload["methods"]}}
+        return {"coverage": [{"spark/Foo.java": {"covered": [3, 4], "uncovered": [7]}} for _ in payload["exec_files"]]}
+
+
+class TestSuiteCoverage:
+    def _project(self, tmp_path, monkeypatch, names):
+        import subprocess
+
+        from extension_api.collect_pairs import utils
+
+        repo = _make_repo(tmp_path, names)
+        for name in names:
+            classes = tmp_path / "spark" / "target" / "classes" / "spark"
+            classes.mkdir(parents=True, exist_ok=True)
+            (classes / f"{name}.class").write_bytes(b"")
+            (classes / f"{name}$Inner.class").write_bytes(b"")
+        builds = []
+        monkeypatch.setattr(utils, "find_jacoco_agent", lambda _repository: "/m2/jacocoagent.jar")
+        monkeypatch.setattr(utils, "find_jacoco_core", lambda _repository: ["/m2/org.jacoco.core.jar", "/m2/asm.jar"])
+        monkeypatch.setattr(utils, "resolve_test_classpath", lambda *_args: ["/m2/junit.jar"])
+        monkeypatch.setattr(utils.subprocess, "run", lambda args, **_kwargs: builds.append(args) or subprocess.CompletedProcess(args, 0, "[INFO] BUILD SUCCESS\n"))
+        return utils, repo, builds
+
+    def test_one_build_and_one_run_for_all_test_methods(self, tmp_path, monkeypatch):
+        utils, repo, builds = self._project(tmp_path, monkeypatch, ["Foo", "Bar"])
+        worker = FakeSuiteWorker()
+        test_methods = {f"{repo}/src/test/java/spark/FooTest.java": ["testA", "testB"], f"{repo}/src/test/java/spark/BarTest.java": ["testC"]}
+
+        coverage = utils.collect_suite_coverage(repo, test_methods, worker=worker)
+
+        assert builds == [["mvn", "clean", "test-compile", "-Dcheckstyle.skip=true"]]
+        assert coverage[("spark.FooTest", "testB")] == {"spark/Foo.java": ([3, 4], [7])}
+        assert sorted(coverage) == [("spark.BarTest", "testC"), ("spark.FooTest", "testA"), ("spark.FooTest", "testB")]
+        run, analysis = worker.requests[:2]
+        assert run["methods"] == ["testA", "testB"] and run["classpath"][-1] == "/m2/junit.jar"
+        assert analysis["exec_files"] == [f'{run["coverage_dir"]}/spark.FooTest#testA.exec', f'{run["coverage_dir"]}/spark.FooTest#testB.exec']
+        assert sorted(os.path.basename(each) for each in analysis["class_files"]) == ["Foo$Inner.class", "Foo.class"]
+
+    def test_a_test_class_that_cannot_run_is_left_out(self, tmp_path, monkeypatch):
+        utils, repo, _ = self._project(tmp_path, monkeypatch, ["Foo", "Bar"])
+        test_methods = {f"{repo}/src/test/java/spark/FooTest.java": ["testA"], f"{repo}/src/test/java/spark/BarTest.java": ["testC"]}
+
+        coverage = utils.collect_suite_coverage(repo, test_methods, worker=FakeSuiteWorker(failing_class="spark.FooTest"))
+
+        assert list(coverage) == [("spark.BarTest", "testC")]
+
+
+# the "<DELETE>"-prefix implementation the line mask replaced, kept as the golden reference
+def _legacy_annotate_deleted_classes(class_content, unused_classes_lines):
+    deleted_lines = []
+    for start, end in unused_classes_lines:
+        del_lines = range(start - 1, end)
+        deleted_lines.extend(del_lines)
+    
+    class_content_copy = class_content.copy()
+
+    for line in deleted_lines:
+        class_content_copy[line] = "<DELETE>" + class_content_copy[line]
+    
+    return class_content_copy
+
+def _legacy_delete_irrelevant_methods_and_comments(class_content, irrelevant_methods, foc_method_lines_dic, comment_lines, is_test = False, delete_all_comments = True):
+    deleted_lines = []
+    for method in irrelevant_methods:
+        # print(foc_method_lines_dic, method)
+        if method not in foc_method_lines_dic:
+            continue
+        del_lines = range(foc_method_lines_dic[method][0] - 1, foc_method_lines_dic[method][1])
+        deleted_lines.extend(del_lines)
+    
+    class_content_copy = class_content.copy()
+
+    for line in deleted_lines:
+        class_content_copy[line] = "<DELETE>" + class_content_copy[line]
+    
+    if not is_test and not delete_all_comments:
+        # For consecutive comment lines (can just be 1 line), delete all of them if the next line has been annotated <DELETE>
+        i = 0
+        while i < len(class_content_copy) - 1:
+            if class_content_copy[i].startswith("<DELETE>") and i in comment_lines:
+                j = i
+                while j >= 1 and j in comment_lines:
+                    class_content_copy[j - 1] = "<DELETE>" + class_content_copy[j - 1]
+                    j -= 1
+            i += 1
+
+        # Delete comments if there is any non ascii characters inside
+        i = 0
+        while i < len(class_content_copy) - 1:
+            j = i
+            if i in comment_lines and (not class_content_copy[i - 1].isascii() or "Copyright" in class_content_copy[i - 1] or "copyright" in class_content_copy[i - 1]):
+                j = i - 1
+                while j > 0 and j in comment_lines:
+                    class_content_copy[j - 1] = "<DELETE>" + class_content_copy[j - 1]
+                    j -= 1
+                j = i
+                while j < len(class_content_copy) and j in comment_lines:
+                    class_content_copy[j - 1] = "<DELETE>" + class_content_copy[j - 1]
+                    j += 1
+            if i == j:
+                i += 1
+            else:
+                i = j
+    else:
+        # delete all comments
+        i = 0
+        while i < len(class_content_copy) + 1:
+            if i in comment_lines:
+                class_content_copy[i - 1] = "<DELETE>" + class_content_copy[i - 1]
+            i += 1
+
+    if is_test:
+        # Delete test annotations (defined as block comments that contains @author)
+        i = 0
+        while i < len(class_content_copy) - 1:
+            j = i
+            if i in comment_lines and "@author" in class_content_copy[i - 1]:
+                j = i - 1
+                while j > 0 and j in comment_lines:
+                    class_content_copy[j - 1] = "<DELETE>" + class_content_copy[j - 1]
+                    j -= 1
+                j = i
+                while j < len(class_content_copy) and j in comment_lines:
+                    class_content_copy[j - 1] = "<DELETE>" + class_content_copy[j - 1]
+                    j += 1
+            if i == j:
+                i += 1
+            else:
+                i = j
+
+    # now actually delete
+    i = 0
+    while i < len(class_content_copy):
+        if class_content_copy[i].startswith("<DELETE>"):
+            del class_content_copy[i]
+        else:
+            i += 1
+
+    return class_content_copy
+
+def _legacy_delete_consecutive_empty_lines(class_content):
+    i = 0
+    while i < len(class_content) - 1:
+        if class_content[i].strip() == "" and class_content[i + 1].strip() == "":
+            del class_content[i]
+        else:
+            i += 1
+            
+    return class_content
+
+
+def _sanitize(module, lines, unused_classes_lines, irrelevant_methods, method_lines, comment_lines, is_test, delete_all_comments):
+    annotate, delete, compact = module
+    try:
+        content = annotate(list(lines), unused_classes_lines)
+        content = delete(content, irrelevant_methods, method_lines, list(comment_lines), is_test, delete_all_comments)
+        return compact(content)
+    except IndexError:
+        return IndexError
+
+
+class TestLineMask:
+    LEGACY = (_legacy_annotate_deleted_classes, _legacy_delete_irrelevant_methods_and_comments, _legacy_delete_consecutive_empty_lines)
+
+    def _current(self):
+        from extension_api.collect_pairs import utils
+
+        return utils.annotate_deleted_classes, utils.delete_irrelevant_methods_and_comments, utils.delete_consecutive_empty_lines
+
+    def test_same_output_as_the_legacy_implementation_on_a_real_file(self):
+        from java_syntax import tokenize
+
+        path = os.path.join(os.path.dirname(__file__), "..", "java", "TestWorker.java")
+        with open(path, encoding="utf-8") as f:
+            source = f.read()
+        lines = source.splitlines(keepends=True)
+        comment_lines = sorted({token.line + k for token in tokenize(source, keep_comments=True) if token.kind.endswith("comment")
+                                for k in range(token.text.count("\n") + 1)})
+        method_lines = {}
+        for nr, line in enumerate(lines, 1):
+            if line.startswith("    private static ") and line.rstrip().endswith("{"):
+                end = next(k for k in range(nr, len(lines)) if lines[k].startswith("    }"))
+                method_lines[line.split("(")[0].split()[-1]] = (nr, end + 1)
+        irrelevant = list(method_lines)[::2]
+
+        for is_test in (True, False):
+            for delete_all_comments in (True, False):
+                args = (lines, [[1, 3]], irrelevant, method_lines, comment_lines, is_test, delete_all_comments)
+                assert _sanitize(self._current(), *args) == _sanitize(self.LEGACY, *args)
+
+    def test_same_output_as_the_legacy_implementation_on_random_files(self):
+        import random
+
+        rng = random.Random(43)
+        pool = ["", "   ", "  // c", " * @author x", "/* Copyright */", "int x;", "  void m() {", "  }", "\u00e9 \u00fc", "<DELETE>x", "@Test"]
+        for _ in range(3000):
+            n = rng.randint(0, 25)
+            lines = [rng.choice(pool) + "\n" for _ in range(n)]
+            comment_lines = rng.sample(range(0, n + 3), k=rng.randint(0, min(n + 3, 12)))
+            starts = [rng.randint(1, n) for _ in range(3)] if n else []
+            method_lines = {f"m{k}": (start, rng.randint(start, n)) for k, start in enumerate(starts)}
+            irrelevant = rng.sample(list(method_lines) + ["missing"], k=rng.randint(0, len(method_lines)))
+            unused = [[start, rng.randint(start, n)] for start in ([rng.randint(1, n)] if n else [])]
+            args = (lines, unused, irrelevant, method_lines, comment_lines, rng.random() < 0.5, rng.random() < 0.5)
+            assert _sanitize(self._current(), *args) == _sanitize(self.LEGACY, *args), args
+
+    def test_consecutive_empty_lines_keep_the_last(self):
+        from extension_api.collect_pairs.utils import delete_consecutive_empty_lines
+
+        content = ["a\n", "\n", " \n", "\n", "b\n", "\n", "\n"]
+        assert delete_consecutive_empty_lines(content) == ["a\n", "\n", "b\n", "\n"]
+        assert content == ["a\n", "\n", "b\n", "\n"]
+
+
+SAMPLE_JAVA = """package org.example;
+
+import java.util.List;
+
+/**
+ * A sample class.
+ */
+public class Sample<T> {
+    private int count; // not a comment line
+
+    public Sample() {
+        reset();
+    }
+
+    // adds the items
+    public <E extends T> int add(List<E> items, String... names) {
+        count += items.size();
+        reset();
+        this.log("added");
+        Sample.helper(count);
+        return count;
+    }
+
+    private void reset() {
+        new Runnable() {
+            public void run() {
+                log("anonymous");
+            }
+        }.run();
+    }
+
+    void log(String message) {
+        /* block
+           comment */
+        System.out.println(message);
+    }
+
+    static int helper(int value) {
+        return value;
+    }
+}
+"""
+
+
+class TestJavaExtractor:
+    def _write(self, tmp_path):
+        path = tmp_path / "Sample.java"
+        path.write_text(SAMPLE_JAVA)
+        return str(path)
+
+    def test_method_lines(self, tmp_path):
+        from extension_api.collect_pairs import java_extractor
+
+        path = self._write(tmp_path)
+
+        assert java_extractor.method_lines_output(path) == [
+            "Sample::::add(List, String[]) 16 22",
+            "Sample::::reset() 24 30",
+            "Sample::::log(String) 32 36",
+            "Sample::::helper(int) 38 40",
+        ]
+        assert java_extractor.method_lines_output(path, new_version=False)[0] == "Sample::::add 16 22"
+
+    def test_comment_lines(self, tmp_path):
+        from extension_api.collect_pairs import java_extractor
+
+        assert java_extractor.comment_lines_output(self._write(tmp_path)) == ["5", "6", "7", "15", "33", "34"]
+
+    def test_method_calls_keep_the_calls_into_the_same_class(self, tmp_path):
+        from extension_api.collect_pairs import java_extractor
+
+        calls = java_extractor.method_calls_output(self._write(tmp_path))
+
+        assert "Sample::::add(List, String[])////Sample::::reset()----Sample::::log(String)----Sample::::helper(int)----" in calls
+        assert not any("println" in each or "size" in each for each in calls)
+
+    def test_client_runs_the_extractor_without_the_worker(self, tmp_path, monkeypatch):
+        from extension_api.collect_pairs import utils
+
+        path = self._write(tmp_path)
+        worker = FakeWorker()
+        monkeypatch.setattr(utils, "run_result_lines", lambda args: ["one shot"])
+        client = utils.AnalysisClient(worker, in_process=True)
+
+        assert client.result_lines(utils.method_lines_jar_path_new, path)[0] == "Sample::::add(List, String[]) 16 22"
+        assert worker.requests == []
+
+    def test_client_runs_the_jar_by_default(self, tmp_path, monkeypatch):
+        from extension_api.collect_pairs import utils
+
+        path = self._write(tmp_path)
+        worker = FakeWorker()
+        monkeypatch.setattr(utils, "run_result_lines", lambda args: ["one shot"])
+        client = utils.AnalysisClient(worker)
+
+        client.result_lines(utils.method_lines_jar_path_new, path)
+        assert worker.requests[0]["jar"] == os.path.abspath(utils.method_lines_jar_path_new)
@@ -0,0 +1,147 @@
+"""
+Tests for compile_repair.py local import/package repair.
+"""
+import zipfile
+
+
+MAVEN_LOG = """[ERROR] COMPILATION ERROR :
+[ERROR] /ws/spark/src/test/java/spark/utils/FooTest.java:[9,9] cannot find symbol
+  symbol:   class ArrayList
+  location: class spark.utils.FooTest
+[ERROR] /ws/spark/src/test/java/spark/utils/FooTest.java:[10,9] cannot find symbol
+  symbol:   method assertEquals(int,int)
+  location: class spark.utils.FooTest
+[ERROR] /ws/spark/src/test/java/spark/utils/FooTest.java:[11,9] cannot find symbol
+  symbol:   class Mystery
+  location: class spark.utils.FooTest
+"""
+
+TEST_CASE = """package spark.utils;
+
+import org.junit.Test;
+
+public class FooTest {
+    @Test
+    public void testFoo() {
+        Foo foo = new Foo();
+        ArrayList<String> list = new ArrayList<>();
+        assertEquals(0, list.size());
+        Mystery m = null;
+    }
+}"""
+
+
+def _make_project(tmp_path):
+    main_dir = tmp_path / "spark" / "src" / "main" / "java" / "spark" / "utils"
+    main_dir.mkdir(parents=True)
+    (main_dir / "Foo.java").write_text("package spark.utils;\npublic class Foo {}\n")
+    (tmp_path / "spark" / "src" / "test" / "java" / "spark" / "utils").mkdir(parents=True)
+    return (tmp_path / "spark").as_posix()
+
+
+class TestParseCompileErrors:
+    def test_parse_maven_format(self):
+        from compile_repair import parse_compile_errors
+
+        diagnostics = parse_compile_errors(MAVEN_LOG)
+
+        assert len(diagnostics) == 3
+        assert diagnostics[0].line == 9
+        assert diagnostics[0].symbol_kind == "class"
+        assert diagnostics[0].symbol_name == "ArrayList"
+        assert diagnostics[1].symbol_kind == "method"
+        assert diagnostics[1].symbol_name == "assertEquals"
+
+    def test_parse_javac_format(self):
+        from compile_repair import parse_compile_errors
+
+        log = "/p/FooTest.java:4: error: cannot find symbol\n        List<String> l;\n        ^\n  symbol:   class List\n"
+        diagnostics = parse_compile_errors(log)
+
+        assert len(diagnostics) == 1
+        assert diagnostics[0].line == 4
+        assert diagnostics[0].symbol_name == "List"
+
+
+class TestClassIndex:
+    def test_project_sources_and_jars(self, tmp_path):
+        from compile_repair import ClassIndex
+
+        project_dir = _make_project(tmp_path)
+        jar_path = tmp_path / "dep.jar"
+        with zipfile.ZipFile(jar_path, "w") as jar:
+            jar.writestr("org/mockito/Mockito.class", b"")
+            jar.writestr("org/mockito/Mockito$Inner.class", b"")
+
+        index = ClassIndex.build(project_dir, [jar_path.as_posix()])
+
+        assert index.lookup("Foo") == "spark.utils"
+        assert index.lookup("List") == "java.util"
+        assert index.has_class("org.mockito.Mockito")
+        assert index.lookup("Inner") is None
+
+    def test_ambiguous_name_prefers_nearest_package(self):
+        from compile_repair import ClassIndex, TIER_JAR
+
+        index = ClassIndex()
+        index.add("Parser", "com.a.core", TIER_JAR)
+        index.add("Parser", "org.other", TIER_JAR)
+
+        assert index.lookup("Parser", "com.a.tests") == "com.a.core"
+        assert index.lookup("Parser", "net.x") is None
+
+
+class TestRepairTestCase:
+    def test_adds_missing_imports(self, tmp_path):
+        from compile_repair import ClassIndex, repair_test_case
+
+        project_dir = _make_project(tmp_path)
+        index = ClassIndex.build(project_dir)
+        test_path = f"{project_dir}/src/test/java/spark/utils/FooTest.java"
+
+        result = repair_test_case(TEST_CASE, MAVEN_LOG, test_path, index, 4)
+
+        assert result.changed
+        assert "import java.util.ArrayList;" in result.test_case
+        assert "import static org.junit.Assert.assertEquals;" in result.test_case
+        assert [d.symbol_name for d in result.unresolved] == ["Mystery"]
+        # imports are appended after the existing ones
+        lines = result.test_case.split("\n")
+        assert lines.index("import java.util.ArrayList;") > lines.index("import org.junit.Test;")
+
+    def test_fixes_package_declaration(self, tmp_path):
+        from compile_repair import ClassIndex, repair_test_case
+
+        project_dir = _make_project(tmp_path)
+        test_path = f"{project_dir}/src/test/java/spark/utils/FooTest.java"
+        test_case = TEST_CASE.replace("package spark.utils;", "package spark;")
+
+        result = repair_test_case(test_case, "", test_path, ClassIndex.build(project_dir), 4)
+
+        assert result.test_case.startswith("package spark.utils;")
+        assert result.fixes == ["package spark -> spark.utils"]
+
+    def test_rewrites_wrong_import(self, tmp_path):
+        from compile_repair import ClassIndex, repair_test_case
+
+        project_dir = _make_project(tmp_path)
+        test_path = f"{project_dir}/src/test/java/spark/utils/FooTest.java"
+        test_case = TEST_CASE.replace("import org.junit.Test;", "import org.junit.Test;\nimport spark.Foo;")
+        log = f"[ERROR] {test_path}:[4,13] cannot find symbol\n  symbol:   class Foo\n  location: package spark\n"
+
+        result = repair_test_case(test_case, log, test_path, ClassIndex.build(project_dir), 4)
+
+        assert "import spark.utils.Foo;" in result.test_case
+        assert "import spark.Foo;" not in result.test_case
+
+    def test_junit5_types(self, tmp_path):
+        from compile_repair import ClassIndex, repair_test_case
+
+        project_dir = _make_project(tmp_path)
+        test_path = f"{project_dir}/src/test/java/spark/utils/FooTest.java"
+        test_case = "package spark.utils;\n\npublic class FooTest {\n    @Test\n    void t() {}\n}"
+        log = f"[ERROR] {test_path}:[4,6] cannot find symbol\n  symbol:   class Test\n"
+
+        result = repair_test_case(test_case, log, test_path, ClassIndex.build(project_dir), 5)
+
+        assert "import org.junit.jupiter.api.Test;" in result.test_case
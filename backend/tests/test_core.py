@@ -70,6 +70,18 @@ class TestModelQuerySession:
         assert parsed["data"]["status"] == "finish"
         assert parsed["data"]["message"]["session_id"] == "sess-3"
 
+    def test_write_status_message(self):
+        from modules.session import ModelQuerySession
+
+        writer = DummyWriter()
+        session = ModelQuerySession("sess-5", _minimal_raw_data(), writer, lambda *_: None, 4)
+        session.write_status_message("queued", {"position": 2})
+
+        parsed = json.loads(writer.written[0].decode("utf-8"))
+        assert parsed["type"] == "status"
+        assert parsed["data"]["status"] == "queued"
+        assert parsed["data"]["message"] == {"session_id": "sess-5", "position": 2}
+
     def test_update_messages(self):
         from modules.session import ModelQuerySession
 
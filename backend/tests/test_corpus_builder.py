@@ -0,0 +1,114 @@
+"""
+Tests for corpus_builder.py background and watch-driven corpus building.
+"""
+
+import json
+import os
+import threading
+import time
+
+
+def _make_project(tmp_path):
+    test_dir = tmp_path / "spark" / "src" / "test" / "java" / "spark"
+    test_dir.mkdir(parents=True)
+    (test_dir / "FooTest.java").write_text("class FooTest {}")
+    return (tmp_path / "spark").as_posix(), test_dir
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+class TestCorpusBuilder:
+    def test_builds_in_the_background_and_reports_progress(self, tmp_path):
+        from corpus_builder import CorpusBuilder
+
+        project, _ = _make_project(tmp_path)
+        corpus_path = (tmp_path / "spark.json").as_posix()
+        release = threading.Event()
+
+        def build(project_path, progress):
+            progress(0, 2)
+            release.wait(5)
+            progress(2, 2)
+            with open(corpus_path, "w") as f:
+                json.dump([{"test_path": project_path}], f)
+
+        builder = CorpusBuilder(project, corpus_path, build, watch_interval=0)
+        events = []
+        builder.subscribe(lambda status, info: events.append((status, info["state"], info["analyzed_files"])))
+        builder.start()
+        try:
+            _wait_for(lambda: builder.progress == (0, 2))
+            # a request arriving now is served without references instead of waiting for the build
+            assert not builder.ready and builder.state == "building"
+            release.set()
+            _wait_for(lambda: builder.ready and builder.state == "idle")
+        finally:
+            builder.stop()
+
+        assert events == [("corpus", "building", 0), ("corpus", "building", 0), ("corpus", "building", 2), ("corpus", "idle", 2)]
+
+    def test_changed_tests_rebuild_the_corpus(self, tmp_path):
+        from corpus_builder import CorpusBuilder
+
+        project, test_dir = _make_project(tmp_path)
+        builds = []
+        builder = CorpusBuilder(project, (tmp_path / "spark.json").as_posix(), lambda project_path, progress: builds.append(project_path), watch_interval=0.02)
+        builder.start()
+        try:
+            _wait_for(lambda: len(builds) == 1)
+            time.sleep(0.1)
+            assert len(builds) == 1
+
+            (test_dir / "BarTest.java").write_text("class BarTest {}")
+            _wait_for(lambda: len(builds) == 2)
+            # sources outside src/test/java are not watched
+            (tmp_path / "spark" / "README.md").write_text("readme")
+            time.sleep(0.1)
+            assert len(builds) == 2
+        finally:
+            builder.stop()
+
+    def test_a_failed_build_is_reported(self, tmp_path):
+        from corpus_builder import CorpusBuilder
+
+        project, _ = _make_project(tmp_path)
+
+        def build(project_path, progress):
+            raise AssertionError("javaparser failed")
+
+        builder = CorpusBuilder(project, (tmp_path / "spark.json").as_posix(), build, watch_interval=0)
+        builder.start()
+        try:
+            _wait_for(lambda: builder.state == "failed")
+        finally:
+            builder.stop()
+
+        assert builder.status() == {"state": "failed", "ready": False, "analyzed_files": 0, "total_files": 0, "pairs": None, "error": "javaparser failed"}
+
+    def test_a_project_without_pairs_is_empty_not_failed(self, tmp_path):
+        from corpus_builder import CorpusBuilder
+
+        project, _ = _make_project(tmp_path)
+        corpus_path = tmp_path / "spark.jsonl"
+        builds = []
+
+        def build(project_path, progress):
+            builds.append(project_path)
+            corpus_path.write_text("")
+            return 0
+
+        builder = CorpusBuilder(project, corpus_path.as_posix(), build, watch_interval=0.02)
+        builder.start()
+        try:
+            _wait_for(lambda: builder.state == "empty")
+            time.sleep(0.1)
+        finally:
+            builder.stop()
+
+        assert len(builds) == 1
+        assert builder.status() == {"state": "empty", "ready": True, "analyzed_files": 0, "total_files": 0, "pairs": 0}
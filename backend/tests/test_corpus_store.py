@@ -0,0 +1,154 @@
+"""
+Tests for corpus_store.py JSONL corpus writing, lazy reading and the focal method index.
+"""
+
+import json
+import os
+
+import pytest
+
+
+def _pairs():
+    return [
+        {"focal_method_name": "Foo::::bar(int)", "test_name": "FooTest::::testBar()", "focal_method": ["int bar(int x) {}"]},
+        {"focal_method_name": "Foo::::baz()", "test_name": "FooTest::::testBaz()", "focal_method": ["void baz() {}"]},
+        {"focal_method_name": "Foo::::bar(String)", "test_name": "FooTest::::testBarString()", "focal_method": ["int bar(String s) {}"]},
+    ]
+
+
+class TestCorpusStore:
+    def test_pairs_are_written_one_per_line_as_they_come(self, tmp_path):
+        from corpus_store import iter_corpus, write_corpus
+
+        corpus_path = (tmp_path / "spark.jsonl").as_posix()
+        consumed = []
+
+        def pairs():
+            for pair in _pairs():
+                consumed.append(pair)
+                yield pair
+
+        assert write_corpus(corpus_path, pairs()) == 3
+        assert len(consumed) == 3
+        with open(corpus_path) as f:
+            assert [json.loads(line) for line in f] == _pairs()
+        assert list(iter_corpus(corpus_path)) == _pairs()
+
+    def test_the_index_finds_overloads_without_scanning(self, tmp_path, monkeypatch):
+        import corpus_store
+
+        corpus_path = (tmp_path / "spark.jsonl").as_posix()
+        corpus_store.write_corpus(corpus_path, _pairs())
+        assert os.path.exists(tmp_path / "spark.index.json")
+        monkeypatch.setattr(corpus_store, "iter_corpus", lambda path: pytest.fail("the corpus was scanned"))
+
+        found = list(corpus_store.find_pairs(corpus_path, "Foo::::bar(long)"))
+
+        assert [position for position, _ in found] == [0, 2]
+        assert [pair["test_name"] for _, pair in found] == ["FooTest::::testBar()", "FooTest::::testBarString()"]
+        assert corpus_store.corpus_size(corpus_path) == 3
+
+    def test_a_stale_index_is_ignored(self, tmp_path):
+        from corpus_store import find_pairs, load_index, write_corpus
+
+        corpus_path = (tmp_path / "spark.jsonl").as_posix()
+        write_corpus(corpus_path, _pairs())
+        with open(corpus_path, "a") as f:
+            f.write(json.dumps({"focal_method_name": "Foo::::baz()", "test_name": "FooTest::::testBazAgain()"}) + "\n")
+
+        assert load_index(corpus_path) is None
+        assert [position for position, _ in find_pairs(corpus_path, "Foo::::baz()")] == [1, 3]
+
+    def test_legacy_json_corpus_is_detected(self, tmp_path):
+        from corpus_store import corpus_size, find_pairs, is_legacy_corpus, iter_corpus
+
+        corpus_path = (tmp_path / "spark.json").as_posix()
+        with open(corpus_path, "w") as f:
+            f.write("\n  ")
+            json.dump(_pairs(), f, indent=4)
+
+        assert is_legacy_corpus(corpus_path)
+        assert list(iter_corpus(corpus_path)) == _pairs()
+        assert corpus_size(corpus_path) == 3
+        assert [position for position, _ in find_pairs(corpus_path, "Foo::::baz")] == [1]
+
+    def test_no_pairs_keep_the_previous_corpus(self, tmp_path):
+        from corpus_store import iter_corpus, write_corpus
+
+        corpus_path = (tmp_path / "spark.jsonl").as_posix()
+        write_corpus(corpus_path, _pairs())
+
+        with pytest.raises(ValueError):
+            write_corpus(corpus_path, iter([]), allow_empty=False)
+
+        assert list(iter_corpus(corpus_path)) == _pairs()
+        assert sorted(os.listdir(tmp_path)) == ["spark.index.json", "spark.jsonl"]
+
+
+    def test_failing_pairs_leave_no_temporary_file(self, tmp_path):
+        from corpus_store import iter_corpus, write_corpus
+
+        corpus_path = (tmp_path / "spark.jsonl").as_posix()
+        write_corpus(corpus_path, _pairs())
+
+        def pairs():
+            yield _pairs()[0]
+            raise RuntimeError("analysis failed")
+
+        with pytest.raises(RuntimeError):
+            write_corpus(corpus_path, pairs())
+
+        assert list(iter_corpus(corpus_path)) == _pairs()
+        assert sorted(os.listdir(tmp_path)) == ["spark.index.json", "spark.jsonl"]
+
+
+class TestColumnarCorpus:
+    def _records(self):
+        context = "class Foo {\n    int bar() { return 1; }\n}\n"
+        return [
+            {"corpus_fm_name": "Foo::::bar()", "corpus_test_case_path": "src/test/java/FooTest.java", "corpus_fm": "int bar() { return 1; }", "corpus_context": context},
+            {"corpus_fm_name": "Foo::::baz()", "corpus_test_case_path": "src/test/java/FooTest.java", "corpus_fm": "void baz() {}", "corpus_context": context},
+            {"corpus_fm_name": "Qux::::ünï()", "corpus_test_case_path": "src/test/java/QuxTest.java", "corpus_fm": "", "corpus_context": "class Qux { /* ü */ }"},
+        ]
+
+    def test_columns_give_back_the_records(self):
+        from corpus_store import ColumnarCorpus
+
+        corpus = ColumnarCorpus.build(self._records(), ("corpus_fm_name", "corpus_test_case_path"), ("corpus_fm", "corpus_context"))
+
+        assert corpus.n_rows == 3
+        assert sorted(corpus) == ["corpus_context", "corpus_fm", "corpus_fm_name", "corpus_test_case_path"]
+        assert corpus["corpus_fm"][0] == "int bar() { return 1; }"
+        assert corpus["corpus_fm"][2] == ""
+        assert corpus["corpus_fm_name"][-1] == "Qux::::ünï()"
+        assert list(corpus["corpus_context"])[2] == "class Qux { /* ü */ }"
+        assert corpus["corpus_fm_name"][:2] == ["Foo::::bar()", "Foo::::baz()"]
+        assert list(corpus.rows()) == self._records()
+        corpus.close()
+
+    def test_repeated_values_are_stored_once(self):
+        from corpus_store import ColumnarCorpus
+
+        records = self._records()
+        corpus = ColumnarCorpus.build(records, ("corpus_fm_name", "corpus_test_case_path"), ("corpus_fm", "corpus_context"))
+
+        assert corpus["corpus_test_case_path"].n_distinct == 2
+        distinct_texts = {each[name] for each in records for name in ("corpus_fm", "corpus_context")}
+        assert corpus.blob_file.size == sum(len(each.encode("utf8")) for each in distinct_texts)
+        corpus.close()
+
+    def test_empty_corpus(self):
+        from corpus_store import ColumnarCorpus
+
+        with ColumnarCorpus.build([], ("corpus_fm_name",), ("corpus_fm",)) as corpus:
+            assert corpus.n_rows == 0
+            assert len(corpus["corpus_fm"]) == 0
+
+    def test_leaving_the_with_block_releases_the_blob_file(self):
+        from corpus_store import ColumnarCorpus
+
+        with ColumnarCorpus.build(self._records(), ("corpus_fm_name",), ("corpus_fm", "corpus_context")) as corpus:
+            assert corpus["corpus_fm"][0] == "int bar() { return 1; }"
+
+        assert corpus.blob_file._map is None
+        assert corpus.blob_file._file.closed
@@ -65,3 +65,133 @@ class TestDatasetAddNewlineChar:
 
         # Should convert escaped newlines to actual newlines
         assert isinstance(result, str)
+
+
+class TestDatasetCoverageData:
+    """Test loading the JaCoCo coverage dataset into columns."""
+
+    def test_pairs_share_the_texts_of_their_focal_class(self, tmp_path):
+        """Test that the pairs come back as CoveragePair and shared texts are stored once."""
+        import json
+        from unittest.mock import MagicMock
+        from dataset import CoveragePair, Dataset
+
+        dataset = Dataset.__new__(Dataset)
+        dataset.configs = MagicMock(project_name="spark", project_dir_no_test_file="/repos/spark")
+        context = ["class Foo {", "    int bar() { return 1; }", "    int baz() { return 2; }", "}"]
+        data = {
+            "src/main/java/spark/Foo.java": {
+                "Foo::::bar()": [["FooTest::::testBar()", ["public class FooTest {", "}"], ["<COVER>int bar() { return 1; }"], context, "class Foo {}"]],
+                "Foo::::baz()": [["FooTest::::testBaz()", ["public class FooTest {", "}"], ["<COVER>int baz() { return 2; }"], context, "class Foo {}"]],
+            }
+        }
+        path = tmp_path / "spark.json"
+        path.write_text(json.dumps(data))
+
+        with dataset._load_coverage_data_jacoco(str(path)) as coverage_data:
+            assert len(coverage_data) == 2
+            assert isinstance(coverage_data[0], CoveragePair)
+            assert coverage_data[1].focal_method == "int baz() { return 2; }\n"
+            assert coverage_data[1].test_case_name == "testBaz"
+            assert coverage_data[0].test_case_path == "/repos/spark/src/test/java/spark/FooTest.java"
+            assert coverage_data[0].context == coverage_data[1].context == "\n".join(context) + "\n"
+            assert coverage_data[0].references is None
+            assert coverage_data.columns["context"][1] == coverage_data[1].context
+            assert coverage_data.columns["test_case_path"].n_distinct == 1
+
+        assert coverage_data.columns.blob_file._file.closed
+
+    def test_pairs_are_streamed_one_at_a_time(self, tmp_path):
+        """Test that the generator yields pairs without building the whole dataset."""
+        import json
+        from unittest.mock import MagicMock
+        from dataset import Dataset
+
+        dataset = Dataset.__new__(Dataset)
+        dataset.configs = MagicMock(project_name="blade", project_dir_no_test_file="/repos/blade")
+        data = {
+            f"src/main/java/blade/C{i}.java": {
+                f"C{i}::::m()": [
+                    [f"C{i}Test::::testM()", ["import x;", f"public class C{i}Test {{", "}"], ["<COVER>void m() {}"], ["class C{i} {}"], "class C {}"],
+                    [f"C{i}Test::::testN()", [f"public class C{i}Test extends Base {{", "}"], ["<COVER>void m() {}"], ["class C{i} {}"], "class C {}"],
+                ]
+            }
+            for i in range(3)
+        }
+        path = tmp_path / "blade.json"
+        path.write_text(json.dumps(data, indent=2))
+
+        pairs = dataset.iter_coverage_data_jacoco(str(path))
+        first = next(pairs)
+
+        assert first.test_case_name == "testM"
+        assert first.test_case_path == "/repos/blade/src/test/java/blade/C0Test.java"
+        # blade skips the test cases extending another class
+        assert [each.focal_file_path for each in pairs] == ["src/main/java/blade/C1.java", "src/main/java/blade/C2.java"]
+
+
+class TestFindTestClassName:
+    """Test the precompiled class name detection against the patterns it replaces."""
+
+    @staticmethod
+    def _legacy(tc):
+        import re
+
+        for each_line in tc:
+            tc_class_name = re.findall(r'public class (\w+)\s*{', each_line)
+            if len(tc_class_name) == 1:
+                return tc_class_name[0], False
+            tc_class_name = re.findall(r'public class (\w+) extends \w+\s*{', each_line)
+            if len(tc_class_name) == 1:
+                return tc_class_name[0], True
+            tc_class_name = re.findall(r'class (\w+)\s*{', each_line)
+            if len(tc_class_name) == 1:
+                return tc_class_name[0], False
+            tc_class_name = re.findall(r'public class (\$\w+)\s*{', each_line)
+            if len(tc_class_name) == 1:
+                return tc_class_name[0], False
+        return None, False
+
+    def test_same_result_as_the_legacy_patterns(self):
+        """Test random test cases made of class declaration fragments."""
+        import random
+        from dataset import find_test_class_name
+
+        fragments = ["public ", "class ", "Foo", "Test", " extends Base", " ", "{", "}", "$Lambda", "final ", "\n", "// class X {", "@Test"]
+        rng = random.Random(7)
+        for _ in range(3000):
+            tc = ["".join(rng.choice(fragments) for _ in range(rng.randint(0, 8))) for _ in range(rng.randint(0, 4))]
+            assert find_test_class_name(tc) == self._legacy(tc), tc
+
+
+class TestIterJsonObject:
+    """Test the streaming decoder of a JSON object."""
+
+    def test_same_items_as_json_load_for_any_chunk_size(self):
+        """Test objects with nested values, escapes and numbers split across chunks."""
+        import io
+        import json
+        from dataset import iter_json_object
+
+        data = {
+            "a/b.java": {"m()": [["t", ["x\"y", "ü}{,:"], [], [], "s"]]},
+            "n": -2.5e10,
+            "f": 1.0,
+            "e": [],
+            "o": {},
+            "t": [True, False, None, 123456789, 3e-07],
+        }
+        for indent in (None, 2):
+            text = json.dumps(data, indent=indent)
+            for chunk_size in (1, 2, 3, 17, 1 << 16):
+                assert dict(iter_json_object(io.StringIO(text), chunk_size)) == data
+
+    def test_malformed_object_raises(self):
+        """Test that what is not a JSON object is rejected."""
+        import io
+        import pytest
+        from dataset import iter_json_object
+
+        for text in ("[1]", '{"a": 1', '{"a" 1}', '{"a": 1 "b": 2}', "", '{"a": 1,}'):
+            with pytest.raises(ValueError):
+                list(iter_json_object(io.StringIO(text)))
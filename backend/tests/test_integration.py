@@ -44,7 +44,7 @@ def test_generation_cancelled_before_work(monkeypatch):
         def __init__(self, *_args, **_kwargs):
             pass
 
-        def compile_and_execute_test_case(self, *_args, **_kwargs):
+        def run_test(self, *_args, **_kwargs):
             raise AssertionError("runner should not be called when cancelled")
 
     monkeypatch.setattr(generator, "TestGenAgent", DummyGenAgent)
@@ -71,3 +71,69 @@ def test_generation_cancelled_before_work(monkeypatch):
             junit_version="5",
             query_session=_DummySession(),
         )
+
+
+def test_local_repair_reruns_without_refine(monkeypatch, tmp_path):
+    import generator
+    from test_results import TestRunResult, parse_compiler_diagnostics
+
+    project_dir = tmp_path / "spark"
+    (project_dir / "src" / "test" / "java" / "spark").mkdir(parents=True)
+    test_case_path = (project_dir / "src" / "test" / "java" / "spark" / "FooTest.java").as_posix()
+    runs = []
+
+    class DummyAgent:
+        def __init__(self, *_args, **_kwargs):
+            pass
+
+        def set_cancel_check(self, _check):
+            pass
+
+    class DummyRunner:
+        def __init__(self, *_args, **_kwargs):
+            pass
+
+        def dependency_classpath(self, _project_dir):
+            return []
+
+        def run_test(self, test_case, _path, _junit_version=4):
+            runs.append(test_case)
+            if "import java.util.List;" in test_case:
+                return TestRunResult("", "BUILD SUCCESS", True, True)
+            log = f"[ERROR] {test_case_path}:[4,9] cannot find symbol\n  symbol:   class List\n"
+            return TestRunResult(log, "", False, False, parse_compiler_diagnostics(log))
+
+    monkeypatch.setattr(generator, "TestGenAgent", DummyAgent)
+    monkeypatch.setattr(generator, "TestRefineAgent", DummyAgent)
+    monkeypatch.setattr(generator, "TestCaseRunner", DummyRunner)
+
+    configs = SimpleNamespace(
+        llm_name="gpt-4o",
+        project_name="spark",
+        project_url="https://example.invalid/",
+        test_case_run_log_dir="/tmp",
+        outcome_cache_size=0,
+        outcome_cache_path="",
+    )
+    tester = generator.IntentionTester(configs)
+    test_case = "package spark;\n\npublic class FooTest {\n    List<String> l;\n}"
+
+    repaired, error_msg, status, messages = tester.repair_locally(test_case, "", "fail_compile", test_case_path, "4", [])
+    assert status == "fail_compile"
+    assert repaired == test_case
+
+    error_msg, status = tester.run_test_case(test_case, test_case_path)
+    repaired, error_msg, status, messages = tester.repair_locally(test_case, error_msg, status, test_case_path, "4", [])
+
+    assert status == "success"
+    assert "import java.util.List;" in repaired
+    assert messages[-1]["content"].startswith("### Local repair")
+    assert len(runs) == 2
+
+    def no_classpath(_project_dir):
+        raise AssertionError("the classpath is only resolved to repair compile errors")
+
+    tester.test_runner.dependency_classpath = no_classpath
+    for failed_status in ("fail_pass", "fail_execute"):
+        assert tester.repair_locally(test_case, "AssertionError", failed_status, test_case_path, "4", []) == (test_case, "AssertionError", failed_status, [])
+    assert len(runs) == 2
@@ -0,0 +1,239 @@
+"""
+Tests for jacoco_report.py JaCoCo XML report parsing.
+"""
+
+REPORT = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<!DOCTYPE report PUBLIC "-//JACOCO//DTD Report 1.1//EN" "report.dtd">
+<report name="spark">
+  <sessioninfo id="s" start="1" dump="2"/>
+  <package name="spark/utils">
+    <class name="spark/utils/CollectionUtils" sourcefilename="CollectionUtils.java">
+      <method name="&lt;init&gt;" desc="()V" line="5">
+        <counter type="INSTRUCTION" missed="3" covered="0"/>
+        <counter type="LINE" missed="1" covered="0"/>
+        <counter type="COMPLEXITY" missed="1" covered="0"/>
+        <counter type="METHOD" missed="1" covered="0"/>
+      </method>
+      <method name="isEmpty" desc="(Ljava/util/Collection;)Z" line="8">
+        <counter type="INSTRUCTION" missed="1" covered="8"/>
+        <counter type="BRANCH" missed="1" covered="3"/>
+        <counter type="LINE" missed="0" covered="2"/>
+        <counter type="COMPLEXITY" missed="1" covered="2"/>
+        <counter type="METHOD" missed="0" covered="1"/>
+      </method>
+      <method name="valuesOfKeys" desc="(Ljava/util/Map;[Ljava/lang/Object;)Ljava/util/ArrayList;" line="12">
+        <counter type="INSTRUCTION" missed="0" covered="10"/>
+        <counter type="LINE" missed="0" covered="3"/>
+        <counter type="COMPLEXITY" missed="0" covered="1"/>
+      </method>
+      <method name="valuesOfKeys" desc="(Ljava/util/Map;Ljava/lang/Iterable;)Ljava/util/ArrayList;" line="16">
+        <counter type="INSTRUCTION" missed="10" covered="0"/>
+        <counter type="LINE" missed="3" covered="0"/>
+        <counter type="COMPLEXITY" missed="1" covered="0"/>
+      </method>
+      <counter type="INSTRUCTION" missed="14" covered="18"/>
+    </class>
+    <class name="spark/utils/CollectionUtils$Index" sourcefilename="CollectionUtils.java">
+      <method name="get" desc="(I)Ljava/lang/Object;" line="22">
+        <counter type="INSTRUCTION" missed="0" covered="4"/>
+        <counter type="LINE" missed="0" covered="1"/>
+        <counter type="COMPLEXITY" missed="0" covered="1"/>
+      </method>
+    </class>
+    <class name="spark/utils/Other" sourcefilename="Other.java">
+      <method name="isEmpty" desc="(Ljava/util/Collection;)Z" line="3"/>
+    </class>
+    <sourcefile name="CollectionUtils.java">
+      <line nr="5" mi="3" ci="0" mb="0" cb="0"/>
+      <line nr="8" mi="1" ci="4" mb="1" cb="3"/>
+      <line nr="9" mi="0" ci="4" mb="0" cb="0"/>
+      <line nr="16" mi="10" ci="0" mb="0" cb="0"/>
+      <counter type="LINE" missed="2" covered="2"/>
+    </sourcefile>
+    <sourcefile name="Other.java">
+      <line nr="3" mi="2" ci="0" mb="0" cb="0"/>
+    </sourcefile>
+  </package>
+</report>
+"""
+
+
+def _write_report(tmp_path):
+    path = tmp_path / "target" / "site" / "jacoco" / "jacoco.xml"
+    path.parent.mkdir(parents=True)
+    path.write_text(REPORT)
+    return path.as_posix()
+
+
+class TestParseJacocoXml:
+    def test_keeps_only_requested_source_files(self, tmp_path):
+        from jacoco_report import parse_jacoco_xml
+
+        report = parse_jacoco_xml(_write_report(tmp_path), ["spark/utils/CollectionUtils.java"])
+
+        assert list(report.source_files) == ["spark/utils/CollectionUtils.java"]
+        assert set(report.classes) == {"spark/utils/CollectionUtils", "spark/utils/CollectionUtils$Index"}
+        lines = report.source_files["spark/utils/CollectionUtils.java"]
+        assert lines.covered_lines == [8, 9]
+        assert lines.uncovered_lines == [5, 16]
+
+    def test_top_level_class_comes_first(self, tmp_path):
+        from jacoco_report import parse_jacoco_xml
+
+        report = parse_jacoco_xml(_write_report(tmp_path))
+
+        names = [each.name for each in report.classes_of("spark/utils/CollectionUtils.java")]
+        assert names == ["spark/utils/CollectionUtils", "spark/utils/CollectionUtils$Index"]
+
+
+class TestFindMethod:
+    def _classes(self, tmp_path):
+        from jacoco_report import parse_jacoco_xml
+
+        return parse_jacoco_xml(_write_report(tmp_path)).classes_of("spark/utils/CollectionUtils.java")
+
+    def test_overloads_are_told_apart_by_descriptor(self, tmp_path):
+        from jacoco_report import find_method
+
+        classes = self._classes(tmp_path)
+
+        assert find_method(classes, "valuesOfKeys(java.util.Map<K, V>,K[])").line == 12
+        assert find_method(classes, "valuesOfKeys(java.util.Map<K, V>,java.lang.Iterable<K>)").line == 16
+        assert find_method(classes, "valuesOfKeys(java.util.Map<K, V>,K...)").line == 12
+
+    def test_constructor_and_nested_class(self, tmp_path):
+        from jacoco_report import find_method
+
+        classes = self._classes(tmp_path)
+
+        assert find_method(classes, "CollectionUtils()").name == "<init>"
+        assert find_method(classes, "get(int)").line == 22
+        assert find_method(classes, "missing(int)") is None
+
+    def test_descriptor_parameter_types(self):
+        from jacoco_report import descriptor_parameter_types, source_parameter_types
+
+        assert descriptor_parameter_types("([[IJLjava/util/Map$Entry;[Ljava/lang/String;)V") == [
+            ("int", 2), ("long", 0), ("java.util.Map.Entry", 0), ("java.lang.String", 1)]
+        assert source_parameter_types("java.util.Map<K, java.util.List<V>>,final int[] xs,@Nullable String s") == [
+            ("java.util.Map", 0), ("int", 1), ("String", 0)]
+
+
+class TestRunnerCoverage:
+    def test_cov_stat_keeps_the_html_report_keys(self, tmp_path, runner_configs):
+        from test_case_runner import TestCaseRunner
+
+        project = tmp_path / "spark"
+        _write_report(project)
+        focal_file = project / "src" / "main" / "java" / "spark" / "utils" / "CollectionUtils.java"
+        focal_file.parent.mkdir(parents=True)
+        focal_file.write_text("".join(f"line{nr}\n" for nr in range(1, 21)))
+        runner = TestCaseRunner(runner_configs(project_dir=tmp_path.as_posix()), tmp_path.as_posix())
+        test_case_path = f"{project.as_posix()}/src/test/java/spark/utils/CollectionUtilsTest.java"
+
+        focal_file_lines, cov_stat = runner.get_focal_file_coverage(
+            "spark/src/main/java/spark/utils/CollectionUtils.java", test_case_path, "isEmpty(java.util.Collection<?>)")
+
+        assert cov_stat == {"number_of_lines": 2, "number_of_branches": 2, "line_coverage": 88.0, "branch_coverage": 75.0}
+        assert focal_file_lines[7] == "<COVER>line8\n"
+        assert focal_file_lines[4] == "line5\n"
+
+        _, cov_stat = runner.get_focal_file_coverage(
+            "spark/src/main/java/spark/utils/CollectionUtils.java", test_case_path, "unknown(int)")
+        assert "CollectionUtils#isEmpty(Ljava/util/Collection;)Z" in cov_stat["raw_html"]
+
+    def test_missing_report(self, tmp_path, runner_configs):
+        from test_case_runner import TestCaseRunner
+
+        runner = TestCaseRunner(runner_configs(project_dir=tmp_path.as_posix()), tmp_path.as_posix())
+        test_case_path = f"{tmp_path.as_posix()}/spark/src/test/java/spark/FooTest.java"
+
+        assert runner.get_focal_file_coverage("spark/Foo.java", test_case_path, "m()") == (None, None)
+
+
+POM = """<?xml version="1.0" encoding="UTF-8"?>
+<project xmlns="http://maven.apache.org/POM/4.0.0">
+  <modelVersion>4.0.0</modelVersion>
+  <build>
+    <plugins>
+      <plugin>
+        <groupId>org.jacoco</groupId>
+        <artifactId>jacoco-maven-plugin</artifactId>
+        <executions>
+          <execution><goals><goal>prepare-agent</goal></goals></execution>
+          <execution>
+            <id>report</id>
+            <phase>verify</phase>
+            <goals><goal>report</goal></goals>
+            <configuration><includes><include>**/*</include></includes></configuration>
+          </execution>
+        </executions>
+      </plugin>
+    </plugins>
+  </build>
+</project>
+"""
+
+
+class TestCoverageScope:
+    def test_includes(self):
+        from jacoco_report import coverage_includes
+
+        path = "/repo/spark/src/test/java/spark/utils/CollectionUtilsTest.java"
+        assert coverage_includes(path, "focal") == ["spark/utils/CollectionUtils*"]
+        assert coverage_includes(path, "package") == ["spark/utils/*"]
+
+    def test_coverage_pom_narrows_every_configuration(self, tmp_path):
+        import xml.etree.ElementTree as ET
+        from maven_utils import COVERAGE_POM_PREFIX, write_coverage_pom
+
+        (tmp_path / "pom.xml").write_text(POM)
+
+        coverage_pom = write_coverage_pom(tmp_path.as_posix(), ["spark/utils/CollectionUtils*"])
+        assert coverage_pom.startswith(COVERAGE_POM_PREFIX)
+        # every build writes its own copy
+        assert write_coverage_pom(tmp_path.as_posix(), ["spark/utils/*"]) != coverage_pom
+
+        ns = "{http://maven.apache.org/POM/4.0.0}"
+        plugin = ET.parse(tmp_path / coverage_pom).getroot().find(f"{ns}build/{ns}plugins/{ns}plugin")
+        assert [each.text for each in plugin.iter(f"{ns}include")] == ["spark/utils/CollectionUtils*"] * 2
+        assert [each.text for each in plugin.iter(f"{ns}format")] == ["XML"] * 2
+        assert (tmp_path / "pom.xml").read_text() == POM
+
+    def test_pom_without_jacoco_is_left_alone(self, tmp_path):
+        from maven_utils import write_coverage_pom
+
+        (tmp_path / "pom.xml").write_text("<project><modelVersion>4.0.0</modelVersion></project>")
+        assert write_coverage_pom(tmp_path.as_posix(), ["x*"]) is None
+
+    def test_attempts_skip_coverage_and_the_final_test_is_measured(self, tmp_path, monkeypatch, runner_configs):
+        import os
+        import test_case_runner
+        from process_runner import ProcessResult
+        from test_case_runner import TestCaseRunner
+
+        project = tmp_path / "spark"
+        (project / "pom.xml").parent.mkdir()
+        (project / "pom.xml").write_text(POM)
+        calls = []
+
+        def fake_run(args, cwd, *_args, **_kwargs):
+            calls.append(args)
+            if "verify" in args and "-Djacoco.skip=true" not in args:
+                _write_report(project)
+            return ProcessResult(0, "[INFO] BUILD SUCCESS\n", "")
+
+        monkeypatch.setattr(test_case_runner, "run_streaming", fake_run)
+        runner = TestCaseRunner(runner_configs(runner_mode="incremental", coverage_scope="focal", coverage_runs="final"), tmp_path.as_posix())
+        path = f"{project.as_posix()}/src/test/java/spark/utils/CollectionUtilsTest.java"
+        test_case = "package spark.utils;\npublic class CollectionUtilsTest {\n@Test public void t() {}\n}"
+
+        runner.compile_and_execute_test_case(test_case, path)
+        assert "-Djacoco.skip=true" in calls[-1]
+
+        coverage = runner.collect_coverage(test_case, path)
+        assert calls[-1][-2] == "-f" and calls[-1][-1].startswith(".intention-test-pom-")
+        assert coverage == {"source_file": "spark/utils/CollectionUtils.java", "covered_lines": [8, 9], "uncovered_lines": [5, 16]}
+        assert runner.skip_coverage
+        # the copy of the pom is removed after the build
+        assert sorted(os.listdir(project)) == ["pom.xml", "src", "target"]
@@ -0,0 +1,113 @@
+"""
+Tests for java_syntax.py pre-flight checks.
+"""
+
+VALID_TEST = """package spark.utils;
+
+import org.junit.Test;
+import static org.junit.Assert.assertEquals;
+
+public class FooTest {
+    // a comment with { unbalanced braces
+    @Test
+    public void testFoo() {
+        String s = "}{)(";
+        char c = '{';
+        assertEquals(1, new int[]{1}.length);
+    }
+}"""
+
+
+class TestTokenize:
+    def test_positions_and_kinds(self):
+        from java_syntax import tokenize
+
+        tokens = list(tokenize('int a = "x";\n@Test'))
+
+        assert [t.kind for t in tokens] == ["ident", "ident", "op", "string", "op", "annotation"]
+        assert (tokens[-1].line, tokens[-1].column) == (2, 1)
+
+    def test_comments_are_optional(self):
+        from java_syntax import tokenize
+
+        assert [t.kind for t in tokenize("// x\nfoo", keep_comments=True)] == ["line_comment", "ident"]
+        assert [t.kind for t in tokenize("// x\nfoo")] == ["ident"]
+
+
+class TestCheckJavaSource:
+    def test_valid_source(self):
+        from java_syntax import check_java_source
+
+        assert check_java_source(VALID_TEST, "/p/src/test/java/spark/utils/FooTest.java") == []
+
+    def test_empty_response(self):
+        from java_syntax import check_java_source
+
+        diagnostics = check_java_source(" ")
+
+        assert len(diagnostics) == 1
+        assert "empty" in diagnostics[0].message
+
+    def test_generation_failure_fallback(self):
+        from java_syntax import check_java_source
+
+        diagnostics = check_java_source("[ERROR] Failed to generate due to API error or quota.")
+
+        assert "no test case" in diagnostics[0].message
+
+    def test_unbalanced_braces(self):
+        from java_syntax import check_java_source
+
+        diagnostics = check_java_source(VALID_TEST[:-1])
+
+        assert diagnostics[0].message == "reached end of file while parsing"
+
+    def test_mismatched_bracket(self):
+        from java_syntax import check_java_source
+
+        source = VALID_TEST.replace("new int[]{1}.length)", "new int[]{1}.length]")
+        diagnostics = check_java_source(source)
+
+        assert diagnostics[0].message == "')' expected"
+        assert diagnostics[0].line == 12
+
+    def test_unclosed_string(self):
+        from java_syntax import check_java_source
+
+        diagnostics = check_java_source(VALID_TEST.replace('"}{)("', '"}{)('))
+
+        assert diagnostics[0].message == "unclosed string literal"
+
+    def test_missing_test_annotation(self):
+        from java_syntax import check_java_source
+
+        diagnostics = check_java_source(VALID_TEST.replace("@Test", ""))
+
+        assert [d.message for d in diagnostics] == ["no test method annotated with @Test was found"]
+
+    def test_public_class_file_name(self):
+        from java_syntax import check_java_source
+
+        diagnostics = check_java_source(VALID_TEST, "/p/BarTest.java")
+
+        assert diagnostics[0].message == "class FooTest is public, should be declared in a file named FooTest.java"
+
+
+class TestRunnerPreflight:
+    def test_build_skipped_on_syntax_error(self, tmp_path, monkeypatch):
+        import subprocess
+        import test_case_runner
+        from test_case_runner import TestCaseRunner
+
+        def fail_run(*_args, **_kwargs):
+            raise AssertionError("Maven must not be started")
+
+        monkeypatch.setattr(subprocess, "run", fail_run)
+        monkeypatch.setattr(test_case_runner, "run_streaming", fail_run)
+        runner = TestCaseRunner.__new__(TestCaseRunner)
+        path = (tmp_path / "src" / "test" / "java" / "spark" / "FooTest.java").as_posix()
+
+        compile_log, test_log, compile_success, execute_success = runner.compile_and_execute_test_case(" ", path)
+
+        assert compile_success is False and execute_success is False
+        assert f"[ERROR] {path}:[1,1]" in compile_log
@@ -0,0 +1,168 @@
+"""
+Tests for javac_runner.py direct javac + JUnit launcher backend.
+"""
+import os
+from types import SimpleNamespace
+
+JUNIT4_FAILURES = """JUnit version 4.13.2
+.E.E
+Time: 0.01
+There were 2 failures:
+1) testA(spark.FooTest)
+java.lang.AssertionError: expected:<1> but was:<2>
+\tat org.junit.Assert.fail(Assert.java:89)
+2) testB(spark.FooTest)
+java.lang.NullPointerException
+\tat spark.FooTest.testB(FooTest.java:12)
+
+FAILURES!!!
+Tests run: 2,  Failures: 2
+
+"""
+
+JUNIT5_REPORT = """<?xml version="1.0" encoding="UTF-8"?>
+<testsuite name="JUnit Jupiter" tests="3">
+  <testcase name="ok()" classname="spark.FooTest"/>
+  <testcase name="bad()" classname="spark.FooTest">
+    <failure type="org.opentest4j.AssertionFailedError" message="expected: 1"/>
+  </testcase>
+  <testcase name="boom()" classname="spark.FooTest">
+    <error type="java.lang.IllegalStateException" message="boom"/>
+  </testcase>
+</testsuite>
+"""
+
+
+class TestCounting:
+    def test_junit4_ok(self):
+        from javac_runner import count_junit4_output
+
+        counts = count_junit4_output("JUnit version 4.13.2\n.\nTime: 0.002\n\nOK (1 test)\n")
+
+        assert (counts.run, counts.failures, counts.errors) == (1, 0, 0)
+
+    def test_junit4_failures_split_by_exception(self):
+        from javac_runner import count_junit4_output
+
+        counts = count_junit4_output(JUNIT4_FAILURES)
+
+        assert (counts.run, counts.failures, counts.errors) == (2, 1, 1)
+        assert counts.summary_line() == "[ERROR] Tests run: 2, Failures: 1, Errors: 1, Skipped: 0"
+
+    def test_junit5_xml_reports(self, tmp_path):
+        from javac_runner import count_junit_xml_reports
+
+        (tmp_path / "TEST-junit-jupiter.xml").write_text(JUNIT5_REPORT)
+        counts = count_junit_xml_reports(tmp_path.as_posix())
+
+        assert (counts.run, counts.failures, counts.errors, counts.skipped) == (3, 1, 1, 0)
+
+
+class TestFingerprint:
+    def test_changes_with_sources(self, tmp_path):
+        from javac_runner import source_tree_fingerprint
+
+        (tmp_path / "A.java").write_text("class A {}")
+        before = source_tree_fingerprint(tmp_path.as_posix())
+        (tmp_path / "B.java").write_text("class B {}")
+
+        assert source_tree_fingerprint(tmp_path.as_posix()) != before
+
+
+class TestJavacTestRunner:
+    def _project(self, tmp_path):
+        project = tmp_path / "spark"
+        (project / "src" / "main" / "java" / "spark").mkdir(parents=True)
+        (project / "src" / "main" / "java" / "spark" / "Foo.java").write_text("package spark; public class Foo {}")
+        (project / "src" / "test" / "java" / "spark").mkdir(parents=True)
+        test_path = project / "src" / "test" / "java" / "spark" / "FooTest.java"
+        test_path.write_text("package spark; public class FooTest {}")
+        return project, test_path.as_posix()
+
+    def _runner(self, tmp_path, monkeypatch, java_output, javac_returncode=0):
+        import javac_runner
+        from process_runner import ProcessResult
+
+        calls = []
+
+        def fake_run(args, cwd, **kwargs):
+            calls.append(args)
+            if args[0].endswith("javac"):
+                return ProcessResult(javac_returncode, "" if javac_returncode == 0 else "FooTest.java:3: error: cannot find symbol\n", "")
+            return ProcessResult(0, java_output, "")
+
+        monkeypatch.setattr(javac_runner, "run_streaming", fake_run)
+        monkeypatch.setattr(javac_runner, "resolve_test_classpath", lambda *_args: ["/m2/junit.jar"])
+        return javac_runner.JavacTestRunner((tmp_path / "cache").as_posix()), calls
+
+    def test_main_sources_compiled_once(self, tmp_path, monkeypatch):
+        project, test_path = self._project(tmp_path)
+        runner, calls = self._runner(tmp_path, monkeypatch, "OK (1 test)\n")
+
+        result = runner.compile_and_execute(test_path, 4)
+        runner.compile_and_execute(test_path, 4)
+
+        assert result[2:] == (True, True)
+        assert "Tests run: 1, Failures: 0, Errors: 0, Skipped: 0" in result[1]
+        javac_calls = [each for each in calls if each[0].endswith("javac")]
+        # main once, the generated test twice
+        assert len(javac_calls) == 3
+        assert any("org.junit.runner.JUnitCore" in each for each in calls)
+
+    def test_compile_failure(self, tmp_path, monkeypatch):
+        project, test_path = self._project(tmp_path)
+        runner, _calls = self._runner(tmp_path, monkeypatch, "", javac_returncode=1)
+
+        compile_log, test_log, compile_success, execute_success = runner.compile_and_execute(test_path, 4)
+
+        assert (compile_success, execute_success) == (False, False)
+        assert "error: cannot find symbol" in compile_log
+
+    def test_status_matches_maven(self, tmp_path, monkeypatch):
+        import generator
+        from test_results import TestRunResult
+
+        project, test_path = self._project(tmp_path)
+        runner, _calls = self._runner(tmp_path, monkeypatch, JUNIT4_FAILURES.replace("java.lang.NullPointerException", "java.lang.AssertionError"))
+
+        tester = generator.IntentionTester.__new__(generator.IntentionTester)
+        tester.query_session = None
+        tester.configs = SimpleNamespace(outcome_cache_size=0, outcome_cache_path="")
+        tester.test_runner = SimpleNamespace(run_test=lambda tc, path, junit: TestRunResult(*runner.compile_and_execute(path, junit)))
+
+        error_msg, status = tester.run_test_case("", test_path, 4)
+
+        assert status == "fail_pass"
+
+
+class TestResolveTestClasspath:
+    def test_concurrent_resolutions_write_their_own_file(self, tmp_path, monkeypatch):
+        import threading
+        import maven_utils
+
+        project = tmp_path / "spark"
+        project.mkdir()
+        (project / "pom.xml").write_text("<project/>")
+        cache_dir = (tmp_path / "cache").as_posix()
+        output_files = []
+        both_running = threading.Barrier(2)
+
+        def run(args, **_kwargs):
+            output_file = next(each for each in args if each.startswith("-Dmdep.outputFile=")).split("=", 1)[1]
+            output_files.append(output_file)
+            both_running.wait(5)
+            with open(output_file, "w") as f:
+                f.write("/m2/junit.jar")
+            return SimpleNamespace(returncode=0, stdout="", stderr="")
+
+        monkeypatch.setattr(maven_utils.subprocess, "run", run)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(maven_utils.resolve_test_classpath(project.as_posix(), cache_dir))) for _ in range(2)]
+        for each in threads:
+            each.start()
+        for each in threads:
+            each.join()
+
+        assert len(set(output_files)) == 2
+        assert results == [["/m2/junit.jar"], ["/m2/junit.jar"]]
+        assert [each for each in os.listdir(cache_dir) if each.endswith(".tmp")] == []
@@ -0,0 +1,266 @@
+"""
+Tests for jvm_worker.py, driven by a fake worker speaking the same line-based JSON protocol, and for the real
+TestWorker.java where a JDK and JUnit 4 are installed.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import textwrap
+import zipfile
+
+import pytest
+
+FAKE_WORKER = textwrap.dedent('''
+    import json, os, sys, time
+    print("not json: something printed before the first request", flush=True)
+    for line in sys.stdin:
+        request = json.loads(line)
+        action = request.get("class_name", "")
+        if action == "crash":
+            os._exit(3)
+        if action == "hang":
+            time.sleep(60)
+        if action == "broken":
+            response = {"compile_success": False, "compile_log": "/p/FooTest.java:3: error: cannot find symbol\\n"}
+        else:
+            response = {"compile_success": True, "compile_log": "", "run": 1, "failures": 1, "errors": 0, "skipped": 0,
+                        "output": "1) testFoo(spark.FooTest)\\njava.lang.AssertionError\\n", "pid": os.getpid()}
+        response["id"] = request["id"]
+        print(json.dumps(response), flush=True)
+''')
+
+
+@pytest.fixture
+def fake_worker(tmp_path):
+    from jvm_worker import JvmWorker
+
+    script = tmp_path / "fake_worker.py"
+    script.write_text(FAKE_WORKER)
+    worker = JvmWorker((tmp_path / "work").as_posix(), command=[sys.executable, script.as_posix()])
+    yield worker
+    worker.stop()
+
+
+class TestJvmWorker:
+    def test_process_is_reused(self, fake_worker):
+        first = fake_worker.request({"type": "run", "class_name": "spark.FooTest"}, timeout=10)
+        second = fake_worker.request({"type": "run", "class_name": "spark.FooTest"}, timeout=10)
+
+        assert first["pid"] == second["pid"]
+        assert fake_worker.n_starts == 1
+
+    def test_timeout_kills_and_restarts(self, fake_worker):
+        from jvm_worker import JvmWorkerTimeout
+
+        with pytest.raises(JvmWorkerTimeout):
+            fake_worker.request({"type": "run", "class_name": "hang"}, timeout=0.5)
+        assert not fake_worker.is_alive()
+
+        response = fake_worker.request({"type": "run", "class_name": "spark.FooTest"}, timeout=10)
+        assert response["compile_success"] is True
+        assert fake_worker.n_starts == 2
+
+    def test_crash_is_reported(self, fake_worker):
+        from jvm_worker import JvmWorkerError
+
+        with pytest.raises(JvmWorkerError):
+            fake_worker.request({"type": "run", "class_name": "crash"}, timeout=10)
+
+
+    def test_cancel_kills_worker(self, fake_worker):
+        from jvm_worker import JvmWorkerCancelled
+
+        with pytest.raises(JvmWorkerCancelled):
+            fake_worker.request({"type": "run", "class_name": "hang"}, timeout=30, cancel_check=lambda: True)
+        assert not fake_worker.is_alive()
+
+
+class TestWorkerTestRunner:
+    def _runner(self, tmp_path, fake_worker):
+        from jvm_worker import WorkerTestRunner
+
+        return WorkerTestRunner((tmp_path / "cache").as_posix(), request_timeout=0.5, worker=fake_worker)
+
+    def test_results(self, tmp_path, fake_worker):
+        runner = self._runner(tmp_path, fake_worker)
+
+        compile_success, _log, counts, output = runner.compile_and_run_test("/p/src/test/java/spark/FooTest.java", "spark.FooTest", [], 4, "/p")
+        assert compile_success is True
+        assert (counts.run, counts.failures, counts.errors) == (1, 1, 0)
+        assert "AssertionError" in output
+
+        compile_success, log, _counts, _output = runner.compile_and_run_test("/p/src/test/java/spark/FooTest.java", "broken", [], 4, "/p")
+        assert compile_success is False
+        assert "cannot find symbol" in log
+
+    def test_timeout_is_an_execution_error(self, tmp_path, fake_worker):
+        runner = self._runner(tmp_path, fake_worker)
+
+        compile_success, _log, counts, output = runner.compile_and_run_test("/p/src/test/java/spark/FooTest.java", "hang", [], 4, "/p")
+
+        assert compile_success is True
+        assert counts.errors == 1
+        assert "terminated" in output
+
+
+CALCULATOR = textwrap.dedent('''
+    public class Calculator {
+        public int add(int a, int b) {
+            return a + b;
+        }
+
+        public int sub(int a, int b) {
+            return a - b;
+        }
+    }
+''')
+
+CALCULATOR_TEST = textwrap.dedent('''
+    import org.junit.Test;
+    import static org.junit.Assert.assertEquals;
+
+    public class CalculatorTest {
+        @Test
+        public void testAdd() {
+            assertEquals(3, new Calculator().add(1, 2));
+        }
+
+        @Test
+        public void testSub() {
+            assertEquals(0, new Calculator().sub(1, 2));
+        }
+    }
+''')
+
+# stands in for the analysis jar of collect_pairs, run once per file
+ANALYZER = textwrap.dedent('''
+    public class Analyzer {
+        public static void main(String[] args) {
+            if (args[0].endsWith(".bad")) {
+                throw new IllegalStateException("cannot parse " + args[0]);
+            }
+            System.out.println("parsed " + new java.io.File(args[0]).getName());
+        }
+    }
+''')
+
+
+def _local_jar(group_id, artifact_id):
+    from jacoco_report import _newest_jar
+    from maven_utils import DEFAULT_LOCAL_REPOSITORY
+
+    return _newest_jar(DEFAULT_LOCAL_REPOSITORY, group_id, artifact_id)
+
+
+def _javac(classpath, out_dir, *sources):
+    subprocess.run(["javac", "-encoding", "UTF-8", "-cp", os.pathsep.join(classpath), "-d", str(out_dir), *map(str, sources)], check=True)
+
+
+@pytest.fixture
+def junit4(tmp_path):
+    classpath = [_local_jar("junit", "junit"), _local_jar("org.hamcrest", "hamcrest-core")]
+    if None in classpath:
+        pytest.skip("JUnit 4 is not in the local Maven repository")
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "Calculator.java").write_text(CALCULATOR)
+    (src / "CalculatorTest.java").write_text(CALCULATOR_TEST)
+    return src, classpath
+
+
+@pytest.mark.skipif(shutil.which("javac") is None, reason="compiling TestWorker.java needs a JDK")
+class TestJavaWorker:
+    """Each request type of the real worker, compiled from TestWorker.java by JvmWorker."""
+
+    @pytest.fixture
+    def worker(self, tmp_path):
+        from jvm_worker import JvmWorker
+
+        worker = JvmWorker((tmp_path / "work").as_posix())
+        yield worker
+        worker.stop()
+
+    def test_run_compiles_the_test_in_memory(self, worker, junit4):
+        src, classpath = junit4
+
+        response = worker.request({"type": "run", "source_path": str(src / "CalculatorTest.java"), "sourcepath": str(src),
+                                   "class_name": "CalculatorTest", "classpath": classpath, "junit_version": 4}, timeout=60)
+
+        assert response["compile_success"] is True, response.get("compile_log")
+        assert (response["run"], response["failures"], response["errors"], response["skipped"]) == (2, 1, 0, 0)
+        assert "testSub" in response["output"]
+        assert not os.path.exists(src / "CalculatorTest.class")
+
+    def test_run_reports_compile_errors(self, worker, junit4):
+        src, classpath = junit4
+        (src / "BrokenTest.java").write_text("public class BrokenTest { void f() { undefined(); } }")
+
+        response = worker.request({"type": "run", "source_path": str(src / "BrokenTest.java"), "sourcepath": str(src),
+                                   "class_name": "BrokenTest", "classpath": classpath, "junit_version": 4}, timeout=60)
+
+        assert response["compile_success"] is False
+        assert "BrokenTest.java:1: error" in response["compile_log"]
+
+    def test_batch_runs_compiled_tests_method_by_method(self, worker, junit4, tmp_path):
+        src, classpath = junit4
+        classes = tmp_path / "classes"
+        _javac(classpath, classes, src / "Calculator.java", src / "CalculatorTest.java")
+
+        # as BatchTestRunner sends them: the classes were compiled by the build, one request per test class
+        response = worker.request({"type": "run", "class_name": "CalculatorTest", "classpath": [str(classes)] + classpath,
+                                   "junit_version": 4, "methods": ["testAdd", "testSub"]}, timeout=60)
+
+        assert response["compile_success"] is True
+        assert (response["run"], response["failures"], response["errors"]) == (2, 1, 0)
+        assert worker.n_starts == 1
+
+    def test_analyze_runs_the_jar_once_per_file(self, worker, tmp_path):
+        classes = tmp_path / "analyzer"
+        (tmp_path / "Analyzer.java").write_text(ANALYZER)
+        _javac([], classes, tmp_path / "Analyzer.java")
+        jar = tmp_path / "analyzer.jar"
+        with zipfile.ZipFile(jar, "w") as f:
+            f.writestr("META-INF/MANIFEST.MF", "Manifest-Version: 1.0\nMain-Class: Analyzer\n")
+            f.write(classes / "Analyzer.class", "Analyzer.class")
+
+        response = worker.request({"type": "analyze", "jar": str(jar), "files": ["/p/Foo.java", "/p/Foo.bad", "/p/Bar.java"]}, timeout=60)
+
+        assert [each.strip() for each in response["outputs"]] == ["parsed Foo.java", "", "parsed Bar.java"]
+        assert response["errors"][0] is None and response["errors"][2] is None
+        assert "cannot parse /p/Foo.bad" in response["errors"][1]
+
+    def test_coverage_of_each_method(self, junit4, tmp_path):
+        from jacoco_report import find_jacoco_agent, find_jacoco_core
+        from jvm_worker import JvmWorker
+
+        agent, jacoco_classpath = find_jacoco_agent(), find_jacoco_core()
+        if agent is None or jacoco_classpath is None:
+            pytest.skip("JaCoCo is not in the local Maven repository")
+        src, classpath = junit4
+        classes = tmp_path / "classes"
+        _javac(classpath, classes, src / "Calculator.java", src / "CalculatorTest.java")
+        coverage_dir = tmp_path / "coverage"
+        coverage_dir.mkdir()
+
+        worker = JvmWorker((tmp_path / "work").as_posix(), jvm_args=[f"-javaagent:{agent}=output=none"])
+        try:
+            run = worker.request({"type": "run", "class_name": "CalculatorTest", "classpath": [str(classes)] + classpath, "junit_version": 4,
+                                  "methods": ["testAdd", "testSub"], "coverage_dir": str(coverage_dir)}, timeout=60)
+            exec_files = [run["coverage_files"]["testAdd"], run["coverage_files"]["testSub"]]
+            response = worker.request({"type": "coverage", "jacoco_classpath": jacoco_classpath, "exec_files": exec_files,
+                                       "class_files": [str(classes / "Calculator.class")], "report": True}, timeout=60)
+        finally:
+            worker.stop()
+
+        add, sub = response["coverage"]
+        # lines 4 and 8 are the bodies of add and sub
+        assert 4 in add["Calculator.java"]["covered"] and 8 in add["Calculator.java"]["uncovered"]
+        assert 8 in sub["Calculator.java"]["covered"] and 4 in sub["Calculator.java"]["uncovered"]
+
+        from jacoco_report import find_method, worker_coverage_report
+
+        report = worker_coverage_report(response["reports"][0])
+        assert report.source_files["Calculator.java"].covered_lines == add["Calculator.java"]["covered"]
+        assert find_method(report.classes_of("Calculator.java"), "add(int,int)").to_cov_stat()["line_coverage"] == 100.0
+        assert find_method(report.classes_of("Calculator.java"), "sub(int,int)").to_cov_stat()["line_coverage"] == 0.0
@@ -0,0 +1,154 @@
+"""
+Tests for outcome_cache.py build-outcome reuse.
+"""
+from types import SimpleNamespace
+
+
+def _make_project(tmp_path):
+    project = tmp_path / "spark"
+    (project / "src" / "main" / "java" / "spark").mkdir(parents=True)
+    (project / "src" / "main" / "java" / "spark" / "Foo.java").write_text("package spark;\npublic class Foo {}\n")
+    (project / "src" / "test" / "java" / "spark").mkdir(parents=True)
+    (project / "pom.xml").write_text("<project/>")
+    return project
+
+
+class TestOutcomeKey:
+    def test_whitespace_only_edits_share_a_key(self):
+        from outcome_cache import outcome_key
+
+        path = "/repo/spark/src/test/java/spark/FooTest.java"
+        key = outcome_key("class FooTest {}\n", path, "s", 4, "maven")
+        assert outcome_key("class FooTest {}   \r\n\n", path, "s", 4, "maven") == key
+        assert outcome_key("class FooTest { }\n", path, "s", 4, "maven") != key
+        assert outcome_key("class FooTest {}\n", path, "s", 5, "maven") != key
+        assert outcome_key("class FooTest {}\n", path, "s", 4, "javac") != key
+        assert outcome_key("class FooTest {}\n", path, "other", 4, "maven") != key
+
+    def test_snapshot_ignores_the_generated_test(self, tmp_path):
+        from outcome_cache import project_snapshot
+
+        project = _make_project(tmp_path)
+        test_path = (project / "src" / "test" / "java" / "spark" / "FooTest.java").as_posix()
+        before = project_snapshot(project.as_posix(), test_path)
+
+        (project / "src" / "test" / "java" / "spark" / "FooTest.java").write_text("class FooTest {}")
+        assert project_snapshot(project.as_posix(), test_path) == before
+
+        (project / "src" / "main" / "java" / "spark" / "Foo.java").write_text("package spark;\npublic class Foo { int x; }\n")
+        assert project_snapshot(project.as_posix(), test_path) != before
+
+
+class TestOutcomeCache:
+    def test_persists_and_evicts_least_recently_used(self, tmp_path):
+        from outcome_cache import CachedOutcome, OutcomeCache
+
+        path = (tmp_path / "cache" / "outcomes.sqlite").as_posix()
+        cache = OutcomeCache(path, 2)
+        cache.put("a", "s", CachedOutcome("", "success", {"line_coverage": 1.0}))
+        cache.put("b", "s", CachedOutcome("err", "fail_compile"))
+        assert cache.get("a").coverage == {"line_coverage": 1.0}
+        cache.put("c", "s", CachedOutcome("", "fail_pass"))
+
+        reopened = OutcomeCache(path, 2)
+        assert len(reopened) == 2
+        assert reopened.get("b") is None
+        assert reopened.get("a").test_status == "success"
+        assert reopened.get("c").test_status == "fail_pass"
+
+    def test_entries_of_other_snapshots_are_kept(self, tmp_path):
+        from outcome_cache import CachedOutcome, OutcomeCache
+
+        # e.g. two sessions whose generated tests are in the project at once
+        cache = OutcomeCache((tmp_path / "outcomes.sqlite").as_posix(), 10)
+        cache.put("a", "one", CachedOutcome("", "success"))
+        cache.put("b", "other", CachedOutcome("", "success"))
+        assert cache.get("a").test_status == "success"
+        assert len(cache) == 2
+
+    def test_coverage_is_added_to_a_stored_outcome(self, tmp_path):
+        from outcome_cache import CachedOutcome, OutcomeCache
+
+        cache = OutcomeCache((tmp_path / "outcomes.sqlite").as_posix(), 10)
+        cache.put("a", "s", CachedOutcome("", "success"))
+        cache.put_coverage("a", {"covered_lines": [3]})
+        cache.put_coverage("missing", {"covered_lines": [3]})
+        assert cache.get("a").coverage == {"covered_lines": [3]}
+        assert len(cache) == 1
+
+    def test_disabled_with_zero_entries(self, tmp_path):
+        from outcome_cache import get_outcome_cache
+
+        assert get_outcome_cache((tmp_path / "outcomes.sqlite").as_posix(), 0) is None
+
+
+class TestGeneratorCache:
+    def test_repeated_test_is_not_built_again(self, tmp_path):
+        import generator
+        from test_results import TestRunResult
+
+        project = _make_project(tmp_path)
+        test_path = (project / "src" / "test" / "java" / "spark" / "FooTest.java").as_posix()
+        builds = []
+
+        def compile_and_execute(test_case, path, junit_version):
+            builds.append(test_case)
+            return "", "[INFO] BUILD SUCCESS", True, True
+
+        tester = generator.IntentionTester.__new__(generator.IntentionTester)
+        tester.query_session = None
+        tester.configs = SimpleNamespace(outcome_cache_size=10, outcome_cache_path=(tmp_path / "outcomes.sqlite").as_posix(), runner_mode="maven")
+        tester.test_runner = SimpleNamespace(run_test=lambda *args: TestRunResult(*compile_and_execute(*args)))
+
+        assert tester.run_test_case("class FooTest {}", test_path, 4) == ("", "success")
+        assert tester.run_test_case("class FooTest {}  \n", test_path, 4) == ("", "success")
+        assert len(builds) == 1
+
+        (project / "src" / "main" / "java" / "spark" / "Foo.java").write_text("package spark;\npublic class Foo { int x; }\n")
+        tester.run_test_case("class FooTest {}", test_path, 4)
+        assert len(builds) == 2
+
+    def test_interrupted_builds_are_not_cached(self, tmp_path):
+        import generator
+        from test_results import TestRunResult
+
+        project = _make_project(tmp_path)
+        test_path = (project / "src" / "test" / "java" / "spark" / "FooTest.java").as_posix()
+        builds = []
+
+        def compile_and_execute(test_case, path, junit_version):
+            builds.append(test_case)
+            return "", "[ERROR] The build was terminated: timed out after 600 seconds, the test may never finish\n", True, False
+
+        tester = generator.IntentionTester.__new__(generator.IntentionTester)
+        tester.query_session = None
+        tester.configs = SimpleNamespace(outcome_cache_size=10, outcome_cache_path=(tmp_path / "outcomes.sqlite").as_posix(), runner_mode="maven")
+        tester.test_runner = SimpleNamespace(run_test=lambda *args: TestRunResult(*compile_and_execute(*args)))
+
+        tester.run_test_case("class FooTest {}", test_path, 4)
+        tester.run_test_case("class FooTest {}", test_path, 4)
+        assert len(builds) == 2
+
+    def test_coverage_of_a_repeated_test_is_not_measured_again(self, tmp_path):
+        import generator
+        from test_results import TestRunResult
+
+        project = _make_project(tmp_path)
+        test_path = (project / "src" / "test" / "java" / "spark" / "FooTest.java").as_posix()
+        measured = []
+
+        def collect_coverage(test_case, path):
+            measured.append(test_case)
+            return {"source_file": "spark/Foo.java", "covered_lines": [2], "uncovered_lines": []}
+
+        tester = generator.IntentionTester.__new__(generator.IntentionTester)
+        tester.query_session = None
+        tester.configs = SimpleNamespace(outcome_cache_size=10, outcome_cache_path=(tmp_path / "outcomes.sqlite").as_posix(), runner_mode="maven")
+        tester.test_runner = SimpleNamespace(skip_coverage=True, collect_coverage=collect_coverage,
+                                             run_test=lambda *args: TestRunResult("", "[INFO] BUILD SUCCESS", True, True))
+
+        for _ in range(2):
+            assert tester.run_test_case("class FooTest {}", test_path, 4) == ("", "success")
+            tester.measure_final_coverage("class FooTest {}", test_path, 4)
+            assert tester.final_coverage["covered_lines"] == [2]
+        assert len(measured) == 1
@@ -0,0 +1,140 @@
+"""
+Tests for process_runner.py streaming subprocess output.
+"""
+import sys
+import textwrap
+import time
+
+import pytest
+
+
+FAKE_MAVEN = textwrap.dedent('''
+    import sys, time
+    print("[INFO] Compiling 1 source file", flush=True)
+    print("[ERROR] COMPILATION ERROR : ", flush=True)
+    print("[INFO] -------------------------------------------------------------", flush=True)
+    print("[ERROR] /p/src/test/java/spark/FooTest.java:[3,5] cannot find symbol", flush=True)
+    print("  symbol:   class List", flush=True)
+    print("[INFO] 1 error", flush=True)
+    time.sleep(30)
+    print("[INFO] BUILD FAILURE", flush=True)
+''')
+
+
+class TestBufferBound:
+    def test_keeps_most_recent_output(self):
+        from process_runner import Buffer
+
+        buf = Buffer(max_chars=12)
+        for idx in range(5):
+            buf.append("stdout", f"line{idx}\n")
+
+        assert buf.stdout == "[INFO] (3 earlier lines were dropped)\nline3\nline4\n"
+        assert buf.stderr == ""
+
+
+class TestRunStreaming:
+    def test_collects_both_streams(self):
+        from process_runner import run_streaming
+
+        lines = []
+        result = run_streaming([sys.executable, "-c", "import sys; print('out'); print('err', file=sys.stderr); sys.exit(3)"], ".", on_line=lines.append)
+
+        assert (result.returncode, result.stdout, result.stderr, result.aborted) == (3, "out\n", "err\n", None)
+        assert sorted(lines) == ["err\n", "out\n"]
+
+    def test_abort_kills_process(self, tmp_path):
+        from process_runner import run_streaming
+        from test_case_runner import CompileErrorWatcher
+
+        script = tmp_path / "mvn.py"
+        script.write_text(FAKE_MAVEN)
+        start = time.monotonic()
+
+        result = run_streaming([sys.executable, script.as_posix()], ".", should_abort=CompileErrorWatcher())
+
+        assert time.monotonic() - start < 10
+        assert result.aborted == "compilation failed"
+        assert "cannot find symbol" in result.stdout
+        assert "BUILD FAILURE" not in result.stdout
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="inspects /proc")
+class TestProcessTree:
+    def test_timeout_kills_the_whole_tree(self, tmp_path):
+        from process_runner import run_streaming
+
+        pid_file = tmp_path / "child.pid"
+        # a build whose forked JVM hangs: the child keeps running after its parent is gone
+        script = f"import subprocess, sys, time; child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)']); open({pid_file.as_posix()!r}, 'w').write(str(child.pid)); time.sleep(60)"
+        start = time.monotonic()
+
+        result = run_streaming([sys.executable, "-c", script], ".", timeout=1)
+
+        assert result.timed_out and result.aborted == "timed out after 1 seconds"
+        assert time.monotonic() - start < 10
+        child_pid = int(pid_file.read_text())
+        assert not _is_running(child_pid)
+
+    def test_cancel(self):
+        from process_runner import run_streaming
+
+        start = time.monotonic()
+        result = run_streaming([sys.executable, "-c", "import time; time.sleep(60)"], ".", cancel_check=lambda: time.monotonic() - start > 0.5)
+
+        assert result.cancelled
+        assert time.monotonic() - start < 10
+
+
+def _is_running(pid):
+    import os
+
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        try:
+            # a zombie waiting for its parent counts as gone
+            with open(f"/proc/{pid}/stat") as f:
+                if f.read().split(")")[-1].split()[0] == "Z":
+                    return False
+        except FileNotFoundError:
+            return False
+        time.sleep(0.1)
+    return True
+
+
+class TestRunMaven:
+    def test_forwards_error_lines(self, tmp_path, runner_configs):
+        from test_case_runner import TestCaseRunner, is_compile_failure
+
+        script = tmp_path / "mvn.py"
+        script.write_text(FAKE_MAVEN)
+        runner = TestCaseRunner(runner_configs(), "/tmp")
+        forwarded = []
+        runner.on_build_output = forwarded.append
+
+        build_log = runner.run_maven([sys.executable, script.as_posix()], tmp_path.as_posix())
+
+        assert forwarded == [
+            "[ERROR] COMPILATION ERROR : ",
+            "[ERROR] /p/src/test/java/spark/FooTest.java:[3,5] cannot find symbol",
+            "  symbol:   class List",
+        ]
+        assert is_compile_failure(build_log)
+        assert build_log.rstrip().endswith("[INFO] The build was stopped early: compilation failed")
+
+    def test_timeout_and_cancel(self, tmp_path, runner_configs):
+        from modules.exceptions import GenerationCancelled
+        from test_case_runner import TestCaseRunner
+
+        runner = TestCaseRunner(runner_configs(build_timeout=1), "/tmp")
+        build_log = runner.run_maven([sys.executable, "-c", "print('[INFO] Running spark.FooTest', flush=True); import time; time.sleep(60)"], tmp_path.as_posix())
+        assert "[ERROR] The build was terminated: timed out after 1 seconds" in build_log
+
+        runner = TestCaseRunner(runner_configs(), "/tmp")
+        runner.cancel_check = lambda: True
+        with pytest.raises(GenerationCancelled):
+            runner.run_maven([sys.executable, "-c", "import time; time.sleep(60)"], tmp_path.as_posix())
@@ -0,0 +1,179 @@
+"""
+Tests for test_results.py structured compiler and surefire results.
+"""
+
+MAVEN_COMPILE_LOG = """[INFO] Compiling 1 source file to /p/target/test-classes
+[ERROR] COMPILATION ERROR :
+[INFO] -------------------------------------------------------------
+[ERROR] /p/src/test/java/spark/FooTest.java:[4,9] cannot find symbol
+  symbol:   class List
+  location: class spark.FooTest
+[INFO] 1 error
+[INFO] BUILD FAILURE
+[ERROR] Failed to execute goal org.apache.maven.plugins:maven-compiler-plugin:3.8.1:testCompile (default-testCompile) on project spark: Compilation failure
+[ERROR] /p/src/test/java/spark/FooTest.java:[4,9] cannot find symbol
+[ERROR]   symbol:   class List
+[ERROR]   location: class spark.FooTest
+[ERROR] -> [Help 1]
+"""
+
+SUREFIRE_REPORT = """<?xml version="1.0" encoding="UTF-8"?>
+<testsuite name="spark.FooTest" tests="4" errors="1" skipped="1" failures="1" time="0.05">
+  <properties><property name="java.version" value="1.8"/></properties>
+  <testcase name="testAdd" classname="spark.FooTest" time="0.01"/>
+  <testcase name="testRemove" classname="spark.FooTest" time="0.02">
+    <failure message="expected:&lt;1&gt; but was:&lt;2&gt;" type="java.lang.AssertionError">java.lang.AssertionError: expected:&lt;1&gt; but was:&lt;2&gt;
+	at org.junit.Assert.fail(Assert.java:89)
+	at org.junit.Assert.assertEquals(Assert.java:146)
+	at spark.FooTest.testRemove(FooTest.java:21)
+	at sun.reflect.NativeMethodAccessorImpl.invoke0(Native Method)
+	at org.junit.runners.ParentRunner.run(ParentRunner.java:413)
+	at org.apache.maven.surefire.booter.ForkedBooter.main(ForkedBooter.java:418)
+</failure>
+    <system-out>removing</system-out>
+  </testcase>
+  <testcase name="testGet" classname="spark.FooTest" time="0.01">
+    <error message="boom" type="java.lang.IllegalStateException">java.lang.IllegalStateException: boom
+	at spark.Foo.get(Foo.java:7)
+	at spark.FooTest.testGet(FooTest.java:30)
+	at java.lang.reflect.Method.invoke(Method.java:498)
+Caused by: java.lang.NullPointerException
+	at spark.Foo.load(Foo.java:12)
+	... 24 more
+</error>
+  </testcase>
+  <testcase name="testSkip" classname="spark.FooTest" time="0"><skipped/></testcase>
+</testsuite>
+"""
+
+
+def _write_surefire_report(project_dir, content=SUREFIRE_REPORT):
+    reports = project_dir / "target" / "surefire-reports"
+    reports.mkdir(parents=True, exist_ok=True)
+    (reports / "TEST-spark.FooTest.xml").write_text(content)
+
+
+class TestCompilerDiagnostics:
+    def test_maven_errors_are_reported_once_with_their_details(self):
+        from test_results import parse_compiler_diagnostics
+
+        diagnostics = parse_compiler_diagnostics(MAVEN_COMPILE_LOG)
+
+        assert len(diagnostics) == 1
+        assert diagnostics[0].format() == ("[ERROR] /p/src/test/java/spark/FooTest.java:[4,9] cannot find symbol\n"
+                                           "  symbol:   class List\n"
+                                           "  location: class spark.FooTest")
+
+    def test_javac_errors_take_the_column_from_the_caret(self):
+        from test_results import parse_compiler_diagnostics
+
+        log = ("/p/src/test/java/spark/FooTest.java:4: error: cannot find symbol\n"
+               "        List<String> l;\n"
+               "        ^\n"
+               "  symbol:   class List\n"
+               "1 error\n")
+
+        diagnostics = parse_compiler_diagnostics(log)
+
+        assert [(each.line, each.column, each.details) for each in diagnostics] == [(4, 9, ["  symbol:   class List"])]
+
+
+class TestSurefireReports:
+    def test_outcomes_and_trimmed_stack_traces(self, tmp_path):
+        from test_results import read_surefire_reports
+
+        _write_surefire_report(tmp_path)
+
+        outcomes = read_surefire_reports(tmp_path.as_posix(), "spark.FooTest")
+
+        assert [(each.name, each.status) for each in outcomes] == [
+            ("testAdd", "passed"), ("testRemove", "failure"), ("testGet", "error"), ("testSkip", "skipped")]
+        assert outcomes[1].message == "expected:<1> but was:<2>"
+        assert outcomes[1].stack_trace == ("java.lang.AssertionError: expected:<1> but was:<2>\n"
+                                           "\tat spark.FooTest.testRemove(FooTest.java:21)")
+        assert outcomes[2].stack_trace == ("java.lang.IllegalStateException: boom\n"
+                                           "\tat spark.Foo.get(Foo.java:7)\n"
+                                           "\tat spark.FooTest.testGet(FooTest.java:30)\n"
+                                           "Caused by: java.lang.NullPointerException\n"
+                                           "\tat spark.Foo.load(Foo.java:12)")
+
+    def test_missing_or_truncated_report(self, tmp_path):
+        from test_results import read_surefire_reports
+
+        assert read_surefire_reports(tmp_path.as_posix(), "spark.FooTest") is None
+        _write_surefire_report(tmp_path, SUREFIRE_REPORT[:300])
+        assert read_surefire_reports(tmp_path.as_posix(), "spark.FooTest") is None
+
+
+class TestTestRunResult:
+    def test_a_passing_method_makes_the_test_case_succeed(self, tmp_path):
+        from test_results import TestRunResult, read_surefire_reports
+
+        _write_surefire_report(tmp_path)
+        result = TestRunResult("", "[INFO] BUILD FAILURE\n", True, False, test_cases=read_surefire_reports(tmp_path.as_posix(), "spark.FooTest"))
+
+        assert result.counts() == (4, 1, 1, 1)
+        assert result.status == "success"
+        assert result.error_message == ""
+
+    def test_error_message_holds_only_the_failed_methods(self, tmp_path):
+        from test_results import TestRunResult, read_surefire_reports
+
+        _write_surefire_report(tmp_path, SUREFIRE_REPORT.replace('<testcase name="testAdd" classname="spark.FooTest" time="0.01"/>', ""))
+        result = TestRunResult("", "[INFO] BUILD FAILURE\n", True, False, test_cases=read_surefire_reports(tmp_path.as_posix(), "spark.FooTest"))
+
+        assert result.status == "fail_pass"
+        assert result.error_message.splitlines()[:4] == [
+            "[ERROR] Tests run: 3, Failures: 1, Errors: 1, Skipped: 1",
+            "[ERROR] testRemove(spark.FooTest)  <<< FAILURE!",
+            "java.lang.AssertionError: expected:<1> but was:<2>",
+            "\tat spark.FooTest.testRemove(FooTest.java:21)",
+        ]
+        assert "org.junit" not in result.error_message
+
+    def test_logs_are_the_fallback(self):
+        from test_results import TestRunResult
+
+        log = "[INFO] Running spark.FooTest\n[ERROR] Tests run: 1, Failures: 0, Errors: 1, Skipped: 0\n[ERROR] t(spark.FooTest)\n[ERROR] To see the full stack trace\n"
+        result = TestRunResult("", log, True, False)
+
+        assert result.status == "fail_execute"
+        assert result.error_message == "[ERROR] Tests run: 1, Failures: 0, Errors: 1, Skipped: 0\n[ERROR] t(spark.FooTest)"
+        assert TestRunResult(MAVEN_COMPILE_LOG, "", False, False).status == "fail_compile"
+
+
+class TestRunnerResults:
+    def test_incremental_build_reads_surefire_reports(self, tmp_path, monkeypatch, runner_configs):
+        import test_case_runner
+        from process_runner import ProcessResult
+        from test_case_runner import TestCaseRunner
+
+        project = tmp_path / "spark"
+
+        def fake_run(args, cwd, *_args, **_kwargs):
+            _write_surefire_report(project)
+            return ProcessResult(0, "[INFO] Tests run: 4\n[INFO] BUILD FAILURE\n", "")
+
+        monkeypatch.setattr(test_case_runner, "run_streaming", fake_run)
+        runner = TestCaseRunner(runner_configs(runner_mode="incremental", coverage_scope="project", coverage_runs="every_run"), tmp_path.as_posix())
+        path = f"{project.as_posix()}/src/test/java/spark/FooTest.java"
+
+        result = runner.run_test("package spark;\npublic class FooTest {\n@Test public void t() {}\n}", path)
+
+        assert result.compile_success and not result.execute_success
+        assert [each.status for each in result.test_cases] == ["passed", "failure", "error", "skipped"]
+        assert result.status == "success"
+
+    def test_compile_failure_has_diagnostics(self, tmp_path, monkeypatch, runner_configs):
+        import test_case_runner
+        from process_runner import ProcessResult
+        from test_case_runner import TestCaseRunner
+
+        project = tmp_path / "p"
+        monkeypatch.setattr(test_case_runner, "run_streaming", lambda *_args, **_kwargs: ProcessResult(1, MAVEN_COMPILE_LOG, ""))
+        runner = TestCaseRunner(runner_configs(runner_mode="incremental", coverage_scope="project"), tmp_path.as_posix())
+
+        result = runner.run_test("package spark;\npublic class FooTest {\n@Test public void t() {}\n}", f"{project.as_posix()}/src/test/java/spark/FooTest.java")
+
+        assert result.status == "fail_compile"
+        assert [each.message for each in result.diagnostics] == ["cannot find symbol"]
@@ -9,7 +9,7 @@ class TestBuffer:
 
     def test_init_empty(self):
         """Test Buffer initializes with empty stdout and stderr."""
-        from test_case_runner import Buffer
+        from process_runner import Buffer
 
         buf = Buffer()
 
@@ -18,7 +18,7 @@ class TestBuffer:
 
     def test_append_stdout(self):
         """Test appending to stdout."""
-        from test_case_runner import Buffer
+        from process_runner import Buffer
 
         buf = Buffer()
         buf.stdout += "line1\n"
@@ -28,7 +28,7 @@ class TestBuffer:
 
     def test_append_stderr(self):
         """Test appending to stderr."""
-        from test_case_runner import Buffer
+        from process_runner import Buffer
 
         buf = Buffer()
         buf.stderr += "error1\n"
@@ -111,3 +111,233 @@ class TestGetTestCaseRelativePath:
         result = runner.get_test_case_relative_path(path)
 
         assert result == "company.module.service.BarTest"
+
+
+class TestIncrementalRunner:
+    """Test the single non-clean Maven invocation mode."""
+
+    COMPILE_FAILURE_LOG = (
+        "[ERROR] COMPILATION ERROR : \n"
+        "[ERROR] /p/src/test/java/spark/FooTest.java:[3,5] cannot find symbol\n"
+        "[ERROR] Failed to execute goal org.apache.maven.plugins:maven-compiler-plugin:3.8.1:testCompile (default-testCompile) on project spark\n"
+    )
+    TEST_FAILURE_LOG = (
+        "[ERROR] Tests run: 1, Failures: 1, Errors: 0, Skipped: 0\n"
+        "[INFO] BUILD FAILURE\n"
+        "[ERROR] Failed to execute goal org.apache.maven.plugins:maven-surefire-plugin:2.22.2:test (default-test) on project spark\n"
+    )
+
+    def _make_runner(self, monkeypatch, runner_configs, build_log, calls):
+        import test_case_runner
+        from process_runner import ProcessResult
+        from test_case_runner import TestCaseRunner
+
+        def fake_run(args, cwd, *_args, **kwargs):
+            calls.append((args, dict(kwargs, cwd=cwd)))
+            return ProcessResult(0, build_log, "")
+
+        monkeypatch.setattr(test_case_runner, "run_streaming", fake_run)
+        return TestCaseRunner(runner_configs(runner_mode="incremental"), "/tmp")
+
+    def test_is_compile_failure(self):
+        from test_case_runner import is_compile_failure
+
+        assert is_compile_failure(self.COMPILE_FAILURE_LOG)
+        assert not is_compile_failure(self.TEST_FAILURE_LOG)
+        assert not is_compile_failure("[INFO] BUILD SUCCESS")
+
+    def test_single_non_clean_build(self, tmp_path, monkeypatch, runner_configs):
+        calls = []
+        runner = self._make_runner(monkeypatch, runner_configs, "[INFO] BUILD SUCCESS\n", calls)
+        path = (tmp_path / "src" / "test" / "java" / "spark" / "FooTest.java").as_posix()
+
+        result = runner.compile_and_execute_test_case("package spark;\npublic class FooTest {\n@Test public void t() {}\n}", path)
+
+        assert len(calls) == 1
+        assert "clean" not in calls[0][0]
+        assert "verify" in calls[0][0]
+        assert result[2:] == (True, True)
+
+    def test_compile_and_test_failures_are_separated(self, tmp_path, monkeypatch, runner_configs):
+        path = (tmp_path / "src" / "test" / "java" / "spark" / "FooTest.java").as_posix()
+        source = "package spark;\npublic class FooTest {\n@Test public void t() {}\n}"
+
+        runner = self._make_runner(monkeypatch, runner_configs, self.COMPILE_FAILURE_LOG, [])
+        compile_log, test_log, compile_success, execute_success = runner.compile_and_execute_test_case(source, path)
+        assert (compile_success, execute_success) == (False, False)
+        assert "cannot find symbol" in compile_log and test_log == ""
+
+        runner = self._make_runner(monkeypatch, runner_configs, self.TEST_FAILURE_LOG, [])
+        compile_log, test_log, compile_success, execute_success = runner.compile_and_execute_test_case(source, path)
+        assert (compile_success, execute_success) == (True, False)
+        assert "Failures: 1" in test_log
+
+    def test_stale_outputs_removed(self, tmp_path):
+        from test_case_runner import TestCaseRunner
+
+        project = tmp_path / "proj"
+        classes = project / "target" / "test-classes" / "spark"
+        classes.mkdir(parents=True)
+        (classes / "FooTest.class").write_text("")
+        (classes / "FooTest$1.class").write_text("")
+        (classes / "OtherTest.class").write_text("")
+        reports = project / "target" / "surefire-reports"
+        reports.mkdir()
+        (reports / "TEST-spark.FooTest.xml").write_text("")
+        (project / "target" / "jacoco.exec").write_text("")
+        (project / "target" / "site" / "jacoco").mkdir(parents=True)
+
+        runner = TestCaseRunner.__new__(TestCaseRunner)
+        runner.remove_stale_test_outputs(project.as_posix(), f"{project.as_posix()}/src/test/java/spark/FooTest.java")
+
+        assert sorted(p.name for p in classes.iterdir()) == ["OtherTest.class"]
+        assert list(reports.iterdir()) == []
+        assert not (project / "target" / "jacoco.exec").exists()
+        assert not (project / "target" / "site" / "jacoco").exists()
+
+
+class TestExecutionScheduler:
+    def test_bounds_parallel_builds(self):
+        import threading
+        import time
+        from test_case_runner import ExecutionScheduler
+
+        scheduler = ExecutionScheduler(2)
+        lock = threading.Lock()
+        running, peak = [0], [0]
+
+        def build():
+            with scheduler.slot():
+                with lock:
+                    running[0] += 1
+                    peak[0] = max(peak[0], running[0])
+                time.sleep(0.05)
+                with lock:
+                    running[0] -= 1
+
+        threads = [threading.Thread(target=build) for _ in range(6)]
+        for each in threads:
+            each.start()
+        for each in threads:
+            each.join(5)
+
+        assert peak[0] == 2
+
+    def test_interactive_builds_go_first(self):
+        import threading
+        import time
+        from test_case_runner import ExecutionScheduler, PRIORITY_BATCH, PRIORITY_INTERACTIVE
+
+        scheduler = ExecutionScheduler(1)
+        order, events = [], []
+
+        def build(name, priority):
+            with scheduler.slot(priority, lambda status, info: events.append((name, status, info))):
+                order.append(name)
+
+        with scheduler.slot():
+            threads = []
+            for name, priority in [("batch-1", PRIORITY_BATCH), ("batch-2", PRIORITY_BATCH), ("session", PRIORITY_INTERACTIVE)]:
+                threads.append(threading.Thread(target=build, args=(name, priority)))
+                threads[-1].start()
+                while scheduler.n_waiting() < len(threads):
+                    time.sleep(0.01)
+        for each in threads:
+            each.join(5)
+
+        assert order == ["session", "batch-1", "batch-2"]
+        assert ("session", "queued", {"position": 1, "parallelism": 1}) in events
+        running = [info for name, status, info in events if name == "session" and status == "running"]
+        assert running[0]["queue_wait"] >= 0
+
+    def test_cancel_leaves_the_queue(self):
+        import threading
+        import time
+        import pytest
+        from modules.exceptions import GenerationCancelled
+        from test_case_runner import ExecutionScheduler
+
+        scheduler = ExecutionScheduler(1)
+        cancelled = threading.Event()
+        errors = []
+
+        def queued_build():
+            try:
+                with scheduler.slot(cancel_check=cancelled.is_set):
+                    pass
+            except GenerationCancelled as e:
+                errors.append(e)
+
+        with scheduler.slot():
+            waiter = threading.Thread(target=queued_build)
+            waiter.start()
+            while scheduler.n_waiting() == 0:
+                time.sleep(0.01)
+            cancelled.set()
+            waiter.join(5)
+            assert len(errors) == 1
+            assert scheduler.n_waiting() == 0
+
+        # the slot of the first build is free again
+        with scheduler.slot():
+            pass
+
+
+class TestOfflineMaven:
+    """Test the go-offline preparation and the offline builds after it."""
+
+    def _fake_maven(self, monkeypatch, returncode=0):
+        import subprocess
+        import maven_utils
+
+        calls = []
+
+        def fake_run(args, cwd, **_kwargs):
+            calls.append(args)
+            return subprocess.CompletedProcess(args, returncode, "", "")
+
+        monkeypatch.setattr(maven_utils.subprocess, "run", fake_run)
+        return calls
+
+    def test_prepared_once_per_pom(self, tmp_path, monkeypatch):
+        from maven_utils import maven_mode_args
+
+        calls = self._fake_maven(monkeypatch)
+        (tmp_path / "pom.xml").write_text("<project/>")
+        repository = (tmp_path / "m2").as_posix()
+
+        assert maven_mode_args(tmp_path.as_posix(), True, repository) == [f"-Dmaven.repo.local={repository}", "--offline"]
+        assert maven_mode_args(tmp_path.as_posix(), True, repository)[-1] == "--offline"
+        assert [each[2] for each in calls] == ["dependency:go-offline", "verify"]
+
+        (tmp_path / "pom.xml").write_text("<project><dependencies/></project>")
+        maven_mode_args(tmp_path.as_posix(), True, repository)
+        assert len(calls) == 4
+
+    def test_failed_preparation_builds_online(self, tmp_path, monkeypatch):
+        from maven_utils import maven_mode_args
+
+        calls = self._fake_maven(monkeypatch, returncode=1)
+        (tmp_path / "pom.xml").write_text("<project/>")
+
+        assert maven_mode_args(tmp_path.as_posix(), True, (tmp_path / "m2").as_posix())[-1] != "--offline"
+        assert maven_mode_args(tmp_path.as_posix(), False) == []
+        assert len(calls) == 1
+
+    def test_runner_builds_offline(self, tmp_path, monkeypatch, runner_configs):
+        import test_case_runner
+        from process_runner import ProcessResult
+        from test_case_runner import TestCaseRunner
+
+        self._fake_maven(monkeypatch)
+        project = tmp_path / "spark"
+        project.mkdir()
+        (project / "pom.xml").write_text("<project/>")
+        builds = []
+        monkeypatch.setattr(test_case_runner, "run_streaming", lambda args, *_args, **_kwargs: builds.append(args) or ProcessResult(0, "[INFO] BUILD SUCCESS\n", ""))
+        configs = runner_configs(runner_mode="incremental", maven_offline=True, maven_local_repository=(tmp_path / "m2").as_posix())
+
+        TestCaseRunner(configs, tmp_path.as_posix()).compile_and_execute_test_case(
+            "package spark;\npublic class FooTest {\n@Test public void t() {}\n}", f"{project.as_posix()}/src/test/java/spark/FooTest.java")
+
+        assert builds[0][-1] == "--offline"
@@ -0,0 +1,132 @@
+"""
+Tests for workspace_pool.py per-session workspaces.
+"""
+import os
+import threading
+
+import pytest
+
+
+def _make_base(tmp_path):
+    base = tmp_path / "repos" / "spark"
+    (base / "src" / "main" / "java" / "spark").mkdir(parents=True)
+    (base / "src" / "main" / "java" / "spark" / "Foo.java").write_text("package spark;\npublic class Foo {}\n")
+    (base / "src" / "test" / "java" / "spark").mkdir(parents=True)
+    (base / "src" / "test" / "java" / "spark" / "BarTest.java").write_text("package spark;\npublic class BarTest {}\n")
+    (base / "pom.xml").write_text("<project/>")
+    (base / "target").mkdir()
+    (base / "target" / "stale.class").write_text("")
+    return base.as_posix()
+
+
+class TestWorkspace:
+    @pytest.mark.parametrize("method", ["hardlink", "copy"])
+    def test_writes_do_not_leak_into_base(self, tmp_path, method):
+        from workspace_pool import WorkspacePool
+
+        base = _make_base(tmp_path)
+        pool = WorkspacePool(base, (tmp_path / "pool").as_posix(), 1, method)
+
+        with pool.checkout() as workspace:
+            assert workspace.root.endswith("/ws-0/spark")
+            assert not os.path.exists(f"{workspace.root}/target")
+            existing = workspace.map_path(f"{base}/src/test/java/spark/BarTest.java")
+            generated = workspace.map_path(f"{base}/src/test/java/spark/FooTest.java")
+            workspace.write_file(existing, "changed")
+            workspace.write_file(generated, "generated")
+            assert workspace.unmap_text(f"[ERROR] {generated}:[1,1] x") == f"[ERROR] {base}/src/test/java/spark/FooTest.java:[1,1] x"
+
+        with open(f"{base}/src/test/java/spark/BarTest.java") as f:
+            assert f.read() == "package spark;\npublic class BarTest {}\n"
+        assert not os.path.exists(f"{base}/src/test/java/spark/FooTest.java")
+        # reset after the attempt
+        with open(existing) as f:
+            assert f.read() == "package spark;\npublic class BarTest {}\n"
+        assert not os.path.exists(generated)
+
+    def test_sync_only_touches_changed_files(self, tmp_path):
+        from workspace_pool import WorkspacePool
+
+        base = _make_base(tmp_path)
+        pool = WorkspacePool(base, (tmp_path / "pool").as_posix(), 1, "copy")
+        workspace = pool.acquire()
+        os.makedirs(f"{workspace.root}/target")
+
+        assert workspace.sync() == 0
+        with open(f"{base}/pom.xml", "w") as f:
+            f.write("<project><version>2</version></project>")
+        os.remove(f"{base}/src/test/java/spark/BarTest.java")
+
+        assert workspace.sync() == 2
+        with open(f"{workspace.root}/pom.xml") as f:
+            assert "version" in f.read()
+        assert not os.path.exists(f"{workspace.root}/src/test/java/spark/BarTest.java")
+        # build outputs of the workspace are kept for the next incremental build
+        assert os.path.isdir(f"{workspace.root}/target")
+
+
+class TestWorkspacePool:
+    def test_concurrent_checkouts_get_distinct_workspaces(self, tmp_path):
+        from workspace_pool import WorkspacePool
+
+        pool = WorkspacePool(_make_base(tmp_path), (tmp_path / "pool").as_posix(), 2, "auto")
+        first = pool.acquire()
+        second = pool.acquire()
+        assert first.root != second.root
+        assert pool.clone_method in ("reflink", "hardlink", "copy")
+
+        acquired = []
+        waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+        waiter.start()
+        waiter.join(0.2)
+        assert acquired == []
+
+        pool.release(first)
+        waiter.join(5)
+        assert acquired[0] is first
+
+    @pytest.mark.parametrize("method", ["hardlink", "copy"])
+    def test_changes_to_the_base_reach_an_idle_workspace(self, tmp_path, method):
+        from workspace_pool import WorkspacePool
+
+        base = _make_base(tmp_path)
+        pool = WorkspacePool(base, (tmp_path / "pool").as_posix(), 1, method)
+        with pool.checkout() as workspace:
+            root = workspace.root
+
+        with open(f"{base}/src/main/java/spark/Baz.java", "w") as f:
+            f.write("package spark;\npublic class Baz {}\n")
+        os.remove(f"{base}/src/test/java/spark/BarTest.java")
+        # replaced by a new inode, as an editor saving through a temporary file does
+        os.remove(f"{base}/src/main/java/spark/Foo.java")
+        with open(f"{base}/src/main/java/spark/Foo.java", "w") as f:
+            f.write("package spark;\npublic class Foo { int x; }\n")
+
+        with pool.checkout() as workspace:
+            assert workspace.root == root
+            with open(f"{root}/src/main/java/spark/Foo.java") as f:
+                assert "int x" in f.read()
+            assert os.path.exists(f"{root}/src/main/java/spark/Baz.java")
+            assert not os.path.exists(f"{root}/src/test/java/spark/BarTest.java")
+
+    def test_runner_builds_in_workspace(self, tmp_path, monkeypatch, runner_configs):
+        import test_case_runner
+        from process_runner import ProcessResult
+        from test_case_runner import TestCaseRunner
+
+        base = _make_base(tmp_path)
+        calls = []
+
+        def fake_run(args, cwd, *_args, **_kwargs):
+            calls.append((args, {"cwd": cwd}))
+            return ProcessResult(1, f"[ERROR] COMPILATION ERROR : \n[ERROR] {cwd}/src/test/java/spark/FooTest.java:[3,5] cannot find symbol\n", "")
+
+        monkeypatch.setattr(test_case_runner, "run_streaming", fake_run)
+        configs = runner_configs(runner_mode="incremental", workspace_pool_size=2, workspace_pool_dir=(tmp_path / "pool").as_posix(), workspace_clone="copy")
+        runner = TestCaseRunner(configs, "/tmp")
+
+        compile_log, _, _, _ = runner.compile_and_execute_test_case("package spark;\npublic class FooTest {\n@Test public void t() {}\n}", f"{base}/src/test/java/spark/FooTest.java")
+
+        assert calls[0][1]["cwd"] == f"{tmp_path.as_posix()}/pool/ws-0/spark"
+        assert f"[ERROR] {base}/src/test/java/spark/FooTest.java:[3,5]" in compile_log
+        assert not os.path.exists(f"{base}/src/test/java/spark/FooTest.java")
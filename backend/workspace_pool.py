@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import contextlib
+import errno
+import os
+import shutil
+import sys
+import threading
+import logging
+from typing import Dict, Iterator, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+CLONE_METHODS = ('auto', 'reflink', 'hardlink', 'copy')
+# build outputs stay private to each workspace (that is what makes its next build incremental), VCS data is never needed
+EXCLUDED_DIRS = ('target', '.git', '.svn', '.idea')
+# ioctl(FICLONE) from linux/fs.h, supported by btrfs, xfs and overlayfs on top of them
+_FICLONE = 0x40049409
+
+
+def _reflink(src: str, dst: str) -> None:
+    if not sys.platform.startswith('linux'):
+        raise OSError(errno.EOPNOTSUPP, 'reflinks are only supported on Linux')
+    import fcntl
+
+    with open(src, 'rb') as src_f, open(dst, 'wb') as dst_f:
+        fcntl.ioctl(dst_f.fileno(), _FICLONE, src_f.fileno())
+    shutil.copystat(src, dst)
+
+
+def clone_file(src: str, dst: str, method: str) -> None:
+    if method == 'reflink':
+        _reflink(src, dst)
+    elif method == 'hardlink':
+        os.link(src, dst)
+    else:
+        shutil.copy2(src, dst)
+
+
+def write_file(path: str, content: str) -> None:
+    """Write through a new inode, so a hardlinked workspace file never changes the base tree."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.lexists(path):
+        os.remove(path)
+    with open(path, 'w', encoding='utf8') as f:
+        f.write(content)
+
+
+def list_tree(root: str) -> Dict[str, os.stat_result]:
+    files = {}
+    for dir_path, dirs, file_names in os.walk(root):
+        dirs[:] = [each for each in dirs if each not in EXCLUDED_DIRS]
+        for file_name in file_names:
+            path = os.path.join(dir_path, file_name)
+            files[os.path.relpath(path, root)] = os.stat(path)
+    return files
+
+
+class Workspace:
+    """A private copy of the base project tree; files are cloned from the base and only what an attempt wrote is reset."""
+
+    def __init__(self, base_dir: str, root: str, clone_method: str, slot: int = 0) -> None:
+        self.base_dir = base_dir
+        self.root = root
+        self.clone_method = clone_method
+        self.slot = slot
+        self.dirty: Set[str] = set()
+
+    def map_path(self, base_path: str) -> str:
+        rel_path = os.path.relpath(base_path, self.base_dir)
+        if rel_path.startswith(os.pardir):
+            raise ValueError(f'{base_path} is not inside {self.base_dir}')
+        return os.path.join(self.root, rel_path).replace('\\', '/')
+
+    def unmap_text(self, text: str) -> str:
+        # logs mention the workspace, the rest of the pipeline (and the LLM) only knows the base tree
+        return text.replace(self.root, self.base_dir)
+
+    def write_file(self, path: str, content: str) -> None:
+        write_file(path, content)
+        self.dirty.add(os.path.relpath(path, self.root))
+
+    def _clone(self, rel_path: str) -> None:
+        dst = os.path.join(self.root, rel_path)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        if os.path.lexists(dst):
+            os.remove(dst)
+        clone_file(os.path.join(self.base_dir, rel_path), dst, self.clone_method)
+
+    def _is_current(self, rel_path: str, base_stat: os.stat_result) -> bool:
+        try:
+            stat = os.stat(os.path.join(self.root, rel_path))
+        except FileNotFoundError:
+            return False
+        if self.clone_method == 'hardlink':
+            return (stat.st_ino, stat.st_dev) == (base_stat.st_ino, base_stat.st_dev)
+        return (stat.st_size, stat.st_mtime_ns) == (base_stat.st_size, base_stat.st_mtime_ns)
+
+    def sync(self) -> int:
+        """Make the workspace match the base tree, touching only files that differ; returns the number of changed files."""
+        base_files = list_tree(self.base_dir)
+        workspace_files = list_tree(self.root) if os.path.isdir(self.root) else {}
+        changed = 0
+        for rel_path in workspace_files.keys() - base_files.keys():
+            os.remove(os.path.join(self.root, rel_path))
+            changed += 1
+        for rel_path, base_stat in base_files.items():
+            if not self._is_current(rel_path, base_stat):
+                self._clone(rel_path)
+                changed += 1
+        self.dirty.clear()
+        return changed
+
+    def reset(self) -> None:
+        """Undo what the last attempt wrote: restore files of the base tree and delete new ones."""
+        for rel_path in self.dirty:
+            if os.path.exists(os.path.join(self.base_dir, rel_path)):
+                self._clone(rel_path)
+            elif os.path.lexists(os.path.join(self.root, rel_path)):
+                os.remove(os.path.join(self.root, rel_path))
+        self.dirty.clear()
+
+
+class WorkspacePool:
+    """At most `size` workspaces of one base tree, each used by a single attempt at a time."""
+
+    def __init__(self, base_dir: str, pool_dir: str, size: int, clone_method: str = 'auto') -> None:
+        assert size > 0, 'a workspace pool needs at least one workspace'
+        assert clone_method in CLONE_METHODS, f'Unknown clone method: {clone_method}'
+        self.base_dir = base_dir.replace('\\', '/').rstrip('/')
+        self.pool_dir = pool_dir
+        self.size = size
+        self.clone_method = clone_method
+        self._idle: List[Workspace] = []
+        self._free_slots = list(range(size - 1, -1, -1))
+        self._condition = threading.Condition()
+
+    def _detect_clone_method(self) -> str:
+        # the cheapest method that works between the base tree and the pool directory
+        probe_src = next((os.path.join(self.base_dir, rel_path) for rel_path in list_tree(self.base_dir)), None)
+        if probe_src is None:
+            return 'copy'
+        probe_dst = os.path.join(self.pool_dir, '.clone-probe')
+        for method in ('reflink', 'hardlink'):
+            try:
+                clone_file(probe_src, probe_dst, method)
+                return method
+            except OSError:
+                continue
+            finally:
+                if os.path.lexists(probe_dst):
+                    os.remove(probe_dst)
+        return 'copy'
+
+    def _create(self, slot: int) -> Workspace:
+        os.makedirs(self.pool_dir, exist_ok=True)
+        if self.clone_method == 'auto':
+            self.clone_method = self._detect_clone_method()
+            logger.info(f'Workspaces of {self.base_dir} are cloned with: {self.clone_method}')
+        # keep the project directory name, paths are matched against it elsewhere
+        root = f'{self.pool_dir}/ws-{slot}/{os.path.basename(self.base_dir)}'.replace('\\', '/')
+        workspace = Workspace(self.base_dir, root, self.clone_method, slot)
+        logger.info(f'Preparing workspace {root}: {workspace.sync()} files cloned')
+        return workspace
+
+    def acquire(self) -> Workspace:
+        with self._condition:
+            while not self._idle and not self._free_slots:
+                self._condition.wait()
+            workspace = self._idle.pop() if self._idle else None
+            slot = workspace.slot if workspace is not None else self._free_slots.pop()
+        if workspace is not None:
+            try:
+                # the base tree may have changed since the workspace was last used; cheap when it has not
+                workspace.sync()
+                return workspace
+            except OSError:
+                logger.error(f'Failed to sync workspace {workspace.root}, preparing it again', exc_info=True)
+        try:
+            return self._create(slot)
+        except Exception:
+            self._free_slot(slot)
+            raise
+
+    def _free_slot(self, slot: int) -> None:
+        with self._condition:
+            self._free_slots.append(slot)
+            self._condition.notify()
+
+    def release(self, workspace: Workspace) -> None:
+        try:
+            try:
+                workspace.reset()
+            except OSError as e:
+                logger.warning(f'Failed to reset workspace {workspace.root}, syncing it with the base tree: {e}')
+                workspace.sync()
+        except OSError:
+            # drop it, the slot is refilled with a fresh workspace on demand
+            logger.error(f'Failed to sync workspace {workspace.root}, it is discarded', exc_info=True)
+            self._free_slot(workspace.slot)
+            return
+        with self._condition:
+            self._idle.append(workspace)
+            self._condition.notify()
+
+    @contextlib.contextmanager
+    def checkout(self) -> Iterator[Workspace]:
+        workspace = self.acquire()
+        try:
+            yield workspace
+        finally:
+            self.release(workspace)
+
+
+_pools: Dict[str, WorkspacePool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(base_dir: str, pool_dir: str, size: int, clone_method: str = 'auto') -> Optional[WorkspacePool]:
+    # one pool per base tree for the whole server, sessions come and go with their runners
+    if size <= 0:
+        return None
+    with _pools_lock:
+        if pool_dir not in _pools:
+            _pools[pool_dir] = WorkspacePool(base_dir, pool_dir, size, clone_method)
+        return _pools[pool_dir]
@@ -112,6 +112,9 @@ export class TesterSession {
                                     this.activeSessionId = undefined;
                                     this.finishActiveRequest?.();
                                     return;
+                                } else if (msg.type === 'status') {
+                                    // progress of the session, e.g. `queued`/`running` while its build waits for a free slot, `build_output` error lines
+                                    console.log(`Session status: ${msg.data.status}`, msg.data.message);
                                 } else if (msg.type === 'msg' && msg.data.session_id && msg.data.messages) {
                                     if (this.updateMessageCallback) {
                                         this.updateMessageCallback(msg.data.messages);